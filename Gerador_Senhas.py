@@ -1,12 +1,22 @@
 # %% Gerador de Senhas e Criptografador de Arquivos (Versão Aprimorada)
 
-import random
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from cryptography.fernet import Fernet, InvalidToken
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
 import sys  # Adicionado para lidar com os caminhos do PyInstaller
-from ttkthemes import ThemedTk
+import motor_senhas
+import politicas_senha
+import forca_senhas
+import historico
+import busca
+import derivacao_chaves
+import frases_senha
+import metricas
+import vazamentos
+import unicidade
+from lista_virtual import ListaVirtual
+import lote_senhas
+import tarefas
 
 # --- Função para encontrar recursos (ícone) ---
 def resource_path(relative_path):
@@ -19,6 +29,16 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
+# Cor das senhas encontradas no índice de senhas vazadas
+COR_VAZADA = "#a94442"
+
+# Busca nas listas: opção do filtro de força que mostra todas e espera (ms) depois da última tecla
+TODAS_FORCAS = "Todas"
+ATRASO_BUSCA = 150
+
+# Número de núcleos sugerido para as operações de criptografia em paralelo
+NUCLEOS_DISPONIVEIS = os.cpu_count() or 1
+
 # --- Configuração de Tema Persistente ---
 CONFIG_FILE = os.path.join(os.path.expanduser('~'), '.gerador_senhas_tema.cfg')
 DEFAULT_THEME = "arc"
@@ -29,7 +49,7 @@ def save_theme_config(theme_name):
         with open(CONFIG_FILE, 'w') as f:
             f.write(theme_name)
     except IOError:
-        print(f"Aviso: Não foi possível salvar a configuração do tema em {CONFIG_FILE}")
+        metricas.avisar("tema", f"Não foi possível salvar a configuração do tema em {CONFIG_FILE}")
 
 def load_theme_config():
     """Carrega o nome do tema do arquivo de configuração."""
@@ -41,6 +61,25 @@ def load_theme_config():
         except IOError:
             return DEFAULT_THEME
     return DEFAULT_THEME
+
+# Última lista de palavras usada nas frases-senha
+CONFIG_LISTA_PALAVRAS = os.path.join(os.path.expanduser('~'), '.gerador_senhas_palavras.cfg')
+
+def save_wordlist_config(caminho):
+    """Salva o caminho da lista de palavras escolhida."""
+    try:
+        with open(CONFIG_LISTA_PALAVRAS, 'w', encoding='utf-8') as f:
+            f.write(caminho)
+    except IOError:
+        metricas.avisar("frases-senha", f"Não foi possível salvar a lista de palavras em {CONFIG_LISTA_PALAVRAS}")
+
+def load_wordlist_config():
+    """Carrega o caminho da última lista de palavras, ou "" se não houver."""
+    try:
+        with open(CONFIG_LISTA_PALAVRAS, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except IOError:
+        return ""
 # -----------------------------------------
 
 class PasswordGeneratorApp:
@@ -66,7 +105,7 @@ class PasswordGeneratorApp:
             icon_image = tk.PhotoImage(file=icon_path)
             self.root.iconphoto(True, icon_image)
         except Exception as e:
-            print(f"Aviso: Não foi possível carregar o ícone da janela '{icon_path}'. Erro: {e}")
+            metricas.avisar("ícone", f"Não foi possível carregar o ícone da janela '{icon_path}'. Erro: {e}")
             # A aplicação continuará funcionando sem o ícone.
 
         self.root.geometry("700x750")
@@ -75,6 +114,7 @@ class PasswordGeneratorApp:
 
         # --- Estilo e Cores ---
         self.style = ttk.Style()
+        self.estilo_temas = None  # ttkthemes, carregado sob demanda
         self.forca_cores = {
             "Muito Fraca": "#d9534f",
             "Fraca": "#f0ad4e",
@@ -85,22 +125,46 @@ class PasswordGeneratorApp:
         self.configure_styles()
 
         # --- Dados ---
-        self.senhas_geradas = []
-        self.letras = list('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')
-        self.numeros = list('0123456789')
-        self.caracteres_especiais = list('!@#$%^&*()_+-=[]{}|;:\'",.<>?/`~\\')
+        self.senhas_geradas = historico.HistoricoSenhas()
+        self.busca_historico = busca.BuscaSenhas(self.senhas_geradas)
+        self.resultado_historico = None  # posições filtradas pela busca do histórico (None: todas)
+        self._atualizacao_historico = None
+        self._busca_agendada = {}  # lista -> chamada do `after` que refaz a busca
+        self.tarefa_lote = None
+        self.tarefa_indice = None
+        self.tarefa_cripto = None  # criptografia/descriptografia de arquivos e cofres em andamento (uma por vez)
+        self.filtro_vazamentos = None  # índice de senhas vazadas (vazamentos.FiltroVazamentos), se carregado
+        self.registro_sessao = unicidade.RegistroUnicidade()  # senhas já emitidas nesta sessão (nenhuma se repete)
+        self.lista_palavras = None  # lista de palavras das frases-senha (frases_senha.ListaPalavras), se aberta
+        self.cache_chaves = derivacao_chaves.CacheChaves()  # chaves derivadas de senhas mestras, por alguns minutos
         
         # Variáveis de controle
         self.caminho_arquivo_senhas = tk.StringVar()
         self.caminho_arquivo_chave = tk.StringVar()
         self._caminho_completo_senhas = ""
         self._caminho_completo_chave = ""
+        self.fonte_descriptografada = None
+        self._reabrir_fonte = None  # abre de novo o arquivo de senhas atual (para carregá-lo na busca)
+        self.busca_descriptografadas = None  # busca.BuscaSenhas sobre o arquivo inteiro decifrado, quando carregado
+        self.resultado_descriptografadas = None
 
         self.caminho_arquivo_a_criptografar = tk.StringVar()
         self.caminho_arquivo_a_descriptografar = tk.StringVar()
         self.caminho_chave_para_descriptografar = tk.StringVar()
+        self.trabalhadores_var = tk.IntVar(value=NUCLEOS_DISPONIVEIS)
+        self.comprimir_var = tk.BooleanVar(value=True)
+
+        self.caminho_pasta_origem = tk.StringVar()
+        self.caminho_pasta_destino = tk.StringVar()
+        self.caminho_chave_lote = tk.StringVar()
+
+        self.tab_diagnostico = None  # aba oculta, aberta com Ctrl+Shift+D
 
         self.create_widgets()
+        self.root.after(60_000, self.limpar_chaves_expiradas)
+        self.root.bind_all("<Control-D>", self.alternar_diagnostico)
+        if metricas.ativo():
+            self.alternar_diagnostico()
 
     def configure_styles(self):
         """Configura os estilos dos widgets ttk."""
@@ -113,6 +177,7 @@ class PasswordGeneratorApp:
         self.style.configure("TLabelframe.Label", background=theme_bg, font=("Segoe UI", 11, "bold"))
         self.style.configure("Result.TLabel", font=("Courier New", 14, "bold"), padding=5)
         self.style.configure("Header.TLabel", font=("Segoe UI", 14, "bold"))
+        self.style.configure("Accent.TButton", font=("Segoe UI", 10, "bold"))  # Estilo para botões de destaque
 
     def create_menu(self):
         """Cria a barra de menu superior."""
@@ -124,18 +189,45 @@ class PasswordGeneratorApp:
         arquivo_menu.add_command(label="Descriptografar Senhas...", command=lambda: self.notebook.select(self.tab_descriptografar_senhas))
         arquivo_menu.add_command(label="Criptografar/Descriptografar Arquivos...", command=lambda: self.notebook.select(self.tab_arquivos))
         arquivo_menu.add_separator()
+        arquivo_menu.add_command(label="Carregar Índice de Senhas Vazadas...", command=self.carregar_indice_vazadas)
+        arquivo_menu.add_command(label="Criar Índice de Senhas Vazadas...", command=self.criar_indice_vazadas)
+        arquivo_menu.add_separator()
+        arquivo_menu.add_command(label="Esquecer Senhas Mestras", command=self.esquecer_senhas_mestras)
+        arquivo_menu.add_separator()
         arquivo_menu.add_command(label="Sair", command=self.root.destroy)
 
-        tema_menu = tk.Menu(menu_bar, tearoff=0)
-        menu_bar.add_cascade(label="Temas", menu=tema_menu)
-        temas_disponiveis = sorted(self.root.get_themes())
+        # A lista de temas só é montada quando o menu é aberto pela primeira vez
+        self.tema_menu = tk.Menu(menu_bar, tearoff=0, postcommand=self.preencher_menu_temas)
+        menu_bar.add_cascade(label="Temas", menu=self.tema_menu)
+
+    def preencher_menu_temas(self):
+        if self.tema_menu.index(tk.END) is not None:
+            return
+        temas_disponiveis = sorted(self.obter_estilo_temas().get_themes())
         for tema in temas_disponiveis:
-            tema_menu.add_command(label=tema, command=lambda t=tema: self.change_theme(t))
+            self.tema_menu.add_command(label=tema, command=lambda t=tema: self.change_theme(t))
+
+    def obter_estilo_temas(self):
+        """Carrega o ttkthemes sob demanda (ele importa o PIL e registra dezenas de temas)."""
+        if self.estilo_temas is None:
+            from ttkthemes import ThemedStyle
+            self.estilo_temas = ThemedStyle(self.root)
+        return self.estilo_temas
+
+    def aplicar_tema_inicial(self):
+        """Aplica o tema salvo. É chamado depois da primeira pintura da janela, para não atrasá-la."""
+        try:
+            self.obter_estilo_temas().set_theme(load_theme_config())
+        except tk.TclError as e:
+            metricas.avisar("tema", f"Não foi possível aplicar o tema salvo ({e}); usando '{DEFAULT_THEME}'.")
+            self.obter_estilo_temas().set_theme(DEFAULT_THEME)
+            save_theme_config(DEFAULT_THEME)
+        self.configure_styles()
 
     def change_theme(self, theme_name):
         """Muda o tema da aplicação."""
         try:
-            self.root.set_theme(theme_name)
+            self.obter_estilo_temas().set_theme(theme_name)
             self.configure_styles() # Re-aplica os estilos para o novo tema
             save_theme_config(theme_name)
         except tk.TclError:
@@ -156,21 +248,29 @@ class PasswordGeneratorApp:
 
         self.tab_simples = ttk.Frame(self.notebook, padding="15")
         self.tab_custom = ttk.Frame(self.notebook, padding="15")
+        self.tab_frase = ttk.Frame(self.notebook, padding="15")
         self.tab_multiplas = ttk.Frame(self.notebook, padding="15")
         self.tab_descriptografar_senhas = ttk.Frame(self.notebook, padding="15")
         self.tab_arquivos = ttk.Frame(self.notebook, padding="15")
 
         self.notebook.add(self.tab_simples, text="⚡ Gerar Senha Rápida")
         self.notebook.add(self.tab_custom, text="⚙️ Senha Customizável")
+        self.notebook.add(self.tab_frase, text="🔤 Frase-Senha")
         self.notebook.add(self.tab_multiplas, text="📋 Múltiplas Senhas")
         self.notebook.add(self.tab_descriptografar_senhas, text="🔑 Descriptografar Senhas")
         self.notebook.add(self.tab_arquivos, text="📁 Criptografar Arquivos")
 
-        self.create_tab_nivel()
-        self.create_tab_customizavel()
-        self.create_tab_multiplas()
-        self.create_tab_descriptografar_senhas()
-        self.create_tab_arquivos()
+        # As abas são construídas quando selecionadas pela primeira vez; só a inicial é montada agora
+        self.construtores_abas = {
+            str(self.tab_simples): self.create_tab_nivel,
+            str(self.tab_custom): self.create_tab_customizavel,
+            str(self.tab_frase): self.create_tab_frase,
+            str(self.tab_multiplas): self.create_tab_multiplas,
+            str(self.tab_descriptografar_senhas): self.create_tab_descriptografar_senhas,
+            str(self.tab_arquivos): self.create_tab_arquivos,
+        }
+        self.notebook.bind("<<NotebookTabChanged>>", self.construir_aba_selecionada)
+        self.construir_aba_selecionada()
 
         # --- Frame de Resultado Imediato ---
         result_frame = ttk.LabelFrame(main_frame, text="Última Senha Gerada", padding="10")
@@ -191,14 +291,13 @@ class PasswordGeneratorApp:
         # --- Frame Inferior: Lista de senhas geradas ---
         list_frame = ttk.LabelFrame(main_frame, text="Histórico da Sessão", padding="10")
         list_frame.grid(row=2, column=0, sticky="nsew", pady=5)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
         list_frame.columnconfigure(0, weight=1)
-        
-        listbox_scrollbar = ttk.Scrollbar(list_frame)
-        listbox_scrollbar.grid(row=0, column=1, sticky="ns")
-        self.password_listbox = tk.Listbox(list_frame, yscrollcommand=listbox_scrollbar.set, font=("Courier New", 12), selectbackground="#0078d4", selectforeground="white")
-        self.password_listbox.grid(row=0, column=0, sticky="nsew")
-        listbox_scrollbar.config(command=self.password_listbox.yview)
+        self.busca_historico_var, self.forca_historico_var, self.contagem_historico_var = self.criar_barra_busca(list_frame, "historico", self.update_password_listbox)
+
+        # Lista virtualizada: só as linhas visíveis do histórico são desenhadas
+        self.password_listbox = ListaVirtual(list_frame, obter_linhas=self.obter_linhas_historico, font=("Courier New", 12), selectbackground="#0078d4", selectforeground="white")
+        self.password_listbox.grid(row=1, column=0, sticky="nsew")
 
         # --- Frame de Ações da Lista ---
         actions_frame = ttk.Frame(main_frame)
@@ -209,6 +308,10 @@ class PasswordGeneratorApp:
         ttk.Button(actions_frame, text="Salvar como Texto...", command=self.salvar_senhas_nao_criptografadas).grid(row=0, column=2, sticky="ew", padx=2)
         ttk.Button(actions_frame, text="Limpar Histórico", command=self.deletar_senhas).grid(row=0, column=3, sticky="ew", padx=2)
 
+    def construir_aba_selecionada(self, event=None):
+        construtor = self.construtores_abas.pop(self.notebook.select(), None)
+        if construtor: construtor()
+
     # --- Métodos de criação de Abas (Refatorados com Grid) ---
     def create_tab_nivel(self):
         self.nivel_var = tk.StringVar(value="M")
@@ -243,11 +346,52 @@ class PasswordGeneratorApp:
         self.sem_repeticao_var = tk.BooleanVar()
         ttk.Checkbutton(self.tab_custom, text="Sem Repetição de Caracteres", variable=self.sem_repeticao_var).grid(row=4, column=0, columnspan=2, sticky="w", pady=3)
 
-        ttk.Label(self.tab_custom, text="Palavras-chave (opcional):").grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 2))
+        self.sem_ambiguos_var = tk.BooleanVar()
+        ttk.Checkbutton(self.tab_custom, text="Sem Caracteres Ambíguos (0/O, 1/l/I)", variable=self.sem_ambiguos_var).grid(row=5, column=0, columnspan=2, sticky="w", pady=3)
+
+        ttk.Label(self.tab_custom, text="Palavras-chave (opcional):").grid(row=6, column=0, columnspan=2, sticky="w", pady=(10, 2))
         self.palavras_var = ttk.Entry(self.tab_custom)
-        self.palavras_var.grid(row=6, column=0, columnspan=2, sticky="ew", pady=2)
+        self.palavras_var.grid(row=7, column=0, columnspan=2, sticky="ew", pady=2)
+
+        ttk.Button(self.tab_custom, text="Gerar Senha Customizada", command=self.gerar_customizavel, style="Accent.TButton").grid(row=8, column=0, columnspan=2, pady=20, ipadx=10)
+
+    def create_tab_frase(self):
+        self.tab_frase.columnconfigure(1, weight=1)
+
+        self.caminho_lista_palavras = tk.StringVar(value="Nenhuma lista selecionada")
+        ttk.Button(self.tab_frase, text="Lista de Palavras...", command=self.selecionar_lista_palavras).grid(row=0, column=0, sticky="ew", pady=2, padx=(0, 5))
+        ttk.Label(self.tab_frase, textvariable=self.caminho_lista_palavras, relief="sunken", anchor="w").grid(row=0, column=1, sticky="ew", pady=2)
 
-        ttk.Button(self.tab_custom, text="Gerar Senha Customizada", command=self.gerar_customizavel, style="Accent.TButton").grid(row=7, column=0, columnspan=2, pady=20, ipadx=10)
+        self.palavras_frase_var = tk.IntVar(value=frases_senha.PALAVRAS_PADRAO)
+        ttk.Label(self.tab_frase, text="Palavras:").grid(row=1, column=0, sticky="w", pady=5)
+        ttk.Spinbox(self.tab_frase, from_=1, to=20, width=5, textvariable=self.palavras_frase_var).grid(row=1, column=1, sticky="w", pady=5)
+
+        self.separadores_frase_var = tk.StringVar(value=frases_senha.SEPARADORES_PADRAO)
+        ttk.Label(self.tab_frase, text="Separadores:").grid(row=2, column=0, sticky="w", pady=5)
+        separadores_frame = ttk.Frame(self.tab_frase)
+        separadores_frame.grid(row=2, column=1, sticky="w")
+        ttk.Entry(separadores_frame, width=10, textvariable=self.separadores_frase_var).pack(side="left")
+        ttk.Label(separadores_frame, text="(com vários, cada separador é sorteado entre eles)").pack(side="left", padx=5)
+
+        self.capitalizacoes_frase = {"Nenhuma": "nenhuma", "Inicial maiúscula": "primeira", "Tudo maiúsculo": "todas", "Inicial aleatória": "aleatoria"}
+        self.capitalizacao_frase_var = tk.StringVar(value="Nenhuma")
+        ttk.Label(self.tab_frase, text="Capitalização:").grid(row=3, column=0, sticky="w", pady=5)
+        ttk.Combobox(self.tab_frase, state="readonly", width=18, values=list(self.capitalizacoes_frase), textvariable=self.capitalizacao_frase_var).grid(row=3, column=1, sticky="w", pady=5)
+
+        self.digitos_frase_var = tk.IntVar(value=0)
+        ttk.Label(self.tab_frase, text="Dígitos:").grid(row=4, column=0, sticky="w", pady=5)
+        ttk.Spinbox(self.tab_frase, from_=0, to=8, width=5, textvariable=self.digitos_frase_var).grid(row=4, column=1, sticky="w", pady=5)
+
+        self.entropia_frase_var = tk.StringVar()
+        ttk.Label(self.tab_frase, textvariable=self.entropia_frase_var).grid(row=5, column=0, columnspan=2, sticky="w", pady=(10, 0))
+        ttk.Button(self.tab_frase, text="Gerar Frase-Senha", command=self.gerar_frase_senha, style="Accent.TButton").grid(row=6, column=0, columnspan=2, pady=20, ipadx=10)
+
+        for var in (self.palavras_frase_var, self.separadores_frase_var, self.capitalizacao_frase_var, self.digitos_frase_var):
+            var.trace_add("write", lambda *_: self.atualizar_entropia_frase())
+        caminho = load_wordlist_config()
+        if caminho and os.path.exists(caminho):
+            self.abrir_lista_palavras(caminho, avisar=False)
+        self.atualizar_entropia_frase()
 
     def create_tab_multiplas(self):
         self.tab_multiplas.columnconfigure(1, weight=1)
@@ -272,11 +416,25 @@ class PasswordGeneratorApp:
         
         ttk.Button(self.tab_multiplas, text="Gerar Múltiplas Senhas", command=self.gerar_multiplas_senhas, style="Accent.TButton").grid(row=4, column=0, columnspan=2, pady=25, ipadx=10)
 
+        # --- Lotes grandes: gerados em segundo plano direto para um arquivo ---
+        lote_frame = ttk.LabelFrame(self.tab_multiplas, text="Lote Grande (direto para arquivo)", padding="10")
+        lote_frame.grid(row=5, column=0, columnspan=2, sticky="ew")
+        lote_frame.columnconfigure(0, weight=1)
+        ttk.Label(lote_frame, text="Sem limite de quantidade; as senhas não entram no histórico da sessão.").grid(row=0, column=0, columnspan=2, sticky="w")
+        self.botao_lote_arquivo = ttk.Button(lote_frame, text="Gerar Lote para Arquivo...", command=self.gerar_lote_para_arquivo)
+        self.botao_lote_arquivo.grid(row=1, column=0, sticky="w", pady=5)
+        self.botao_cancelar_lote = ttk.Button(lote_frame, text="Cancelar", command=self.cancelar_lote_arquivo, state="disabled")
+        self.botao_cancelar_lote.grid(row=1, column=1, sticky="e", pady=5)
+        self.progresso_lote = ttk.Progressbar(lote_frame, mode="determinate")
+        self.progresso_lote.grid(row=2, column=0, columnspan=2, sticky="ew")
+        self.status_lote_var = tk.StringVar()
+        ttk.Label(lote_frame, textvariable=self.status_lote_var).grid(row=3, column=0, columnspan=2, sticky="w")
+
     def create_tab_descriptografar_senhas(self):
         self.tab_descriptografar_senhas.columnconfigure(1, weight=1)
         self.tab_descriptografar_senhas.rowconfigure(2, weight=1)
 
-        ttk.Button(self.tab_descriptografar_senhas, text="Selecionar Arquivo de Senhas (.txt)", command=self.selecionar_arquivo_senhas).grid(row=0, column=0, sticky='ew', padx=(0,5), pady=5)
+        ttk.Button(self.tab_descriptografar_senhas, text="Selecionar Arquivo de Senhas (.cofre/.txt)", command=self.selecionar_arquivo_senhas).grid(row=0, column=0, sticky='ew', padx=(0,5), pady=5)
         ttk.Label(self.tab_descriptografar_senhas, textvariable=self.caminho_arquivo_senhas, relief="sunken", anchor="w").grid(row=0, column=1, sticky='ew', pady=5)
         
         ttk.Button(self.tab_descriptografar_senhas, text="Selecionar Arquivo de Chave (.key)", command=self.selecionar_arquivo_chave).grid(row=1, column=0, sticky='ew', padx=(0,5), pady=5)
@@ -286,14 +444,14 @@ class PasswordGeneratorApp:
         
         list_frame = ttk.LabelFrame(self.tab_descriptografar_senhas, text="Senhas Descriptografadas", padding="10")
         list_frame.grid(row=2, column=0, columnspan=2, sticky="nsew", pady=10)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
         list_frame.columnconfigure(0, weight=1)
-        
-        scrollbar = ttk.Scrollbar(list_frame)
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        self.decrypted_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, font=("Courier New", 12))
-        self.decrypted_listbox.grid(row=0, column=0, sticky="nsew")
-        scrollbar.config(command=self.decrypted_listbox.yview)
+        self.busca_descriptografadas_var, self.forca_descriptografadas_var, self.contagem_descriptografadas_var = self.criar_barra_busca(
+            list_frame, "descriptografadas", self.aplicar_filtro_descriptografadas)
+
+        # Lista virtualizada: só as linhas visíveis são decifradas e desenhadas
+        self.decrypted_listbox = ListaVirtual(list_frame, font=("Courier New", 12))
+        self.decrypted_listbox.grid(row=1, column=0, columnspan=2, sticky="nsew")
         
         ttk.Button(self.tab_descriptografar_senhas, text="Copiar Senha Selecionada", command=self.copiar_senha_descriptografada).grid(row=3, column=0, columnspan=2, pady=(5,0))
     
@@ -303,24 +461,48 @@ class PasswordGeneratorApp:
         
         tab_cript = ttk.Frame(notebook_arquivos, padding="15")
         tab_descript = ttk.Frame(notebook_arquivos, padding="15")
+        tab_pasta = ttk.Frame(notebook_arquivos, padding="15")
         notebook_arquivos.add(tab_cript, text="Criptografar Arquivo")
         notebook_arquivos.add(tab_descript, text="Descriptografar Arquivo")
+        notebook_arquivos.add(tab_pasta, text="Criptografar Pasta")
 
         # Aba de Criptografia
         tab_cript.columnconfigure(1, weight=1)
         ttk.Label(tab_cript, text="Selecione um arquivo para criptografar:").grid(row=0, column=0, columnspan=2, sticky='w', pady=(0, 10))
         ttk.Button(tab_cript, text="Selecionar Arquivo...", command=self.selecionar_arquivo_para_criptografar).grid(row=1, column=0, sticky='ew', padx=(0, 5))
         ttk.Label(tab_cript, textvariable=self.caminho_arquivo_a_criptografar, relief="sunken", anchor="w").grid(row=1, column=1, sticky='ew')
-        ttk.Button(tab_cript, text="Criptografar Arquivo Selecionado", command=self.executar_criptografia_arquivo, style="Accent.TButton").grid(row=2, column=0, columnspan=2, pady=20)
+        ttk.Label(tab_cript, text="Núcleos de processamento:").grid(row=2, column=0, sticky='w', pady=(10, 0))
+        ttk.Spinbox(tab_cript, from_=1, to=max(64, NUCLEOS_DISPONIVEIS), width=5, textvariable=self.trabalhadores_var).grid(row=2, column=1, sticky='w', pady=(10, 0))
+        ttk.Checkbutton(tab_cript, text="Comprimir antes de criptografar (ignorado em arquivos já comprimidos)", variable=self.comprimir_var).grid(row=3, column=0, columnspan=2, sticky='w', pady=(10, 0))
+        ttk.Button(tab_cript, text="Criptografar Arquivo Selecionado", command=self.executar_criptografia_arquivo, style="Accent.TButton").grid(row=4, column=0, columnspan=2, pady=20)
 
         # Aba de Descriptografia
         tab_descript.columnconfigure(1, weight=1)
-        ttk.Label(tab_descript, text="Selecione os arquivos para descriptografar:").grid(row=0, column=0, columnspan=2, sticky='w', pady=(0, 10))
+        ttk.Label(tab_descript, text="Selecione os arquivos para descriptografar (arquivos protegidos por senha mestra não precisam de chave):").grid(row=0, column=0, columnspan=2, sticky='w', pady=(0, 10))
         ttk.Button(tab_descript, text="Arquivo Criptografado (.enc)...", command=self.selecionar_arquivo_para_descriptografar).grid(row=1, column=0, sticky='ew', pady=2, padx=(0, 5))
         ttk.Label(tab_descript, textvariable=self.caminho_arquivo_a_descriptografar, relief="sunken", anchor="w").grid(row=1, column=1, sticky='ew', pady=2)
         ttk.Button(tab_descript, text="Arquivo de Chave (.key)...", command=self.selecionar_chave_para_descriptografar).grid(row=2, column=0, sticky='ew', pady=2, padx=(0, 5))
         ttk.Label(tab_descript, textvariable=self.caminho_chave_para_descriptografar, relief="sunken", anchor="w").grid(row=2, column=1, sticky='ew', pady=2)
-        ttk.Button(tab_descript, text="Descriptografar Arquivo", command=self.executar_descriptografia_arquivo, style="Accent.TButton").grid(row=3, column=0, columnspan=2, pady=20)
+        ttk.Label(tab_descript, text="Núcleos de processamento:").grid(row=3, column=0, sticky='w', pady=(10, 0))
+        ttk.Spinbox(tab_descript, from_=1, to=max(64, NUCLEOS_DISPONIVEIS), width=5, textvariable=self.trabalhadores_var).grid(row=3, column=1, sticky='w', pady=(10, 0))
+        botoes_descript = ttk.Frame(tab_descript)
+        botoes_descript.grid(row=4, column=0, columnspan=2, pady=20)
+        ttk.Button(botoes_descript, text="Descriptografar Arquivo", command=self.executar_descriptografia_arquivo, style="Accent.TButton").pack(side="left", padx=5)
+        ttk.Button(botoes_descript, text="Verificar Integridade", command=self.executar_verificacao_arquivo).pack(side="left", padx=5)
+
+        # Aba de Criptografia em Lote (pasta inteira, com manifesto retomável)
+        tab_pasta.columnconfigure(1, weight=1)
+        ttk.Label(tab_pasta, text="Criptografe uma pasta inteira. Repetir sobre o mesmo destino retoma o lote.").grid(row=0, column=0, columnspan=2, sticky='w', pady=(0, 10))
+        ttk.Button(tab_pasta, text="Pasta de Origem...", command=self.selecionar_pasta_origem).grid(row=1, column=0, sticky='ew', pady=2, padx=(0, 5))
+        ttk.Label(tab_pasta, textvariable=self.caminho_pasta_origem, relief="sunken", anchor="w").grid(row=1, column=1, sticky='ew', pady=2)
+        ttk.Button(tab_pasta, text="Pasta de Destino...", command=self.selecionar_pasta_destino).grid(row=2, column=0, sticky='ew', pady=2, padx=(0, 5))
+        ttk.Label(tab_pasta, textvariable=self.caminho_pasta_destino, relief="sunken", anchor="w").grid(row=2, column=1, sticky='ew', pady=2)
+        ttk.Button(tab_pasta, text="Chave Existente (.key)...", command=self.selecionar_chave_lote).grid(row=3, column=0, sticky='ew', pady=2, padx=(0, 5))
+        ttk.Label(tab_pasta, textvariable=self.caminho_chave_lote, relief="sunken", anchor="w").grid(row=3, column=1, sticky='ew', pady=2)
+        ttk.Label(tab_pasta, text="Núcleos de processamento:").grid(row=4, column=0, sticky='w', pady=(10, 0))
+        ttk.Spinbox(tab_pasta, from_=1, to=max(64, NUCLEOS_DISPONIVEIS), width=5, textvariable=self.trabalhadores_var).grid(row=4, column=1, sticky='w', pady=(10, 0))
+        ttk.Checkbutton(tab_pasta, text="Comprimir antes de criptografar (ignorado em arquivos já comprimidos)", variable=self.comprimir_var).grid(row=5, column=0, columnspan=2, sticky='w', pady=(10, 0))
+        ttk.Button(tab_pasta, text="Criptografar Pasta", command=self.executar_criptografia_pasta, style="Accent.TButton").grid(row=6, column=0, columnspan=2, pady=20)
 
 
     # --- Lógica de Geração ---
@@ -339,27 +521,24 @@ class PasswordGeneratorApp:
             self.incluir_num_var.set(True)
             self.incluir_especiais_var.set(True)
 
-    def gerar_senha(self, tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False):
-        caracteres = []
-        if usar_letras: caracteres.extend(self.letras)
-        if usar_numeros: caracteres.extend(self.numeros)
-        if usar_especiais: caracteres.extend(self.caracteres_especiais)
-        if not caracteres:
-            messagebox.showerror("Erro", "Nenhum conjunto de caracteres selecionado.")
+    def gerar_lote_unico(self, quantidade, politica, registrar=True):
+        """Sorteia senhas da política, fora do índice de vazadas e (com `registrar`) nunca emitidas antes nesta sessão."""
+        senhas = politica.gerar(quantidade)
+        rejeitar = lote_senhas.combinar_rejeicoes(self.filtro_vazamentos, self.registro_sessao if registrar else None)
+        if rejeitar is not None:
+            motor_senhas.substituir_rejeitadas_com(senhas, rejeitar, politica.gerar)
+        return senhas
+
+    def gerar_senha(self, politica, registrar=True):
+        try:
+            return self.gerar_lote_unico(1, politica, registrar)[0]
+        except ValueError as e:
+            messagebox.showerror("Erro de Geração", str(e))
             return None
-        if sem_repeticao:
-            if tamanho > len(caracteres):
-                messagebox.showerror("Erro de Geração", f"Não é possível gerar uma senha de tamanho {tamanho} sem repetição com os caracteres selecionados (máx: {len(caracteres)}).")
-                return None
-            return ''.join(random.sample(caracteres, tamanho))
-        else:
-            return ''.join(random.choice(caracteres) for _ in range(tamanho))
 
     def gerar_por_nivel(self):
-        nivel = self.nivel_var.get()
-        config = { "B": {"tamanho": 8, "num": False, "esp": False}, "M": {"tamanho": 10, "num": True, "esp": False}, "A": {"tamanho": 14, "num": True, "esp": True}, "D": {"tamanho": 20, "num": True, "esp": True} }
-        c = config[nivel]
-        senha = self.gerar_senha(c["tamanho"], usar_numeros=c["num"], usar_especiais=c["esp"])
+        # A política do nível garante cada classe de caracteres, então a força nunca cai abaixo da do nível
+        senha = self.gerar_senha(politicas_senha.politica_do_nivel(self.nivel_var.get()))
         if senha: self.adicionar_senha_lista(senha)
 
     def gerar_customizavel(self):
@@ -375,16 +554,90 @@ class PasswordGeneratorApp:
         if tamanho_palavras >= tamanho:
             messagebox.showerror("Erro", "O tamanho total das palavras-chave não pode ser maior ou igual ao tamanho da senha.")
             return
+        if self.filtro_vazamentos is not None:
+            vazadas = [p for p in palavras if self.filtro_vazamentos.comprometida(p)]
+            if vazadas:
+                messagebox.showerror("Palavra-chave Vazada", f"Estas palavras-chave aparecem no índice de senhas vazadas e não devem ser usadas: {', '.join(vazadas)}")
+                return
 
         tamanho_aleatorio = tamanho - tamanho_palavras
-        senha_aleatoria = self.gerar_senha(tamanho_aleatorio, usar_numeros=self.incluir_num_var.get(), usar_especiais=self.incluir_especiais_var.get(), sem_repeticao=self.sem_repeticao_var.get())
-        
-        if senha_aleatoria:
+        try:
+            politica = politicas_senha.politica_das_opcoes(tamanho_aleatorio, usar_numeros=self.incluir_num_var.get(), usar_especiais=self.incluir_especiais_var.get(),
+                                                           sem_repeticao=self.sem_repeticao_var.get(), sem_ambiguos=self.sem_ambiguos_var.get())
+        except ValueError as e:
+            messagebox.showerror("Erro de Geração", str(e))
+            return
+        # Só a senha final entra no registro da sessão; se ela já foi emitida, sorteia de novo
+        for _ in range(100):
+            senha_aleatoria = self.gerar_senha(politica, registrar=False)
+            if not senha_aleatoria:
+                return
             senha_final_lista = list(senha_aleatoria + ''.join(palavras))
-            random.shuffle(senha_final_lista)
+            motor_senhas.embaralhar(senha_final_lista)
             senha_final = ''.join(senha_final_lista)
-            self.adicionar_senha_lista(senha_final)
+            if not self.registro_sessao.reservar(senha_final):
+                self.adicionar_senha_lista(senha_final)
+                return
+        messagebox.showerror("Erro de Geração", "Todas as combinações sorteadas já foram geradas nesta sessão. Aumente o tamanho da senha.")
             
+    # --- Frases-senha ---
+    def selecionar_lista_palavras(self):
+        caminho = filedialog.askopenfilename(title="Selecionar lista de palavras", filetypes=[("Lista de Palavras", "*.txt"), ("Índice Compilado", f"*{frases_senha.EXTENSAO}"), ("Todos os arquivos", "*.*")])
+        if caminho and self.abrir_lista_palavras(caminho):
+            save_wordlist_config(caminho)
+        self.atualizar_entropia_frase()
+
+    def abrir_lista_palavras(self, caminho, avisar=True):
+        """Abre a lista (compilando o índice na primeira vez). Retorna True se deu certo."""
+        try:
+            lista = frases_senha.abrir_lista(caminho)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            if avisar: messagebox.showerror("Lista de Palavras", f"Não foi possível abrir a lista de palavras: {e}")
+            return False
+        if self.lista_palavras is not None:
+            self.lista_palavras.fechar()
+        self.lista_palavras = lista
+        self.caminho_lista_palavras.set(f"{os.path.basename(caminho)} ({len(lista):,} palavras)".replace(",", "."))
+        return True
+
+    def opcoes_frase(self):
+        """Opções de frases_senha.gerar_frases escolhidas na aba. Levanta ValueError se forem inválidas."""
+        try:
+            palavras, digitos = self.palavras_frase_var.get(), self.digitos_frase_var.get()
+        except tk.TclError:
+            raise ValueError("A quantidade de palavras e de dígitos deve ser um número inteiro.") from None
+        if not 1 <= palavras <= 20 or not 0 <= digitos <= 8:
+            raise ValueError("Use de 1 a 20 palavras e de 0 a 8 dígitos.")
+        return {"palavras": palavras, "separadores": self.separadores_frase_var.get(),
+                "capitalizacao": self.capitalizacoes_frase[self.capitalizacao_frase_var.get()], "digitos": digitos}
+
+    def atualizar_entropia_frase(self):
+        if self.lista_palavras is None:
+            self.entropia_frase_var.set("Escolha uma lista de palavras (uma por linha; o formato diceware também é aceito).")
+            return
+        try:
+            bits, forca = frases_senha.avaliar_frase(self.lista_palavras, **self.opcoes_frase())
+        except ValueError as e:
+            self.entropia_frase_var.set(str(e))
+            return
+        self.entropia_frase_var.set(f"Entropia: {bits:.1f} bits ({forca})".replace(".", ","))
+
+    def gerar_frase_senha(self):
+        if self.lista_palavras is None:
+            messagebox.showwarning("Aviso", "Escolha primeiro uma lista de palavras.")
+            return
+        try:
+            opcoes = self.opcoes_frase()
+            _, forca = frases_senha.avaliar_frase(self.lista_palavras, **opcoes)
+            sortear = lambda quantidade: frases_senha.gerar_frases(self.lista_palavras, quantidade, **opcoes)
+            # Frases vazadas ou já emitidas nesta sessão são sorteadas de novo
+            rejeitar = lote_senhas.combinar_rejeicoes(self.filtro_vazamentos, self.registro_sessao)
+            frase = motor_senhas.substituir_rejeitadas_com(sortear(1), rejeitar, sortear)[0]
+        except ValueError as e:
+            messagebox.showerror("Erro de Geração", str(e))
+            return
+        self.adicionar_senha_lista(frase, forca=forca)
+
     def gerar_multiplas_senhas(self):
         try:
             quantidade = int(self.quantidade_var.get())
@@ -394,48 +647,357 @@ class PasswordGeneratorApp:
             messagebox.showerror("Erro de Validação", "A quantidade deve ser entre 1-100 e o tamanho entre 4-100.")
             return
 
-        nivel = self.nivel_multiplas_var.get()
-        config = { "B": {"num": False, "esp": False}, "M": {"num": True, "esp": False}, "A": {"num": True, "esp": True} }
-        c = config[nivel]
-        
-        novas_senhas = [self.gerar_senha(tamanho, usar_numeros=c["num"], usar_especiais=c["esp"]) for _ in range(quantidade)]
+        try:
+            novas_senhas = self.gerar_lote_unico(quantidade, politicas_senha.politica_do_nivel(self.nivel_multiplas_var.get(), tamanho))
+        except ValueError as e:
+            messagebox.showerror("Erro de Geração", str(e))
+            return
         if novas_senhas:
-            for s in novas_senhas: 
-                if s: self.adicionar_senha_lista(s, update_ui=False)
-            self.update_password_listbox()
+            self.adicionar_senhas_lista(novas_senhas)
             messagebox.showinfo("Sucesso", f"{len(novas_senhas)} senhas geradas com sucesso!")
 
+    def gerar_lote_para_arquivo(self):
+        import cofre_senhas
+        if self.tarefa_lote is not None:
+            messagebox.showwarning("Aviso", "Já existe um lote sendo gerado.")
+            return
+        try:
+            quantidade = int(self.quantidade_var.get())
+            tamanho = int(self.tamanho_multiplas_var.get())
+            if not (1 <= quantidade and 4 <= tamanho <= 100): raise ValueError
+        except ValueError:
+            messagebox.showerror("Erro de Validação", "A quantidade deve ser maior que zero e o tamanho entre 4-100.")
+            return
+
+        caminho = filedialog.asksaveasfilename(title="Salvar lote de senhas", defaultextension=cofre_senhas.EXTENSAO, filetypes=[("Cofre de Senhas (criptografado)", f"*{cofre_senhas.EXTENSAO}"), ("Texto simples (NÃO criptografado)", "*.txt")])
+        if not caminho: return
+        obter_chave = caminho_chave = None
+        if caminho.endswith(cofre_senhas.EXTENSAO):
+            nova = self.nova_chave("senhas.key")
+            if nova is None: return
+            obter_chave, caminho_chave = nova
+            if caminho_chave and os.path.abspath(caminho) == os.path.abspath(caminho_chave):
+                messagebox.showerror("Erro de Segurança", "O arquivo de senhas e o arquivo da chave não podem ser o mesmo. Operação cancelada.")
+                return
+        elif not messagebox.askyesno("Aviso de Segurança", "As senhas serão gravadas SEM criptografia. Deseja continuar?"):
+            return
+
+        politica = politicas_senha.politica_do_nivel(self.nivel_multiplas_var.get(), tamanho)
+
+        def executar(tarefa):
+            chave, derivacao = obter_chave() if obter_chave else (None, None)
+            # Cofres ganham um registro de unicidade (.unicos) para que senhas adicionadas depois não repitam estas
+            # (texto simples: registro só deste lote, já que o da sessão não pode ser usado fora da thread do Tk)
+            opcoes = {"capacidade": quantidade, "probabilistico": quantidade > unicidade.LIMITE_EXATO}
+            registro = unicidade.RegistroUnicidade.criar(chave, **opcoes) if chave is not None else unicidade.RegistroUnicidade(**opcoes)
+            # A chave vai para o disco antes do arquivo que só ela abre
+            if caminho_chave:
+                with open(caminho_chave, "wb") as f: f.write(chave)
+            feitos = lote_senhas.gerar_para_arquivo(caminho, quantidade, tamanho, politica=politica, chave=chave,
+                                                    progresso=tarefa.informar_progresso, cancelar=lambda: tarefa.cancelada,
+                                                    filtro=self.filtro_vazamentos, registro=registro, derivacao=derivacao)
+            if feitos is None:
+                if caminho_chave: os.remove(caminho_chave)  # cancelado: nenhum arquivo usa a chave
+            elif chave is not None:
+                registro.salvar(unicidade.caminho_registro(caminho))
+            return feitos
+
+        def ao_concluir(tarefa):
+            self.tarefa_lote = None
+            self.botao_lote_arquivo.config(state="normal")
+            self.botao_cancelar_lote.config(state="disabled")
+            if tarefa.erro is not None:
+                messagebox.showerror("Erro no Lote", f"Ocorreu um erro: {tarefa.erro}")
+            elif tarefa.resultado is None:
+                self.status_lote_var.set("Lote cancelado.")
+            else:
+                messagebox.showinfo("Sucesso", f"{tarefa.resultado:,} senhas gravadas em: {os.path.basename(caminho)}".replace(",", "."))
+
+        self.tarefa_lote = tarefas.Tarefa(executar, total=quantidade, unidade="senhas").iniciar()
+        self.botao_lote_arquivo.config(state="disabled")
+        self.botao_cancelar_lote.config(state="normal")
+        self.acompanhar_tarefa(self.tarefa_lote, self.progresso_lote, self.status_lote_var, ao_concluir)
+
+    def cancelar_lote_arquivo(self):
+        if self.tarefa_lote is not None:
+            self.tarefa_lote.cancelar()
+            self.status_lote_var.set("Cancelando...")
+
+    # --- Tarefas em segundo plano ---
+    def formatar_progresso(self, tarefa):
+        """Texto de progresso: quantidade processada, total e taxa."""
+        if tarefa.unidade == "bytes":
+            feitos, taxa, unidade = tarefa.feitos / (1 << 20), tarefa.taxa() / (1 << 20), "MB"
+            total = tarefa.total / (1 << 20) if tarefa.total else None
+            texto = f"{feitos:,.1f}" + (f" de {total:,.1f}" if total else "") + f" {unidade} ({taxa:,.1f} {unidade}/s)"
+        else:
+            texto = f"{tarefa.feitos:,}" + (f" de {tarefa.total:,}" if tarefa.total else "") + f" {tarefa.unidade} ({tarefa.taxa():,.0f}/s)"
+        return texto.replace(",", "X").replace(".", ",").replace("X", ".")
+
+    def acompanhar_tarefa(self, tarefa, barra, status_var, ao_concluir):
+        """Atualiza a barra e o texto de progresso a cada 100 ms; ao terminar, chama `ao_concluir(tarefa)` na thread do Tk."""
+        fracao = tarefa.fracao()
+        if fracao is None:
+            barra.config(mode="indeterminate")
+            barra.step(5)
+        else:
+            barra.config(mode="determinate", maximum=1000)
+            barra["value"] = fracao * 1000
+        status_var.set(self.formatar_progresso(tarefa))
+        if tarefa.concluida:
+            ao_concluir(tarefa)
+        else:
+            self.root.after(100, self.acompanhar_tarefa, tarefa, barra, status_var, ao_concluir)
+
+    def mostrar_janela_progresso(self, titulo, tarefa, ao_concluir):
+        """Janela com barra de progresso e botão Cancelar para uma tarefa sem área própria na interface."""
+        janela = tk.Toplevel(self.root)
+        janela.title(titulo)
+        janela.transient(self.root)
+        janela.resizable(False, False)
+        quadro = ttk.Frame(janela, padding="15")
+        quadro.pack(fill="both", expand=True)
+        barra = ttk.Progressbar(quadro, mode="determinate", length=360)
+        barra.pack(fill="x")
+        status_var = tk.StringVar()
+        ttk.Label(quadro, textvariable=status_var).pack(anchor="w", pady=5)
+        ttk.Button(quadro, text="Cancelar", command=tarefa.cancelar).pack(anchor="e")
+        janela.protocol("WM_DELETE_WINDOW", tarefa.cancelar)
+
+        def concluir(tarefa):
+            janela.destroy()
+            ao_concluir(tarefa)
+        self.acompanhar_tarefa(tarefa, barra, status_var, concluir)
+
+    def iniciar_tarefa_cripto(self, titulo, executar, ao_concluir, total=None, unidade="bytes"):
+        """
+        Executa `executar(tarefa)` (leitura, cifra e escrita de arquivos) fora da thread do Tk, com a
+        janela de progresso; `ao_concluir(tarefa)` roda de volta na thread do Tk. Uma tarefa por vez.
+        """
+        if self.tarefa_cripto is not None:
+            messagebox.showwarning("Aviso", "Aguarde a operação de criptografia em andamento terminar (ou cancele-a).")
+            return
+
+        def concluir(tarefa):
+            self.tarefa_cripto = None
+            ao_concluir(tarefa)
+
+        self.tarefa_cripto = tarefas.Tarefa(executar, total=total, unidade=unidade).iniciar()
+        self.mostrar_janela_progresso(titulo, self.tarefa_cripto, concluir)
+
+    # --- Diagnóstico (aba oculta) ---
+    COLUNAS_DIAGNOSTICO = (("operacao", "Operação", 190), ("chamadas", "Chamadas", 70), ("media", "Média", 75), ("p50", "p50", 75),
+                           ("p95", "p95", 75), ("p99", "p99", 75), ("maximo", "Máximo", 75), ("vazao", "Vazão", 110))
+
+    def alternar_diagnostico(self, event=None):
+        """Mostra a aba de diagnóstico (criando-a na primeira vez) ou a esconde se já estiver aberta."""
+        if self.tab_diagnostico is None:
+            self.tab_diagnostico = ttk.Frame(self.notebook, padding="15")
+            self.notebook.add(self.tab_diagnostico, text="🩺 Diagnóstico")
+            self.create_tab_diagnostico()
+            self.root.after(1000, self.atualizar_diagnostico)
+        elif self.notebook.select() == str(self.tab_diagnostico):
+            self.notebook.hide(self.tab_diagnostico)
+            return
+        else:
+            self.notebook.add(self.tab_diagnostico)  # volta a mostrar a aba, se estava escondida
+        self.notebook.select(self.tab_diagnostico)
+        self.preencher_diagnostico()
+
+    def create_tab_diagnostico(self):
+        aba = self.tab_diagnostico
+        aba.columnconfigure(0, weight=1)
+        aba.rowconfigure(1, weight=1)
+
+        controles = ttk.Frame(aba)
+        controles.grid(row=0, column=0, sticky="ew", pady=(0, 10))
+        self.metricas_ativas_var = tk.BooleanVar(value=metricas.ativo())
+        ttk.Checkbutton(controles, text="Coletar métricas", variable=self.metricas_ativas_var, command=self.alternar_coleta_metricas).pack(side="left")
+        ttk.Button(controles, text="Exportar JSON...", command=self.exportar_metricas).pack(side="right")
+        ttk.Button(controles, text="Limpar", command=lambda: (metricas.limpar(), self.preencher_diagnostico())).pack(side="right", padx=5)
+
+        self.tabela_metricas = ttk.Treeview(aba, columns=[c for c, _, _ in self.COLUNAS_DIAGNOSTICO], show="headings", height=10)
+        for coluna, titulo, largura in self.COLUNAS_DIAGNOSTICO:
+            self.tabela_metricas.heading(coluna, text=titulo)
+            self.tabela_metricas.column(coluna, width=largura, anchor="w" if coluna == "operacao" else "e", stretch=coluna == "operacao")
+        self.tabela_metricas.grid(row=1, column=0, sticky="nsew")
+
+        ttk.Label(aba, text="Avisos recentes:").grid(row=2, column=0, sticky="w", pady=(10, 2))
+        self.lista_avisos = tk.Listbox(aba, height=4, font=("Courier New", 9))
+        self.lista_avisos.grid(row=3, column=0, sticky="ew")
+
+    def alternar_coleta_metricas(self):
+        if self.metricas_ativas_var.get():
+            metricas.ativar()
+        else:
+            metricas.desativar()
+
+    def atualizar_diagnostico(self):
+        """Recarrega a tabela a cada segundo, mas só enquanto a aba de diagnóstico estiver selecionada."""
+        if self.notebook.select() == str(self.tab_diagnostico):
+            self.preencher_diagnostico()
+        self.root.after(1000, self.atualizar_diagnostico)
+
+    def preencher_diagnostico(self):
+        self.tabela_metricas.delete(*self.tabela_metricas.get_children())
+        for nome, r in metricas.resumo().items():
+            if r["bytes"]:
+                vazao = f"{r['bytes_por_segundo'] / (1 << 20):,.1f} MB/s"
+            elif r["itens"]:
+                vazao = f"{r['itens_por_segundo']:,.0f}/s"
+            else:
+                vazao = "-"
+            duracoes = [metricas.formatar_duracao(r[campo]) for campo in ("media", "p50", "p95", "p99", "maximo")]
+            chamadas, vazao = (texto.replace(",", "X").replace(".", ",").replace("X", ".") for texto in (f"{r['chamadas']:,}", vazao))
+            self.tabela_metricas.insert("", tk.END, values=(nome, chamadas, *duracoes, vazao))
+        self.lista_avisos.delete(0, tk.END)
+        for aviso in reversed(metricas.avisos()):
+            self.lista_avisos.insert(tk.END, f"{aviso['quando']}  [{aviso['origem']}] {aviso['mensagem']}")
+
+    def exportar_metricas(self):
+        caminho = filedialog.asksaveasfilename(title="Exportar métricas", initialfile="metricas.json", defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not caminho: return
+        try:
+            metricas.despejar(caminho)
+            messagebox.showinfo("Diagnóstico", f"Métricas exportadas para: {os.path.basename(caminho)}")
+        except OSError as e:
+            messagebox.showerror("Diagnóstico", f"Não foi possível exportar as métricas: {e}")
+
+    # --- Índice de senhas vazadas ---
+    def carregar_indice_vazadas(self, caminho=None):
+        caminho = caminho or filedialog.askopenfilename(title="Selecione o índice de senhas vazadas", filetypes=[("Índice de Senhas Vazadas", f"*{vazamentos.EXTENSAO}"), ("Todos os arquivos", "*.*")])
+        if not caminho: return
+        try:
+            filtro = vazamentos.FiltroVazamentos(caminho)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Erro", f"Não foi possível abrir o índice: {e}")
+            return
+        if self.filtro_vazamentos is not None:
+            self.filtro_vazamentos.fechar()
+        self.filtro_vazamentos = filtro
+        # Marca as senhas do histórico que já estão no índice
+        self.senhas_geradas.marcar_vazadas(filtro.verificar_lote(self.senhas_geradas.senhas()))
+        self.update_password_listbox()
+        messagebox.showinfo("Índice Carregado", f"Índice com {filtro.quantidade:,} senhas carregado. Senhas vazadas serão rejeitadas na geração e marcadas no histórico.".replace(",", "."))
+
+    def criar_indice_vazadas(self):
+        if self.tarefa_indice is not None:
+            messagebox.showwarning("Aviso", "Já existe um índice sendo criado.")
+            return
+        origens = filedialog.askopenfilenames(title="Selecione os dumps SHA-1 (HIBP) e/ou listas de palavras", filetypes=[("Arquivos de texto", "*.txt"), ("Todos os arquivos", "*.*")])
+        if not origens: return
+        destino = filedialog.asksaveasfilename(title="Salvar índice de senhas vazadas", defaultextension=vazamentos.EXTENSAO, filetypes=[("Índice de Senhas Vazadas", f"*{vazamentos.EXTENSAO}")])
+        if not destino: return
+
+        def executar(tarefa):
+            return vazamentos.construir_filtro(list(origens), destino, progresso=tarefa.informar_progresso, cancelar=lambda: tarefa.cancelada)
+
+        def ao_concluir(tarefa):
+            self.tarefa_indice = None
+            if tarefa.erro is not None:
+                messagebox.showerror("Erro", f"Não foi possível criar o índice: {tarefa.erro}")
+            elif tarefa.resultado is not None:
+                self.carregar_indice_vazadas(destino)
+
+        self.tarefa_indice = tarefas.Tarefa(executar, unidade="bytes").iniciar()
+        self.mostrar_janela_progresso("Criando índice de senhas vazadas", self.tarefa_indice, ao_concluir)
+
     # --- Funções Auxiliares e de UI ---
     def avaliar_forca(self, senha):
-        score = 0
-        if len(senha) >= 8: score += 1
-        if len(senha) >= 12: score += 1
-        if any(c in self.numeros for c in senha): score += 1
-        if any(c in self.caracteres_especiais for c in senha): score += 1
-        if any(c.islower() for c in senha) and any(c.isupper() for c in senha): score += 1
-        
-        if score <= 1: return "Muito Fraca"
-        if score == 2: return "Fraca"
-        if score == 3: return "Média"
-        if score == 4: return "Forte"
-        return "Muito Forte"
-    
-    def adicionar_senha_lista(self, senha, update_ui=True):
-        forca = self.avaliar_forca(senha)
-        self.senhas_geradas.append({"senha": senha, "forca": forca})
-        self.last_password_var.set(senha)
-        self.strength_var.set(forca)
-        self.strength_label.config(foreground=self.forca_cores.get(forca, "black"))
-        if update_ui: self.update_password_listbox()
-            
+        """Rótulo de força pela entropia estimada (ver forca_senhas)."""
+        return forca_senhas.avaliar(senha)
+
+    def adicionar_senha_lista(self, senha, update_ui=True, forca=None):
+        """`forca`: rótulo já conhecido (ex.: frases-senha, cuja entropia vem do sorteio e não do texto)."""
+        forca = forca or self.avaliar_forca(senha)
+        vazada = self.filtro_vazamentos is not None and self.filtro_vazamentos.comprometida(senha)
+        self.senhas_geradas.adicionar(senha, forca, vazada)
+        if update_ui: self.agendar_atualizacao_historico()
+
+    def adicionar_senhas_lista(self, senhas):
+        """Adiciona várias senhas ao histórico com uma única atualização da interface."""
+        forcas = forca_senhas.avaliar_lote(senhas)
+        vazadas = self.filtro_vazamentos.verificar_lote(senhas) if self.filtro_vazamentos is not None else None
+        self.senhas_geradas.adicionar_lote(senhas, forcas, vazadas)
+        self.agendar_atualizacao_historico()
+
+    def agendar_atualizacao_historico(self):
+        """Agrupa as inserções feitas no mesmo quadro (~16 ms) em uma única atualização da lista."""
+        if self._atualizacao_historico is None:
+            self._atualizacao_historico = self.root.after(16, self.update_password_listbox)
+
+    def obter_linhas_historico(self, inicio, fim):
+        if self.resultado_historico is None:
+            itens = self.senhas_geradas[inicio:fim]
+            prefixos = [""] * len(itens)
+        else:
+            posicoes = self.resultado_historico[inicio:fim]
+            itens = [self.senhas_geradas[posicao] for posicao in posicoes]
+            prefixos = [f"#{posicao + 1:<8}" for posicao in posicoes]  # número da senha no histórico completo
+        linhas = []
+        for item, prefixo in zip(itens, prefixos):
+            if item['vazada']:
+                linhas.append((f"{prefixo}{item['senha']:<30} | VAZADA", COR_VAZADA))
+            else:
+                linhas.append((f"{prefixo}{item['senha']:<30} | Força: {item['forca']}", self.forca_cores.get(item['forca'], "black")))
+        return linhas
+
+    # --- Busca nas listas ---
+    def criar_barra_busca(self, master, nome, aplicar):
+        """
+        Campo de busca, filtro de força e contagem acima de uma lista (linha 0 de `master`). A busca é
+        refeita por `aplicar()` quando a digitação para. Retorna as variáveis (texto, força, contagem).
+        """
+        barra = ttk.Frame(master)
+        barra.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+        barra.columnconfigure(1, weight=1)
+        texto_var, forca_var, contagem_var = tk.StringVar(), tk.StringVar(value=TODAS_FORCAS), tk.StringVar()
+        ttk.Label(barra, text="Buscar:").grid(row=0, column=0, padx=(0, 5))
+        ttk.Entry(barra, textvariable=texto_var).grid(row=0, column=1, sticky="ew")
+        ttk.Combobox(barra, textvariable=forca_var, values=(TODAS_FORCAS,) + busca.FILTROS_FORCA, state="readonly", width=12).grid(row=0, column=2, padx=5)
+        ttk.Label(barra, textvariable=contagem_var).grid(row=0, column=3)
+        texto_var.trace_add("write", lambda *args: self.agendar_busca(nome, aplicar))
+        forca_var.trace_add("write", lambda *args: self.agendar_busca(nome, aplicar))
+        return texto_var, forca_var, contagem_var
+
+    def agendar_busca(self, nome, aplicar):
+        """Refaz a busca da lista `nome` só ATRASO_BUSCA ms depois da última tecla."""
+        if nome in self._busca_agendada:
+            self.root.after_cancel(self._busca_agendada.pop(nome))
+
+        def executar():
+            del self._busca_agendada[nome]
+            aplicar()
+        self._busca_agendada[nome] = self.root.after(ATRASO_BUSCA, executar)
+
+    def filtro_busca(self, texto_var, forca_var):
+        """(texto, força) de uma barra de busca, com força None para todas."""
+        forca = forca_var.get()
+        return texto_var.get(), None if forca == TODAS_FORCAS else forca
+
+    @metricas.cronometrar("interface.historico")
     def update_password_listbox(self):
-        self.password_listbox.delete(0, tk.END)
-        for i, item in enumerate(self.senhas_geradas):
-            self.password_listbox.insert(tk.END, f"{item['senha']:<30} | Força: {item['forca']}")
-            cor = self.forca_cores.get(item['forca'], "black")
-            self.password_listbox.itemconfig(i, {'fg': cor})
-        self.password_listbox.yview_moveto(1) # Rola para o final
-            
+        if self._atualizacao_historico is not None:
+            self.root.after_cancel(self._atualizacao_historico)
+            self._atualizacao_historico = None
+        # A busca só examina as senhas novas; só as linhas visíveis são redesenhadas
+        self.resultado_historico = resultado = self.busca_historico.buscar(*self.filtro_busca(self.busca_historico_var, self.forca_historico_var))
+        if resultado is None:
+            self.contagem_historico_var.set("")
+            self.password_listbox.definir_total(len(self.senhas_geradas), rolar_para_fim=True)
+        else:
+            self.contagem_historico_var.set(f"{len(resultado):,} de {len(self.senhas_geradas):,}".replace(",", "."))
+            self.password_listbox.definir_total(len(resultado), rolar_para_fim=True)
+        if self.senhas_geradas:
+            ultimo = self.senhas_geradas[-1]
+            self.last_password_var.set(ultimo['senha'])
+            if ultimo['vazada']:
+                self.strength_var.set("VAZADA (presente no índice de senhas vazadas)")
+                self.strength_label.config(foreground=COR_VAZADA)
+            else:
+                self.strength_var.set(ultimo['forca'])
+                self.strength_label.config(foreground=self.forca_cores.get(ultimo['forca'], "black"))
+
     def copiar_para_clipboard(self, texto):
         self.root.clipboard_clear()
         self.root.clipboard_append(texto)
@@ -451,7 +1013,10 @@ class PasswordGeneratorApp:
 
     def copiar_senha_selecionada(self):
         try:
-            selected_index = self.password_listbox.curselection()[0]
+            selected_index = self.password_listbox.indice_selecionado()
+            if selected_index is None: raise IndexError
+            if self.resultado_historico is not None:
+                selected_index = self.resultado_historico[selected_index]
             senha_para_copiar = self.senhas_geradas[selected_index]['senha']
             self.copiar_para_clipboard(senha_para_copiar)
         except IndexError:
@@ -462,39 +1027,177 @@ class PasswordGeneratorApp:
             messagebox.showinfo("Informação", "O histórico de senhas já está vazio.")
             return
         if messagebox.askyesno("Confirmar", "Tem certeza que deseja apagar todas as senhas do histórico da sessão?"):
-            self.senhas_geradas.clear()
+            self.senhas_geradas.limpar()  # sobrescreve as senhas guardadas com zeros
             self.update_password_listbox()
             self.last_password_var.set("Sua senha aparecerá aqui...")
             self.strength_var.set("")
             messagebox.showinfo("Sucesso", "Histórico da sessão limpo.")
 
     # --- Funções de Salvamento e Descriptografia ---
+    # --- Chaves: arquivo .key ou senha mestra ---
+    def limpar_chaves_expiradas(self):
+        self.cache_chaves.limpar_expiradas()
+        self.root.after(60_000, self.limpar_chaves_expiradas)
+
+    def esquecer_senhas_mestras(self):
+        self.cache_chaves.limpar()
+        messagebox.showinfo("Senhas Mestras", "As chaves derivadas de senhas mestras foram apagadas da memória.")
+
+    def pedir_senha_mestra(self, confirmar=False):
+        """Pede a senha mestra (duas vezes, com `confirmar`). Retorna None se o usuário cancelar."""
+        senha = simpledialog.askstring("Senha Mestra", "Digite a senha mestra:", show="*", parent=self.root)
+        if not senha:
+            return None
+        if confirmar:
+            if simpledialog.askstring("Senha Mestra", "Digite a senha mestra novamente:", show="*", parent=self.root) != senha:
+                messagebox.showerror("Senha Mestra", "As senhas digitadas não conferem.")
+                return None
+            if forca_senhas.entropia(senha) < forca_senhas.LIMITES[2] and not messagebox.askyesno(
+                    "Senha Mestra Fraca", f"A força estimada desta senha mestra é \"{forca_senhas.avaliar(senha)}\". Deseja usá-la mesmo assim?"):
+                return None
+        return senha
+
+    def preparar_senha_mestra(self, parametros):
+        """
+        Chave dos parâmetros: do cache ou derivada de uma senha mestra, pedida aqui ao usuário.
+        Retorna uma função sem argumentos que produz a chave (a derivação, lenta, roda quando ela
+        for chamada, em uma tarefa em segundo plano), ou None se o usuário cancelar.
+        """
+        chave = self.cache_chaves.buscar(parametros)
+        if chave is not None:
+            return lambda: chave
+        senha = self.pedir_senha_mestra()
+        if senha is None:
+            return None
+        return lambda: self.cache_chaves.obter(parametros, senha)
+
+    def nova_chave(self, nome_sugerido, titulo_chave="Salvar arquivo da CHAVE DE CRIPTOGRAFIA"):
+        """
+        Faz as perguntas para a chave de um arquivo novo: derivada de uma senha mestra ou aleatória (.key).
+        Retorna (função sem argumentos que produz (chave, parâmetros de derivação ou None), caminho do
+        .key ou None), ou None se cancelado. A calibração e a derivação, lentas, rodam quando a função
+        for chamada (em uma tarefa em segundo plano). O .key ainda não é gravado: quem chama o grava
+        antes do arquivo que só ela abre.
+        """
+        from cryptography.fernet import Fernet
+        resposta = messagebox.askyesnocancel("Tipo de Chave", "Proteger com uma senha mestra?\n\nSim: a chave é derivada de uma senha mestra (sem arquivo .key).\nNão: gerar um arquivo de chave (.key) aleatório.")
+        if resposta is None:
+            return None
+        if resposta:
+            senha = self.pedir_senha_mestra(confirmar=True)
+            if senha is None:
+                return None
+
+            def obter_chave():
+                parametros = derivacao_chaves.novos_parametros()  # a calibração só roda na primeira vez
+                return self.cache_chaves.obter(parametros, senha), parametros
+            return obter_chave, None
+        caminho_chave = filedialog.asksaveasfilename(title=titulo_chave, initialfile=nome_sugerido, defaultextension=".key", filetypes=[("Arquivo de Chave", "*.key")])
+        if not caminho_chave:
+            return None
+        chave = Fernet.generate_key()
+        return (lambda: (chave, None)), caminho_chave
+
+    def preparar_chave_existente(self, caminho_arquivo, caminho_chave=None):
+        """
+        Faz as perguntas necessárias para abrir `caminho_arquivo` (senha mestra, se o cabeçalho dele
+        tiver os parâmetros de derivação, ou o arquivo .key, pedido aqui se não for informado) e
+        retorna uma função sem argumentos que produz a chave; a derivação, lenta, fica para quando
+        ela for chamada (em uma tarefa em segundo plano). Retorna None se o usuário cancelar.
+        """
+        parametros = derivacao_chaves.parametros_do_arquivo(caminho_arquivo)
+        if parametros is not None:
+            return self.preparar_senha_mestra(parametros)
+        if not caminho_chave:
+            caminho_chave = filedialog.askopenfilename(title="Selecionar o arquivo de CHAVE", filetypes=[("Arquivo de Chave", "*.key")])
+            if not caminho_chave:
+                return None
+        with open(caminho_chave, 'rb') as f:
+            chave = f.read()
+        return lambda: chave
+
     def salvar_senhas_criptografadas(self):
+        import cofre_senhas
+        from cryptography.fernet import InvalidToken
         if not self.senhas_geradas:
             messagebox.showwarning("Aviso", "Nenhuma senha para salvar.")
             return
-        arquivo_senhas = filedialog.asksaveasfilename(title="Salvar arquivo de senhas", defaultextension=".txt", filetypes=[("Arquivos de Texto Criptografados", "*.txt")])
+        arquivo_senhas = filedialog.asksaveasfilename(title="Salvar cofre de senhas", defaultextension=cofre_senhas.EXTENSAO, filetypes=[("Cofre de Senhas", f"*{cofre_senhas.EXTENSAO}")], confirmoverwrite=False)
         if not arquivo_senhas: return
-        arquivo_chave = filedialog.asksaveasfilename(title="Salvar arquivo da CHAVE DE CRIPTOGRAFIA", defaultextension=".key", filetypes=[("Arquivo de Chave", "*.key")])
-        if not arquivo_chave: return
 
-        if os.path.abspath(arquivo_senhas) == os.path.abspath(arquivo_chave):
+        # Um cofre existente pode receber as novas senhas no fim, sem ser reescrito
+        anexar = False
+        if os.path.exists(arquivo_senhas):
+            if cofre_senhas.eh_cofre(arquivo_senhas):
+                resposta = messagebox.askyesnocancel("Cofre Existente", "Este cofre já existe.\n\nSim: adicionar as senhas ao cofre existente (requer a chave dele).\nNão: substituir o arquivo por um novo cofre.")
+                if resposta is None: return
+                anexar = resposta
+            elif not messagebox.askyesno("Confirmar", f"O arquivo '{os.path.basename(arquivo_senhas)}' já existe. Deseja substituí-lo?"):
+                return
+
+        try:
+            if anexar:
+                obter = self.preparar_chave_existente(arquivo_senhas)
+                nova = None if obter is None else ((lambda: (obter(), None)), None)
+            else:
+                nova = self.nova_chave("senhas.key")
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Erro ao Salvar", str(e))
+            return
+        if nova is None: return
+        obter_chave, arquivo_chave = nova
+
+        if arquivo_chave and os.path.abspath(arquivo_senhas) == os.path.abspath(arquivo_chave):
             messagebox.showerror("Erro de Segurança", "O arquivo de senhas e o arquivo da chave não podem ser o mesmo. Operação cancelada.")
             return
-        try:
-            chave = Fernet.generate_key()
-            cipher = Fernet(chave)
-            with open(arquivo_senhas, "w") as f:
-                for item in self.senhas_geradas:
-                    senha_criptografada = cipher.encrypt(item['senha'].encode()).decode()
-                    f.write(f"{senha_criptografada}\n")
-            with open(arquivo_chave, "wb") as f: f.write(chave)
-            messagebox.showinfo("Sucesso!", f"Senhas salvas em: {os.path.basename(arquivo_senhas)}\nChave salva em: {os.path.basename(arquivo_chave)}\n\nATENÇÃO: Guarde o arquivo da chave em um local SEGURO e SEPARADO.")
-        except Exception as e:
-            messagebox.showerror("Erro ao Salvar", f"Ocorreu um erro: {e}")
+        senhas = self.senhas_geradas.senhas()
+
+        def executar(tarefa):
+            chave, derivacao = obter_chave()
+            if anexar:
+                registro = unicidade.registro_do_cofre(arquivo_senhas, chave)
+            else:
+                registro = unicidade.RegistroUnicidade.criar(chave)
+            # Senhas que o cofre já contém (ou repetidas na lista) não são gravadas de novo
+            novas = [senha for senha, repetida in zip(senhas, registro.reservar_lote(senhas)) if not repetida]
+            if tarefa.cancelada:
+                return None
+            # A chave vai para o disco antes do cofre que só ela abre
+            if arquivo_chave:
+                with open(arquivo_chave, "wb") as f: f.write(chave)
+            # Um cofre novo é escrito em um temporário e só substitui o destino no fim
+            destino = arquivo_senhas if anexar else arquivo_senhas + ".parcial"
+            try:
+                total = cofre_senhas.salvar_cofre(destino, chave, novas, anexar=anexar, derivacao=derivacao)
+                if not anexar: os.replace(destino, arquivo_senhas)
+            except BaseException:
+                if not anexar:
+                    if os.path.exists(destino): os.remove(destino)
+                    if arquivo_chave: os.remove(arquivo_chave)  # nenhum arquivo usa a chave
+                raise
+            registro.salvar(unicidade.caminho_registro(arquivo_senhas))
+            return total, len(novas)
+
+        def ao_concluir(tarefa):
+            if anexar and isinstance(tarefa.erro, (InvalidToken, ValueError)):
+                messagebox.showerror("Erro ao Salvar", "Não foi possível abrir o cofre existente. Verifique se a chave corresponde a ele.")
+            elif tarefa.erro is not None:
+                messagebox.showerror("Erro ao Salvar", f"Ocorreu um erro: {tarefa.erro}")
+            elif tarefa.resultado is None:
+                messagebox.showinfo("Cancelado", "Operação cancelada. Nenhuma senha foi gravada.")
+            else:
+                total, gravadas = tarefa.resultado
+                ignoradas = len(senhas) - gravadas
+                aviso = f"\n{ignoradas} senha(s) já existente(s) no cofre foram ignoradas." if ignoradas else ""
+                if arquivo_chave:
+                    aviso += f"\nChave: {os.path.basename(arquivo_chave)}\n\nATENÇÃO: Guarde o arquivo da chave em um local SEGURO e SEPARADO."
+                messagebox.showinfo("Sucesso!", f"Senhas salvas em: {os.path.basename(arquivo_senhas)} ({total} no cofre){aviso}")
+
+        self.iniciar_tarefa_cripto("Salvando senhas", executar, ao_concluir, unidade="senhas")
 
     def selecionar_arquivo_senhas(self):
-        arquivo = filedialog.askopenfilename(title="Abrir arquivo de senhas", filetypes=[("Arquivos de Texto", "*.txt")])
+        import cofre_senhas
+        arquivo = filedialog.askopenfilename(title="Abrir arquivo de senhas", filetypes=[("Cofre de Senhas", f"*{cofre_senhas.EXTENSAO}"), ("Arquivos de Texto (formato antigo)", "*.txt"), ("Todos os arquivos", "*.*")])
         if arquivo:
             self.caminho_arquivo_senhas.set(os.path.basename(arquivo))
             self._caminho_completo_senhas = arquivo
@@ -506,32 +1209,147 @@ class PasswordGeneratorApp:
             self._caminho_completo_chave = arquivo
     
     def executar_descriptografia_senhas(self):
-        if not self._caminho_completo_senhas or not self._caminho_completo_chave:
-            messagebox.showerror("Erro", "Por favor, selecione o arquivo de senhas e o arquivo de chave.")
+        import fontes_senhas
+        from cryptography.fernet import InvalidToken
+        if not self._caminho_completo_senhas:
+            messagebox.showerror("Erro", "Por favor, selecione o arquivo de senhas (e o arquivo de chave, se ele não usar uma senha mestra).")
             return
+        self.fechar_fonte_descriptografada()
+        caminho = self._caminho_completo_senhas
         try:
-            with open(self._caminho_completo_chave, 'rb') as f_chave: chave = f_chave.read()
-            cipher = Fernet(chave)
-            with open(self._caminho_completo_senhas, 'r') as f_senhas: senhas_criptografadas = f_senhas.readlines()
-            
-            self.decrypted_listbox.delete(0, tk.END)
-            for s_cript in senhas_criptografadas:
-                s_descript = cipher.decrypt(s_cript.strip().encode()).decode()
-                self.decrypted_listbox.insert(tk.END, s_descript)
-            if not senhas_criptografadas: messagebox.showinfo("Informação", "O arquivo de senhas está vazio.")
-        except (InvalidToken, ValueError, TypeError):
-            messagebox.showerror("Erro de Descriptografia", "Falha ao descriptografar. Verifique se a chave corresponde ao arquivo de senhas.")
-            self.decrypted_listbox.delete(0, tk.END)
-        except Exception as e:
-            messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {e}")
-            self.decrypted_listbox.delete(0, tk.END)
+            obter_chave = self.preparar_chave_existente(caminho, self._caminho_completo_chave)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o arquivo: {e}")
+            return
+        if obter_chave is None: return
+
+        def executar(tarefa):
+            fonte = fontes_senhas.abrir_fonte(caminho, obter_chave())
+            try:
+                # Indexa só o primeiro trecho; o restante do arquivo antigo é indexado depois, aos poucos
+                fonte.indexar()
+                if len(fonte): fonte[0]  # Confere a chave logo de início
+            except BaseException:
+                fonte.fechar()
+                raise
+            return fonte
+
+        def ao_concluir(tarefa):
+            fonte = tarefa.resultado
+            if isinstance(tarefa.erro, (InvalidToken, ValueError, TypeError)):
+                messagebox.showerror("Erro de Descriptografia", "Falha ao descriptografar. Verifique se a chave corresponde ao arquivo de senhas.")
+            elif tarefa.erro is not None:
+                messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {tarefa.erro}")
+            elif tarefa.cancelada:
+                fonte.fechar()
+            else:
+                self.fonte_descriptografada = fonte
+                self._reabrir_fonte = lambda: fontes_senhas.abrir_fonte(caminho, obter_chave())
+                self.aplicar_filtro_descriptografadas()
+                if not fonte.completo:
+                    self.root.after(1, self.continuar_indexacao, fonte)
+                elif not len(fonte):
+                    messagebox.showinfo("Informação", "O arquivo de senhas está vazio.")
+
+        self.iniciar_tarefa_cripto("Abrindo arquivo de senhas", executar, ao_concluir)
+
+    def continuar_indexacao(self, fonte):
+        """Indexa mais um trecho do arquivo de senhas por vez, sem bloquear a interface."""
+        if fonte is not self.fonte_descriptografada:
+            return  # Outro arquivo foi aberto nesse meio-tempo
+        completo = fonte.indexar()
+        if self.resultado_descriptografadas is None:
+            self.decrypted_listbox.definir_total(len(fonte))
+        if not completo:
+            self.root.after(1, self.continuar_indexacao, fonte)
+
+    def pre_carregar_descriptografadas(self, fonte, inicio, fim):
+        """Decifra antecipadamente a próxima página para a rolagem ficar suave."""
+        if fonte is self.fonte_descriptografada:
+            try:
+                fonte.pre_carregar(fim, fim + (fim - inicio))
+            except Exception:
+                pass  # Erros aparecem quando a linha for de fato exibida
+
+    def fechar_fonte_descriptografada(self):
+        if self.fonte_descriptografada is not None:
+            self.fonte_descriptografada.fechar()
+            self.fonte_descriptografada = None
+        if self.busca_descriptografadas is not None:
+            self.busca_descriptografadas.historico.limpar()  # sobrescreve com zeros as senhas carregadas para a busca
+            self.busca_descriptografadas = None
+        self._reabrir_fonte = None
+        self.resultado_descriptografadas = None
+        self.contagem_descriptografadas_var.set("")
+        self.decrypted_listbox.ao_renderizar = None
+        self.decrypted_listbox.limpar()
+
+    # --- Busca nas senhas descriptografadas ---
+    def aplicar_filtro_descriptografadas(self):
+        """
+        Sem filtro, a lista decifra só as linhas visíveis, como antes. Com filtro, o arquivo inteiro
+        é decifrado uma vez (em segundo plano) para a busca percorrê-lo.
+        """
+        fonte = self.fonte_descriptografada
+        if fonte is None:
+            return
+        texto, forca = self.filtro_busca(self.busca_descriptografadas_var, self.forca_descriptografadas_var)
+        if not texto and forca is None:
+            self.resultado_descriptografadas = None
+            self.contagem_descriptografadas_var.set("")
+            self.decrypted_listbox.ao_renderizar = lambda inicio, fim: self.root.after_idle(self.pre_carregar_descriptografadas, fonte, inicio, fim)
+            self.decrypted_listbox.definir_fonte(fonte.obter_intervalo, len(fonte))
+            return
+        if self.busca_descriptografadas is None:
+            self.carregar_busca_descriptografadas()
+            return
+        carregadas = self.busca_descriptografadas.historico
+        resultado = self.resultado_descriptografadas = self.busca_descriptografadas.buscar(texto, forca)
+        self.contagem_descriptografadas_var.set(f"{len(resultado):,} de {len(carregadas):,}".replace(",", "."))
+        self.decrypted_listbox.ao_renderizar = None
+        self.decrypted_listbox.definir_fonte(lambda inicio, fim: [f"#{posicao + 1:<8}{carregadas.senha(posicao)}" for posicao in resultado[inicio:fim]],
+                                             len(resultado))
+
+    def carregar_busca_descriptografadas(self):
+        """Decifra o arquivo de senhas aberto inteiro, fora da thread do Tk, e refaz a busca ao terminar."""
+        if self.tarefa_cripto is not None:
+            self.contagem_descriptografadas_var.set("Aguarde a operação em andamento...")
+            return
+        fonte, reabrir = self.fonte_descriptografada, self._reabrir_fonte
+        carregadas = historico.HistoricoSenhas()
+
+        def executar(tarefa):
+            # Um segundo acesso ao arquivo: a lista continua lendo o dela enquanto a carga avança
+            copia = reabrir()
+            try:
+                return busca.carregar_fonte(copia, carregadas, progresso=tarefa.informar_progresso, cancelar=lambda: tarefa.cancelada)
+            finally:
+                copia.fechar()
+
+        def ao_concluir(tarefa):
+            if tarefa.erro is not None or tarefa.resultado is None or fonte is not self.fonte_descriptografada:
+                carregadas.limpar()
+                if tarefa.erro is not None:
+                    messagebox.showerror("Erro", f"Não foi possível preparar a busca: {tarefa.erro}")
+                return
+            self.busca_descriptografadas = busca.BuscaSenhas(carregadas)
+            self.aplicar_filtro_descriptografadas()
+
+        self.iniciar_tarefa_cripto("Preparando a busca nas senhas", executar, ao_concluir, unidade="senhas")
 
     def copiar_senha_descriptografada(self):
-        try:
-            senha_para_copiar = self.decrypted_listbox.get(self.decrypted_listbox.curselection()[0])
-            self.copiar_para_clipboard(senha_para_copiar)
-        except IndexError:
+        from cryptography.fernet import InvalidToken
+        indice = self.decrypted_listbox.indice_selecionado()
+        if indice is None or self.fonte_descriptografada is None:
             messagebox.showwarning("Aviso", "Nenhuma senha selecionada na lista de descriptografados.")
+            return
+        try:
+            if self.resultado_descriptografadas is not None:
+                self.copiar_para_clipboard(self.busca_descriptografadas.historico.senha(self.resultado_descriptografadas[indice]))
+                return
+            self.copiar_para_clipboard(self.fonte_descriptografada[indice])
+        except (InvalidToken, ValueError):
+            messagebox.showerror("Erro de Descriptografia", "Não foi possível descriptografar a senha selecionada.")
 
     def salvar_senhas_nao_criptografadas(self):
         if not self.senhas_geradas:
@@ -548,34 +1366,66 @@ class PasswordGeneratorApp:
             messagebox.showerror("Erro ao Salvar", f"Não foi possível salvar o arquivo: {e}")
 
     # --- Funções de Criptografia de Arquivos (mantidas, mas agora dentro de uma UI melhor) ---
+    def obter_trabalhadores(self):
+        """Número de núcleos escolhido na aba de arquivos (mínimo 1)."""
+        try:
+            return max(1, int(self.trabalhadores_var.get()))
+        except (tk.TclError, ValueError):
+            return 1
+
+    def obter_compressao(self):
+        """Compressão escolhida na aba de arquivos ("auto" ou None)."""
+        return "auto" if self.comprimir_var.get() else None
+
     def selecionar_arquivo_para_criptografar(self):
         arquivo = filedialog.askopenfilename(title="Selecionar arquivo para criptografar")
         if arquivo: self.caminho_arquivo_a_criptografar.set(arquivo)
     
     def executar_criptografia_arquivo(self):
+        import cripto_arquivos
         caminho_original = self.caminho_arquivo_a_criptografar.get()
         if not caminho_original:
             messagebox.showerror("Erro", "Nenhum arquivo selecionado para criptografar.")
             return
+        if not os.path.isfile(caminho_original):
+            messagebox.showerror("Erro", "O arquivo selecionado não existe mais.")
+            return
         
         nome_base = os.path.basename(caminho_original)
         caminho_criptografado = filedialog.asksaveasfilename(title="Salvar arquivo criptografado como...", initialfile=f"{nome_base}.enc", defaultextension=".enc", filetypes=[("Arquivo Criptografado", "*.enc")])
         if not caminho_criptografado: return
 
-        caminho_chave = filedialog.asksaveasfilename(title="Salvar arquivo da CHAVE como...", initialfile=f"{nome_base}.key", defaultextension=".key", filetypes=[("Arquivo de Chave", "*.key")])
-        if not caminho_chave: return
-
-        try:
-            with open(caminho_original, 'rb') as f: data = f.read()
-            chave = Fernet.generate_key()
-            cipher = Fernet(chave)
-            data_criptografada = cipher.encrypt(data)
-            with open(caminho_criptografado, 'wb') as f: f.write(data_criptografada)
-            with open(caminho_chave, 'wb') as f: f.write(chave)
-            messagebox.showinfo("Sucesso", "Arquivo criptografado com sucesso!\nLembre-se de guardar a chave em um local seguro.")
-            self.caminho_arquivo_a_criptografar.set("")
-        except Exception as e:
-            messagebox.showerror("Erro na Criptografia", f"Ocorreu um erro: {e}")
+        nova = self.nova_chave(f"{nome_base}.key", "Salvar arquivo da CHAVE como...")
+        if nova is None: return
+        obter_chave, caminho_chave = nova
+        trabalhadores = self.obter_trabalhadores()
+        compressao = self.obter_compressao()
+
+        def executar(tarefa):
+            chave, derivacao = obter_chave()
+            # A chave vai para o disco antes do arquivo que só ela abre
+            if caminho_chave:
+                with open(caminho_chave, 'wb') as f: f.write(chave)
+            feitos = cripto_arquivos.criptografar_arquivo(caminho_original, caminho_criptografado, chave, progresso=tarefa.informar_progresso,
+                                                          trabalhadores=trabalhadores, derivacao=derivacao, cancelar=lambda: tarefa.cancelada,
+                                                          compressao=compressao)
+            if feitos is None and caminho_chave:
+                os.remove(caminho_chave)  # cancelado: nenhum arquivo usa a chave
+            return feitos
+
+        def ao_concluir(tarefa):
+            if tarefa.erro is not None:
+                messagebox.showerror("Erro na Criptografia", f"Ocorreu um erro: {tarefa.erro}")
+            elif tarefa.resultado is None:
+                messagebox.showinfo("Cancelado", "Criptografia cancelada. Nenhum arquivo foi gravado.")
+            else:
+                if caminho_chave:
+                    messagebox.showinfo("Sucesso", "Arquivo criptografado com sucesso!\nLembre-se de guardar a chave em um local seguro.")
+                else:
+                    messagebox.showinfo("Sucesso", "Arquivo criptografado com sucesso!\nEle só pode ser aberto com a mesma senha mestra.")
+                self.caminho_arquivo_a_criptografar.set("")
+
+        self.iniciar_tarefa_cripto("Criptografando arquivo", executar, ao_concluir, total=os.path.getsize(caminho_original))
 
     def selecionar_arquivo_para_descriptografar(self):
         arquivo = filedialog.askopenfilename(title="Selecionar arquivo criptografado (.enc)", filetypes=[("Arquivo Criptografado", "*.enc")])
@@ -586,10 +1436,12 @@ class PasswordGeneratorApp:
         if arquivo: self.caminho_chave_para_descriptografar.set(arquivo)
 
     def executar_descriptografia_arquivo(self):
+        import cripto_arquivos
+        from cryptography.fernet import InvalidToken
         caminho_criptografado = self.caminho_arquivo_a_descriptografar.get()
         caminho_chave = self.caminho_chave_para_descriptografar.get()
-        if not caminho_criptografado or not caminho_chave:
-            messagebox.showerror("Erro", "Selecione o arquivo criptografado e o arquivo de chave.")
+        if not caminho_criptografado:
+            messagebox.showerror("Erro", "Selecione o arquivo criptografado (e o arquivo de chave, se ele não usar uma senha mestra).")
             return
 
         nome_base = os.path.basename(caminho_criptografado)
@@ -599,35 +1451,153 @@ class PasswordGeneratorApp:
         if not caminho_descriptografado: return
         
         try:
-            with open(caminho_chave, 'rb') as f: chave = f.read()
-            cipher = Fernet(chave)
-            with open(caminho_criptografado, 'rb') as f: data_criptografada = f.read()
-            data_descriptografada = cipher.decrypt(data_criptografada)
-            with open(caminho_descriptografado, 'wb') as f: f.write(data_descriptografada)
-            messagebox.showinfo("Sucesso", "Arquivo descriptografado com sucesso!")
-            self.caminho_arquivo_a_descriptografar.set("")
-            self.caminho_chave_para_descriptografar.set("")
-        except (InvalidToken, ValueError, TypeError):
-            messagebox.showerror("Erro de Descriptografia", "Falha ao descriptografar. Verifique se a chave corresponde ao arquivo.")
+            obter_chave = self.preparar_chave_existente(caminho_criptografado, caminho_chave)
+            total = cripto_arquivos.estimar_tamanho_original(caminho_criptografado)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o arquivo: {e}")
+            return
+        if obter_chave is None: return
+        trabalhadores = self.obter_trabalhadores()
+
+        def executar(tarefa):
+            # Aceita tanto o formato em blocos quanto os .enc legados (token Fernet único)
+            return cripto_arquivos.descriptografar_arquivo(caminho_criptografado, caminho_descriptografado, obter_chave(), progresso=tarefa.informar_progresso,
+                                                           trabalhadores=trabalhadores, cancelar=lambda: tarefa.cancelada)
+
+        def ao_concluir(tarefa):
+            if isinstance(tarefa.erro, (InvalidToken, ValueError, TypeError)):
+                messagebox.showerror("Erro de Descriptografia", "Falha ao descriptografar. Verifique se a chave corresponde ao arquivo.")
+            elif tarefa.erro is not None:
+                messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {tarefa.erro}")
+            elif tarefa.resultado is None:
+                messagebox.showinfo("Cancelado", "Descriptografia cancelada. Nenhum arquivo foi gravado.")
+            else:
+                messagebox.showinfo("Sucesso", "Arquivo descriptografado com sucesso!")
+                self.caminho_arquivo_a_descriptografar.set("")
+                self.caminho_chave_para_descriptografar.set("")
+
+        self.iniciar_tarefa_cripto("Descriptografando arquivo", executar, ao_concluir, total=total)
+
+    def executar_verificacao_arquivo(self):
+        """Confere se o .enc abre com a chave e não foi alterado, sem gravar o conteúdo em claro."""
+        import verificacao_arquivos
+        caminho_criptografado = self.caminho_arquivo_a_descriptografar.get()
+        caminho_chave = self.caminho_chave_para_descriptografar.get()
+        if not caminho_criptografado:
+            messagebox.showerror("Erro", "Selecione o arquivo criptografado (e o arquivo de chave, se ele não usar uma senha mestra).")
+            return
+        try:
+            obter_chave = self.preparar_chave_existente(caminho_criptografado, caminho_chave)
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Erro", f"Não foi possível ler o arquivo: {e}")
+            return
+        if obter_chave is None: return
+        trabalhadores = self.obter_trabalhadores()
+
+        def executar(tarefa):
+            # Sem senha na verificação: a chave derivada da senha mestra já vai na lista
+            chaves = verificacao_arquivos.ChavesVerificacao([obter_chave()])
+            return verificacao_arquivos.verificar_arquivo(caminho_criptografado, chaves, progresso=tarefa.informar_progresso,
+                                                          trabalhadores=trabalhadores, cancelar=lambda: tarefa.cancelada)
+
+        def ao_concluir(tarefa):
+            entrada = tarefa.resultado
+            if isinstance(tarefa.erro, ValueError):  # senha mestra incorreta ou chave inválida
+                messagebox.showerror("Falha na Verificação", str(tarefa.erro))
+            elif tarefa.erro is not None:
+                messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {tarefa.erro}")
+            elif entrada["status"] == verificacao_arquivos.CANCELADO:
+                messagebox.showinfo("Cancelado", "Verificação cancelada.")
+            elif entrada["status"] == verificacao_arquivos.OK:
+                messagebox.showinfo("Arquivo Íntegro", "A chave corresponde ao arquivo e nenhum bloco foi alterado.")
+            elif entrada["status"] == verificacao_arquivos.CHAVE_INCORRETA:
+                messagebox.showerror("Falha na Verificação", "A chave não abre este arquivo (chave errada ou conteúdo alterado).")
+            else:
+                messagebox.showerror("Falha na Verificação", f"O arquivo está corrompido ou não pôde ser lido: {entrada.get('erro')}")
+
+        self.iniciar_tarefa_cripto("Verificando arquivo", executar, ao_concluir, total=os.path.getsize(caminho_criptografado))
+
+    # --- Criptografia em Lote de Pastas ---
+    def selecionar_pasta_origem(self):
+        pasta = filedialog.askdirectory(title="Selecionar pasta para criptografar")
+        if pasta: self.caminho_pasta_origem.set(pasta)
+
+    def selecionar_pasta_destino(self):
+        pasta = filedialog.askdirectory(title="Selecionar pasta de destino dos arquivos criptografados")
+        if pasta: self.caminho_pasta_destino.set(pasta)
+
+    def selecionar_chave_lote(self):
+        arquivo = filedialog.askopenfilename(title="Selecionar chave existente (para retomar um lote)", filetypes=[("Arquivo de Chave", "*.key")])
+        if arquivo: self.caminho_chave_lote.set(arquivo)
+
+    def executar_criptografia_pasta(self):
+        import lote_arquivos
+        origem = self.caminho_pasta_origem.get()
+        destino = self.caminho_pasta_destino.get()
+        if not origem or not destino:
+            messagebox.showerror("Erro", "Selecione a pasta de origem e a pasta de destino.")
+            return
+        if os.path.abspath(origem) == os.path.abspath(destino):
+            messagebox.showerror("Erro", "A pasta de destino deve ser diferente da pasta de origem.")
+            return
+
+        caminho_chave = self.caminho_chave_lote.get()
+        try:
+            # Um lote iniciado com senha mestra é retomado com a mesma derivação (parâmetros no manifesto)
+            derivacao = lote_arquivos.derivacao_do_manifesto(os.path.join(destino, lote_arquivos.NOME_MANIFESTO))
+            if caminho_chave:
+                with open(caminho_chave, 'rb') as f: chave = f.read()
+                obter_chave = lambda: (chave, derivacao)
+            elif derivacao is not None:
+                obter = self.preparar_senha_mestra(derivacao)
+                if obter is None: return
+                obter_chave = lambda: (obter(), derivacao)
+            else:
+                nova = self.nova_chave(f"{os.path.basename(os.path.abspath(origem))}.key", "Salvar arquivo da CHAVE do lote como...")
+                if nova is None: return
+                obter_chave, caminho_chave = nova
+                if caminho_chave:
+                    with open(caminho_chave, 'wb') as f: f.write(obter_chave()[0])
+                    self.caminho_chave_lote.set(caminho_chave)
+        except ValueError as e:
+            messagebox.showerror("Erro no Lote", str(e))
+            return
         except Exception as e:
             messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {e}")
+            return
+        trabalhadores = self.obter_trabalhadores()
+        compressao = self.obter_compressao()
+
+        def executar(tarefa):
+            chave, derivacao = obter_chave()
+            return lote_arquivos.criptografar_diretorio(origem, destino, chave, trabalhadores=trabalhadores, progresso=tarefa.informar_progresso,
+                                                        cancelar=lambda: tarefa.cancelada, derivacao=derivacao, compressao=compressao)
+
+        def ao_concluir(tarefa):
+            if isinstance(tarefa.erro, ValueError):
+                messagebox.showerror("Erro no Lote", str(tarefa.erro))
+            elif tarefa.erro is not None:
+                messagebox.showerror("Erro", f"Ocorreu um erro inesperado: {tarefa.erro}")
+            else:
+                resumo = tarefa.resultado
+                titulo = "Lote Cancelado" if resumo["cancelado"] else "Lote Concluído"
+                retomar = "\n\nRepita a operação com o mesmo destino para retomar." if resumo["cancelado"] else ""
+                messagebox.showinfo(titulo, f"Arquivos criptografados: {resumo['ok']}\nJá concluídos (pulados): {resumo['pulados']}\nErros: {resumo['erros']}\n\nDetalhes em: {lote_arquivos.NOME_MANIFESTO}{retomar}")
+
+        self.iniciar_tarefa_cripto("Criptografando pasta", executar, ao_concluir, unidade="arquivos")
+
+def criar_aplicacao():
+    """Cria a janela e pinta a primeira tela; o tema é aplicado logo em seguida, já com a janela visível."""
+    root = tk.Tk()
+    app = PasswordGeneratorApp(root)
+    root.update()  # Primeira pintura da janela
+    root.after_idle(app.aplicar_tema_inicial)
+    return root, app
 
 if __name__ == "__main__":
     # Para executar este script, você precisa instalar as bibliotecas:
     # pip install cryptography ttkthemes
-    root = ThemedTk()
-    initial_theme = load_theme_config()
-    if initial_theme in root.get_themes():
-        root.set_theme(initial_theme)
-    else:
-        root.set_theme(DEFAULT_THEME)
-        save_theme_config(DEFAULT_THEME)
-    
-    # Adiciona um estilo para botões de destaque
-    style = ttk.Style()
-    style.configure('Accent.TButton', font=('Segoe UI', 10, 'bold'))
-
-    app = PasswordGeneratorApp(root)
+    import multiprocessing
+    multiprocessing.freeze_support()  # Necessário para o pool de processos no executável do PyInstaller
+    root, app = criar_aplicacao()
     root.mainloop()
-
-
@@ -0,0 +1,53 @@
+# %% Benchmark: busca no histórico (filtrar enquanto digita)
+#
+# Enche um HistoricoSenhas com --quantidade senhas e mede a latência de cada passo da digitação
+# de uma busca ("a", "ab", "abc", ...), a busca por força, a combinação das duas, a posição ("#n")
+# e a mesma busca repetida depois de um novo lote (que só examina as senhas novas). Para
+# comparação, mostra também o filtro ingênuo sobre uma lista de `str` (`trecho in senha`).
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import busca
+import forca_senhas
+import historico
+import motor_senhas
+from comum import medir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a latência da busca no histórico enquanto se digita.")
+    parser.add_argument("--quantidade", type=int, default=1_000_000)
+    parser.add_argument("--tamanho", type=int, default=16)
+    parser.add_argument("--texto", default="aB3$", help="texto digitado, um caractere por vez")
+    args = parser.parse_args()
+
+    senhas = motor_senhas.generate_many(args.quantidade, args.tamanho)
+    forcas = forca_senhas.avaliar_lote(senhas)
+    registro = historico.HistoricoSenhas()
+    registro.adicionar_lote(senhas, forcas)
+    pesquisa = busca.BuscaSenhas(registro)
+    t_baldes, _ = medir(pesquisa.atualizar, 1)
+    print(f"{args.quantidade:,} senhas de {args.tamanho} caracteres; baldes de força montados em {t_baldes * 1000:.0f} ms\n")
+
+    print(f"{'busca':<28} {'resultados':>11} {'arena':>10} {'lista de str':>13}")
+    consultas = [(args.texto[:i], None) for i in range(1, len(args.texto) + 1)]
+    consultas += [("", "Forte"), ("", busca.VAZADAS), (args.texto[:2], "Muito Forte"), (f"#{args.quantidade // 2}", None)]
+    for texto, forca in consultas:
+        t, resultado = medir(lambda: pesquisa.buscar(texto, forca), 1)  # repetir cairia na busca guardada
+        t_lista, _ = medir(lambda: [i for i, senha in enumerate(senhas) if texto in senha], 1) if texto and not texto.startswith("#") and forca is None else (None, None)
+        rotulo = repr(texto) + (f" + {forca}" if forca else "")
+        lista = f"{t_lista * 1000:>10.1f} ms" if t_lista is not None else f"{'-':>13}"
+        print(f"{rotulo:<28} {len(resultado):>11,} {t * 1000:>7.1f} ms {lista}")
+
+    novas = motor_senhas.generate_many(1000, args.tamanho)
+    pesquisa.buscar(args.texto[:2])
+    registro.adicionar_lote(novas, forca_senhas.avaliar_lote(novas))
+    t, resultado = medir(lambda: pesquisa.buscar(args.texto[:2]), 1)
+    print(f"\nmesma busca após +1.000 senhas: {t * 1000:.2f} ms ({len(resultado):,} resultados)")
+
+
+if __name__ == "__main__":
+    main()
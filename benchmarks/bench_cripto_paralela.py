@@ -0,0 +1,76 @@
+# %% Benchmark: escalonamento da criptografia em blocos de 1 a N núcleos
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cripto_arquivos
+from cryptography.fernet import Fernet
+
+_UNIDADES = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def ler_tamanho(texto):
+    """Converte '100M', '1G', '512K' ou um número de bytes em inteiro."""
+    texto = texto.strip().upper().rstrip("B")
+    if texto and texto[-1] in _UNIDADES:
+        return int(float(texto[:-1]) * _UNIDADES[texto[-1]])
+    return int(texto)
+
+
+def criar_arquivo(caminho, tamanho):
+    """Cria um arquivo de teste repetindo 1 MiB aleatório (o conteúdo não muda o custo da cifra)."""
+    bloco = os.urandom(1 << 20)
+    with open(caminho, 'wb') as f:
+        restante = tamanho
+        while restante > 0:
+            f.write(bloco[:restante])
+            restante -= len(bloco)
+
+
+def contagens_nucleos(maximo):
+    contagens = [1]
+    while contagens[-1] * 2 <= maximo:
+        contagens.append(contagens[-1] * 2)
+    if contagens[-1] != maximo:
+        contagens.append(maximo)
+    return contagens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede MB/s da criptografia em blocos variando o número de núcleos.")
+    parser.add_argument("--tamanhos", nargs="+", default=["100M", "1G", "10G"], help="tamanhos dos arquivos (ex.: 100M 1G 10G)")
+    parser.add_argument("--nucleos", type=int, default=cripto_arquivos.TRABALHADORES_PADRAO, help="número máximo de núcleos")
+    parser.add_argument("--threads", action="store_true", help="usa pool de threads em vez de processos")
+    parser.add_argument("--diretorio", default=None, help="diretório para os arquivos temporários")
+    args = parser.parse_args()
+
+    chave = Fernet.generate_key()
+    print(f"{'tamanho':>8} | {'núcleos':>7} | {'cifrar (MB/s)':>13} | {'decifrar (MB/s)':>15} | {'escala':>6}")
+    with tempfile.TemporaryDirectory(dir=args.diretorio) as pasta:
+        for texto_tamanho in args.tamanhos:
+            tamanho = ler_tamanho(texto_tamanho)
+            original = os.path.join(pasta, "original.bin")
+            cifrado = os.path.join(pasta, "original.bin.enc")
+            decifrado = os.path.join(pasta, "decifrado.bin")
+            criar_arquivo(original, tamanho)
+            base = None
+            for nucleos in contagens_nucleos(args.nucleos):
+                inicio = time.perf_counter()
+                cripto_arquivos.criptografar_arquivo(original, cifrado, chave, trabalhadores=nucleos, usar_processos=not args.threads)
+                t_cifrar = time.perf_counter() - inicio
+                inicio = time.perf_counter()
+                cripto_arquivos.descriptografar_arquivo(cifrado, decifrado, chave, trabalhadores=nucleos, usar_processos=not args.threads)
+                t_decifrar = time.perf_counter() - inicio
+                mb = tamanho / (1 << 20)
+                base = base or t_cifrar
+                print(f"{texto_tamanho:>8} | {nucleos:>7} | {mb / t_cifrar:>13,.1f} | {mb / t_decifrar:>15,.1f} | {base / t_cifrar:>5.2f}x")
+            for caminho in (original, cifrado, decifrado):
+                os.remove(caminho)
+
+
+if __name__ == "__main__":
+    main()
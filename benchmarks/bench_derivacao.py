@@ -0,0 +1,62 @@
+# %% Benchmark: chaves derivadas de senha mestra e o cache da sessão
+#
+# Mede a calibração do custo (scrypt e, se disponível, Argon2id), o tempo de uma derivação com o
+# custo escolhido e a abertura de uma pasta de arquivos .enc que dividem o mesmo sal de derivação:
+# sem cache cada arquivo paga a derivação; com o cache, só o primeiro.
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cripto_arquivos
+import derivacao_chaves
+from comum import medir
+
+
+def abrir_todos(caminhos, chave_de):
+    for caminho in caminhos:
+        chave = chave_de(derivacao_chaves.parametros_do_arquivo(caminho))
+        cripto_arquivos.descriptografar_arquivo(caminho, caminho + ".dec", chave)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a calibração, a derivação e o cache de chaves derivadas.")
+    parser.add_argument("--alvo", type=float, default=derivacao_chaves.TEMPO_ALVO, help="segundos por derivação")
+    parser.add_argument("--arquivos", type=int, default=20)
+    args = parser.parse_args()
+
+    senha = "senha mestra de teste"
+    print(f"{'algoritmo':<10} {'calibração':>11} {'custo':>20} {'derivação':>10}")
+    for algoritmo in derivacao_chaves.ALGORITMOS:
+        try:
+            t_calibrar, custo = medir(lambda: derivacao_chaves.calibrar(algoritmo, args.alvo))
+        except ValueError as e:
+            print(f"{algoritmo:<10} indisponível ({e})")
+            continue
+        t_derivar = medir(lambda: derivacao_chaves.derivar(senha, derivacao_chaves.criar_parametros(algoritmo, custo)))[0]
+        print(f"{algoritmo:<10} {t_calibrar:>10.2f}s {str(custo):>20} {t_derivar:>9.3f}s")
+
+    parametros = derivacao_chaves.novos_parametros(alvo=args.alvo)
+    chave = derivacao_chaves.derivar(senha, parametros)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = []
+        for i in range(args.arquivos):
+            origem = os.path.join(pasta, f"{i}.txt")
+            with open(origem, 'wb') as f:
+                f.write(os.urandom(4096))
+            cripto_arquivos.criptografar_arquivo(origem, origem + ".enc", chave, derivacao=parametros)
+            caminhos.append(origem + ".enc")
+
+        t_sem = medir(lambda: abrir_todos(caminhos, lambda p: derivacao_chaves.derivar(senha, p)))[0]
+        cache = derivacao_chaves.CacheChaves()
+        t_com = medir(lambda: abrir_todos(caminhos, lambda p: cache.obter(p, senha)))[0]
+        cache.limpar()
+    print(f"\n{args.arquivos} arquivos com o mesmo sal:")
+    print(f"  sem cache: {t_sem:.2f}s")
+    print(f"  com cache: {t_com:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# %% Benchmark: avaliação de força em lote (forca_senhas) vs. avaliar_forca original
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forca_senhas
+import motor_senhas
+from comum import melhor_tempo
+
+NUMEROS = list(motor_senhas.NUMEROS)
+CARACTERES_ESPECIAIS = list(motor_senhas.CARACTERES_ESPECIAIS)
+
+
+def avaliar_forca_original(senha):
+    """Reprodução do `avaliar_forca` original da interface: pontuação 0-5 com buscas em listas."""
+    score = 0
+    if len(senha) >= 8: score += 1
+    if len(senha) >= 12: score += 1
+    if any(c in NUMEROS for c in senha): score += 1
+    if any(c in CARACTERES_ESPECIAIS for c in senha): score += 1
+    if any(c.islower() for c in senha) and any(c.isupper() for c in senha): score += 1
+    return ("Muito Fraca", "Muito Fraca", "Fraca", "Média", "Forte", "Muito Forte")[score]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a avaliação de força em lote com a função original.")
+    parser.add_argument("--quantidade", type=int, default=1_000_000)
+    parser.add_argument("--quantidade-original", type=int, default=100_000)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[8, 14, 32])
+    args = parser.parse_args()
+
+    alfabeto = motor_senhas.obter_alfabeto()
+    print(f"{'tamanho':>8} | {'original (senhas/s)':>20} | {'lote (senhas/s)':>16} | {'lote c/ alfabeto':>16} | {'ganho':>7}")
+    for tamanho in args.tamanhos:
+        senhas = motor_senhas.generate_many(args.quantidade, tamanho)
+        t_original = melhor_tempo(lambda: [avaliar_forca_original(s) for s in senhas[:args.quantidade_original]])
+        t_lote = melhor_tempo(lambda: forca_senhas.avaliar_lote(senhas))
+        t_alfabeto = melhor_tempo(lambda: forca_senhas.avaliar_lote(senhas, alfabeto))
+        taxa_original = args.quantidade_original / t_original
+        taxa_lote = args.quantidade / t_lote
+        print(f"{tamanho:>8} | {taxa_original:>20,.0f} | {taxa_lote:>16,.0f} | {args.quantidade / t_alfabeto:>16,.0f} | {taxa_lote / taxa_original:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
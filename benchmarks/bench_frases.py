@@ -0,0 +1,52 @@
+# %% Benchmark: frases-senha com a lista de palavras compilada e mapeada em memória
+#
+# Mede a compilação do índice (feita uma única vez por lista), a abertura do índice já compilado
+# e o custo por frase. Sem --lista, usa uma lista sintética de --palavras-lista palavras.
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import frases_senha
+import motor_senhas
+from comum import medir
+
+
+def criar_lista_sintetica(caminho, quantidade):
+    palavras = set()
+    while len(palavras) < quantidade:
+        palavras.update(motor_senhas.generate_many(quantidade - len(palavras), 7, usar_numeros=False, usar_especiais=False))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write("\n".join(sorted(palavras)) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede a compilação, a abertura e a geração de frases-senha.")
+    parser.add_argument("--lista", help="lista de palavras (padrão: uma lista sintética)")
+    parser.add_argument("--palavras-lista", type=int, default=200_000)
+    parser.add_argument("--quantidade", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        origem = args.lista
+        if origem is None:
+            origem = os.path.join(pasta, "lista.txt")
+            criar_lista_sintetica(origem, args.palavras_lista)
+        indice = os.path.join(pasta, "lista" + frases_senha.EXTENSAO)
+        t_compilar = medir(lambda: frases_senha.compilar_lista(origem, indice))[0]
+        t_abrir, lista = medir(lambda: frases_senha.ListaPalavras(indice))
+        with lista:
+            t_uma = medir(lambda: frases_senha.gerar_frase(lista))[0]
+            t_lote = medir(lambda: frases_senha.gerar_frases(lista, args.quantidade))[0]
+            bits, forca = frases_senha.avaliar_frase(lista)
+            print(f"lista: {len(lista):,} palavras ({bits:.1f} bits por frase de {frases_senha.PALAVRAS_PADRAO} palavras, {forca})")
+        print(f"compilação (uma vez): {t_compilar * 1000:.1f} ms")
+        print(f"abertura do índice:   {t_abrir * 1000:.3f} ms")
+        print(f"primeira frase:       {t_uma * 1000:.3f} ms")
+        print(f"em lote:              {args.quantidade / t_lote:,.0f} frases/s")
+
+
+if __name__ == "__main__":
+    main()
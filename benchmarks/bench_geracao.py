@@ -0,0 +1,40 @@
+# %% Benchmark: motor em lote (motor_senhas) vs. laço caractere a caractere original
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import motor_senhas
+from comum import melhor_tempo
+
+
+def gerar_senha_original(tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True):
+    """Reprodução do `gerar_senha` original da interface: recria a lista e sorteia com `random.choice`."""
+    caracteres = []
+    if usar_letras: caracteres.extend(motor_senhas.LETRAS)
+    if usar_numeros: caracteres.extend(motor_senhas.NUMEROS)
+    if usar_especiais: caracteres.extend(motor_senhas.CARACTERES_ESPECIAIS)
+    return ''.join(random.choice(caracteres) for _ in range(tamanho))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o motor de geração em lote com o laço original.")
+    parser.add_argument("--quantidade", type=int, default=1_000_000, help="senhas por rodada no motor em lote")
+    parser.add_argument("--quantidade-original", type=int, default=100_000, help="senhas por rodada no laço original")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'tamanho':>8} | {'original (senhas/s)':>20} | {'lote (senhas/s)':>16} | {'ganho':>7}")
+    for tamanho in args.tamanhos:
+        t_original = melhor_tempo(lambda: [gerar_senha_original(tamanho) for _ in range(args.quantidade_original)], args.repeticoes)
+        t_lote = melhor_tempo(lambda: motor_senhas.generate_many(args.quantidade, tamanho), args.repeticoes)
+        taxa_original = args.quantidade_original / t_original
+        taxa_lote = args.quantidade / t_lote
+        print(f"{tamanho:>8} | {taxa_original:>20,.0f} | {taxa_lote:>16,.0f} | {taxa_lote / taxa_original:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# %% Benchmark: memória e velocidade do histórico da sessão
+#
+# Compara a lista de dicionários usada antes ({"senha": str, "forca": str, "vazada": bool} por
+# senha) com o HistoricoSenhas (arena de bytes + offsets + um byte de código por senha): memória
+# retida (medida com tracemalloc, contando as `str` que a estrutura mantém vivas), tempo de
+# inserção em lote, leitura de uma página de linhas (o que a lista virtual pede a cada quadro),
+# leitura de todas as senhas (salvar no cofre) e limpeza.
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import forca_senhas
+import historico
+import motor_senhas
+from comum import melhor_tempo
+
+LINHAS_PAGINA = 40
+
+
+def lista_dicionarios(senhas, forcas):
+    return [{"senha": senha, "forca": forca, "vazada": False} for senha, forca in zip(senhas, forcas)]
+
+
+def arena(senhas, forcas):
+    h = historico.HistoricoSenhas()
+    h.adicionar_lote(senhas, forcas)
+    return h
+
+
+def memoria_retida(construir, senhas, forcas):
+    """
+    Bytes que a estrutura mantém alocados. As `str` das senhas são criadas antes da medição; a lista
+    de dicionários continua apontando para elas, então o tamanho delas entra na conta.
+    """
+    gc.collect()
+    tracemalloc.start()
+    estrutura = construir(senhas, forcas)
+    gc.collect()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if isinstance(estrutura, list):
+        memoria += sum(map(sys.getsizeof, senhas))
+    return memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a memória e a velocidade do histórico em arena com a lista de dicionários.")
+    parser.add_argument("--quantidades", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--tamanho", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'estrutura':<20} {'senhas':>10} {'memória':>11} {'bytes/senha':>12} {'inserir':>9} {'página':>9} {'todas':>9} {'limpar':>9}")
+    for quantidade in args.quantidades:
+        senhas = motor_senhas.generate_many(quantidade, args.tamanho)
+        forcas = forca_senhas.avaliar_lote(senhas)
+        for nome, construir, ler_pagina, ler_todas, limpar in (
+            ("lista de dicionários", lista_dicionarios, lambda e: e[-LINHAS_PAGINA:],
+             lambda e: [item['senha'] for item in e], lambda e: e.clear()),
+            ("arena", arena, lambda e: e[len(e) - LINHAS_PAGINA:], lambda e: e.senhas(), lambda e: e.limpar()),
+        ):
+            memoria = memoria_retida(construir, senhas, forcas)
+            estrutura = [None]
+            t_inserir = melhor_tempo(lambda: estrutura.__setitem__(0, construir(senhas, forcas)))
+            t_pagina = melhor_tempo(lambda: ler_pagina(estrutura[0]))
+            t_todas = melhor_tempo(lambda: ler_todas(estrutura[0]))
+            t_limpar = melhor_tempo(lambda: limpar(estrutura[0]))
+            print(f"{nome:<20} {quantidade:>10,} {memoria / 2**20:>8.1f} MB {memoria / quantidade:>12.1f} "
+                  f"{t_inserir * 1000:>7.1f}ms {t_pagina * 1e6:>7.0f}µs {t_todas * 1000:>7.1f}ms {t_limpar * 1000:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
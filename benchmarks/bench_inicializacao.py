@@ -0,0 +1,82 @@
+# %% Benchmark: tempo de inicialização da interface (primeira pintura e primeira interação)
+#
+# Cada medição roda em um processo novo, para incluir o custo real dos imports.
+# - importação: tempo para importar Gerador_Senhas (tkinter, motor, lista virtual...)
+# - primeira pintura: janela criada e desenhada (`criar_aplicacao` retorna depois de `update()`)
+# - primeira interação: o tema já foi aplicado e o laço de eventos está livre para o usuário
+# - processo: do início do processo filho até a primeira interação, medido pelo processo pai
+# Precisa de um display (no Linux sem interface, use `xvfb-run`).
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado no processo filho; imprime uma linha JSON com os tempos em milissegundos
+CODIGO_FILHO = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import tkinter as tk
+try:
+    import Gerador_Senhas
+    t_import = time.perf_counter()
+    root, app = Gerador_Senhas.criar_aplicacao()
+except tk.TclError as e:
+    print(json.dumps({"erro": str(e)}))
+    sys.exit(0)
+t_pintura = time.perf_counter()
+tempos = {}
+
+def interacao():
+    tempos["interacao"] = time.perf_counter()
+    root.destroy()
+
+# `criar_aplicacao` agenda o tema com after_idle; este after_idle entra na fila depois dele
+root.after_idle(lambda: root.after(0, interacao))
+root.mainloop()
+print(json.dumps({
+    "importacao": (t_import - t0) * 1000,
+    "pintura": (t_pintura - t0) * 1000,
+    "interacao": (tempos["interacao"] - t0) * 1000,
+}))
+"""
+
+
+def medir_uma_vez():
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, "-c", CODIGO_FILHO, RAIZ], capture_output=True, text=True, check=True).stdout
+    processo = (time.perf_counter() - inicio) * 1000
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    resultado["processo"] = processo
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo até a primeira pintura e a primeira interação da interface.")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    medidas = []
+    for _ in range(args.repeticoes):
+        resultado = medir_uma_vez()
+        if "erro" in resultado:
+            print(f"Não foi possível abrir a janela: {resultado['erro']}")
+            return 1
+        medidas.append(resultado)
+
+    print(f"{'etapa':>18} | {'mediana (ms)':>12} | {'mínimo (ms)':>11}")
+    for etapa, nome in (("importacao", "importação"), ("pintura", "primeira pintura"),
+                        ("interacao", "primeira interação"), ("processo", "processo completo")):
+        valores = [m[etapa] for m in medidas]
+        print(f"{nome:>18} | {statistics.median(valores):>12.1f} | {min(valores):>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# %% Benchmark: rotação de chaves em lote
+#
+# Cria `--arquivos` .enc comprimidos (logs sintéticos) e um cofre, e troca a chave deles de três
+# jeitos: o caminho ingênuo (descriptografar para um arquivo em claro no disco e criptografar de
+# novo, comprimindo outra vez), a rotação em fluxo de rotacao_chaves com um trabalhador e com
+# `--trabalhadores`. A rotação não descomprime nem recomprime: os blocos só mudam de chave, então
+# o custo é o da AES-GCM e não o da zlib. O cofre mostra o mesmo efeito: os registros passam de uma
+# chave para a outra sem ser desempacotados (a não ser para refazer o .unicos, quando ele existe).
+#
+# Cada medição alterna as duas chaves (A → B, B → A), então todas partem de arquivos válidos.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cofre_senhas
+import cripto_arquivos
+import motor_senhas
+import rotacao_chaves
+from bench_compressao import _escrever_texto, _linhas_log
+from bench_cripto_paralela import ler_tamanho
+from comum import melhor_tempo
+from cryptography.fernet import Fernet
+
+
+class _Chaves:
+    """Par de chaves que troca de lado a cada rotação."""
+    def __init__(self):
+        self.atual, self.proxima = Fernet.generate_key(), Fernet.generate_key()
+
+    def trocar(self):
+        self.atual, self.proxima = self.proxima, self.atual
+
+
+def rotacionar_ingenuo(caminhos, chaves):
+    for caminho in caminhos:
+        if caminho.endswith(cofre_senhas.EXTENSAO):
+            with cofre_senhas.Cofre(caminho, chaves.atual) as cofre:
+                senhas = list(cofre)
+            cofre_senhas.salvar_cofre(caminho + ".novo", chaves.proxima, senhas)
+            os.replace(caminho + ".novo", caminho)
+            continue
+        claro = caminho + ".claro"
+        cripto_arquivos.descriptografar_arquivo(caminho, claro, chaves.atual)
+        cripto_arquivos.criptografar_arquivo(claro, caminho, chaves.proxima, compressao=cripto_arquivos.ZLIB)
+        os.remove(claro)
+    chaves.trocar()
+
+
+def rotacionar_fluxo(caminhos, chaves, trabalhadores):
+    resumo = rotacao_chaves.rotacionar_arquivos(caminhos, rotacao_chaves.ChavesRotacao(chaves.proxima, [chaves.atual]), trabalhadores)
+    if resumo["ok"] != len(caminhos):
+        raise RuntimeError(f"Rotação incompleta: {resumo}")
+    chaves.trocar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a rotação de chaves em fluxo com descriptografar e criptografar de novo.")
+    parser.add_argument("--arquivos", type=int, default=8, help="quantidade de .enc (padrão: 8)")
+    parser.add_argument("--tamanho", default="16M", help="tamanho original de cada .enc (padrão: 16M)")
+    parser.add_argument("--senhas", type=int, default=500_000, help="senhas no cofre (padrão: 500000)")
+    parser.add_argument("--trabalhadores", type=int, default=cripto_arquivos.TRABALHADORES_PADRAO)
+    parser.add_argument("--pasta", help="pasta para os arquivos temporários (padrão: a do sistema)")
+    args = parser.parse_args()
+
+    chaves_enc, chaves_cofre = _Chaves(), _Chaves()
+    tamanho = ler_tamanho(args.tamanho)
+    with tempfile.TemporaryDirectory(dir=args.pasta) as pasta:
+        original = os.path.join(pasta, "original.log")
+        _escrever_texto(original, tamanho, _linhas_log(random.Random(2026)))
+        arquivos = []
+        for i in range(args.arquivos):
+            caminho = os.path.join(pasta, f"arquivo{i}.log.enc")
+            cripto_arquivos.criptografar_arquivo(original, caminho, chaves_enc.atual, compressao=cripto_arquivos.ZLIB)
+            arquivos.append(caminho)
+        cofre = os.path.join(pasta, "senhas" + cofre_senhas.EXTENSAO)
+        cofre_senhas.salvar_cofre(cofre, chaves_cofre.atual, motor_senhas.generate_many(args.senhas, 16, True, True, True))
+        bytes_enc = sum(os.path.getsize(caminho) for caminho in arquivos)
+        megabytes = args.arquivos * os.path.getsize(original) / 1e6
+        print(f"{args.arquivos} .enc de {os.path.getsize(original) / 1e6:.1f} MB cada ({bytes_enc / 1e6:.1f} MB comprimidos no total) "
+              f"e um cofre de {args.senhas} senhas\n")
+
+        print(f"{'método':<34} {'.enc':>9} {'MB/s':>8} {'cofre':>9} {'senhas/s':>11}")
+        medicoes = [
+            ("decifrar em disco + cifrar", lambda lista, chaves: rotacionar_ingenuo(lista, chaves)),
+            ("rotação em fluxo, 1 trabalhador", lambda lista, chaves: rotacionar_fluxo(lista, chaves, 1)),
+            (f"rotação em fluxo, {args.trabalhadores} trabalhadores",
+             lambda lista, chaves: rotacionar_fluxo(lista, chaves, args.trabalhadores)),
+        ]
+        for nome, funcao in medicoes:
+            t_enc = melhor_tempo(lambda: funcao(arquivos, chaves_enc))
+            t_cofre = melhor_tempo(lambda: funcao([cofre], chaves_cofre))
+            print(f"{nome:<34} {t_enc:>8.2f}s {megabytes / t_enc:>8.0f} {t_cofre:>8.2f}s {args.senhas / t_cofre:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
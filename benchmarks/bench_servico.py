@@ -0,0 +1,184 @@
+# %% Benchmark: carga no serviço local de senhas (pedidos/s e latência p99)
+#
+# Sobe `gerador_cli.py serve` em um processo separado, como em produção, e mede com clientes asyncio:
+#   - um processo por pedido: o que o serviço substitui (`gerador_cli.py generate` a cada senha)
+#   - uma conexão por pedido: conecta, pede e fecha
+#   - conexões persistentes com 1 e com `--clientes` clientes, sem pipeline (espera cada resposta)
+#     e com `--profundidade` pedidos enviados de uma vez
+# A latência de cada pedido vai do envio até a chegada da sua resposta (no pipeline, o pedido
+# espera os anteriores da mesma janela). Por fim, um cliente insiste contra um serviço com limite de
+# `--taxa-limite` senhas/s: as senhas aceitas por segundo devem ficar perto do limite, e o resto é
+# recusado com "tentar_em".
+# Antes das medições, confere que pedidos inválidos (ou com uma política cara demais) no meio de um
+# pipeline só recebem um erro, sem demora.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(RAIZ, "gerador_cli.py")
+
+
+def iniciar_servico(pasta, taxa, nome):
+    """Processo do serviço e o seu endereço (caminho do socket, ou a porta quando não há socket Unix)."""
+    comando = [sys.executable, CLI, "serve", "--taxa", str(taxa)]
+    comando += ["--socket", os.path.join(pasta, nome + ".sock")] if hasattr(socket, "AF_UNIX") else ["--porta", "0"]
+    processo = subprocess.Popen(comando, stderr=subprocess.PIPE, text=True)
+    linha = processo.stderr.readline().strip()  # "Atendendo em <endereço>"
+    if not linha.startswith("Atendendo em "):
+        processo.kill()
+        raise RuntimeError(f"O serviço não iniciou: {linha}")
+    endereco = linha[len("Atendendo em "):]
+    return processo, endereco if hasattr(socket, "AF_UNIX") else int(endereco.rsplit(":", 1)[1])
+
+
+async def conectar(endereco):
+    if isinstance(endereco, str):
+        return await asyncio.open_unix_connection(endereco)
+    return await asyncio.open_connection("127.0.0.1", endereco)
+
+
+async def cliente(endereco, pedidos, profundidade, pedido, latencias):
+    """Faz `pedidos` pedidos em janelas de `profundidade`, guardando a latência de cada um."""
+    leitor, escritor = await conectar(endereco)
+    linha = (json.dumps(pedido) + "\n").encode()
+    restantes = pedidos
+    while restantes:
+        janela = min(profundidade, restantes)
+        enviado = time.perf_counter()
+        escritor.write(linha * janela)
+        await escritor.drain()
+        for _ in range(janela):
+            resposta = json.loads(await leitor.readline())
+            if "erro" in resposta:
+                raise RuntimeError(resposta["erro"])
+            latencias.append(time.perf_counter() - enviado)
+        restantes -= janela
+    escritor.close()
+    await escritor.wait_closed()
+
+
+async def uma_conexao_por_pedido(endereco, pedidos, pedido, latencias):
+    for _ in range(pedidos):
+        await cliente(endereco, 1, 1, pedido, latencias)
+
+
+def conferir_pedidos_invalidos(endereco):
+    """Pedidos inválidos no meio de um pipeline recebem um erro e não derrubam a conexão nem as outras respostas."""
+    async def conferir():
+        leitor, escritor = await conectar(endereco)
+        # O pedido 4 pede uma política cuja tabela teria bilhões de estados: é recusado antes de ser montada
+        lote = [{"id": 1}, {"id": 2, "minimos": {"numeros": -3}}, {"id": 3, "quantidade": 0},
+                {"id": 4, "tamanho": 128, "maximos": {nome: 60 for nome in ("minusculas", "maiusculas", "numeros", "especiais")},
+                 "maximo_seguidos": 2}]
+        escritor.write(b"".join(json.dumps(pedido).encode() + b"\n" for pedido in lote) + b"[" * 60_000 + b'\n{"id": 6}\n')
+        await escritor.drain()
+        respostas = [json.loads(await asyncio.wait_for(leitor.readline(), 10)) for _ in range(6)]
+        escritor.close()
+        await escritor.wait_closed()
+        return respostas
+    respostas = asyncio.run(conferir())
+    if [("senhas" in r, "erro" in r) for r in respostas] != [(True, False), *[(False, True)] * 4, (True, False)]:
+        raise RuntimeError(f"Pedidos inválidos não foram isolados: {respostas}")
+
+
+def medir_carga(endereco, clientes, pedidos, profundidade, pedido):
+    async def carga():
+        await asyncio.gather(*(cliente(endereco, pedidos // clientes, profundidade, pedido, latencias) for _ in range(clientes)))
+    latencias = []
+    inicio = time.perf_counter()
+    asyncio.run(carga())
+    return time.perf_counter() - inicio, latencias
+
+
+def medir_processos(pedidos, quantidade):
+    latencias = []
+    for _ in range(pedidos):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, CLI, "generate", "--nivel", "A", "-n", str(quantidade)], capture_output=True, check=True)
+        latencias.append(time.perf_counter() - inicio)
+    return sum(latencias), latencias
+
+
+def percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+def imprimir(nome, duracao, latencias, quantidade):
+    ordenadas = sorted(latencias)
+    print(f"{nome:<40} {len(latencias) / duracao:>11,.0f} {len(latencias) * quantidade / duracao:>11,.0f} "
+          f"{percentil(ordenadas, 0.50) * 1000:>9.2f} {percentil(ordenadas, 0.99) * 1000:>9.2f}")
+
+
+def medir_limite(endereco, segundos, quantidade):
+    """Um cliente sem pipeline pedindo sem parar por `segundos`: (senhas aceitas, pedidos recusados)."""
+    async def insistir():
+        leitor, escritor = await conectar(endereco)
+        linha = (json.dumps({"nivel": "A", "quantidade": quantidade}) + "\n").encode()
+        aceitas = recusados = 0
+        fim = time.perf_counter() + segundos
+        while time.perf_counter() < fim:
+            escritor.write(linha)
+            resposta = json.loads(await leitor.readline())
+            if "erro" in resposta:
+                recusados += 1
+            else:
+                aceitas += len(resposta["senhas"])
+        escritor.close()
+        await escritor.wait_closed()
+        return aceitas, recusados
+    return asyncio.run(insistir())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede pedidos/s e latência do serviço local de senhas sob carga.")
+    parser.add_argument("--pedidos", type=int, default=20_000, help="pedidos por cenário (padrão: 20000)")
+    parser.add_argument("--clientes", type=int, default=16, help="conexões simultâneas (padrão: 16)")
+    parser.add_argument("--profundidade", type=int, default=32, help="pedidos por janela no pipeline (padrão: 32)")
+    parser.add_argument("--quantidade", type=int, default=1, help="senhas por pedido (padrão: 1)")
+    parser.add_argument("--processos", type=int, default=20, help="pedidos no cenário de um processo por pedido (padrão: 20)")
+    parser.add_argument("--taxa-limite", type=int, default=5000, help="limite (senhas/s) no teste do limite de taxa (padrão: 5000)")
+    args = parser.parse_args()
+
+    pedido = {"nivel": "A", "quantidade": args.quantidade}
+    with tempfile.TemporaryDirectory() as pasta:
+        processo, endereco = iniciar_servico(pasta, 0, "livre")
+        try:
+            conferir_pedidos_invalidos(endereco)
+            print(f"{args.pedidos} pedidos de {args.quantidade} senha(s) do nível A por cenário\n")
+            print(f"{'cenário':<40} {'pedidos/s':>11} {'senhas/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+            imprimir("um processo por pedido", *medir_processos(args.processos, args.quantidade), args.quantidade)
+
+            latencias = []
+            inicio = time.perf_counter()
+            asyncio.run(uma_conexao_por_pedido(endereco, args.pedidos // 10, pedido, latencias))
+            imprimir("uma conexão por pedido", time.perf_counter() - inicio, latencias, args.quantidade)
+
+            for clientes in (1, args.clientes):
+                for profundidade in (1, args.profundidade):
+                    nome = f"{clientes} cliente(s), " + (f"pipeline de {profundidade}" if profundidade > 1 else "sem pipeline")
+                    imprimir(nome, *medir_carga(endereco, clientes, args.pedidos, profundidade, pedido), args.quantidade)
+        finally:
+            processo.terminate()
+            processo.wait()
+
+        processo, endereco = iniciar_servico(pasta, args.taxa_limite, "limitado")
+        try:
+            segundos = 3
+            aceitas, recusados = medir_limite(endereco, segundos, max(1, args.taxa_limite // 100))
+            print(f"\nLimite de {args.taxa_limite} senhas/s: {aceitas / segundos:,.0f} senhas/s aceitas em {segundos} s "
+                  f"(a rajada inicial entra na conta), {recusados} pedidos recusados")
+        finally:
+            processo.terminate()
+            processo.wait()
+
+
+if __name__ == "__main__":
+    main()
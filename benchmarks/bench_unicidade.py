@@ -0,0 +1,64 @@
+# %% Benchmark: registro de unicidade (unicidade.py) vs. um set de senhas
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import motor_senhas
+import unicidade
+from comum import medir
+
+
+def medir_memoria(funcao):
+    """Bytes alocados pela estrutura (medido à parte: o tracemalloc deixa tudo mais lento)."""
+    tracemalloc.start()
+    estrutura = funcao()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del estrutura
+    return memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o custo de registrar e conferir senhas em cada modo do registro de unicidade.")
+    parser.add_argument("--quantidade", type=int, default=1_000_000)
+    parser.add_argument("--tamanho", type=int, default=16)
+    parser.add_argument("--tamanho-lote", type=int, default=50_000)
+    args = parser.parse_args()
+
+    senhas = motor_senhas.generate_many(args.quantidade, args.tamanho)
+    lotes = [senhas[i:i + args.tamanho_lote] for i in range(0, len(senhas), args.tamanho_lote)]
+    modos = (
+        ("set de senhas", lambda: set()),
+        ("exato", lambda: unicidade.RegistroUnicidade()),
+        ("exato (pré-dimensionado)", lambda: unicidade.RegistroUnicidade(capacidade=args.quantidade)),
+        ("aproximado (0,1%)", lambda: unicidade.RegistroUnicidade(probabilistico=True, capacidade=args.quantidade)),
+    )
+    print(f"{'modo':>26} | {'registrar (senhas/s)':>20} | {'conferir (senhas/s)':>19} | {'bytes/senha':>11}")
+    for nome, criar in modos:
+        if nome == "set de senhas":
+            def registrar():
+                conjunto = criar()
+                for lote in lotes:
+                    conjunto.update(lote)
+                return conjunto
+            conferir = lambda conjunto: [[s in conjunto for s in lote] for lote in lotes]
+        else:
+            def registrar():
+                registro = criar()
+                for lote in lotes:
+                    registro.reservar_lote(lote)
+                return registro
+            conferir = lambda registro: [registro.verificar_lote(lote) for lote in lotes]
+        t_registrar, estrutura = medir(registrar)
+        t_conferir = medir(lambda: conferir(estrutura))[0]
+        memoria = medir_memoria(registrar)
+        if nome == "set de senhas":
+            memoria += sum(map(sys.getsizeof, senhas))  # o set precisa manter as próprias senhas
+        print(f"{nome:>26} | {args.quantidade / t_registrar:>20,.0f} | {args.quantidade / t_conferir:>19,.0f} | {memoria / args.quantidade:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# %% Benchmark: verificação de integridade em lote
+#
+# Cria `--arquivos` .enc e compara três jeitos de conferir se eles abrem com a chave e não foram
+# alterados: descriptografar cada um para um arquivo em claro (e apagá-lo), como era preciso
+# antes; e a verificação de verificacao_arquivos, que só confere as tags, com um trabalhador e com
+# `--trabalhadores`. A verificação não grava nada, então o tempo fica perto do de só ler os
+# arquivos (a coluna "leitura" mostra esse limite, com os arquivos já no cache do sistema).
+#
+# Metade dos arquivos é comprimida (logs), para mostrar que a verificação não descomprime.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cripto_arquivos
+import verificacao_arquivos
+from bench_compressao import _escrever_texto, _linhas_log
+from bench_cripto_paralela import ler_tamanho
+from comum import melhor_tempo
+from cryptography.fernet import Fernet
+
+
+def descriptografar_todos(caminhos, chave):
+    for caminho in caminhos:
+        claro = caminho + ".claro"
+        cripto_arquivos.descriptografar_arquivo(caminho, claro, chave)
+        os.remove(claro)
+
+
+def verificar_todos(caminhos, chave, trabalhadores):
+    resumo = verificacao_arquivos.verificar_arquivos(caminhos, verificacao_arquivos.ChavesVerificacao([chave]), trabalhadores)
+    if resumo["ok"] != len(caminhos):
+        raise RuntimeError(f"Verificação falhou: {resumo}")
+
+
+def ler_todos(caminhos):
+    for caminho in caminhos:
+        with open(caminho, 'rb') as f:
+            while f.read(1 << 20):
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a verificação de integridade com descriptografar para o disco.")
+    parser.add_argument("--arquivos", type=int, default=16, help="quantidade de .enc (padrão: 16)")
+    parser.add_argument("--tamanho", default="16M", help="tamanho original de cada .enc (padrão: 16M)")
+    parser.add_argument("--trabalhadores", type=int, default=cripto_arquivos.TRABALHADORES_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--pasta", help="pasta para os arquivos temporários (padrão: a do sistema)")
+    args = parser.parse_args()
+
+    chave = Fernet.generate_key()
+    tamanho = ler_tamanho(args.tamanho)
+    with tempfile.TemporaryDirectory(dir=args.pasta) as pasta:
+        logs = os.path.join(pasta, "original.log")
+        _escrever_texto(logs, tamanho, _linhas_log(random.Random(2026)))
+        binario = os.path.join(pasta, "original.bin")
+        with open(binario, 'wb') as f:
+            f.write(os.urandom(tamanho))
+        arquivos = []
+        for i in range(args.arquivos):
+            caminho = os.path.join(pasta, f"arquivo{i}.enc")
+            if i % 2:
+                cripto_arquivos.criptografar_arquivo(logs, caminho, chave, compressao=cripto_arquivos.ZLIB)
+            else:
+                cripto_arquivos.criptografar_arquivo(binario, caminho, chave)
+            arquivos.append(caminho)
+        megabytes = sum(os.path.getsize(caminho) for caminho in arquivos) / 1e6
+        print(f"{args.arquivos} .enc, {megabytes:.1f} MB cifrados no total\n")
+
+        print(f"{'método':<34} {'tempo':>9} {'MB/s':>8}")
+        medicoes = [
+            ("leitura (limite)", lambda: ler_todos(arquivos)),
+            ("descriptografar para o disco", lambda: descriptografar_todos(arquivos, chave)),
+            ("verificação, 1 trabalhador", lambda: verificar_todos(arquivos, chave, 1)),
+            (f"verificação, {args.trabalhadores} trabalhadores", lambda: verificar_todos(arquivos, chave, args.trabalhadores)),
+        ]
+        for nome, funcao in medicoes:
+            tempo = melhor_tempo(funcao, args.repeticoes)
+            print(f"{nome:<34} {tempo:>8.2f}s {megabytes / tempo:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
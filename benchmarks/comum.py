@@ -0,0 +1,18 @@
+# %% Funções comuns dos benchmarks
+
+import time
+
+
+def medir(funcao, repeticoes=1):
+    """Melhor tempo entre `repeticoes` execuções de `funcao()` e o resultado da última: (segundos, resultado)."""
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def melhor_tempo(funcao, repeticoes=1):
+    """Só o tempo de `medir`."""
+    return medir(funcao, repeticoes)[0]
@@ -0,0 +1,370 @@
+# %% Suíte de Benchmarks (resultados em JSON e comparação com uma linha de base)
+#
+# Reúne as medições que mais importam para o desempenho do programa:
+#   geracao:   senhas/s por tamanho e alfabeto (uma a uma, como o botão da interface, e em lote)
+#   forca:     avaliações de força por segundo (uma a uma e em lote)
+#   cripto:    MB/s de criptografia e descriptografia de arquivos de 1 KB a 1 GB
+#   memoria:   pico de memória (RSS) de um processo que criptografa um arquivo grande
+#   cofre:     latência para abrir um cofre e ler a primeira senha
+#   historico: tempo para atualizar o histórico com 10 mil e 100 mil senhas
+#
+# Cada medição é repetida e fica a melhor rodada (a menos afetada por ruído). O resultado pode
+# ser gravado em JSON (--saida) e comparado com uma linha de base salva antes (--base); uma
+# piora acima da tolerância em qualquer medição faz o comando terminar com código 1.
+#
+#   python benchmarks/executar.py --salvar-base benchmarks/base.json
+#   python benchmarks/executar.py --base benchmarks/base.json --saida resultado.json
+#
+# O histórico usa o Tk de verdade quando há display; sem display (servidores de CI), os widgets
+# são substituídos por uma camada simulada e só o código do programa é medido.
+
+import argparse
+import datetime
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+import motor_senhas
+from bench_cripto_paralela import criar_arquivo, ler_tamanho
+from comum import melhor_tempo
+
+GRUPOS = ("geracao", "forca", "cripto", "memoria", "cofre", "historico")
+ALFABETOS = {
+    "letras": {"usar_numeros": False, "usar_especiais": False},
+    "letras+numeros": {"usar_especiais": False},
+    "completo": {},
+}
+TAMANHOS_SENHA = (8, 16, 32, 64)
+TAMANHOS_ARQUIVO = ("1K", "1M", "64M")
+TAMANHOS_ARQUIVO_COMPLETO = ("1K", "1M", "64M", "1G")
+TAMANHOS_HISTORICO = (10_000, 100_000)
+TOLERANCIA = 0.15
+
+# Executado em um processo novo: criptografa o arquivo e imprime o pico de RSS em bytes, do próprio
+# processo e do maior processo trabalhador (com mais de um núcleo, os blocos são cifrados em outros processos)
+CODIGO_MEMORIA = r"""
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import resource
+import cripto_arquivos
+from cryptography.fernet import Fernet
+if sys.argv[2] != "-":
+    cripto_arquivos.criptografar_arquivo(sys.argv[2], sys.argv[2] + ".enc", Fernet.generate_key(), trabalhadores=int(sys.argv[3]))
+escala = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes no macOS, KiB no Linux
+print(json.dumps({"pico": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * escala,
+                  "pico_trabalhador": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * escala}))
+"""
+
+
+def resultado(valor, unidade, maior_melhor=True):
+    return {"valor": valor, "unidade": unidade, "maior_melhor": maior_melhor}
+
+
+# --- Medições ---
+def medir_geracao(args):
+    medidas = {}
+    for alfabeto, opcoes in ALFABETOS.items():
+        for tamanho in TAMANHOS_SENHA:
+            n = args.quantidade
+            t = melhor_tempo(lambda: motor_senhas.generate_many(n, tamanho, **opcoes), args.repeticoes)
+            medidas[f"geracao/lote/{alfabeto}/{tamanho}"] = resultado(n / t, "senhas/s")
+            n_uma = max(1, n // 20)
+            t = melhor_tempo(lambda: [motor_senhas.gerar_senha(tamanho, **opcoes) for _ in range(n_uma)], args.repeticoes)
+            medidas[f"geracao/uma/{alfabeto}/{tamanho}"] = resultado(n_uma / t, "senhas/s")
+    return medidas
+
+
+def medir_forca(args):
+    import forca_senhas
+    medidas = {}
+    for tamanho in (8, 16):
+        senhas = motor_senhas.generate_many(args.quantidade, tamanho)
+        t = melhor_tempo(lambda: forca_senhas.avaliar_lote(senhas), args.repeticoes)
+        medidas[f"forca/lote/{tamanho}"] = resultado(len(senhas) / t, "senhas/s")
+        amostra = senhas[:max(1, len(senhas) // 20)]
+        t = melhor_tempo(lambda: [forca_senhas.avaliar(s) for s in amostra], args.repeticoes)
+        medidas[f"forca/uma/{tamanho}"] = resultado(len(amostra) / t, "senhas/s")
+    return medidas
+
+
+def medir_cripto(args):
+    import cripto_arquivos
+    from cryptography.fernet import Fernet
+    chave = Fernet.generate_key()
+    medidas = {}
+    with tempfile.TemporaryDirectory(dir=args.pasta) as pasta:
+        for texto in args.tamanhos_arquivo:
+            tamanho = ler_tamanho(texto)
+            original = os.path.join(pasta, "original.bin")
+            cifrado, decifrado = original + ".enc", original + ".dec"
+            criar_arquivo(original, tamanho)
+            # Arquivos grandes dominam o tempo total: uma rodada só acima de 256 MB
+            repeticoes = args.repeticoes if tamanho <= 256 << 20 else 1
+            t_cifrar = melhor_tempo(lambda: cripto_arquivos.criptografar_arquivo(original, cifrado, chave, trabalhadores=args.trabalhadores), repeticoes)
+            t_decifrar = melhor_tempo(lambda: cripto_arquivos.descriptografar_arquivo(cifrado, decifrado, chave, trabalhadores=args.trabalhadores), repeticoes)
+            medidas[f"cripto/criptografar/{texto}"] = resultado(tamanho / (1 << 20) / t_cifrar, "MB/s")
+            medidas[f"cripto/descriptografar/{texto}"] = resultado(tamanho / (1 << 20) / t_decifrar, "MB/s")
+            for caminho in (original, cifrado, decifrado):
+                os.remove(caminho)
+    return medidas
+
+
+def medir_memoria(args):
+    if importlib.util.find_spec("resource") is None:
+        print("memoria: indisponível neste sistema (sem o módulo resource)", file=sys.stderr)
+        return {}
+    texto = args.tamanhos_arquivo[-1]
+    with tempfile.TemporaryDirectory(dir=args.pasta) as pasta:
+        original = os.path.join(pasta, "original.bin")
+        criar_arquivo(original, ler_tamanho(texto))
+
+        def rodar(caminho):
+            saida = subprocess.run([sys.executable, "-c", CODIGO_MEMORIA, RAIZ, caminho, str(args.trabalhadores)],
+                                   capture_output=True, text=True, check=True).stdout
+            return json.loads(saida.strip().splitlines()[-1])
+        base = rodar("-")["pico"]
+        medida = rodar(original)
+    medidas = {
+        f"memoria/pico/{texto}": resultado(medida["pico"] / (1 << 20), "MB", maior_melhor=False),
+        f"memoria/acrescimo/{texto}": resultado(max(0, medida["pico"] - base) / (1 << 20), "MB", maior_melhor=False),
+    }
+    if medida["pico_trabalhador"]:
+        medidas[f"memoria/pico_trabalhador/{texto}"] = resultado(medida["pico_trabalhador"] / (1 << 20), "MB", maior_melhor=False)
+    return medidas
+
+
+def medir_cofre(args):
+    import cofre_senhas
+    import fontes_senhas
+    from cryptography.fernet import Fernet
+    chave = Fernet.generate_key()
+    with tempfile.TemporaryDirectory(dir=args.pasta) as pasta:
+        caminho = os.path.join(pasta, "senhas" + cofre_senhas.EXTENSAO)
+        cofre_senhas.salvar_cofre(caminho, chave, itertools.chain.from_iterable(motor_senhas.gerar_em_lotes(args.senhas_cofre, 16)))
+
+        def abrir():
+            fonte = fontes_senhas.abrir_fonte(caminho, chave)
+            fonte.indexar()
+            fonte[0]
+            fonte.fechar()
+        t = melhor_tempo(abrir, args.repeticoes)
+    return {f"cofre/abrir/{args.senhas_cofre}": resultado(t * 1000, "ms", maior_melhor=False)}
+
+
+class _WidgetSimulado:
+    """Substitui Listbox, Scrollbar, Label e StringVar: aceita as chamadas e não desenha nada."""
+    def __init__(self, altura=400):
+        self.altura = altura
+        self.itens = []
+
+    def winfo_height(self):
+        return self.altura
+
+    def cget(self, opcao):
+        return "0"
+
+    def delete(self, inicio, fim=None):
+        self.itens.clear()
+
+    def insert(self, posicao, *textos):
+        self.itens.extend(textos)
+
+    def itemconfig(self, *args, **kwargs): pass
+    def selection_set(self, *args): pass
+    def set(self, *args): pass
+    def config(self, **kwargs): pass
+    def after_cancel(self, *args): pass
+
+
+def _criar_historico(quantidade):
+    """Instância mínima do aplicativo com `quantidade` senhas no histórico (sem montar a janela inteira)."""
+    import forca_senhas
+    import busca
+    import Gerador_Senhas
+    import historico
+    senhas = motor_senhas.generate_many(quantidade, 16)
+    app = types.SimpleNamespace(
+        senhas_geradas=historico.HistoricoSenhas(),
+        forca_cores={rotulo: "#2e6da4" for rotulo in forca_senhas.ROTULOS},  # a cor não muda o custo
+        _atualizacao_historico=None,
+    )
+    app.senhas_geradas.adicionar_lote(senhas, forca_senhas.avaliar_lote(senhas))
+    # Sem texto na barra de busca, como na abertura do programa (a busca só mantém os baldes de força)
+    app.busca_historico, app.resultado_historico = busca.BuscaSenhas(app.senhas_geradas), None
+    app.busca_historico_var = app.forca_historico_var = None
+    app.contagem_historico_var = _WidgetSimulado()
+    app.filtro_busca = lambda texto_var, forca_var: ("", None)
+    app.obter_linhas_historico = types.MethodType(Gerador_Senhas.PasswordGeneratorApp.obter_linhas_historico, app)
+    app.update_password_listbox = types.MethodType(Gerador_Senhas.PasswordGeneratorApp.update_password_listbox, app)
+    return app
+
+
+def medir_historico(args):
+    import tkinter as tk
+    from lista_virtual import ListaVirtual
+    try:
+        root = tk.Tk()
+        root.geometry("600x400")
+        camada = "tk"
+    except tk.TclError:
+        root = None
+        camada = "simulada"
+    print(f"historico: camada de widgets {camada}", file=sys.stderr)
+
+    medidas = {}
+    try:
+        for quantidade in TAMANHOS_HISTORICO:
+            app = _criar_historico(quantidade)
+            if root is not None:
+                app.root = root
+                app.password_listbox = ListaVirtual(root, obter_linhas=app.obter_linhas_historico)
+                app.password_listbox.pack(fill="both", expand=True)
+                app.last_password_var, app.strength_var = tk.StringVar(root), tk.StringVar(root)
+                app.strength_label = tk.Label(root)
+                root.update()
+            else:
+                app.root = app.last_password_var = app.strength_var = app.strength_label = _WidgetSimulado()
+                lista = ListaVirtual.__new__(ListaVirtual)  # sem Tk: só os atributos que a renderização usa
+                lista.listbox, lista.scrollbar = _WidgetSimulado(), _WidgetSimulado()
+                lista.obter_linhas, lista.ao_renderizar = app.obter_linhas_historico, None
+                lista.total, lista.topo, lista.selecionado, lista._altura_linha = 0, 0, None, 20
+                app.password_listbox = lista
+
+            def atualizar():
+                app.update_password_listbox()
+                if root is not None:
+                    root.update_idletasks()
+            t = melhor_tempo(atualizar, args.repeticoes)
+            medidas[f"historico/atualizar/{quantidade}"] = resultado(t * 1000, "ms", maior_melhor=False)
+            if root is not None:
+                app.password_listbox.destroy()
+    finally:
+        if root is not None:
+            root.destroy()
+    return medidas
+
+
+MEDICOES = {
+    "geracao": medir_geracao,
+    "forca": medir_forca,
+    "cripto": medir_cripto,
+    "memoria": medir_memoria,
+    "cofre": medir_cofre,
+    "historico": medir_historico,
+}
+
+
+# --- Resultados e comparação ---
+def ambiente():
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def comparar(atual, base, tolerancia):
+    """Linhas (nome, valor base, valor atual, variação relativa, situação) e o número de regressões."""
+    linhas = []
+    regressoes = 0
+    for nome, medida in atual.items():
+        anterior = base.get(nome)
+        if anterior is None or not anterior["valor"]:
+            linhas.append((nome, None, medida["valor"], None, "nova"))
+            continue
+        variacao = medida["valor"] / anterior["valor"] - 1
+        melhora = variacao if medida["maior_melhor"] else -variacao
+        if melhora < -tolerancia:
+            situacao = "PIOROU"
+            regressoes += 1
+        elif melhora > tolerancia:
+            situacao = "melhorou"
+        else:
+            situacao = "igual"
+        linhas.append((nome, anterior["valor"], medida["valor"], variacao, situacao))
+    return linhas, regressoes
+
+
+def formatar(valor):
+    if valor is None:
+        return "-"
+    return f"{valor:,.0f}" if abs(valor) >= 100 else f"{valor:,.2f}"
+
+
+def imprimir(resultados, comparacao=None):
+    largura = max(len(nome) for nome in resultados)
+    if comparacao is None:
+        print(f"{'medição':<{largura}} | {'valor':>14} | unidade")
+        for nome, medida in resultados.items():
+            print(f"{nome:<{largura}} | {formatar(medida['valor']):>14} | {medida['unidade']}")
+        return
+    print(f"{'medição':<{largura}} | {'base':>14} | {'atual':>14} | {'variação':>9} | situação")
+    for nome, anterior, valor, variacao, situacao in comparacao:
+        texto_variacao = "-" if variacao is None else f"{variacao:+.1%}"
+        print(f"{nome:<{largura}} | {formatar(anterior):>14} | {formatar(valor):>14} | {texto_variacao:>9} | {situacao}")
+
+
+def gravar_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa a suíte de benchmarks e compara com uma linha de base.")
+    parser.add_argument("--grupos", nargs="+", choices=GRUPOS, default=list(GRUPOS), help="medições a executar (padrão: todas)")
+    parser.add_argument("--saida", help="grava os resultados em JSON neste arquivo")
+    parser.add_argument("--base", help="compara com os resultados JSON deste arquivo")
+    parser.add_argument("--salvar-base", help="grava os resultados como nova linha de base neste arquivo")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA, help="piora relativa aceita antes de acusar regressão (padrão: 0.15)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--quantidade", type=int, default=200_000, help="senhas por rodada em geração e força")
+    parser.add_argument("--tamanhos-arquivo", nargs="+", default=None, help="tamanhos dos arquivos de teste (padrão: 1K 1M 64M)")
+    parser.add_argument("--completo", action="store_true", help="inclui o arquivo de 1 GB")
+    parser.add_argument("--trabalhadores", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--senhas-cofre", type=int, default=1_000_000)
+    parser.add_argument("--pasta", help="pasta para os arquivos temporários (padrão: a do sistema)")
+    args = parser.parse_args()
+    if args.tamanhos_arquivo is None:
+        args.tamanhos_arquivo = list(TAMANHOS_ARQUIVO_COMPLETO if args.completo else TAMANHOS_ARQUIVO)
+
+    resultados = {}
+    for grupo in args.grupos:
+        inicio = time.perf_counter()
+        resultados.update(MEDICOES[grupo](args))
+        print(f"{grupo}: {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    dados = {"versao": 1, "ambiente": ambiente(), "resultados": resultados}
+
+    codigo = 0
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        if base.get("ambiente", {}).get("plataforma") != dados["ambiente"]["plataforma"]:
+            print("Aviso: a linha de base foi medida em outra plataforma; compare com cuidado.", file=sys.stderr)
+        linhas, regressoes = comparar(resultados, base["resultados"], args.tolerancia)
+        imprimir(resultados, linhas)
+        if regressoes:
+            print(f"\n{regressoes} medição(ões) piorou(aram) mais de {args.tolerancia:.0%} em relação à linha de base.")
+            codigo = 1
+    else:
+        imprimir(resultados)
+    if args.saida:
+        gravar_json(args.saida, dados)
+    if args.salvar_base:
+        gravar_json(args.salvar_base, dados)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,382 @@
+# %% Cofre de Senhas Binário e Indexado (.cofre)
+#
+# Formato:
+#   cabeçalho: MAGIA(5) | versão(1) | registros por bloco(4) | sal(16) | tamanho da extensão(2) | extensão
+#   blocos:    nonce(12) | AES-256-GCM( [tamanho(2) | senha UTF-8] × até N registros )
+#   índice:    nonce(12) | AES-256-GCM( total de registros(8) | [offset(8) | tamanho(4)] por bloco )
+#   rodapé:    offset do índice(8) | tamanho do índice(4) | MAGIA_RODAPE(4)
+#
+# Todos os blocos, exceto o último, têm exatamente N registros, então o registro i fica no bloco
+# i // N: o acesso aleatório lê e decifra um único bloco. Para anexar, os novos blocos, um novo
+# índice e um novo rodapé são escritos no fim do arquivo (o bloco final incompleto é reescrito
+# junto com os novos registros); o rodapé mais recente é sempre o válido. Um anexo só escreve depois
+# do rodapé anterior, e os blocos vão para o disco antes do índice que aponta para eles. Se o anexo
+# for interrompido (queda, disco cheio), o fim do arquivo fica sem rodapé, e a leitura procura para
+# trás o último rodapé completo: o cofre volta ao estado anterior ao anexo. O anexo seguinte
+# descarta esses restos.
+#
+# `recifrar_cofre` troca a chave de um cofre bloco a bloco: os registros empacotados passam da chave
+# antiga para a nova sem ir para o disco, e o cofre novo sai compacto (sem os índices anteriores).
+
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import cripto_arquivos
+import metricas
+
+MAGIA = b"GSVLT"
+MAGIA_RODAPE = b"GSVI"
+VERSAO = 1
+EXTENSAO = ".cofre"
+REGISTROS_POR_BLOCO = 64
+TAMANHO_NONCE = 12
+
+_FORMATO_CABECALHO = ">5sBI16sH"
+_TAMANHO_CABECALHO_FIXO = struct.calcsize(_FORMATO_CABECALHO)
+_FORMATO_RODAPE = ">QI4s"
+_TAMANHO_RODAPE = struct.calcsize(_FORMATO_RODAPE)
+_FORMATO_ENTRADA_INDICE = ">QI"
+_TAMANHO_ENTRADA_INDICE = struct.calcsize(_FORMATO_ENTRADA_INDICE)
+_LEITURA_RODAPE = 1 << 20  # bytes lidos por passo ao procurar o rodapé anterior a um anexo interrompido
+_CONTEXTO_CHAVE = b"gerador-senhas/cofre/v1"
+
+
+def eh_cofre(caminho):
+    """Indica se o arquivo está no formato de cofre binário (e não no formato de uma linha Fernet por senha)."""
+    with open(caminho, 'rb') as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def _montar_cabecalho(registros_por_bloco, sal, extensao=b""):
+    return struct.pack(_FORMATO_CABECALHO, MAGIA, VERSAO, registros_por_bloco, sal, len(extensao)) + extensao
+
+
+def ler_cabecalho(f):
+    """Lê e valida o cabeçalho do cofre. Retorna um dicionário com os campos e os bytes brutos."""
+    f.seek(0)
+    fixo = f.read(_TAMANHO_CABECALHO_FIXO)
+    if len(fixo) < _TAMANHO_CABECALHO_FIXO:
+        raise ValueError("Cabeçalho do cofre incompleto.")
+    magia, versao, registros_por_bloco, sal, tamanho_ext = struct.unpack(_FORMATO_CABECALHO, fixo)
+    if magia != MAGIA:
+        raise ValueError("O arquivo não é um cofre de senhas.")
+    if versao != VERSAO:
+        raise ValueError(f"Versão de cofre não suportada: {versao}.")
+    if registros_por_bloco <= 0:
+        raise ValueError("Cabeçalho do cofre inválido.")
+    extensao = f.read(tamanho_ext)
+    return {"registros_por_bloco": registros_por_bloco, "sal": sal, "extensao": extensao, "bruto": fixo + extensao}
+
+
+def _empacotar_registros(senhas):
+    partes = []
+    for senha in senhas:
+        dados = senha.encode('utf-8')
+        partes.append(struct.pack(">H", len(dados)))
+        partes.append(dados)
+    return b"".join(partes)
+
+
+def _desempacotar_registros(dados):
+    registros = []
+    posicao = 0
+    while posicao < len(dados):
+        (tamanho,) = struct.unpack_from(">H", dados, posicao)
+        posicao += 2
+        registros.append(dados[posicao:posicao + tamanho].decode('utf-8'))
+        posicao += tamanho
+    return registros
+
+
+def _dados_associados_bloco(cabecalho, indice_bloco):
+    return cabecalho + struct.pack(">Q", indice_bloco)
+
+
+def _cifrar(aead, dados, dados_associados):
+    nonce = os.urandom(TAMANHO_NONCE)
+    return nonce + aead.encrypt(nonce, dados, dados_associados)
+
+
+def _decifrar(aead, bruto, dados_associados):
+    try:
+        return aead.decrypt(bruto[:TAMANHO_NONCE], bruto[TAMANHO_NONCE:], dados_associados)
+    except InvalidTag:
+        raise InvalidToken from None
+
+
+def _ler_rodape(f, fim_rodape, inicio_dados):
+    """(offset, tamanho) do índice se o rodapé que termina em `fim_rodape` for coerente, senão None."""
+    if fim_rodape - _TAMANHO_RODAPE < inicio_dados:
+        return None
+    f.seek(fim_rodape - _TAMANHO_RODAPE)
+    offset_indice, tamanho_indice, magia = struct.unpack(_FORMATO_RODAPE, f.read(_TAMANHO_RODAPE))
+    # O índice é gravado logo antes do rodapé
+    if magia != MAGIA_RODAPE or offset_indice < inicio_dados or offset_indice + tamanho_indice != fim_rodape - _TAMANHO_RODAPE:
+        return None
+    return offset_indice, tamanho_indice
+
+
+def _procurar_rodape(f, fim, inicio_dados):
+    """Procura, de `fim` para trás, o último rodapé completo. Retorna (fim do rodapé, (offset, tamanho) do índice)."""
+    fim_busca = fim
+    while True:
+        inicio = max(inicio_dados, fim_busca - _LEITURA_RODAPE)
+        f.seek(inicio)
+        trecho = f.read(fim_busca - inicio)
+        posicao = trecho.rfind(MAGIA_RODAPE)
+        while posicao >= 0:
+            fim_rodape = inicio + posicao + len(MAGIA_RODAPE)
+            rodape = _ler_rodape(f, fim_rodape, inicio_dados)
+            if rodape is not None:
+                return fim_rodape, rodape
+            posicao = trecho.rfind(MAGIA_RODAPE, 0, posicao + len(MAGIA_RODAPE) - 1)
+        if inicio == inicio_dados:
+            raise ValueError("Rodapé do cofre inválido (arquivo truncado ou corrompido).")
+        fim_busca = inicio + len(MAGIA_RODAPE) - 1  # uma MAGIA dividida entre dois trechos também é achada
+
+
+def _ler_indice(f, aead, cabecalho):
+    """
+    Lê o rodapé e o índice mais recentes. Retorna (total de registros, [(offset, tamanho)] por
+    bloco) e deixa `f` logo depois do rodapé lido (antes dos restos de um anexo interrompido).
+    """
+    f.seek(0, os.SEEK_END)
+    fim = f.tell()
+    if fim < len(cabecalho) + _TAMANHO_RODAPE:
+        raise ValueError("Cofre sem índice (arquivo truncado).")
+    rodape = _ler_rodape(f, fim, len(cabecalho))
+    if rodape is None:
+        # Sem rodapé no fim: um anexo foi interrompido, e vale o último rodapé completo
+        fim, rodape = _procurar_rodape(f, fim, len(cabecalho))
+    offset_indice, tamanho_indice = rodape
+    f.seek(offset_indice)
+    indice = _decifrar(aead, f.read(tamanho_indice), cabecalho + b"indice")
+    (total,) = struct.unpack_from(">Q", indice, 0)
+    blocos = [struct.unpack_from(_FORMATO_ENTRADA_INDICE, indice, posicao)
+              for posicao in range(8, len(indice), _TAMANHO_ENTRADA_INDICE)]
+    f.seek(fim)
+    return total, blocos
+
+
+def _escrever_indice(f, aead, cabecalho, total, blocos):
+    """Grava o índice cifrado e o rodapé que aponta para ele na posição atual de `f`."""
+    indice = struct.pack(">Q", total) + b"".join(struct.pack(_FORMATO_ENTRADA_INDICE, *b) for b in blocos)
+    bruto = _cifrar(aead, indice, cabecalho + b"indice")
+    offset_indice = f.tell()
+    f.write(bruto)
+    f.write(struct.pack(_FORMATO_RODAPE, offset_indice, len(bruto), MAGIA_RODAPE))
+
+
+class Cofre:
+    """
+    Leitura de um cofre de senhas com acesso aleatório.
+    - `len(cofre)` e `cofre[i]` não dependem do tamanho do arquivo: só um bloco é lido e decifrado.
+    - O último bloco decifrado fica em cache, então leituras sequenciais decifram cada bloco uma vez.
+    """
+    def __init__(self, caminho, chave):
+        self.caminho = caminho
+        self.f = open(caminho, 'rb')
+        try:
+            cab = ler_cabecalho(self.f)
+            self.cabecalho = cab["bruto"]
+            self.registros_por_bloco = cab["registros_por_bloco"]
+            self.aead = AESGCM(cripto_arquivos.derivar_chave(chave, cab["sal"], _CONTEXTO_CHAVE))
+            self.total, self.blocos = _ler_indice(self.f, self.aead, self.cabecalho)
+        except Exception:
+            self.f.close()
+            raise
+        self._bloco_em_cache = (None, None)
+
+    def __len__(self):
+        return self.total
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.f.close()
+
+    def ler_bloco(self, indice_bloco):
+        """Decifra o bloco `indice_bloco` e retorna a lista de senhas que ele contém."""
+        if self._bloco_em_cache[0] == indice_bloco:
+            return self._bloco_em_cache[1]
+        with metricas.medir("cofre.decifrar_bloco") as medicao:
+            offset, tamanho = self.blocos[indice_bloco]
+            self.f.seek(offset)
+            dados = _decifrar(self.aead, self.f.read(tamanho), _dados_associados_bloco(self.cabecalho, indice_bloco))
+            registros = _desempacotar_registros(dados)
+            medicao.bytes, medicao.itens = tamanho, len(registros)
+        self._bloco_em_cache = (indice_bloco, registros)
+        return registros
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.total
+        if not (0 <= i < self.total):
+            raise IndexError("Índice fora do cofre.")
+        return self.ler_bloco(i // self.registros_por_bloco)[i % self.registros_por_bloco]
+
+    def obter_intervalo(self, inicio, fim):
+        """Retorna as senhas [inicio, fim), decifrando apenas os blocos necessários."""
+        inicio = max(inicio, 0)
+        fim = min(fim, self.total)
+        resultado = []
+        if fim <= inicio:
+            return resultado
+        n = self.registros_por_bloco
+        for indice_bloco in range(inicio // n, (fim - 1) // n + 1):
+            registros = self.ler_bloco(indice_bloco)
+            base = indice_bloco * n
+            resultado.extend(registros[max(inicio - base, 0):fim - base])
+        return resultado
+
+    def __iter__(self):
+        for indice_bloco in range(len(self.blocos)):
+            yield from self.ler_bloco(indice_bloco)
+
+
+class EscritorCofre:
+    """
+    Grava senhas em um cofre, bloco a bloco (memória limitada a um bloco + o índice).
+    Com `anexar=True` e um cofre existente, os registros novos são acrescentados ao fim do
+    arquivo sem reescrevê-lo. Use como gerenciador de contexto ou chame `fechar()`.
+    `derivacao`: parâmetros de derivacao_chaves gravados no cabeçalho de um cofre novo, quando
+    `chave` foi derivada de uma senha mestra.
+    """
+    def __init__(self, caminho, chave, registros_por_bloco=REGISTROS_POR_BLOCO, anexar=False, derivacao=None):
+        self.caminho = caminho
+        if anexar and os.path.exists(caminho) and os.path.getsize(caminho) > 0:
+            self.f = open(caminho, 'r+b')
+            try:
+                cab = ler_cabecalho(self.f)
+                self.cabecalho = cab["bruto"]
+                self.registros_por_bloco = cab["registros_por_bloco"]
+                self.aead = AESGCM(cripto_arquivos.derivar_chave(chave, cab["sal"], _CONTEXTO_CHAVE))
+                self.total, self.blocos = _ler_indice(self.f, self.aead, self.cabecalho)
+                fim = self.f.tell()
+                self.pendentes = []
+                # O último bloco incompleto é reescrito junto com os novos registros
+                if self.blocos and self.total % self.registros_por_bloco:
+                    offset, tamanho = self.blocos.pop()
+                    self.f.seek(offset)
+                    dados = _decifrar(self.aead, self.f.read(tamanho), _dados_associados_bloco(self.cabecalho, len(self.blocos)))
+                    self.pendentes = _desempacotar_registros(dados)
+                    self.total -= len(self.pendentes)
+                # Os novos blocos começam depois do último rodapé válido (restos de um anexo interrompido são descartados)
+                self.f.seek(fim)
+                self.f.truncate()
+            except Exception:
+                self.f.close()
+                raise
+        else:
+            sal = os.urandom(cripto_arquivos.TAMANHO_SAL)
+            self.registros_por_bloco = registros_por_bloco
+            extensao = b""
+            if derivacao is not None:
+                import derivacao_chaves
+                extensao = derivacao_chaves.serializar(derivacao)
+            self.cabecalho = _montar_cabecalho(registros_por_bloco, sal, extensao)
+            self.aead = AESGCM(cripto_arquivos.derivar_chave(chave, sal, _CONTEXTO_CHAVE))
+            self.total = 0
+            self.blocos = []
+            self.pendentes = []
+            self.f = open(caminho, 'wb')
+            self.f.write(self.cabecalho)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _gravar_bloco(self, registros):
+        bruto = _cifrar(self.aead, _empacotar_registros(registros), _dados_associados_bloco(self.cabecalho, len(self.blocos)))
+        self.blocos.append((self.f.tell(), len(bruto)))
+        self.f.write(bruto)
+        self.total += len(registros)
+
+    def adicionar(self, senha):
+        self.pendentes.append(senha)
+        if len(self.pendentes) >= self.registros_por_bloco:
+            self._gravar_bloco(self.pendentes)
+            self.pendentes = []
+
+    def adicionar_varios(self, senhas):
+        for senha in senhas:
+            self.adicionar(senha)
+
+    def fechar(self):
+        """Grava o bloco incompleto, o índice e o rodapé. Depois disso o cofre pode ser lido."""
+        if self.f.closed:
+            return
+        if self.pendentes:
+            self._gravar_bloco(self.pendentes)
+            self.pendentes = []
+        # Os blocos chegam ao disco antes do índice e do rodapé que os tornam válidos
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        _escrever_indice(self.f, self.aead, self.cabecalho, self.total, self.blocos)
+        self.f.close()
+
+
+@metricas.cronometrar("cofre.salvar", itens=int)
+def salvar_cofre(caminho, chave, senhas, anexar=False, derivacao=None):
+    """Grava (ou anexa) as senhas em um cofre. Retorna o total de registros no cofre."""
+    with EscritorCofre(caminho, chave, anexar=anexar, derivacao=derivacao) as escritor:
+        escritor.adicionar_varios(senhas)
+    return escritor.total
+
+
+@metricas.cronometrar("cofre.recifrar", itens=int)
+def recifrar_cofre(cofre, saida, chave_nova, derivacao=None, ao_ler_bloco=None, cancelar=None):
+    """
+    Grava em `saida` (aberto para escrita binária) o conteúdo de `cofre` (um Cofre aberto com a
+    chave antiga) cifrado com `chave_nova`, com sal novo e o mesmo número de registros por bloco.
+    `ao_ler_bloco(senhas)`, se informado, recebe as senhas de cada bloco (para refazer o registro de
+    unicidade). Retorna o total de registros, ou None se `cancelar()` retornar True.
+    """
+    sal = os.urandom(cripto_arquivos.TAMANHO_SAL)
+    extensao = b""
+    if derivacao is not None:
+        import derivacao_chaves
+        extensao = derivacao_chaves.serializar(derivacao)
+    cabecalho = _montar_cabecalho(cofre.registros_por_bloco, sal, extensao)
+    aead = AESGCM(cripto_arquivos.derivar_chave(chave_nova, sal, _CONTEXTO_CHAVE))
+    saida.write(cabecalho)
+    blocos = []
+    for indice_bloco, (offset, tamanho) in enumerate(cofre.blocos):
+        cofre.f.seek(offset)
+        dados = _decifrar(cofre.aead, cofre.f.read(tamanho), _dados_associados_bloco(cofre.cabecalho, indice_bloco))
+        if ao_ler_bloco:
+            ao_ler_bloco(_desempacotar_registros(dados))
+        bruto = _cifrar(aead, dados, _dados_associados_bloco(cabecalho, indice_bloco))
+        blocos.append((saida.tell(), len(bruto)))
+        saida.write(bruto)
+        if cancelar and cancelar():
+            return None
+    _escrever_indice(saida, aead, cabecalho, cofre.total, blocos)
+    return cofre.total
+
+
+@metricas.cronometrar("cofre.verificar", itens=int)
+def verificar_cofre(cofre, cancelar=None):
+    """
+    Confere a tag de todos os blocos de um Cofre aberto (o índice é conferido ao abri-lo), sem
+    desempacotar os registros. Retorna o total de registros, ou None se `cancelar()` retornar True.
+    Levanta InvalidToken no primeiro bloco adulterado e ValueError se o índice não bate com o total.
+    """
+    if len(cofre.blocos) != -(-cofre.total // cofre.registros_por_bloco):
+        raise ValueError("O índice do cofre não corresponde ao total de registros.")
+    for indice_bloco, (offset, tamanho) in enumerate(cofre.blocos):
+        cofre.f.seek(offset)
+        _decifrar(cofre.aead, cofre.f.read(tamanho), _dados_associados_bloco(cofre.cabecalho, indice_bloco))
+        if cancelar and cancelar():
+            return None
+    return cofre.total
@@ -0,0 +1,595 @@
+# %% Criptografia de Arquivos em Fluxo (formato em blocos autenticados)
+#
+# Formato do contêiner (.enc):
+#   cabeçalho: MAGIA(5) | versão(1) | flags(1) | tamanho do bloco(4) | sal(16) | tamanho da extensão(2) | extensão
+#   blocos:    tamanho(4, bit mais alto = último bloco) | texto cifrado AES-256-GCM (+16 bytes de tag)
+#
+# A chave de cada arquivo é derivada (HKDF-SHA256) da chave Fernet do arquivo .key com o sal do
+# cabeçalho (ou da chave derivada de uma senha mestra, cujos parâmetros vão na extensão; ver
+# derivacao_chaves.py). O nonce de cada bloco é o índice do bloco + a marca de "último bloco", e o cabeçalho
+# inteiro entra como dado associado. Assim, reordenar, truncar ou alterar o cabeçalho invalida a tag.
+#
+# Arquivos .enc antigos (um único token Fernet) continuam legíveis, também em fluxo.
+#
+# Trocar a chave de um .enc (recifrar_fluxo) não exige o conteúdo em claro: cada bloco é decifrado
+# com a chave antiga e cifrado com a nova sob um sal novo, ainda comprimido, e nada passa pelo disco.
+# Conferir a integridade (verificar_fluxo) também não grava nada: a tag de cada bloco é conferida e o
+# conteúdo, que só existe na memória durante a conferência, é descartado sem ser descomprimido.
+#
+# Compressão opcional (zlib, ou zstd com o pacote `zstandard` instalado), antes da cifra: o
+# algoritmo vai nas flags do cabeçalho e o contêiner passa para a versão 2, que versões antigas do
+# programa recusam em vez de devolver dados comprimidos. Cada bloco é comprimido sozinho (os blocos
+# continuam independentes e paralelos) e começa, já dentro do texto cifrado, com 1 byte: 1 =
+# comprimido, 0 = guardado como está. Antes de comprimir, a entropia de uma amostra do bloco é
+# estimada: conteúdo que já é comprimido ou cifrado (mídia, .zip, .gz) passa direto, sem custo de
+# compressão, e se o primeiro bloco do arquivo já tiver essa cara a compressão nem é ligada (o
+# arquivo sai na versão 1).
+#
+# As funções de fluxo aceitam `cancelar()`, consultado a cada bloco: retornando True, elas param e
+# retornam None. As funções de arquivo escrevem em um temporário (.parcial) e só o renomeiam para
+# o destino no fim, então um cancelamento ou erro (chave errada, bloco adulterado) nunca deixa um
+# arquivo pela metade no lugar do destino.
+
+import base64
+import hmac
+import hashlib
+import importlib.util
+import itertools
+import math
+import os
+import struct
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+import metricas
+
+MAGIA = b"GSENC"
+VERSAO = 1
+VERSAO_COMPRESSAO = 2           # blocos com o byte de compressão na frente
+TAMANHO_BLOCO_PADRAO = 1 << 20  # 1 MiB por bloco
+TAMANHO_BLOCO_MAXIMO = 64 << 20  # limite aceito na leitura, para manter a memória limitada
+TRABALHADORES_PADRAO = os.cpu_count() or 1
+TAMANHO_SAL = 16
+TAMANHO_TAG = 16
+MARCA_ULTIMO = 0x80000000
+
+# Compressão
+ZLIB = "zlib"
+ZSTD = "zstd"
+AUTOMATICA = "auto"             # zstd se disponível, senão zlib
+NENHUMA = "nenhuma"
+COMPRESSOES = (AUTOMATICA, ZLIB, ZSTD, NENHUMA)
+FLAG_ZLIB = 0x01
+FLAG_ZSTD = 0x02
+NIVEL_ZLIB = 1                  # ~2x mais rápido que o nível 3 em logs/SQL, com razão só ~10% pior
+NIVEL_ZSTD = 3
+LIMITE_ENTROPIA = 7.5           # bits por byte na amostra; acima disso o bloco não é comprimido
+TAMANHO_AMOSTRA = 16 << 10      # bytes examinados por bloco (4 trechos espalhados)
+_NOMES_COMPRESSAO = {FLAG_ZLIB: ZLIB, FLAG_ZSTD: ZSTD}
+_BLOCO_GUARDADO = b"\x00"
+_BLOCO_COMPRIMIDO = b"\x01"
+
+_FORMATO_CABECALHO = ">5sBBI16sH"
+_TAMANHO_CABECALHO_FIXO = struct.calcsize(_FORMATO_CABECALHO)
+_FORMATO_QUADRO = ">I"
+
+# Leitura do formato legado: o token Fernet é base64, então lemos múltiplos de 4 caracteres
+_TAMANHO_LEITURA_LEGADO = 4 * (1 << 18)
+
+
+def _chave_bruta(chave):
+    """Decodifica uma chave Fernet (base64) nos 32 bytes originais."""
+    if isinstance(chave, str):
+        chave = chave.encode()
+    try:
+        bruta = base64.urlsafe_b64decode(chave.strip())
+    except Exception as e:
+        raise ValueError("A chave Fernet deve ter 32 bytes codificados em base64 url-safe.") from e
+    if len(bruta) != 32:
+        raise ValueError("A chave Fernet deve ter 32 bytes codificados em base64 url-safe.")
+    return bruta
+
+
+def chave_valida(chave):
+    """Indica se `chave` tem o formato de uma chave Fernet (não diz se ela abre algum arquivo)."""
+    try:
+        _chave_bruta(chave)
+    except (ValueError, TypeError, AttributeError):
+        return False
+    return True
+
+
+def derivar_chave(chave, sal, contexto):
+    """Deriva uma chave de 32 bytes (HKDF-SHA256) a partir da chave Fernet, do sal e do contexto de uso."""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=sal, info=contexto)
+    return hkdf.derive(_chave_bruta(chave))
+
+
+def derivar_chave_arquivo(chave, sal):
+    """Deriva a chave AES-256-GCM de um arquivo a partir da chave Fernet e do sal do cabeçalho."""
+    return derivar_chave(chave, sal, b"gerador-senhas/arquivo/v1")
+
+
+def montar_cabecalho(tamanho_bloco=TAMANHO_BLOCO_PADRAO, flags=0, sal=None, extensao=b""):
+    """Monta os bytes do cabeçalho do contêiner (versão 2 quando as flags pedem compressão)."""
+    sal = sal if sal is not None else os.urandom(TAMANHO_SAL)
+    versao = VERSAO_COMPRESSAO if flags in _NOMES_COMPRESSAO else VERSAO
+    return struct.pack(_FORMATO_CABECALHO, MAGIA, versao, flags, tamanho_bloco, sal, len(extensao)) + extensao
+
+
+def ler_cabecalho(f):
+    """Lê e valida o cabeçalho do contêiner. Retorna um dicionário com os campos e os bytes brutos."""
+    fixo = f.read(_TAMANHO_CABECALHO_FIXO)
+    if len(fixo) < _TAMANHO_CABECALHO_FIXO:
+        raise ValueError("Cabeçalho do arquivo criptografado incompleto.")
+    magia, versao, flags, tamanho_bloco, sal, tamanho_ext = struct.unpack(_FORMATO_CABECALHO, fixo)
+    if magia != MAGIA:
+        raise ValueError("O arquivo não está no formato de contêiner em blocos.")
+    if versao not in (VERSAO, VERSAO_COMPRESSAO):
+        raise ValueError(f"Versão de contêiner não suportada: {versao}.")
+    if (versao == VERSAO and flags) or (versao == VERSAO_COMPRESSAO and flags not in _NOMES_COMPRESSAO):
+        raise ValueError("Flags desconhecidas no cabeçalho do arquivo criptografado.")
+    if not (0 < tamanho_bloco <= TAMANHO_BLOCO_MAXIMO):
+        raise ValueError("Tamanho de bloco inválido no cabeçalho do arquivo criptografado.")
+    extensao = f.read(tamanho_ext)
+    if len(extensao) < tamanho_ext:
+        raise ValueError("Cabeçalho do arquivo criptografado incompleto.")
+    return {"versao": versao, "flags": flags, "compressao": _NOMES_COMPRESSAO.get(flags), "tamanho_bloco": tamanho_bloco,
+            "sal": sal, "extensao": extensao, "bruto": fixo + extensao}
+
+
+def nonce_bloco(indice, ultimo):
+    """Nonce de 12 bytes do bloco: índice (8 bytes) + marca de último bloco + preenchimento."""
+    return struct.pack(">QB3x", indice, 1 if ultimo else 0)
+
+
+def _ler_exato(f, tamanho):
+    dados = f.read(tamanho)
+    if len(dados) < tamanho:
+        raise ValueError("Arquivo criptografado truncado.")
+    return dados
+
+
+def ler_quadros(f, tamanho_bloco):
+    """Itera sobre os quadros (índice, último, texto cifrado) do contêiner, validando o fim do fluxo."""
+    indice = 0
+    limite = tamanho_bloco + TAMANHO_TAG + 1024
+    while True:
+        bruto = f.read(4)
+        if len(bruto) < 4:
+            raise ValueError("Arquivo criptografado truncado: marcador de fim ausente.")
+        (campo,) = struct.unpack(_FORMATO_QUADRO, bruto)
+        ultimo = bool(campo & MARCA_ULTIMO)
+        tamanho = campo & ~MARCA_ULTIMO
+        if tamanho > limite:
+            raise ValueError("Bloco com tamanho inválido no arquivo criptografado.")
+        yield indice, ultimo, _ler_exato(f, tamanho)
+        if ultimo:
+            if f.read(1):
+                raise ValueError("Dados extras após o marcador de fim do arquivo criptografado.")
+            return
+        indice += 1
+
+
+def escrever_quadro(f, ultimo, texto_cifrado):
+    campo = len(texto_cifrado) | (MARCA_ULTIMO if ultimo else 0)
+    f.write(struct.pack(_FORMATO_QUADRO, campo))
+    f.write(texto_cifrado)
+
+
+def cifrar_bloco(aead, cabecalho, indice, ultimo, dados):
+    return aead.encrypt(nonce_bloco(indice, ultimo), dados, cabecalho)
+
+
+def decifrar_bloco(aead, cabecalho, indice, ultimo, texto_cifrado):
+    try:
+        return aead.decrypt(nonce_bloco(indice, ultimo), texto_cifrado, cabecalho)
+    except InvalidTag:
+        raise InvalidToken from None
+
+
+# --- Compressão ---
+def zstd_disponivel():
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("A compressão zstd requer o pacote zstandard (pip install zstandard).") from None
+    return zstandard
+
+
+def flag_compressao(compressao):
+    """Flag do cabeçalho para o nome de compressão pedido (0 = sem compressão)."""
+    if compressao in (None, NENHUMA):
+        return 0
+    if compressao == AUTOMATICA:
+        return FLAG_ZSTD if zstd_disponivel() else FLAG_ZLIB
+    if compressao == ZLIB:
+        return FLAG_ZLIB
+    if compressao == ZSTD:
+        _zstandard()
+        return FLAG_ZSTD
+    raise ValueError(f"Compressão desconhecida: {compressao}. Use uma de: {', '.join(COMPRESSOES)}.")
+
+
+def entropia_amostra(dados, tamanho_amostra=TAMANHO_AMOSTRA):
+    """
+    Entropia de Shannon, em bits por byte (0 a 8), de uma amostra de `dados`: o bloco inteiro se
+    for pequeno, senão 4 trechos espalhados por ele. Texto, logs e dumps SQL ficam por volta de 4
+    a 6; dados comprimidos ou cifrados, perto de 8.
+    """
+    if len(dados) > tamanho_amostra:
+        trecho = tamanho_amostra // 4
+        passo = (len(dados) - trecho) // 3
+        dados = b"".join(dados[i * passo:i * passo + trecho] for i in range(4))
+    if not dados:
+        return 0.0
+    total = len(dados)
+    return -sum(n / total * math.log2(n / total) for n in Counter(dados).values())
+
+
+def comprimir_bloco(flag, dados):
+    """Byte de marca + bloco comprimido, ou + bloco original se a compressão não valer a pena."""
+    if entropia_amostra(dados) <= LIMITE_ENTROPIA:
+        if flag == FLAG_ZSTD:
+            comprimido = _zstandard().ZstdCompressor(level=NIVEL_ZSTD).compress(dados)
+        else:
+            comprimido = zlib.compress(dados, NIVEL_ZLIB)
+        # Exige pelo menos ~3% de economia: abaixo disso a descompressão custa mais do que poupa
+        if len(comprimido) < len(dados) - len(dados) // 32:
+            return _BLOCO_COMPRIMIDO + comprimido
+    return _BLOCO_GUARDADO + dados
+
+
+def descomprimir_bloco(flag, dados, tamanho_bloco):
+    """Desfaz `comprimir_bloco`, recusando blocos que descomprimiriam para mais que `tamanho_bloco`."""
+    marca, corpo = dados[:1], dados[1:]
+    if marca == _BLOCO_GUARDADO:
+        return corpo
+    if marca != _BLOCO_COMPRIMIDO:
+        raise ValueError("Bloco com marca de compressão inválida.")
+    if flag == FLAG_ZSTD:
+        zstandard = _zstandard()
+        try:
+            if zstandard.frame_content_size(corpo) > tamanho_bloco:
+                raise ValueError("Bloco comprimido maior que o tamanho de bloco do cabeçalho.")
+            return zstandard.ZstdDecompressor().decompress(corpo, max_output_size=tamanho_bloco)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Bloco comprimido inválido: {e}") from None
+    descompressor = zlib.decompressobj()
+    try:
+        resultado = descompressor.decompress(corpo, tamanho_bloco)
+    except zlib.error as e:
+        raise ValueError(f"Bloco comprimido inválido: {e}") from None
+    if descompressor.unconsumed_tail or descompressor.unused_data or not descompressor.eof:
+        raise ValueError("Bloco comprimido inválido ou maior que o tamanho de bloco do cabeçalho.")
+    return resultado
+
+
+# Tarefas executadas pelos trabalhadores (funções de módulo para poderem ser serializadas pelo pool de processos)
+def _tarefa_cifrar(chave_arquivo, cabecalho, indice, ultimo, dados, compressao=0):
+    texto = comprimir_bloco(compressao, dados) if compressao else dados
+    return ultimo, cifrar_bloco(AESGCM(chave_arquivo), cabecalho, indice, ultimo, texto), len(dados)
+
+
+def _tarefa_decifrar(chave_arquivo, cabecalho, indice, ultimo, texto_cifrado, compressao=0, tamanho_bloco=0):
+    dados = decifrar_bloco(AESGCM(chave_arquivo), cabecalho, indice, ultimo, texto_cifrado)
+    return descomprimir_bloco(compressao, dados, tamanho_bloco) if compressao else dados
+
+
+def _tarefa_verificar(chave_arquivo, cabecalho, indice, ultimo, texto_cifrado):
+    decifrar_bloco(AESGCM(chave_arquivo), cabecalho, indice, ultimo, texto_cifrado)
+    return len(texto_cifrado)
+
+
+def _tarefa_recifrar(chave_antiga, cabecalho_antigo, chave_nova, cabecalho_novo, indice, ultimo, texto_cifrado):
+    dados = decifrar_bloco(AESGCM(chave_antiga), cabecalho_antigo, indice, ultimo, texto_cifrado)
+    return ultimo, cifrar_bloco(AESGCM(chave_nova), cabecalho_novo, indice, ultimo, dados), len(dados)
+
+
+def processar_em_ordem(funcao, tarefas, trabalhadores=1, usar_processos=True):
+    """
+    Aplica `funcao(*args)` a cada item de `tarefas` e devolve os resultados na ordem original.
+    Com mais de um trabalhador usa um pool (de processos ou threads) com no máximo
+    2 × trabalhadores tarefas em andamento, o que mantém a memória limitada.
+    """
+    if trabalhadores <= 1:
+        for args in tarefas:
+            yield funcao(*args)
+        return
+    executor = ProcessPoolExecutor if usar_processos else ThreadPoolExecutor
+    em_andamento = deque()
+    with executor(max_workers=trabalhadores) as pool:
+        try:
+            for args in tarefas:
+                em_andamento.append(pool.submit(funcao, *args))
+                if len(em_andamento) >= 2 * trabalhadores:
+                    yield em_andamento.popleft().result()
+            while em_andamento:
+                yield em_andamento.popleft().result()
+        finally:
+            for futuro in em_andamento:
+                futuro.cancel()
+
+
+def _blocos_com_marca_final(f, tamanho_bloco):
+    """Lê blocos de tamanho fixo, olhando um bloco à frente para saber qual é o último."""
+    atual = f.read(tamanho_bloco)
+    indice = 0
+    while True:
+        proximo = f.read(tamanho_bloco) if len(atual) == tamanho_bloco else b""
+        ultimo = not proximo
+        yield indice, ultimo, atual
+        if ultimo:
+            return
+        atual = proximo
+        indice += 1
+
+
+@metricas.cronometrar("cripto.criptografar", bytes_do_resultado=True)
+def criptografar_fluxo(entrada, saida, chave, tamanho_bloco=TAMANHO_BLOCO_PADRAO, progresso=None,
+                       trabalhadores=1, usar_processos=True, derivacao=None, cancelar=None, compressao=None):
+    """
+    Criptografa o fluxo `entrada` para `saida` no formato em blocos. Os blocos são independentes,
+    então podem ser cifrados em paralelo por `trabalhadores` e remontados em ordem; a memória
+    fica limitada a alguns blocos por trabalhador. `progresso`, se informado, recebe o total de
+    bytes processados. `derivacao`: parâmetros de derivacao_chaves gravados no cabeçalho, quando
+    `chave` foi derivada de uma senha mestra. `compressao`: um de COMPRESSOES (None = sem).
+    """
+    flags = flag_compressao(compressao)
+    blocos = _blocos_com_marca_final(entrada, tamanho_bloco)
+    if flags:
+        primeiro = next(blocos)
+        blocos = itertools.chain([primeiro], blocos)
+        if entropia_amostra(primeiro[2]) > LIMITE_ENTROPIA:
+            flags = 0  # começa como mídia já comprimida: nem liga a compressão
+    sal = os.urandom(TAMANHO_SAL)
+    extensao = b""
+    if derivacao is not None:
+        import derivacao_chaves
+        extensao = derivacao_chaves.serializar(derivacao)
+    cabecalho = montar_cabecalho(tamanho_bloco, flags=flags, sal=sal, extensao=extensao)
+    chave_arquivo = derivar_chave_arquivo(chave, sal)
+    saida.write(cabecalho)
+    tarefas = ((chave_arquivo, cabecalho, indice, ultimo, dados, flags) for indice, ultimo, dados in blocos)
+    processados = 0
+    for ultimo, texto_cifrado, tamanho in processar_em_ordem(_tarefa_cifrar, tarefas, trabalhadores, usar_processos):
+        escrever_quadro(saida, ultimo, texto_cifrado)
+        processados += tamanho
+        if progresso: progresso(processados)
+        if cancelar and cancelar():
+            return None
+    return processados
+
+
+@metricas.cronometrar("cripto.descriptografar", bytes_do_resultado=True)
+def descriptografar_fluxo(entrada, saida, chave, progresso=None, trabalhadores=1, usar_processos=True, cancelar=None):
+    """
+    Descriptografa um contêiner em blocos de `entrada` para `saida`, autenticando (e, se for o caso,
+    descomprimindo) cada bloco, em paralelo se pedido.
+    """
+    cab = ler_cabecalho(entrada)
+    chave_arquivo = derivar_chave_arquivo(chave, cab["sal"])
+    tamanho_bloco = cab["tamanho_bloco"]
+    tarefas = ((chave_arquivo, cab["bruto"], indice, ultimo, texto_cifrado, cab["flags"], tamanho_bloco)
+               for indice, ultimo, texto_cifrado in ler_quadros(entrada, tamanho_bloco))
+    processados = 0
+    for dados in processar_em_ordem(_tarefa_decifrar, tarefas, trabalhadores, usar_processos):
+        saida.write(dados)
+        processados += len(dados)
+        if progresso: progresso(processados)
+        if cancelar and cancelar():
+            return None
+    return processados
+
+
+@metricas.cronometrar("cripto.recifrar", bytes_do_resultado=True)
+def recifrar_fluxo(entrada, saida, chave_antiga, chave_nova, progresso=None, trabalhadores=1, usar_processos=True,
+                   derivacao=None, cancelar=None):
+    """
+    Troca a chave de um contêiner em blocos: cada bloco é decifrado com `chave_antiga` e cifrado de
+    novo com `chave_nova`, sob um sal novo, em paralelo se pedido. O tamanho do bloco e a compressão
+    são mantidos (os blocos comprimidos mudam de chave sem ser descomprimidos). `derivacao`:
+    parâmetros gravados no novo cabeçalho, quando `chave_nova` foi derivada de uma senha mestra.
+    """
+    cab = ler_cabecalho(entrada)
+    sal = os.urandom(TAMANHO_SAL)
+    extensao = b""
+    if derivacao is not None:
+        import derivacao_chaves
+        extensao = derivacao_chaves.serializar(derivacao)
+    cabecalho = montar_cabecalho(cab["tamanho_bloco"], flags=cab["flags"], sal=sal, extensao=extensao)
+    chave_antiga_arquivo = derivar_chave_arquivo(chave_antiga, cab["sal"])
+    chave_nova_arquivo = derivar_chave_arquivo(chave_nova, sal)
+    saida.write(cabecalho)
+    tarefas = ((chave_antiga_arquivo, cab["bruto"], chave_nova_arquivo, cabecalho, indice, ultimo, texto_cifrado)
+               for indice, ultimo, texto_cifrado in ler_quadros(entrada, cab["tamanho_bloco"]))
+    processados = 0
+    for ultimo, texto_cifrado, tamanho in processar_em_ordem(_tarefa_recifrar, tarefas, trabalhadores, usar_processos):
+        escrever_quadro(saida, ultimo, texto_cifrado)
+        processados += tamanho
+        if progresso: progresso(processados)
+        if cancelar and cancelar():
+            return None
+    return processados
+
+
+@metricas.cronometrar("cripto.verificar", bytes_do_resultado=True)
+def verificar_fluxo(entrada, chave, progresso=None, trabalhadores=1, usar_processos=True, cancelar=None):
+    """
+    Confere a tag de todos os blocos de um contêiner em blocos, e a estrutura do fluxo (nenhum bloco
+    faltando, sobrando ou fora de ordem), sem escrever nada. Retorna os bytes cifrados conferidos,
+    ou None se cancelado. Levanta InvalidToken no primeiro bloco que não confere.
+    """
+    cab = ler_cabecalho(entrada)
+    chave_arquivo = derivar_chave_arquivo(chave, cab["sal"])
+    tarefas = ((chave_arquivo, cab["bruto"], indice, ultimo, texto_cifrado)
+               for indice, ultimo, texto_cifrado in ler_quadros(entrada, cab["tamanho_bloco"]))
+    processados = 0
+    for tamanho in processar_em_ordem(_tarefa_verificar, tarefas, trabalhadores, usar_processos):
+        processados += tamanho
+        if progresso: progresso(processados)
+        if cancelar and cancelar():
+            return None
+    return processados
+
+
+# --- Formato legado (token Fernet único) ---
+def _ler_base64_legado(f, inicio, fim):
+    """Decodifica em pedaços o trecho [inicio, fim) (em bytes decodificados) do token Fernet."""
+    # Cada 3 bytes decodificados correspondem a 4 caracteres base64
+    f.seek(0)
+    posicao = 0
+    resto = b""
+    while posicao < fim:
+        texto = f.read(_TAMANHO_LEITURA_LEGADO)
+        if not texto:
+            break
+        texto = resto + texto.strip()
+        corte = len(texto) - (len(texto) % 4)
+        texto, resto = texto[:corte], texto[corte:]
+        try:
+            dados = base64.urlsafe_b64decode(texto) if texto else b""
+        except ValueError:
+            raise InvalidToken from None
+        trecho_ini = max(inicio - posicao, 0)
+        trecho_fim = min(fim - posicao, len(dados))
+        if trecho_ini < trecho_fim:
+            yield dados[trecho_ini:trecho_fim]
+        posicao += len(dados)
+
+
+def _tamanho_token_legado(f):
+    """Tamanho, em bytes decodificados, do token Fernet armazenado em `f`."""
+    f.seek(0, os.SEEK_END)
+    tamanho_texto = f.tell()
+    # Desconta espaços/quebras de linha no final do arquivo
+    f.seek(max(tamanho_texto - 8, 0))
+    cauda = f.read()
+    tamanho_texto -= len(cauda) - len(cauda.rstrip())
+    if tamanho_texto % 4:
+        raise InvalidToken
+    f.seek(max(tamanho_texto - 2, 0))
+    preenchimento = f.read(2).count(b"=")
+    return tamanho_texto // 4 * 3 - preenchimento
+
+
+def verificar_legado_fluxo(f, chave):
+    """Confere o HMAC de um token Fernet legado sem carregá-lo inteiro. Retorna (tamanho, iv)."""
+    bruta = _chave_bruta(chave)
+    chave_assinatura = bruta[:16]
+    tamanho = _tamanho_token_legado(f)
+    if tamanho < 1 + 8 + 16 + 16 + 32 or (tamanho - 57) % 16:
+        raise InvalidToken
+    assinatura = hmac.new(chave_assinatura, digestmod=hashlib.sha256)
+    prefixo = b""
+    pendente = b""  # os últimos 32 bytes são a tag e ficam fora do HMAC
+    for pedaco in _ler_base64_legado(f, 0, tamanho):
+        if len(prefixo) < 25:
+            prefixo += pedaco[:25 - len(prefixo)]
+        pendente += pedaco
+        if len(pendente) > 32:
+            assinatura.update(pendente[:-32])
+            pendente = pendente[-32:]
+    tag = pendente
+    if prefixo[:1] != b"\x80" or not hmac.compare_digest(assinatura.digest(), tag):
+        raise InvalidToken
+    return tamanho, prefixo[9:25]
+
+
+@metricas.cronometrar("cripto.descriptografar_legado", bytes_do_resultado=True)
+def descriptografar_legado_fluxo(entrada, saida, chave, progresso=None, cancelar=None):
+    """Descriptografa um .enc legado (token Fernet único) em fluxo: confere o HMAC e depois decifra."""
+    tamanho, iv = verificar_legado_fluxo(entrada, chave)
+    decifrador = Cipher(algorithms.AES(_chave_bruta(chave)[16:]), modes.CBC(iv)).decryptor()
+    despreenchedor = padding.PKCS7(algorithms.AES.block_size).unpadder()
+    processados = 0
+    try:
+        for pedaco in _ler_base64_legado(entrada, 25, tamanho - 32):
+            dados = despreenchedor.update(decifrador.update(pedaco))
+            saida.write(dados)
+            processados += len(dados)
+            if progresso: progresso(processados)
+            if cancelar and cancelar():
+                return None
+        dados = despreenchedor.update(decifrador.finalize()) + despreenchedor.finalize()
+    except ValueError:
+        raise InvalidToken from None
+    saida.write(dados)
+    processados += len(dados)
+    if progresso: progresso(processados)
+    return processados
+
+
+# --- Funções de alto nível ---
+def estimar_tamanho_original(caminho):
+    """
+    Tamanho aproximado do conteúdo de um .enc (para barras de progresso da descriptografia), ou
+    None se ele estiver comprimido (o tamanho original não é gravado).
+    """
+    tamanho = os.path.getsize(caminho)
+    with open(caminho, 'rb') as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            return max(0, tamanho * 3 // 4 - 57)  # token Fernet: base64 de versão, data, IV, dados e HMAC
+        f.seek(0)
+        cab = ler_cabecalho(f)
+    if cab["compressao"]:
+        return None
+    return (tamanho - len(cab["bruto"])) * cab["tamanho_bloco"] // (cab["tamanho_bloco"] + 4 + TAMANHO_TAG)
+
+
+def _escrever_com_temporario(caminho_destino, escrever):
+    """
+    Chama `escrever(f)` com um temporário ao lado do destino e o renomeia para o destino se ela
+    terminar sem erro e sem cancelamento (resultado diferente de None); senão, apaga o temporário.
+    """
+    temporario = caminho_destino + ".parcial"
+    resultado = None
+    try:
+        with open(temporario, 'wb') as saida:
+            resultado = escrever(saida)
+    finally:
+        if resultado is not None:
+            os.replace(temporario, caminho_destino)
+        elif os.path.exists(temporario):
+            os.remove(temporario)
+    return resultado
+
+
+def criptografar_arquivo(caminho_origem, caminho_destino, chave, tamanho_bloco=TAMANHO_BLOCO_PADRAO, progresso=None,
+                         trabalhadores=1, usar_processos=True, derivacao=None, cancelar=None, compressao=None):
+    """Criptografa um arquivo no formato em blocos. Retorna os bytes processados, ou None se cancelado."""
+    with open(caminho_origem, 'rb') as entrada:
+        return _escrever_com_temporario(caminho_destino, lambda saida: criptografar_fluxo(
+            entrada, saida, chave, tamanho_bloco, progresso, trabalhadores, usar_processos, derivacao, cancelar, compressao))
+
+
+def descriptografar_arquivo_para_fluxo(caminho_origem, saida, chave, progresso=None, trabalhadores=1, usar_processos=True,
+                                       cancelar=None):
+    """Descriptografa um .enc (em blocos ou Fernet legado) escrevendo o conteúdo no fluxo `saida`."""
+    with open(caminho_origem, 'rb') as entrada:
+        if entrada.read(len(MAGIA)) == MAGIA:
+            entrada.seek(0)
+            return descriptografar_fluxo(entrada, saida, chave, progresso, trabalhadores, usar_processos, cancelar)
+        return descriptografar_legado_fluxo(entrada, saida, chave, progresso, cancelar)
+
+
+def descriptografar_arquivo(caminho_origem, caminho_destino, chave, progresso=None, trabalhadores=1, usar_processos=True,
+                            cancelar=None):
+    """
+    Descriptografa um .enc no formato em blocos ou no formato Fernet legado (este sempre sequencial).
+    Retorna os bytes escritos, ou None se cancelado.
+    """
+    return _escrever_com_temporario(caminho_destino, lambda saida: descriptografar_arquivo_para_fluxo(
+        caminho_origem, saida, chave, progresso, trabalhadores, usar_processos, cancelar))
@@ -0,0 +1,239 @@
+# %% Chaves Derivadas de uma Senha Mestra (scrypt / Argon2id)
+#
+# Em vez de um arquivo .key aleatório, a chave pode vir de uma senha mestra passada por uma função
+# de derivação lenta (scrypt ou Argon2id). O sal e o custo ficam no próprio arquivo, na extensão
+# do cabeçalho do contêiner (.enc) ou do cofre (.cofre):
+#   MAGIA(5) | versão(1) | algoritmo(1) | sal(16) | verificador(16) | custo(3 × 4 bytes)
+#   scrypt:   custo = (N, r, p)
+#   argon2id: custo = (iterações, memória em KiB, paralelismo)
+# O verificador (BLAKE2b com a chave derivada) detecta uma senha mestra errada logo após a
+# derivação, antes de qualquer dado ser decifrado, e impede que uma chave errada vá para o cache.
+# A chave derivada tem o formato de uma chave Fernet, então o resto do programa (HKDF por arquivo,
+# AES-GCM) não muda: ela faz o papel do arquivo .key. Cada arquivo continua com o seu sal HKDF;
+# arquivos criptografados na mesma operação (uma pasta, por exemplo) dividem o sal da derivação,
+# então abri-los de novo custa uma única derivação.
+#
+# `calibrar` escolhe o custo que leva cerca de TEMPO_ALVO segundos nesta máquina, e
+# `CacheChaves` guarda as chaves já derivadas por alguns minutos (por sal e custo), apagando-as
+# da memória ao expirar.
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+import unicodedata
+
+import metricas
+
+MAGIA = b"GSKDF"
+VERSAO = 1
+SCRYPT = "scrypt"
+ARGON2ID = "argon2id"
+ALGORITMOS = (SCRYPT, ARGON2ID)
+TAMANHO_SAL = 16
+TEMPO_ALVO = 0.5                    # segundos por derivação escolhidos pela calibração
+VALIDADE_CACHE = 300                # segundos que uma chave derivada fica no cache
+MEMORIA_MAXIMA = 1 << 30            # limite aceito de um cabeçalho (evita arquivos que pedem memória demais)
+MEMORIA_ARGON2_KIB = 64 * 1024
+PARALELISMO_ARGON2 = 4
+
+_CODIGOS = {SCRYPT: 1, ARGON2ID: 2}
+_NOMES = {codigo: nome for nome, codigo in _CODIGOS.items()}
+_FORMATO = ">5sBB16s16sIII"
+TAMANHO_PARAMETROS = struct.calcsize(_FORMATO)
+
+
+def _validar_custo(algoritmo, custo):
+    if algoritmo == SCRYPT:
+        n, r, p = custo
+        if n < 2 or n & (n - 1) or not 1 <= r <= 64 or not 1 <= p <= 16 or 128 * r * n > MEMORIA_MAXIMA:
+            raise ValueError("Parâmetros de scrypt inválidos ou caros demais.")
+    elif algoritmo == ARGON2ID:
+        iteracoes, memoria_kib, paralelismo = custo
+        if not 1 <= iteracoes <= 100 or not 1 <= paralelismo <= 16 or not 8 * paralelismo <= memoria_kib <= MEMORIA_MAXIMA // 1024:
+            raise ValueError("Parâmetros de Argon2id inválidos ou caros demais.")
+    else:
+        raise ValueError(f"Algoritmo de derivação desconhecido: {algoritmo}. Use um de: {', '.join(ALGORITMOS)}.")
+
+
+def criar_parametros(algoritmo, custo, sal=None, verificador=None):
+    """
+    Parâmetros de derivação: {"algoritmo", "custo", "sal", "verificador"} (sal novo se não
+    informado; o verificador é preenchido na primeira derivação).
+    """
+    custo = tuple(custo)
+    _validar_custo(algoritmo, custo)
+    return {"algoritmo": algoritmo, "custo": custo, "sal": sal if sal is not None else os.urandom(TAMANHO_SAL),
+            "verificador": verificador}
+
+
+def _identificador(parametros):
+    return parametros["algoritmo"], parametros["sal"], parametros["custo"]
+
+
+def serializar(parametros):
+    """Bytes dos parâmetros, como gravados na extensão do cabeçalho (depois da primeira derivação)."""
+    if parametros["verificador"] is None:
+        raise ValueError("Derive a chave antes de gravar os parâmetros (falta o verificador).")
+    return struct.pack(_FORMATO, MAGIA, VERSAO, _CODIGOS[parametros["algoritmo"]], parametros["sal"],
+                       parametros["verificador"], *parametros["custo"])
+
+
+def desserializar(dados):
+    """Parâmetros gravados em uma extensão de cabeçalho, ou None se ela não contiver uma derivação."""
+    if len(dados) < TAMANHO_PARAMETROS or not dados.startswith(MAGIA):
+        return None
+    _, versao, codigo, sal, verificador, *custo = struct.unpack_from(_FORMATO, dados)
+    if versao != VERSAO:
+        raise ValueError(f"Versão de derivação de chave não suportada: {versao}.")
+    if codigo not in _NOMES:
+        raise ValueError("Algoritmo de derivação de chave desconhecido no cabeçalho.")
+    return criar_parametros(_NOMES[codigo], custo, sal, verificador)
+
+
+@metricas.cronometrar("kdf.derivar")
+def derivar(senha, parametros):
+    """
+    Deriva da senha mestra a chave (no formato de chave Fernet) descrita pelos parâmetros.
+    Levanta ValueError se a senha não corresponder ao verificador; sem verificador (parâmetros
+    novos), ele é preenchido.
+    """
+    dados = unicodedata.normalize("NFC", senha).encode('utf-8')
+    sal, custo = parametros["sal"], parametros["custo"]
+    if parametros["algoritmo"] == SCRYPT:
+        from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+        kdf = Scrypt(salt=sal, length=32, n=custo[0], r=custo[1], p=custo[2])
+    else:
+        try:
+            from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+        except ImportError:
+            raise ValueError("Argon2id requer a biblioteca cryptography 44 ou mais recente.") from None
+        kdf = Argon2id(salt=sal, length=32, iterations=custo[0], memory_cost=custo[1], lanes=custo[2])
+    bruta = kdf.derive(dados)
+    verificador = hashlib.blake2b(b"verificador", key=bruta, digest_size=16).digest()
+    if parametros["verificador"] is None:
+        parametros["verificador"] = verificador
+    elif not hmac.compare_digest(verificador, parametros["verificador"]):
+        raise ValueError("Senha mestra incorreta.")
+    return base64.urlsafe_b64encode(bruta)
+
+
+def _custo_inicial(algoritmo):
+    return (1 << 14, 8, 1) if algoritmo == SCRYPT else (1, MEMORIA_ARGON2_KIB, PARALELISMO_ARGON2)
+
+
+_calibrados = {}
+
+
+def calibrar(algoritmo=SCRYPT, alvo=TEMPO_ALVO):
+    """
+    Custo que leva cerca de `alvo` segundos por derivação nesta máquina: dobra o custo (N no
+    scrypt, iterações no Argon2id) até passar do alvo e fica com o mais próximo dele (em escala
+    logarítmica) entre o último passo abaixo e o primeiro acima. O resultado fica guardado para o
+    resto da execução.
+    """
+    if (algoritmo, alvo) in _calibrados:
+        return _calibrados[algoritmo, alvo]
+    custo, anterior = _custo_inicial(algoritmo), None
+    while True:
+        inicio = time.perf_counter()
+        derivar("calibracao", criar_parametros(algoritmo, custo, bytes(TAMANHO_SAL)))
+        tempo = time.perf_counter() - inicio
+        if tempo >= alvo:
+            if anterior is not None and alvo / anterior[1] < tempo / alvo:
+                custo = anterior[0]
+            break
+        proximo = (custo[0] * 2,) + custo[1:]
+        try:
+            _validar_custo(algoritmo, proximo)
+        except ValueError:
+            break  # o próximo passo passaria dos limites aceitos
+        custo, anterior = proximo, (custo, tempo)
+    _calibrados[algoritmo, alvo] = custo
+    return custo
+
+
+def novos_parametros(algoritmo=SCRYPT, alvo=TEMPO_ALVO):
+    """Parâmetros com sal novo e o custo calibrado para esta máquina."""
+    return criar_parametros(algoritmo, calibrar(algoritmo, alvo))
+
+
+class CacheChaves:
+    """
+    Chaves já derivadas, por parâmetros (sal + custo), válidas por `validade` segundos.
+    Como o sal é aleatório, ele identifica a derivação: arquivos com o mesmo sal saíram da mesma
+    senha mestra, e abrir centenas deles paga a derivação uma única vez. Ao expirar ou em
+    `limpar()`, as chaves são sobrescritas com zeros (melhor esforço: o Python pode ter feito
+    cópias dos bytes que já foram entregues).
+    """
+    def __init__(self, validade=VALIDADE_CACHE):
+        self.validade = validade
+        self._chaves = {}  # (algoritmo, sal, custo) -> (bytearray da chave, instante de expiração)
+        self._trava = threading.Lock()
+
+    def _apagar(self, identificador):
+        chave, _ = self._chaves.pop(identificador)
+        chave[:] = bytes(len(chave))
+
+    def limpar_expiradas(self):
+        agora = time.monotonic()
+        with self._trava:
+            for identificador in [i for i, (_, expira) in self._chaves.items() if expira <= agora]:
+                self._apagar(identificador)
+
+    def limpar(self):
+        with self._trava:
+            for identificador in list(self._chaves):
+                self._apagar(identificador)
+
+    def __len__(self):
+        self.limpar_expiradas()
+        return len(self._chaves)
+
+    def buscar(self, parametros):
+        """A chave em cache para estes parâmetros, ou None (renova a validade quando encontrada)."""
+        self.limpar_expiradas()
+        identificador = _identificador(parametros)
+        with self._trava:
+            if identificador not in self._chaves:
+                return None
+            chave, _ = self._chaves[identificador]
+            self._chaves[identificador] = (chave, time.monotonic() + self.validade)
+            return bytes(chave)
+
+    def guardar(self, parametros, chave):
+        with self._trava:
+            identificador = _identificador(parametros)
+            if identificador in self._chaves:
+                self._apagar(identificador)
+            self._chaves[identificador] = (bytearray(chave), time.monotonic() + self.validade)
+
+    def obter(self, parametros, senha):
+        """
+        Chave dos parâmetros: do cache, ou derivada de `senha` (texto, ou função sem argumentos
+        que o retorna, chamada só quando a derivação é necessária).
+        """
+        chave = self.buscar(parametros)
+        if chave is None:
+            chave = derivar(senha() if callable(senha) else senha, parametros)
+            self.guardar(parametros, chave)
+        return chave
+
+
+def parametros_do_arquivo(caminho):
+    """Parâmetros de derivação gravados no cabeçalho de um .enc ou .cofre, ou None se o arquivo usa um .key."""
+    import cofre_senhas
+    import cripto_arquivos
+    with open(caminho, 'rb') as f:
+        magia = f.read(5)
+        f.seek(0)
+        if magia == cripto_arquivos.MAGIA:
+            extensao = cripto_arquivos.ler_cabecalho(f)["extensao"]
+        elif magia == cofre_senhas.MAGIA:
+            extensao = cofre_senhas.ler_cabecalho(f)["extensao"]
+        else:
+            return None  # formatos antigos (Fernet) só existem com arquivo .key
+    return desserializar(extensao)
@@ -0,0 +1,151 @@
+# %% Fontes de Senhas Descriptografadas sob Demanda
+#
+# Dão acesso por índice às senhas de um arquivo criptografado sem decifrar tudo de uma vez:
+# só as linhas pedidas (a janela visível da lista, mais a pré-carga) são decifradas, e um
+# pequeno cache LRU evita repetir o trabalho ao rolar para cima e para baixo.
+
+from array import array
+from collections import OrderedDict
+
+from cryptography.fernet import Fernet
+
+import cofre_senhas
+import metricas
+
+TAMANHO_LEITURA_INDICE = 1 << 20  # bytes lidos por passo ao indexar as linhas do formato antigo
+
+
+class CacheLRU:
+    """Cache com política LRU (o item menos usado recentemente sai primeiro)."""
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+
+    def obter(self, chave, padrao=None):
+        try:
+            self.itens.move_to_end(chave)
+            return self.itens[chave]
+        except KeyError:
+            return padrao
+
+    def guardar(self, chave, valor):
+        self.itens[chave] = valor
+        self.itens.move_to_end(chave)
+        while len(self.itens) > self.capacidade:
+            self.itens.popitem(last=False)
+
+    def __contains__(self, chave):
+        return chave in self.itens
+
+    def limpar(self):
+        self.itens.clear()
+
+
+class FonteCofre:
+    """Senhas de um cofre binário; o cache guarda blocos inteiros já decifrados."""
+    completo = True
+
+    def __init__(self, caminho, chave, blocos_em_cache=64):
+        self.cofre = cofre_senhas.Cofre(caminho, chave)
+        self.cache = CacheLRU(blocos_em_cache)
+
+    def __len__(self):
+        return len(self.cofre)
+
+    def _bloco(self, indice_bloco):
+        registros = self.cache.obter(indice_bloco)
+        if registros is None:
+            registros = self.cofre.ler_bloco(indice_bloco)
+            self.cache.guardar(indice_bloco, registros)
+        return registros
+
+    def __getitem__(self, i):
+        n = self.cofre.registros_por_bloco
+        if not (0 <= i < len(self.cofre)):
+            raise IndexError("Índice fora do cofre.")
+        return self._bloco(i // n)[i % n]
+
+    def obter_intervalo(self, inicio, fim):
+        fim = min(fim, len(self.cofre))
+        return [self[i] for i in range(max(inicio, 0), fim)]
+
+    def pre_carregar(self, inicio, fim):
+        """Decifra antecipadamente os blocos do intervalo (usado para deixar a rolagem suave)."""
+        n = self.cofre.registros_por_bloco
+        fim = min(fim, len(self.cofre))
+        if fim > inicio:
+            for indice_bloco in range(max(inicio, 0) // n, (fim - 1) // n + 1):
+                self._bloco(indice_bloco)
+
+    def indexar(self):
+        """O cofre já tem índice; nada a fazer. Retorna True (indexação completa)."""
+        return True
+
+    def fechar(self):
+        self.cofre.fechar()
+
+
+class FonteLinhasFernet:
+    """
+    Senhas no formato antigo (um token Fernet por linha). Os offsets das linhas são indexados
+    aos poucos por `indexar()`, então a primeira linha fica disponível sem ler o arquivo inteiro.
+    """
+    def __init__(self, caminho, chave, linhas_em_cache=4096):
+        self.cipher = Fernet(chave)
+        self.f = open(caminho, 'rb')
+        self.offsets = array('Q')
+        self._posicao_varredura = 0
+        self._inicio_linha = 0
+        self.completo = False
+        self.cache = CacheLRU(linhas_em_cache)
+
+    def indexar(self, limite_bytes=TAMANHO_LEITURA_INDICE):
+        """Indexa mais um trecho do arquivo. Retorna True quando o arquivo inteiro foi indexado."""
+        if self.completo:
+            return True
+        self.f.seek(self._posicao_varredura)
+        dados = self.f.read(limite_bytes)
+        if not dados:
+            # Última linha sem quebra de linha no final
+            if self._posicao_varredura > self._inicio_linha:
+                self.offsets.append(self._inicio_linha)
+            self.completo = True
+            return True
+        posicao = dados.find(b"\n")
+        while posicao != -1:
+            fim_linha = self._posicao_varredura + posicao
+            if fim_linha > self._inicio_linha:  # ignora linhas vazias
+                self.offsets.append(self._inicio_linha)
+            self._inicio_linha = fim_linha + 1
+            posicao = dados.find(b"\n", posicao + 1)
+        self._posicao_varredura += len(dados)
+        return False
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        senha = self.cache.obter(i)
+        if senha is None:
+            self.f.seek(self.offsets[i])
+            senha = self.cipher.decrypt(self.f.readline().strip()).decode()
+            self.cache.guardar(i, senha)
+        return senha
+
+    def obter_intervalo(self, inicio, fim):
+        fim = min(fim, len(self.offsets))
+        return [self[i] for i in range(max(inicio, 0), fim)]
+
+    def pre_carregar(self, inicio, fim):
+        self.obter_intervalo(inicio, fim)
+
+    def fechar(self):
+        self.f.close()
+
+
+@metricas.cronometrar("senhas.abrir")
+def abrir_fonte(caminho, chave):
+    """Abre o arquivo de senhas no formato adequado (cofre binário ou uma linha Fernet por senha)."""
+    if cofre_senhas.eh_cofre(caminho):
+        return FonteCofre(caminho, chave)
+    return FonteLinhasFernet(caminho, chave)
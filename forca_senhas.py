@@ -0,0 +1,194 @@
+# %% Avaliação de Força de Senhas por Entropia
+#
+# A força é estimada em bits: tamanho × log2(tamanho do conjunto de caracteres usado), com
+# penalidade para sequências e repetições ("aaa", "abc", "321", "qwe"). O resultado é
+# classificado nas mesmas faixas de cor da interface ("Muito Fraca" ... "Muito Forte").
+#
+# Tudo é feito com tabelas pré-calculadas por byte. Em lote, as senhas são unidas em um único
+# buffer: as classes de caractere saem de `bytes.translate` + `split`, e os padrões são achados
+# de uma vez só (ver `_candidatos_padrao`); o laço em Python só roda para as poucas senhas
+# suspeitas, então milhões de senhas geradas são avaliadas em poucos segundos.
+
+import math
+import re
+from bisect import bisect_right
+
+import metricas
+import motor_senhas
+
+# Classes de caracteres e o tamanho do conjunto que cada uma acrescenta
+CLASSES = (
+    (motor_senhas.LETRAS[26:], 26),               # minúsculas
+    (motor_senhas.LETRAS[:26], 26),               # maiúsculas
+    (motor_senhas.NUMEROS, 10),
+    (motor_senhas.CARACTERES_ESPECIAIS, len(motor_senhas.CARACTERES_ESPECIAIS)),
+)
+TAMANHO_OUTROS = 128  # espaço, caracteres de controle e qualquer caractere fora do ASCII
+
+# Limites (em bits) das faixas de força, na ordem de `ROTULOS`
+LIMITES = (28, 36, 60, 80)
+ROTULOS = ("Muito Fraca", "Fraca", "Média", "Forte", "Muito Forte")
+
+# Sequências consideradas padrão quando percorridas em qualquer sentido
+SEQUENCIAS_ALFABETO = ("abcdefghijklmnopqrstuvwxyz", "0123456789")
+SEQUENCIAS_TECLADO = ("1234567890", "qwertyuiop", "asdfghjkl", "zxcvbnm")
+
+
+def _tabelas_apagar_classes():
+    """Para cada classe (e para 'outros'), a lista de bytes a apagar para sobrar só aquela classe e as quebras de linha."""
+    tabelas = []
+    conhecidos = set()
+    for caracteres, _ in CLASSES:
+        manter = set(caracteres.encode('ascii'))
+        conhecidos |= manter
+        tabelas.append(bytes(b for b in range(256) if b not in manter | {0x0A}))
+    tabelas.append(bytes(sorted(conhecidos)))  # 'outros': apaga todos os caracteres das classes acima
+    return tabelas
+
+
+def _tabela_coordenadas(sequencias):
+    """
+    Atribui a cada byte um código de 7 bits: caracteres vizinhos numa sequência recebem
+    códigos consecutivos (maiúsculas = minúsculas) e os demais ficam separados por pelo menos 2,
+    de modo que uma diferença de -1, 0 ou +1 entre caracteres adjacentes indica um padrão.
+    """
+    tabela = [None] * 256
+    proximo = 2
+    for sequencia in sequencias:
+        for c in sequencia:
+            if tabela[ord(c)] is None:
+                tabela[ord(c)] = tabela[ord(c.upper())] = proximo
+                proximo += 1
+        proximo += 1
+    for b in list(range(0x20, 0x7F)) + [0x0A]:
+        if tabela[b] is None:
+            tabela[b] = proximo
+            proximo += 2
+    # Controles e bytes fora do ASCII dividem um código: o filtro pode acusar falsos candidatos, nunca perder um padrão
+    outros = proximo
+    assert outros < 0x80
+    return bytes(outros if codigo is None else codigo for codigo in tabela)
+
+
+_APAGAR_CLASSES = _tabelas_apagar_classes()
+_TAMANHOS_CLASSES = tuple(tamanho for _, tamanho in CLASSES) + (TAMANHO_OUTROS,)
+_TABELAS_COORDENADAS = (_tabela_coordenadas(SEQUENCIAS_ALFABETO), _tabela_coordenadas(SEQUENCIAS_TECLADO))
+# Dois passos iguais seguidos (-1, 0 ou +1, somados a 0x80) = três caracteres em padrão
+_PASSOS_REPETIDOS = re.compile(rb"([\x7f-\x81])\1")
+
+
+def classificar(bits):
+    """Converte a entropia em bits no rótulo da faixa de força."""
+    return ROTULOS[bisect_right(LIMITES, bits)]
+
+
+def _tamanho_conjunto(presencas):
+    return sum(tamanho for presente, tamanho in zip(presencas, _TAMANHOS_CLASSES) if presente)
+
+
+def _caracteres_em_padrao(senha):
+    """Quantos caracteres de `senha` apenas continuam uma sequência ou repetição de 3 ou mais."""
+    marcados = set()
+    for tabela in _TABELAS_COORDENADAS:
+        # Caracteres fora do ASCII recebem códigos distantes entre si: só a repetição conta como padrão
+        codigos = [tabela[o] if o < 0x80 else 0x100 + 3 * o for o in map(ord, senha)]
+        inicio, passo_anterior = 0, None
+        for i in range(1, len(codigos)):
+            passo = codigos[i] - codigos[i - 1]
+            if passo not in (-1, 0, 1):
+                passo_anterior = None
+                continue
+            if passo == passo_anterior:
+                marcados.update(range(inicio + 1, i + 1))
+            else:
+                inicio, passo_anterior = i - 1, passo
+    return len(marcados)
+
+
+def _aplicar_penalidade(bits, senha):
+    """Caracteres em padrão valem 1 bit em vez dos bits de um caractere sorteado."""
+    em_padrao = _caracteres_em_padrao(senha)
+    if not em_padrao:
+        return bits
+    bits_por_caractere = bits / len(senha)
+    return bits - em_padrao * max(0.0, bits_por_caractere - 1)
+
+
+@metricas.cronometrar("forca.uma")
+def entropia(senha):
+    """Entropia estimada de uma senha, em bits, já com as penalidades de padrão."""
+    if not senha:
+        return 0.0
+    # A quebra de linha é preservada pelas tabelas (separa as senhas no lote); aqui ela conta como controle
+    dados = senha.encode('utf-8', 'surrogatepass').replace(b"\n", b"\0")
+    presencas = [len(dados.translate(None, apagar)) > 0 for apagar in _APAGAR_CLASSES]
+    bits = len(senha) * math.log2(_tamanho_conjunto(presencas))
+    return _aplicar_penalidade(bits, senha)
+
+
+def avaliar(senha):
+    """Rótulo de força de uma senha."""
+    return classificar(entropia(senha))
+
+
+def _candidatos_padrao(dados):
+    """
+    Índices das linhas de `dados` (senhas separadas por b"\\n") que podem conter um padrão.
+    As diferenças entre códigos vizinhos são calculadas para o buffer inteiro com uma única
+    subtração de inteiros grandes: com códigos < 0x80, (X | 0x8080...) - Y dá, em cada byte,
+    0x80 + x - y sem empréstimo entre bytes.
+    """
+    candidatos = set()
+    if len(dados) < 3:
+        return candidatos
+    mascara = int.from_bytes(b"\x80" * (len(dados) - 1), 'big')
+    for tabela in _TABELAS_COORDENADAS:
+        codigos = dados.translate(tabela)
+        diferencas = ((int.from_bytes(codigos[1:], 'big') | mascara) - int.from_bytes(codigos[:-1], 'big')).to_bytes(len(dados) - 1, 'big')
+        linha, posicao_anterior = 0, 0
+        for achado in _PASSOS_REPETIDOS.finditer(diferencas):
+            posicao = achado.start()
+            linha += dados.count(b"\n", posicao_anterior, posicao)
+            posicao_anterior = posicao
+            candidatos.add(linha)
+    return candidatos
+
+
+@metricas.cronometrar("forca.lote", itens=len)
+def entropias_lote(senhas, alfabeto=None):
+    """
+    Entropia em bits de cada senha, calculada para o lote inteiro de uma vez.
+    Se `alfabeto` for informado (senhas sorteadas pelo motor), ele define o conjunto de
+    caracteres de todas as senhas e a análise das classes é pulada.
+    """
+    if not senhas:
+        return []
+    dados = "\n".join(senhas).encode('utf-8', 'surrogatepass')
+    if dados.count(b"\n") != len(senhas) - 1:
+        # Alguma senha contém quebra de linha: não dá para separar o buffer, avalia uma a uma
+        return [entropia(senha) for senha in senhas]
+
+    if alfabeto is not None:
+        bits_por_caractere = math.log2(len(set(alfabeto))) if alfabeto else 0.0
+        memoria = {}
+        bits = [memoria[n] if n in memoria else memoria.setdefault(n, n * bits_por_caractere) for n in map(len, senhas)]
+    else:
+        presencas = [map(len, dados.translate(None, apagar).split(b"\n")) for apagar in _APAGAR_CLASSES]
+        memoria = {}
+        bits = []
+        for chave in zip(map(len, senhas), *presencas):
+            valor = memoria.get(chave)
+            if valor is None:
+                valor = memoria[chave] = chave[0] * math.log2(_tamanho_conjunto(chave[1:])) if chave[0] else 0.0
+            bits.append(valor)
+
+    for i in _candidatos_padrao(dados):
+        if senhas[i]:
+            bits[i] = _aplicar_penalidade(bits[i], senhas[i])
+    return bits
+
+
+def avaliar_lote(senhas, alfabeto=None):
+    """Rótulos de força de um lote de senhas (ver `entropias_lote`)."""
+    memoria = {}
+    return [memoria[b] if b in memoria else memoria.setdefault(b, classificar(b)) for b in entropias_lote(senhas, alfabeto)]
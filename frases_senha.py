@@ -0,0 +1,246 @@
+# %% Frases-Senha no Estilo Diceware (lista de palavras indexada e mapeada em memória)
+#
+# Uma frase-senha é formada por palavras sorteadas de forma uniforme (CSPRNG do sistema) de uma
+# lista grande, como a lista longa da EFF ou qualquer arquivo com uma palavra por linha. Linhas no
+# formato diceware ("11111<tab>palavra") também são aceitas: o número de dados é ignorado.
+#
+# Cada lista é compilada uma única vez em um índice (.idx, ao lado dela):
+#   cabeçalho (32 bytes): MAGIA(5) | versão(1) | reservado(2) | palavras(8) |
+#                         tamanho da origem(8) | data de modificação da origem em ns(8)
+#   offsets:              (palavras + 1) × 4 bytes, início de cada palavra nos dados
+#   dados:                as palavras em UTF-8, sem separadores
+# O índice é aberto com mmap: abrir uma lista de centenas de milhares de palavras não lê o arquivo
+# inteiro, e sortear uma palavra toca só duas posições dele. Se a origem mudar (tamanho ou data),
+# o índice é recompilado.
+#
+# As palavras são guardadas em minúsculas e sem repetições (a capitalização é uma opção da frase),
+# para que cada sorteio valha exatamente log2(palavras na lista) bits.
+
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import forca_senhas
+import metricas
+import motor_senhas
+
+MAGIA = b"GSPAL"
+VERSAO = 1
+EXTENSAO = ".idx"
+PALAVRAS_PADRAO = 6
+SEPARADORES_PADRAO = "-"
+CAPITALIZACOES = ("nenhuma", "primeira", "todas", "aleatoria")
+
+_FORMATO_CABECALHO = ">5sBxxQQq"
+_TAMANHO_CABECALHO = struct.calcsize(_FORMATO_CABECALHO)
+_TAMANHO_OFFSET = 4
+
+
+def caminho_indice(origem):
+    """Caminho do índice compilado de uma lista de palavras."""
+    return origem + EXTENSAO
+
+
+def _ler_palavras(origem):
+    """Palavras da lista, em minúsculas e sem repetições, na ordem do arquivo."""
+    vistas = set()
+    palavras = []
+    with open(origem, encoding='utf-8') as f:
+        for linha in f:
+            campos = linha.split()
+            if not campos or campos[0].startswith("#"):
+                continue
+            # Formato diceware: "11111 palavra" (o número dos dados vem antes da palavra)
+            palavra = campos[-1] if len(campos) == 2 and campos[0].isdigit() else " ".join(campos)
+            palavra = palavra.lower()
+            if palavra not in vistas:
+                vistas.add(palavra)
+                palavras.append(palavra)
+    return palavras
+
+
+def compilar_lista(origem, destino=None):
+    """Compila a lista `origem` no índice `destino` (padrão: ao lado dela). Retorna o caminho do índice."""
+    destino = destino or caminho_indice(origem)
+    palavras = _ler_palavras(origem)
+    if len(palavras) < 2:
+        raise ValueError("A lista de palavras precisa ter pelo menos duas palavras diferentes.")
+    dados = [palavra.encode('utf-8') for palavra in palavras]
+    offsets = array('I', [0])
+    posicao = 0
+    for palavra in dados:
+        posicao += len(palavra)
+        offsets.append(posicao)
+    if posicao >= 1 << 32:
+        raise ValueError("A lista de palavras é grande demais (mais de 4 GB).")
+    if sys.byteorder == 'little':
+        offsets.byteswap()
+    info = os.stat(origem)
+    temporario = destino + ".parcial"
+    with open(temporario, 'wb') as f:
+        f.write(struct.pack(_FORMATO_CABECALHO, MAGIA, VERSAO, len(palavras), info.st_size, info.st_mtime_ns))
+        f.write(offsets.tobytes())
+        f.write(b"".join(dados))
+    os.replace(temporario, destino)
+    return destino
+
+
+class ListaPalavras:
+    """Lista de palavras compilada, aberta com mmap (somente leitura)."""
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.f = open(caminho, 'rb')
+        try:
+            cabecalho = self.f.read(_TAMANHO_CABECALHO)
+            if len(cabecalho) < _TAMANHO_CABECALHO:
+                raise ValueError("Índice de palavras incompleto.")
+            magia, versao, self.quantidade, self.tamanho_origem, self.data_origem = struct.unpack(_FORMATO_CABECALHO, cabecalho)
+            if magia != MAGIA:
+                raise ValueError("O arquivo não é um índice de palavras.")
+            if versao != VERSAO:
+                raise ValueError(f"Versão de índice não suportada: {versao}.")
+            self._inicio_dados = _TAMANHO_CABECALHO + (self.quantidade + 1) * _TAMANHO_OFFSET
+            if os.fstat(self.f.fileno()).st_size < self._inicio_dados:
+                raise ValueError("Índice de palavras truncado.")
+            self.mapa = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.f.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.mapa.close()
+        self.f.close()
+
+    def __len__(self):
+        return self.quantidade
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.quantidade:
+            raise IndexError("Palavra fora da lista.")
+        inicio, fim = struct.unpack_from(">II", self.mapa, _TAMANHO_CABECALHO + i * _TAMANHO_OFFSET)
+        return self.mapa[self._inicio_dados + inicio:self._inicio_dados + fim].decode('utf-8')
+
+
+def eh_indice(caminho):
+    """Indica se o arquivo é um índice compilado (e não uma lista em texto)."""
+    with open(caminho, 'rb') as f:
+        return f.read(len(MAGIA)) == MAGIA
+
+
+def abrir_lista(caminho):
+    """
+    Abre uma lista de palavras: um índice compilado, ou uma lista em texto (compilada na primeira
+    vez e recompilada se tiver mudado desde a compilação).
+    """
+    if eh_indice(caminho):
+        return ListaPalavras(caminho)
+    indice = caminho_indice(caminho)
+    if os.path.exists(indice):
+        info = os.stat(caminho)
+        try:
+            lista = ListaPalavras(indice)
+        except ValueError:
+            lista = None
+        if lista is not None:
+            if (lista.tamanho_origem, lista.data_origem) == (info.st_size, info.st_mtime_ns):
+                return lista
+            lista.fechar()
+    return ListaPalavras(compilar_lista(caminho, indice))
+
+
+def sortear_indices(limite, quantidade):
+    """`quantidade` inteiros uniformes em [0, limite), de buffers do os.urandom com amostragem por rejeição."""
+    if limite > 1 << 32:
+        raise ValueError("Limite grande demais para o sorteio em 32 bits.")
+    aceitar = (1 << 32) - (1 << 32) % limite
+    indices = []
+    while len(indices) < quantidade:
+        falta = quantidade - len(indices)
+        bruto = array('I', os.urandom(4 * (falta + falta // 8 + 8)))
+        indices.extend(x % limite for x in bruto if x < aceitar)
+    return indices[:quantidade]
+
+
+def _validar(palavras, separadores, capitalizacao, digitos):
+    """Confere as opções e retorna os separadores sem repetições (repetidos distorceriam o sorteio)."""
+    if palavras < 1:
+        raise ValueError("A frase precisa ter pelo menos uma palavra.")
+    if capitalizacao not in CAPITALIZACOES:
+        raise ValueError(f"Capitalização desconhecida: {capitalizacao}. Use uma de: {', '.join(CAPITALIZACOES)}.")
+    if digitos < 0:
+        raise ValueError("A quantidade de dígitos não pode ser negativa.")
+    return "".join(dict.fromkeys(separadores))
+
+
+def entropia_frase(tamanho_lista, palavras=PALAVRAS_PADRAO, separadores=SEPARADORES_PADRAO, capitalizacao="nenhuma", digitos=0):
+    """
+    Entropia exata, em bits, de uma frase gerada com estas opções (é a do processo de sorteio,
+    não uma estimativa sobre o texto): palavras × log2(lista), mais log2(separadores) por
+    separador, 1 bit por palavra com inicial maiúscula aleatória e, com dígitos, log2(10) por dígito
+    e log2(palavras) pela posição em que eles entram.
+    """
+    separadores = _validar(palavras, separadores, capitalizacao, digitos)
+    bits = palavras * math.log2(tamanho_lista)
+    if len(separadores) > 1:
+        bits += (palavras - 1) * math.log2(len(separadores))
+    if capitalizacao == "aleatoria":
+        bits += palavras
+    if digitos:
+        bits += digitos * math.log2(10) + math.log2(palavras)
+    return bits
+
+
+@metricas.cronometrar("geracao.frases", itens=len)
+def gerar_frases(lista, n, palavras=PALAVRAS_PADRAO, separadores=SEPARADORES_PADRAO, capitalizacao="nenhuma", digitos=0):
+    """
+    Gera `n` frases de uma só vez. Com mais de um caractere em `separadores`, cada separador é
+    sorteado entre eles; `digitos` acrescenta um número aleatório com essa quantidade de dígitos
+    logo depois de uma palavra sorteada.
+    """
+    separadores = _validar(palavras, separadores, capitalizacao, digitos)
+    if n <= 0:
+        return []
+    indices = sortear_indices(len(lista), n * palavras)
+    sorteadas = [lista[i] for i in indices]
+    if capitalizacao == "primeira":
+        sorteadas = [p[:1].upper() + p[1:] for p in sorteadas]
+    elif capitalizacao == "todas":
+        sorteadas = [p.upper() for p in sorteadas]
+    elif capitalizacao == "aleatoria":
+        moedas = motor_senhas.amostrar_caracteres("01", len(sorteadas))
+        sorteadas = [p[:1].upper() + p[1:] if m == "1" else p for p, m in zip(sorteadas, moedas)]
+    if digitos:
+        numeros = motor_senhas.amostrar_caracteres(motor_senhas.NUMEROS, n * digitos)
+        posicoes = sortear_indices(palavras, n)
+        for k, posicao in enumerate(posicoes):
+            sorteadas[k * palavras + posicao] += numeros[k * digitos:(k + 1) * digitos]
+
+    if len(separadores) <= 1:
+        return [separadores.join(sorteadas[k:k + palavras]) for k in range(0, n * palavras, palavras)]
+    escolhidos = motor_senhas.amostrar_caracteres(separadores, n * (palavras - 1)) if palavras > 1 else ""
+    frases = []
+    for k in range(n):
+        partes = sorteadas[k * palavras:(k + 1) * palavras]
+        seps = escolhidos[k * (palavras - 1):(k + 1) * (palavras - 1)]
+        frases.append("".join(p + s for p, s in zip(partes, seps)) + partes[-1])
+    return frases
+
+
+def gerar_frase(lista, **opcoes):
+    """Gera uma única frase-senha (atalho para gerar_frases com n=1)."""
+    return gerar_frases(lista, 1, **opcoes)[0]
+
+
+def avaliar_frase(lista, **opcoes):
+    """(bits, rótulo de força) das frases geradas com estas opções."""
+    bits = entropia_frase(len(lista), **opcoes)
+    return bits, forca_senhas.classificar(bits)
@@ -0,0 +1,596 @@
+# %% Gerador de Senhas - Linha de Comando (sem interface gráfica)
+#
+# Usa a mesma lógica de geração e criptografia da interface, mas nunca importa tkinter/ttkthemes.
+# Os módulos de criptografia só são importados pelos subcomandos que precisam deles, para que
+# `generate` e `batch` em texto simples iniciem em dezenas de milissegundos.
+#
+# Exemplos:
+#   python gerador_cli.py generate --nivel A -n 5
+#   python gerador_cli.py generate --tamanho 24 --sem-especiais --formato ndjson
+#   python gerador_cli.py generate --tamanho 16 --minimo numeros=2 --minimo especiais=2 --sem-ambiguos --maximo-seguidos 1
+#   python gerador_cli.py batch -n 10000000 --saida senhas.cofre --chave nova.key
+#   python gerador_cli.py encrypt dump.sql dump.sql.enc --nova-chave dump.key
+#   python gerador_cli.py decrypt dump.sql.enc - --chave dump.key > dump.sql
+#   python gerador_cli.py encrypt notas.txt notas.txt.enc --senha-mestra   (sem arquivo .key)
+#   python gerador_cli.py encrypt app.log app.log.enc --chave dump.key --comprimir auto
+#   python gerador_cli.py vault list senhas.cofre --chave nova.key --inicio 100 --fim 200
+#   python gerador_cli.py breach build pwned-passwords-sha1.txt palavras.txt --saida vazadas.vaz
+#   python gerador_cli.py generate -n 1000 --vazadas vazadas.vaz
+#   python gerador_cli.py passphrase --lista eff_large_wordlist.txt --palavras 6 -n 5 --entropia
+#   python gerador_cli.py batch -n 1000000 --registro emitidas.unicos --chave emitidas.key > lote.txt
+#   python gerador_cli.py rotate senhas.cofre backups/*.enc --chave-antiga velha.key --nova-chave nova.key
+#   python gerador_cli.py verify backups/ --chave-ao-lado --trabalhadores 8 > auditoria.txt
+#   python gerador_cli.py serve --socket /run/gerador/senhas.sock --modo 660 --taxa 5000
+
+import argparse
+import json
+import os
+import sys
+
+import motor_senhas
+
+VARIAVEL_SENHA_MESTRA = "GERADOR_SENHA_MESTRA"
+VARIAVEL_SENHA_MESTRA_NOVA = "GERADOR_SENHA_MESTRA_NOVA"  # senha de destino do 'rotate'
+
+def _escrever_senhas(senhas, formato, saida):
+    if formato == "ndjson":
+        saida.write("".join(json.dumps({"senha": s}) + "\n" for s in senhas))
+    else:
+        saida.write("\n".join(senhas) + "\n")
+
+
+def _opcoes_geracao(args):
+    """Converte os argumentos de geração em (tamanho, usar_letras, usar_numeros, usar_especiais)."""
+    c = motor_senhas.NIVEIS[args.nivel]
+    return (args.tamanho or c["tamanho"], not args.sem_letras,
+            c["num"] and not args.sem_numeros, c["esp"] and not args.sem_especiais)
+
+
+def _ler_limites(pares, opcao):
+    """Converte ["numeros=2", ...] em {"numeros": 2}."""
+    limites = {}
+    for par in pares or []:
+        nome, _, valor = par.partition("=")
+        try:
+            limites[nome.strip()] = int(valor)
+        except ValueError:
+            raise ValueError(f"Use {opcao} CLASSE=N (ex.: {opcao} numeros=2), não '{par}'.") from None
+    return limites
+
+
+def _politica(args, tamanho, letras, numeros, especiais, sem_repeticao=False):
+    """PoliticaSenha pedida pelas opções de política, ou None se nenhuma foi usada (sorteio simples do motor)."""
+    if not (args.exigir_classes or args.minimo or args.maximo or args.excluir or args.sem_ambiguos or args.maximo_seguidos):
+        return None
+    import politicas_senha
+    classes = (["minusculas", "maiusculas"] if letras else []) + (["numeros"] if numeros else []) + (["especiais"] if especiais else [])
+    minimos = {nome: 1 for nome in classes} if args.exigir_classes else {}
+    minimos.update(_ler_limites(args.minimo, "--minimo"))
+    return politicas_senha.PoliticaSenha(tamanho, classes, minimos, _ler_limites(args.maximo, "--maximo"), args.excluir or "",
+                                         args.sem_ambiguos, sem_repeticao, args.maximo_seguidos)
+
+
+def _ler_chave(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+
+def _nova_chave(caminho):
+    """Gera uma chave Fernet nova e a grava em `caminho` (sem sobrescrever arquivos existentes)."""
+    from cryptography.fernet import Fernet
+    chave = Fernet.generate_key()
+    with open(caminho, 'xb') as f:
+        f.write(chave)
+    return chave
+
+
+def _senha_mestra(confirmar=False, variavel=VARIAVEL_SENHA_MESTRA, rotulo="Senha mestra"):
+    """Senha mestra da variável `variavel` ou digitada no terminal (duas vezes com `confirmar`)."""
+    senha = os.environ.get(variavel)
+    if senha:
+        return senha
+    import getpass
+    senha = getpass.getpass(f"{rotulo}: ")
+    if confirmar and getpass.getpass(f"Repita a {rotulo.lower()}: ") != senha:
+        raise ValueError("As senhas digitadas não conferem.")
+    if not senha:
+        raise ValueError("A senha mestra não pode ser vazia.")
+    return senha
+
+
+def _chave_para_ler(caminho, args):
+    """Chave de um .enc/.cofre existente: pela senha mestra se o cabeçalho tiver os parâmetros, senão o --chave."""
+    import derivacao_chaves
+    parametros = derivacao_chaves.parametros_do_arquivo(caminho) if os.path.isfile(caminho) else None
+    if parametros is not None:
+        return derivacao_chaves.derivar(_senha_mestra(), parametros)
+    if not args.chave:
+        raise ValueError("Este arquivo não usa senha mestra: informe --chave.")
+    return _ler_chave(args.chave)
+
+
+def _chave_da_senha_mestra(args):
+    """(chave, parâmetros de derivação) novos a partir da senha mestra, com o custo calibrado nesta máquina."""
+    import derivacao_chaves
+    parametros = derivacao_chaves.novos_parametros(args.kdf, args.tempo_kdf)
+    return derivacao_chaves.derivar(_senha_mestra(confirmar=True), parametros), parametros
+
+
+def _abrir_filtro(args):
+    """Índice de senhas vazadas pedido com --vazadas, ou None."""
+    if not args.vazadas:
+        return None
+    import vazamentos
+    return vazamentos.FiltroVazamentos(args.vazadas)
+
+
+def _abrir_registro(args, chave, caminho, reaproveitar):
+    """
+    Registro de unicidade do lote: o arquivo `caminho` (carregado se `reaproveitar` e ele existir,
+    senão criado) ou, sem caminho, um registro só desta execução.
+    """
+    import unicidade
+    opcoes = {"capacidade": args.quantidade, "probabilistico": args.quantidade > unicidade.LIMITE_EXATO}
+    if args.taxa_registro is not None:
+        opcoes = {"capacidade": max(args.quantidade, unicidade.CAPACIDADE_PADRAO) if caminho else args.quantidade,
+                  "probabilistico": True, "taxa_falsos_positivos": args.taxa_registro}
+    if caminho is None:
+        return unicidade.RegistroUnicidade(**opcoes)
+    if reaproveitar and os.path.exists(caminho):
+        return unicidade.RegistroUnicidade.carregar(caminho, chave)
+    return unicidade.RegistroUnicidade.criar(chave, **opcoes)
+
+
+def comando_generate(args):
+    import lote_senhas
+    import unicidade
+    tamanho, letras, numeros, especiais = _opcoes_geracao(args)
+    filtro = _abrir_filtro(args)
+    try:
+        # Nenhuma senha se repete na mesma execução
+        rejeitar = lote_senhas.combinar_rejeicoes(filtro, unicidade.RegistroUnicidade(capacidade=args.quantidade))
+        politica = _politica(args, tamanho, letras, numeros, especiais, args.sem_repeticao)
+        if politica is not None:
+            senhas = motor_senhas.substituir_rejeitadas_com(politica.gerar(args.quantidade), rejeitar, politica.gerar)
+        else:
+            senhas = motor_senhas.generate_many(args.quantidade, tamanho, letras, numeros, especiais, args.sem_repeticao)
+            motor_senhas.substituir_rejeitadas(senhas, rejeitar, tamanho, letras, numeros, especiais, args.sem_repeticao)
+    finally:
+        if filtro is not None: filtro.fechar()
+    _escrever_senhas(senhas, args.formato, sys.stdout)
+    return 0
+
+
+def comando_batch(args):
+    import lote_senhas
+    import unicidade
+    tamanho, letras, numeros, especiais = _opcoes_geracao(args)
+    politica = _politica(args, tamanho, letras, numeros, especiais)
+    para_arquivo = args.saida and args.saida != "-"
+    cofre = para_arquivo and args.saida.endswith(".cofre")
+    if cofre and not args.chave:
+        print("Erro: gravar um cofre exige --chave (arquivo .key novo ou existente).", file=sys.stderr)
+        return 2
+    if args.registro and not args.chave:
+        print("Erro: --registro exige --chave (arquivo .key novo ou existente).", file=sys.stderr)
+        return 2
+    chave = None
+    if cofre or args.registro:
+        chave = _ler_chave(args.chave) if os.path.exists(args.chave) else _nova_chave(args.chave)
+    # Um cofre novo ganha o seu registro (.unicos); --registro reaproveita o de execuções anteriores
+    caminho_registro = args.registro or (unicidade.caminho_registro(args.saida) if cofre else None)
+    registro = _abrir_registro(args, chave, caminho_registro, reaproveitar=bool(args.registro))
+    filtro = _abrir_filtro(args)
+    try:
+        if para_arquivo:
+            progresso = None
+            if args.progresso:
+                progresso = lambda feitos, total: print(f"{feitos}/{total}", file=sys.stderr)
+            lote_senhas.gerar_para_arquivo(args.saida, args.quantidade, tamanho, letras, numeros, especiais, chave=chave if cofre else None,
+                                           progresso=progresso, filtro=filtro, registro=registro, politica=politica)
+        else:
+            rejeitar = lote_senhas.combinar_rejeicoes(filtro, registro)
+            if politica is not None:
+                sortear = politica.gerar
+                lotes = (sortear(min(args.tamanho_lote, args.quantidade - i)) for i in range(0, args.quantidade, args.tamanho_lote))
+            else:
+                sortear = lambda n: motor_senhas.generate_many(n, tamanho, letras, numeros, especiais)
+                lotes = motor_senhas.gerar_em_lotes(args.quantidade, tamanho, letras, numeros, especiais, tamanho_lote=args.tamanho_lote)
+            for lote in lotes:
+                motor_senhas.substituir_rejeitadas_com(lote, rejeitar, sortear)
+                _escrever_senhas(lote, args.formato, sys.stdout)
+        if caminho_registro is not None:
+            registro.salvar(caminho_registro)
+        return 0
+    finally:
+        if filtro is not None: filtro.fechar()
+
+
+def comando_passphrase(args):
+    import frases_senha
+    import lote_senhas
+    import unicidade
+    opcoes = {"palavras": args.palavras, "separadores": args.separadores, "capitalizacao": args.capitalizacao, "digitos": args.digitos}
+    filtro = _abrir_filtro(args)
+    try:
+        with frases_senha.abrir_lista(args.lista) as lista:
+            bits, forca = frases_senha.avaliar_frase(lista, **opcoes)
+            if args.entropia:
+                print(f"{bits:.1f} bits ({forca}); lista com {len(lista)} palavras", file=sys.stderr)
+            sortear = lambda quantidade: frases_senha.gerar_frases(lista, quantidade, **opcoes)
+            # Nenhuma frase se repete na mesma execução
+            rejeitar = lote_senhas.combinar_rejeicoes(filtro, unicidade.RegistroUnicidade(capacidade=args.quantidade))
+            for inicio in range(0, args.quantidade, 4096):
+                frases = sortear(min(4096, args.quantidade - inicio))
+                _escrever_senhas(motor_senhas.substituir_rejeitadas_com(frases, rejeitar, sortear), args.formato, sys.stdout)
+    finally:
+        if filtro is not None: filtro.fechar()
+    return 0
+
+
+def comando_encrypt(args):
+    import cripto_arquivos
+    derivacao = chave_criada = None
+    if args.senha_mestra:
+        chave, derivacao = _chave_da_senha_mestra(args)
+    elif args.nova_chave:
+        chave, chave_criada = _nova_chave(args.nova_chave), args.nova_chave
+    elif args.chave:
+        chave = _ler_chave(args.chave)
+    else:
+        print("Erro: informe --chave (existente), --nova-chave (a ser criada) ou --senha-mestra.", file=sys.stderr)
+        return 2
+    entrada = None
+    try:
+        entrada = sys.stdin.buffer if args.entrada == "-" else open(args.entrada, 'rb')
+        cifrar = lambda saida: cripto_arquivos.criptografar_fluxo(entrada, saida, chave, trabalhadores=args.trabalhadores,
+                                                                  derivacao=derivacao, compressao=args.comprimir)
+        if args.saida == "-":
+            cifrar(sys.stdout.buffer)
+        else:
+            # Um temporário (.parcial) só substitui a saída no fim: uma falha ou um Ctrl+C não deixa um .enc pela metade
+            cripto_arquivos._escrever_com_temporario(args.saida, cifrar)
+    except BaseException:
+        if chave_criada: os.remove(chave_criada)  # nenhum arquivo usa a chave recém-criada
+        raise
+    finally:
+        if entrada not in (None, sys.stdin.buffer): entrada.close()
+    return 0
+
+
+def comando_decrypt(args):
+    import cripto_arquivos
+    chave = _chave_para_ler(args.entrada, args)
+    if args.saida == "-":
+        cripto_arquivos.descriptografar_arquivo_para_fluxo(args.entrada, sys.stdout.buffer, chave, trabalhadores=args.trabalhadores)
+    else:
+        cripto_arquivos.descriptografar_arquivo(args.entrada, args.saida, chave, trabalhadores=args.trabalhadores)
+    return 0
+
+
+def _sem_repetidas(senhas, registro, contagem, tamanho_lote=4096):
+    """As senhas que `registro` ainda não tinha (e que passam a constar nele); as descartadas somam em contagem["ignoradas"]."""
+    lote = []
+    for senha in senhas:
+        lote.append(senha)
+        if len(lote) >= tamanho_lote:
+            yield from _descartar_repetidas(lote, registro, contagem)
+            lote = []
+    yield from _descartar_repetidas(lote, registro, contagem)
+
+
+def _descartar_repetidas(lote, registro, contagem):
+    repetidas = registro.reservar_lote(lote)
+    contagem["ignoradas"] += sum(repetidas)
+    return [senha for senha, repetida in zip(lote, repetidas) if not repetida]
+
+
+def comando_vault(args):
+    import cofre_senhas
+    if args.acao == "append":
+        derivacao = None
+        if os.path.exists(args.arquivo) and os.path.getsize(args.arquivo) > 0:
+            chave = _chave_para_ler(args.arquivo, args)
+        elif args.senha_mestra:
+            chave, derivacao = _chave_da_senha_mestra(args)
+        elif args.chave:
+            chave = _ler_chave(args.chave) if os.path.exists(args.chave) else _nova_chave(args.chave)
+        else:
+            print("Erro: um cofre novo exige --chave (arquivo .key novo ou existente) ou --senha-mestra.", file=sys.stderr)
+            return 2
+        senhas = (s for s in (linha.rstrip("\r\n") for linha in sys.stdin) if s)
+        # Com um registro de unicidade ao lado do cofre, senhas já emitidas não entram de novo
+        import unicidade
+        caminho_unicos = unicidade.caminho_registro(args.arquivo)
+        registro = unicidade.RegistroUnicidade.carregar(caminho_unicos, chave) if os.path.exists(caminho_unicos) else None
+        contagem = {"ignoradas": 0}
+        if registro is not None:
+            senhas = _sem_repetidas(senhas, registro, contagem)
+        total = cofre_senhas.salvar_cofre(args.arquivo, chave, senhas, anexar=True, derivacao=derivacao)
+        if registro is not None:
+            registro.salvar(caminho_unicos)
+            if contagem["ignoradas"]:
+                print(f"{contagem['ignoradas']} senha(s) já registrada(s) em {caminho_unicos} foram ignoradas", file=sys.stderr)
+        print(total, file=sys.stderr)
+        return 0
+
+    import fontes_senhas
+    fonte = fontes_senhas.abrir_fonte(args.arquivo, _chave_para_ler(args.arquivo, args))
+    try:
+        while not fonte.indexar():
+            pass
+        if args.acao == "count":
+            print(len(fonte))
+            return 0
+        if args.acao == "get":
+            print(fonte[args.indice])
+            return 0
+        inicio = args.inicio
+        fim = len(fonte) if args.fim is None else min(args.fim, len(fonte))
+        passo = 4096
+        for i in range(inicio, fim, passo):
+            _escrever_senhas(fonte.obter_intervalo(i, min(i + passo, fim)), args.formato, sys.stdout)
+    finally:
+        fonte.fechar()
+    return 0
+
+
+def comando_rotate(args):
+    import derivacao_chaves
+    import rotacao_chaves
+    derivacao = senha_nova = None
+    if args.senha_mestra:
+        senha_nova = _senha_mestra(confirmar=True, variavel=VARIAVEL_SENHA_MESTRA_NOVA, rotulo="Nova senha mestra")
+        derivacao = derivacao_chaves.novos_parametros(args.kdf, args.tempo_kdf)
+        chave_nova = derivacao_chaves.derivar(senha_nova, derivacao)
+    elif args.nova_chave:
+        chave_nova = _nova_chave(args.nova_chave)
+    elif args.chave:
+        chave_nova = _ler_chave(args.chave)
+    else:
+        print("Erro: informe a chave de destino: --chave (existente), --nova-chave (a ser criada) ou --senha-mestra.", file=sys.stderr)
+        return 2
+    # A senha antiga só é pedida se algum arquivo usar senha mestra
+    senha_antiga = None
+    if any(os.path.isfile(caminho) and derivacao_chaves.parametros_do_arquivo(caminho) is not None for caminho in args.arquivos):
+        senha_antiga = _senha_mestra(rotulo="Senha mestra atual")
+    chaves = rotacao_chaves.ChavesRotacao(chave_nova, [_ler_chave(caminho) for caminho in args.chave_antiga], derivacao,
+                                          senha_antiga, senha_nova)
+    progresso = None
+    if args.progresso:
+        progresso = lambda feitos, total: print(f"{feitos}/{total}", file=sys.stderr)
+    resumo = rotacao_chaves.rotacionar_arquivos(args.arquivos, chaves, args.trabalhadores, progresso=progresso)
+    for entrada in resumo.pop("arquivos"):
+        if entrada["status"] == "erro":
+            print(f"{entrada['caminho']}: {entrada['erro']}", file=sys.stderr)
+        elif entrada.get("unicos_fora_do_cofre"):
+            print(f"{entrada['caminho']}: o registro de unicidade foi refeito com as senhas do cofre; "
+                  f"{entrada['unicos_fora_do_cofre']} senhas registradas fora dele deixaram de constar", file=sys.stderr)
+    print(json.dumps(resumo), file=sys.stderr)
+    return 1 if resumo["erros"] else 0
+
+
+def comando_verify(args):
+    import derivacao_chaves
+    import verificacao_arquivos
+    caminhos = list(verificacao_arquivos.expandir_caminhos(args.arquivos))
+    # A senha só é pedida se algum arquivo usar senha mestra
+    senha = None
+    if any(os.path.isfile(caminho) and derivacao_chaves.parametros_do_arquivo(caminho) is not None for caminho in caminhos):
+        senha = _senha_mestra()
+    chaves = verificacao_arquivos.ChavesVerificacao([_ler_chave(caminho) for caminho in args.chave], senha, args.chave_ao_lado)
+
+    def ao_verificar(entrada):
+        if args.formato == "ndjson":
+            print(json.dumps(entrada, ensure_ascii=False))
+        else:
+            print("\t".join([entrada["status"], entrada["caminho"]] + ([entrada["erro"]] if "erro" in entrada else [])))
+    resumo = verificacao_arquivos.verificar_arquivos(caminhos, chaves, args.trabalhadores, ao_verificar=ao_verificar)
+    del resumo["arquivos"]
+    print(json.dumps(resumo), file=sys.stderr)
+    return 0 if resumo["ok"] == resumo["total"] else 1
+
+
+def comando_serve(args):
+    import servico_senhas
+    try:
+        modo = int(args.modo, 8)
+    except ValueError:
+        raise ValueError(f"Use --modo em octal (ex.: 660), não '{args.modo}'.") from None
+    opcoes = {nome: valor for nome, valor in (("taxa", args.taxa), ("rajada", args.rajada)) if valor is not None}
+    filtro = _abrir_filtro(args)
+    try:
+        estatisticas = servico_senhas.servir(args.socket, args.porta, modo, rejeitar=filtro.verificar_lote if filtro else None,
+                                             ao_iniciar=lambda endereco: print(f"Atendendo em {endereco}", file=sys.stderr, flush=True),
+                                             **opcoes)
+    finally:
+        if filtro is not None: filtro.fechar()
+    print(json.dumps(estatisticas), file=sys.stderr)
+    return 0
+
+
+def comando_breach(args):
+    import vazamentos
+    if args.acao == "build":
+        if not args.saida:
+            print("Erro: 'build' exige --saida (arquivo do índice).", file=sys.stderr)
+            return 2
+        progresso = None
+        if args.progresso:
+            progresso = lambda lidos, total: print(f"{lidos}/{total} bytes", file=sys.stderr)
+        resumo = vazamentos.construir_filtro(args.arquivos, args.saida, args.taxa, progresso=progresso)
+        print(json.dumps(resumo), file=sys.stderr)
+        return 0
+
+    # check: o primeiro arquivo é o índice; as senhas vêm da entrada padrão, uma por linha
+    with vazamentos.FiltroVazamentos(args.arquivos[0]) as filtro:
+        encontradas = 0
+        lote = []
+        for linha in sys.stdin:
+            lote.append(linha.rstrip("\r\n"))
+            if len(lote) >= 4096:
+                encontradas += _conferir_lote(filtro, lote, args)
+                lote = []
+        encontradas += _conferir_lote(filtro, lote, args)
+    return 1 if encontradas else 0
+
+
+def _conferir_lote(filtro, senhas, args):
+    vazadas = filtro.verificar_lote(senhas)
+    if args.formato == "ndjson":
+        sys.stdout.write("".join(json.dumps({"senha": s, "vazada": v}) + "\n" for s, v in zip(senhas, vazadas)))
+    else:
+        sys.stdout.write("".join(s + "\n" for s, v in zip(senhas, vazadas) if v))
+    return sum(vazadas)
+
+
+def _adicionar_opcoes_geracao(parser):
+    parser.add_argument("--nivel", choices=sorted(motor_senhas.NIVEIS), default="A", help="nível predefinido (padrão: A)")
+    parser.add_argument("--tamanho", type=int, help="tamanho da senha (padrão: o do nível)")
+    parser.add_argument("--sem-letras", action="store_true")
+    parser.add_argument("--sem-numeros", action="store_true")
+    parser.add_argument("--sem-especiais", action="store_true")
+    parser.add_argument("--formato", choices=["linhas", "ndjson"], default="linhas")
+    parser.add_argument("--vazadas", help="índice de senhas vazadas (.vaz); senhas presentes nele são sorteadas de novo")
+    politica = parser.add_argument_group("política (sorteio uniforme entre as senhas que a cumprem)")
+    politica.add_argument("--exigir-classes", action="store_true", help="pelo menos um caractere de cada classe usada")
+    politica.add_argument("--minimo", action="append", metavar="CLASSE=N",
+                          help="mínimo de caracteres de uma classe (minusculas, maiusculas, numeros, especiais); repetível")
+    politica.add_argument("--maximo", action="append", metavar="CLASSE=N", help="máximo de caracteres de uma classe; repetível")
+    politica.add_argument("--excluir", metavar="CARACTERES", help="caracteres que nunca aparecem")
+    politica.add_argument("--sem-ambiguos", action="store_true", help="exclui caracteres fáceis de confundir (0 O o 1 l I | ` ' \")")
+    politica.add_argument("--maximo-seguidos", type=int, help="maior sequência do mesmo caractere (ex.: 1 proíbe 'aa')")
+
+
+def _adicionar_opcoes_senha_mestra(parser, variavel=VARIAVEL_SENHA_MESTRA):
+    parser.add_argument("--senha-mestra", action="store_true",
+                        help=f"deriva a chave de uma senha mestra (digitada ou da variável {variavel}) em vez de um .key")
+    parser.add_argument("--kdf", choices=["scrypt", "argon2id"], default="scrypt", help="função de derivação (padrão: scrypt)")
+    parser.add_argument("--tempo-kdf", type=float, default=0.5, help="segundos por derivação na calibração do custo (padrão: 0.5)")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="gerador_cli", description="Gerador de senhas e criptografia de arquivos, sem interface gráfica.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("generate", help="gera senhas e escreve na saída padrão")
+    _adicionar_opcoes_geracao(p)
+    p.add_argument("-n", "--quantidade", type=int, default=1)
+    p.add_argument("--sem-repeticao", action="store_true")
+    p.set_defaults(funcao=comando_generate)
+
+    p = sub.add_parser("batch", help="gera lotes grandes em fluxo (stdout, .txt ou .cofre)")
+    _adicionar_opcoes_geracao(p)
+    p.add_argument("-n", "--quantidade", type=int, required=True)
+    p.add_argument("--saida", help="arquivo de saída (.cofre grava criptografado); padrão: saída padrão")
+    p.add_argument("--chave", help="arquivo .key do cofre e/ou do registro (criado se não existir)")
+    p.add_argument("--registro", help="registro de senhas já emitidas (.unicos), atualizado a cada lote; nenhuma senha dele se repete")
+    p.add_argument("--taxa-registro", type=float, help="usa um registro aproximado (filtro de Bloom) com esta taxa de falsos positivos")
+    p.add_argument("--tamanho-lote", type=int, default=50_000)
+    p.add_argument("--progresso", action="store_true", help="mostra o progresso na saída de erro")
+    p.set_defaults(funcao=comando_batch)
+
+    p = sub.add_parser("passphrase", help="gera frases-senha (diceware) a partir de uma lista de palavras")
+    p.add_argument("--lista", required=True, help="lista de palavras (uma por linha ou diceware), compilada em um índice .idx na primeira vez")
+    p.add_argument("-n", "--quantidade", type=int, default=1)
+    p.add_argument("--palavras", type=int, default=6)
+    p.add_argument("--separadores", default="-", help="caracteres separadores; com vários, cada um é sorteado entre eles (padrão: -)")
+    p.add_argument("--capitalizacao", choices=["nenhuma", "primeira", "todas", "aleatoria"], default="nenhuma")
+    p.add_argument("--digitos", type=int, default=0, help="dígitos aleatórios acrescentados a uma palavra sorteada")
+    p.add_argument("--entropia", action="store_true", help="mostra a entropia e a força na saída de erro")
+    p.add_argument("--formato", choices=["linhas", "ndjson"], default="linhas")
+    p.add_argument("--vazadas", help="índice de senhas vazadas (.vaz); frases presentes nele são sorteadas de novo")
+    p.set_defaults(funcao=comando_passphrase)
+
+    p = sub.add_parser("encrypt", help="criptografa um arquivo no formato em blocos")
+    p.add_argument("entrada", help="arquivo de entrada ('-' para a entrada padrão)")
+    p.add_argument("saida", help="arquivo .enc de saída ('-' para a saída padrão)")
+    p.add_argument("--chave", help="arquivo .key existente")
+    p.add_argument("--nova-chave", help="cria uma chave nova neste caminho")
+    _adicionar_opcoes_senha_mestra(p)
+    p.add_argument("--trabalhadores", type=int, default=1)
+    p.add_argument("--comprimir", choices=["auto", "zlib", "zstd", "nenhuma"], default="nenhuma",
+                   help="comprime antes de cifrar (auto: zstd se instalado, senão zlib); conteúdo já comprimido é detectado e passa direto")
+    p.set_defaults(funcao=comando_encrypt)
+
+    p = sub.add_parser("decrypt", help="descriptografa um .enc (formato em blocos ou legado)")
+    p.add_argument("entrada")
+    p.add_argument("saida", help="arquivo de saída ('-' para a saída padrão)")
+    p.add_argument("--chave", help="arquivo .key (dispensado se o arquivo usa senha mestra)")
+    p.add_argument("--trabalhadores", type=int, default=1)
+    p.set_defaults(funcao=comando_decrypt)
+
+    p = sub.add_parser("vault", help="lê ou anexa senhas em um cofre (.cofre ou .txt antigo)")
+    p.add_argument("acao", choices=["list", "count", "get", "append"])
+    p.add_argument("arquivo")
+    p.add_argument("--chave", help="arquivo .key (dispensado se o cofre usa senha mestra; criado por 'append' se não existir)")
+    _adicionar_opcoes_senha_mestra(p)
+    p.add_argument("--inicio", type=int, default=0)
+    p.add_argument("--fim", type=int)
+    p.add_argument("--indice", type=int, default=0, help="registro lido por 'get'")
+    p.add_argument("--formato", choices=["linhas", "ndjson"], default="linhas")
+    p.set_defaults(funcao=comando_vault)
+
+    p = sub.add_parser("breach", help="cria ou consulta um índice offline de senhas vazadas")
+    p.add_argument("acao", choices=["build", "check"])
+    p.add_argument("arquivos", nargs="+", help="build: dumps SHA-1 (HIBP) e/ou listas de palavras; check: o índice .vaz")
+    p.add_argument("--saida", help="índice criado por 'build'")
+    p.add_argument("--taxa", type=float, default=0.001, help="taxa de falsos positivos do índice (padrão: 0.001)")
+    p.add_argument("--progresso", action="store_true", help="mostra o progresso na saída de erro")
+    p.add_argument("--formato", choices=["linhas", "ndjson"], default="linhas", help="check: 'linhas' lista só as vazadas")
+    p.set_defaults(funcao=comando_breach)
+
+    p = sub.add_parser("rotate", help="troca a chave de cofres e .enc no lugar, sem gravar o conteúdo em claro")
+    p.add_argument("arquivos", nargs="+", help="arquivos .enc, .cofre ou .txt (formato antigo)")
+    p.add_argument("--chave-antiga", action="append", default=[], metavar="KEY",
+                   help="arquivo .key atual; repetível (em cada arquivo vale a que o abrir). Arquivos com senha mestra pedem a senha atual")
+    p.add_argument("--chave", help="arquivo .key de destino, existente")
+    p.add_argument("--nova-chave", help="cria a chave de destino neste caminho")
+    _adicionar_opcoes_senha_mestra(p, VARIAVEL_SENHA_MESTRA_NOVA)
+    p.add_argument("--trabalhadores", type=int, default=os.cpu_count() or 1, help="arquivos recifrados ao mesmo tempo")
+    p.add_argument("--progresso", action="store_true", help="mostra o progresso na saída de erro")
+    p.set_defaults(funcao=comando_rotate)
+
+    p = sub.add_parser("verify", help="confere chave e integridade de .enc e cofres, sem gravar nada em claro")
+    p.add_argument("arquivos", nargs="+", help="arquivos ou pastas (verifica os .enc e .cofre dentro delas)")
+    p.add_argument("--chave", action="append", default=[], help="arquivo .key; repetível (em cada arquivo vale a que o abrir)")
+    p.add_argument("--chave-ao-lado", action="store_true", help="tenta também o .key com o nome de cada arquivo (dump.sql.enc -> dump.sql.key)")
+    p.add_argument("--trabalhadores", type=int, default=os.cpu_count() or 1, help="arquivos conferidos ao mesmo tempo")
+    p.add_argument("--formato", choices=["linhas", "ndjson"], default="linhas", help="linhas: resultado, caminho e erro separados por tabulação")
+    p.set_defaults(funcao=comando_verify)
+
+    p = sub.add_parser("serve", help="serviço local de geração para outros processos (pedidos e respostas em NDJSON)")
+    destino = p.add_mutually_exclusive_group(required=True)
+    destino.add_argument("--socket", help="caminho do socket Unix")
+    destino.add_argument("--porta", type=int, help="porta TCP em 127.0.0.1 (0: uma livre)")
+    p.add_argument("--modo", default="600", help="permissões do socket Unix, em octal (padrão: 600, só o dono)")
+    p.add_argument("--taxa", type=float, help="senhas por segundo por cliente (padrão: 20000; 0 desliga o limite)")
+    p.add_argument("--rajada", type=int, help="senhas que um cliente pode pedir de uma vez acima da taxa (padrão: o maior entre a taxa e 10000)")
+    p.add_argument("--vazadas", help="índice de senhas vazadas (.vaz); senhas presentes nele são sorteadas de novo")
+    p.set_defaults(funcao=comando_serve)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    try:
+        return args.funcao(args)
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: `| head`); encerra sem traceback
+        sys.stderr.close()
+        return 0
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        if type(e).__name__ == "InvalidToken":
+            print("Erro: falha ao descriptografar. Verifique se a chave corresponde ao arquivo.", file=sys.stderr)
+            return 1
+        raise
+
+
+if __name__ == "__main__":
+    sys.exit(main())
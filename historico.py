@@ -0,0 +1,198 @@
+# %% Histórico de Senhas da Sessão (arena de bytes que pode ser apagada)
+#
+# Em vez de uma lista de dicionários com uma `str` por senha, o histórico guarda:
+#   arena:    todas as senhas em UTF-8, uma após a outra, em um único bytearray
+#   offsets:  array('Q') com o início de cada senha (e o fim da última)
+#   códigos:  bytearray com um byte por senha: índice da força em forca_senhas.ROTULOS,
+#             com o bit 0x80 marcando senhas presentes no índice de vazadas
+# Cada senha custa os seus bytes mais 9 bytes de controle, contra algumas centenas de bytes da
+# lista de dicionários. Como a arena é mutável, `limpar()` sobrescreve as senhas com zeros. A arena
+# cresce por cópia explícita (e a antiga é zerada), para que o realocador do Python não deixe
+# cópias para trás. É o melhor esforço possível: as `str` entregues a quem lê o histórico (e as que
+# foram passadas para ele) são imutáveis e continuam na memória até o coletor liberá-las.
+#
+# O acesso por índice devolve o mesmo dicionário de antes ({"senha", "forca", "vazada"}), então
+# o resto do programa lê o histórico como lia a lista. `procurar` acha as senhas que contêm um
+# trecho percorrendo a arena com uma expressão regular, sem criar uma `str` por senha.
+
+import re
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+import forca_senhas
+
+CAPACIDADE_INICIAL = 4096           # bytes da arena antes do primeiro crescimento
+VAZADA = 0x80
+_CODIGOS = {rotulo: codigo for codigo, rotulo in enumerate(forca_senhas.ROTULOS)}
+
+
+def _codigo(forca, vazada):
+    if forca not in _CODIGOS:
+        raise ValueError(f"Força desconhecida: {forca}.")
+    return _CODIGOS[forca] | (VAZADA if vazada else 0)
+
+
+def _senha_em(offsets, posicao, primeira, total):
+    """Índice da senha que contém o byte `posicao` da arena, procurando a partir de `primeira` (perto dela primeiro)."""
+    i = bisect_right(offsets, posicao, primeira, min(total, primeira + 64)) - 1
+    if offsets[i + 1] <= posicao:
+        i = bisect_right(offsets, posicao, i, total) - 1
+    return i
+
+
+def _item(senha, codigo):
+    return {"senha": senha, "forca": forca_senhas.ROTULOS[codigo & ~VAZADA], "vazada": bool(codigo & VAZADA)}
+
+
+class HistoricoSenhas:
+    """Senhas geradas na sessão, com a força e a marca de vazada de cada uma."""
+    def __init__(self):
+        self._arena = bytearray(CAPACIDADE_INICIAL)
+        self._offsets = array('Q', [0])
+        self._codigos = bytearray()
+        self.geracao = 0  # muda sempre que senhas já guardadas são apagadas ou alteradas
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def _reservar(self, tamanho):
+        """Garante espaço para mais `tamanho` bytes, copiando para uma arena maior e zerando a antiga."""
+        usado = self._offsets[-1]
+        if usado + tamanho <= len(self._arena):
+            return
+        nova = bytearray(max(2 * len(self._arena), usado + tamanho))
+        nova[:usado] = memoryview(self._arena)[:usado]
+        self._arena[:] = bytes(len(self._arena))
+        self._arena = nova
+
+    # --- Inserção ---
+    def adicionar(self, senha, forca, vazada=False):
+        codigo = _codigo(forca, vazada)
+        dados = senha.encode('utf-8')
+        self._reservar(len(dados))
+        inicio = self._offsets[-1]
+        self._arena[inicio:inicio + len(dados)] = dados
+        self._offsets.append(inicio + len(dados))
+        self._codigos.append(codigo)
+
+    def adicionar_lote(self, senhas, forcas, vazadas=None):
+        """Adiciona várias senhas de uma vez (uma única codificação e uma única cópia para a arena)."""
+        codigos = bytes(map(_codigo, forcas, vazadas if vazadas is not None else [False] * len(senhas)))
+        if len(codigos) != len(senhas):
+            raise ValueError("O lote precisa de uma força para cada senha.")
+        texto = "".join(senhas)
+        dados = texto.encode('utf-8')
+        # Só ASCII (o caso comum): o tamanho em bytes de cada senha é o seu número de caracteres
+        tamanhos = map(len, senhas) if len(dados) == len(texto) else (len(senha.encode('utf-8')) for senha in senhas)
+        self._reservar(len(dados))
+        inicio = self._offsets[-1]
+        self._arena[inicio:inicio + len(dados)] = dados
+        fins = accumulate(tamanhos, initial=inicio)
+        next(fins)  # `initial` repete o fim atual, que já está na lista
+        self._offsets.extend(fins)
+        self._codigos += codigos
+
+    # --- Leitura ---
+    def _indice(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Índice fora do histórico.")
+        return i
+
+    def senha(self, i):
+        i = self._indice(i)
+        return str(memoryview(self._arena)[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def forca(self, i):
+        return forca_senhas.ROTULOS[self._codigos[self._indice(i)] & ~VAZADA]
+
+    def vazada(self, i):
+        return bool(self._codigos[self._indice(i)] & VAZADA)
+
+    def __getitem__(self, i):
+        """Dicionário {"senha", "forca", "vazada"} da posição `i`, ou uma lista deles para uma fatia."""
+        if isinstance(i, slice):
+            inicio, fim, passo = i.indices(len(self))
+            if passo != 1:
+                return [self[j] for j in range(inicio, fim, passo)]
+            return list(map(_item, self.senhas(inicio, fim), self._codigos[inicio:fim]))
+        i = self._indice(i)
+        return _item(self.senha(i), self._codigos[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def senhas(self, inicio=0, fim=None):
+        """Lista das senhas de `inicio` a `fim` (decodifica o trecho da arena de uma vez)."""
+        inicio, fim, _ = slice(inicio, fim).indices(len(self))
+        if inicio >= fim:
+            return []
+        base = self._offsets[inicio]
+        texto = str(memoryview(self._arena)[base:self._offsets[fim]], 'utf-8')
+        if len(texto) != self._offsets[fim] - base:
+            return [self.senha(i) for i in range(inicio, fim)]  # há caracteres fora do ASCII
+        limites = [offset - base for offset in self._offsets[inicio:fim + 1]]
+        return list(map(texto.__getitem__, map(slice, limites, limites[1:])))
+
+    def codigos(self, inicio=0, fim=None):
+        """Cópia dos códigos (força | VAZADA) das senhas de `inicio` a `fim`."""
+        return bytes(self._codigos[inicio:fim])
+
+    def procurar(self, trecho, inicio=0):
+        """
+        Posições (a partir de `inicio`, em ordem) das senhas que contêm `trecho`, diferenciando
+        maiúsculas. Cada ocorrência é localizada pelos offsets; uma que atravessa o fim de uma senha
+        não conta, e depois de um acerto a busca pula para a senha seguinte.
+        """
+        dados = trecho.encode('utf-8')
+        padrao = re.compile(re.escape(dados))
+        arena, offsets, total = self._arena, self._offsets, len(self)
+        fim = offsets[-1]
+        posicao = offsets[min(inicio, total)]
+        encontradas = array('I')
+        i = min(inicio, total)
+        if len(dados) == 1:
+            # Um byte: muitas ocorrências, e nenhuma atravessa o fim de uma senha; finditer evita
+            # uma chamada de search por acerto, e as ocorrências na mesma senha são puladas
+            limite = posicao
+            for ocorrencia in padrao.finditer(arena, posicao, fim):
+                inicio_ocorrencia = ocorrencia.start()
+                if inicio_ocorrencia < limite:
+                    continue
+                i = _senha_em(offsets, inicio_ocorrencia, i, total)
+                encontradas.append(i)
+                limite = offsets[i + 1]
+            return encontradas
+        while (ocorrencia := padrao.search(arena, posicao, fim)) is not None:
+            i = _senha_em(offsets, ocorrencia.start(), i, total)
+            if ocorrencia.end() <= offsets[i + 1]:
+                encontradas.append(i)
+                i += 1
+                posicao = offsets[i]
+            else:
+                posicao = ocorrencia.start() + 1
+        return encontradas
+
+    # --- Alteração ---
+    def marcar_vazadas(self, vazadas):
+        """Atualiza a marca de vazada de todas as senhas (lista de booleanos na ordem do histórico)."""
+        if len(vazadas) != len(self):
+            raise ValueError("A lista de vazadas precisa ter uma entrada por senha.")
+        for i, vazada in enumerate(vazadas):
+            self._codigos[i] = self._codigos[i] & ~VAZADA | (VAZADA if vazada else 0)
+        self.geracao += 1
+
+    def limpar(self):
+        """Apaga o histórico, sobrescrevendo com zeros as senhas guardadas na arena."""
+        self._arena[:] = bytes(len(self._arena))
+        self._arena = bytearray(CAPACIDADE_INICIAL)
+        self._offsets = array('Q', [0])
+        self._codigos = bytearray()
+        self.geracao += 1
+
+    def memoria(self):
+        """Bytes reservados pelo histórico (arena + offsets + códigos)."""
+        return len(self._arena) + self._offsets.itemsize * len(self._offsets) + len(self._codigos)
@@ -0,0 +1,149 @@
+# %% Lista Virtualizada para Tkinter
+#
+# Um Listbox comum precisa receber todos os itens; com centenas de milhares de linhas isso
+# trava a interface. A ListaVirtual mantém no Listbox apenas as linhas visíveis e pede o
+# conteúdo a uma função `obter_linhas(inicio, fim)`, que pode decifrar ou montar as linhas
+# sob demanda. A barra de rolagem representa o total de linhas, não as que estão no widget.
+
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+import metricas
+
+
+class ListaVirtual(ttk.Frame):
+    """
+    Lista que renderiza apenas a janela visível.
+    - `obter_linhas(inicio, fim)` retorna textos ou tuplas (texto, cor) para as linhas [inicio, fim).
+    - `ao_renderizar(inicio, fim)`, se definido, é chamado depois de cada renderização (ex.: pré-carga).
+    """
+    def __init__(self, master, obter_linhas=None, total=0, **opcoes_listbox):
+        super().__init__(master)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.listbox = tk.Listbox(self, activestyle="none", exportselection=False, **opcoes_listbox)
+        self.listbox.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(self, command=self._rolar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.obter_linhas = obter_linhas or (lambda inicio, fim: [])
+        self.ao_renderizar = None
+        self.total = total
+        self.topo = 0
+        self.selecionado = None
+        self._altura_linha = None
+
+        self.listbox.bind("<Configure>", lambda e: self.renderizar())
+        self.listbox.bind("<<ListboxSelect>>", self._ao_selecionar)
+        self.listbox.bind("<MouseWheel>", lambda e: self._rolar("scroll", -1 if e.delta > 0 else 1, "units", passo=3))
+        self.listbox.bind("<Button-4>", lambda e: self._rolar("scroll", -1, "units", passo=3))
+        self.listbox.bind("<Button-5>", lambda e: self._rolar("scroll", 1, "units", passo=3))
+        self.listbox.bind("<Up>", lambda e: self._mover_selecao(-1))
+        self.listbox.bind("<Down>", lambda e: self._mover_selecao(1))
+        self.listbox.bind("<Prior>", lambda e: self._mover_selecao(-self.linhas_visiveis()))
+        self.listbox.bind("<Next>", lambda e: self._mover_selecao(self.linhas_visiveis()))
+        self.listbox.bind("<Home>", lambda e: self._mover_selecao(-self.total))
+        self.listbox.bind("<End>", lambda e: self._mover_selecao(self.total))
+
+    # --- Geometria ---
+    def linhas_visiveis(self):
+        if self._altura_linha is None:
+            fonte = tkfont.Font(font=self.listbox.cget("font"))
+            self._altura_linha = fonte.metrics("linespace") + 2 * int(self.listbox.cget("selectborderwidth"))
+        altura = self.listbox.winfo_height() - 2 * (int(self.listbox.cget("borderwidth")) + int(self.listbox.cget("highlightthickness")))
+        return max(1, altura // max(1, self._altura_linha))
+
+    def _limitar_topo(self, topo):
+        return max(0, min(topo, self.total - self.linhas_visiveis()))
+
+    # --- API pública ---
+    def definir_fonte(self, obter_linhas, total):
+        """Troca a origem dos dados e volta para o topo."""
+        self.obter_linhas = obter_linhas
+        self.total = total
+        self.topo = 0
+        self.selecionado = None
+        self.renderizar()
+
+    def definir_total(self, total, rolar_para_fim=False):
+        """Atualiza o total de linhas (ex.: quando a fonte cresce) sem perder a posição."""
+        self.total = total
+        if self.selecionado is not None and self.selecionado >= total:
+            self.selecionado = None
+        if rolar_para_fim:
+            self.topo = self._limitar_topo(total)
+        else:
+            self.topo = self._limitar_topo(self.topo)
+        self.renderizar()
+
+    def limpar(self):
+        self.definir_fonte(lambda inicio, fim: [], 0)
+
+    def indice_selecionado(self):
+        """Índice absoluto da linha selecionada, ou None."""
+        return self.selecionado
+
+    def ver(self, indice):
+        """Rola a lista para deixar a linha `indice` visível."""
+        visiveis = self.linhas_visiveis()
+        if indice < self.topo:
+            self.topo = self._limitar_topo(indice)
+        elif indice >= self.topo + visiveis:
+            self.topo = self._limitar_topo(indice - visiveis + 1)
+        self.renderizar()
+
+    def renderizar(self):
+        """Redesenha apenas as linhas visíveis."""
+        with metricas.medir("interface.renderizar_lista") as medicao:
+            medicao.itens = self._renderizar()
+
+    def _renderizar(self):
+        visiveis = self.linhas_visiveis()
+        self.topo = self._limitar_topo(self.topo)
+        fim = min(self.total, self.topo + visiveis)
+        linhas = self.obter_linhas(self.topo, fim) if fim > self.topo else []
+
+        self.listbox.delete(0, tk.END)
+        textos = [linha[0] if isinstance(linha, tuple) else linha for linha in linhas]
+        if textos:
+            self.listbox.insert(tk.END, *textos)
+        for i, linha in enumerate(linhas):
+            if isinstance(linha, tuple) and linha[1]:
+                self.listbox.itemconfig(i, {'fg': linha[1]})
+        if self.selecionado is not None and self.topo <= self.selecionado < fim:
+            self.listbox.selection_set(self.selecionado - self.topo)
+
+        if self.total:
+            self.scrollbar.set(self.topo / self.total, fim / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+        if self.ao_renderizar:
+            self.ao_renderizar(self.topo, fim)
+        return len(linhas)
+
+    # --- Eventos ---
+    def _rolar(self, acao, quantidade=0, unidade="units", passo=1):
+        if acao == "moveto":
+            self.topo = int(float(quantidade) * self.total)
+        elif acao == "scroll":
+            tamanho = self.linhas_visiveis() if unidade == "pages" else passo
+            self.topo += int(quantidade) * tamanho
+        self.topo = self._limitar_topo(self.topo)
+        self.renderizar()
+        return "break"
+
+    def _ao_selecionar(self, event=None):
+        selecao = self.listbox.curselection()
+        if selecao:
+            self.selecionado = self.topo + selecao[0]
+
+    def _mover_selecao(self, deslocamento):
+        if not self.total:
+            return "break"
+        atual = self.selecionado if self.selecionado is not None else self.topo - (1 if deslocamento > 0 else 0)
+        self.selecionado = max(0, min(self.total - 1, atual + deslocamento))
+        self.ver(self.selecionado)
+        self.listbox.event_generate("<<ListboxSelect>>")
+        return "break"
@@ -0,0 +1,219 @@
+# %% Criptografia em Lote de Diretórios (com manifesto retomável)
+#
+# Percorre uma árvore de diretórios e criptografa cada arquivo com a mesma chave Fernet do lote,
+# no formato em blocos de `cripto_arquivos`. O progresso vai para um manifesto JSON Lines
+# (uma linha por arquivo processado, com status e digests SHA-256), gravado de forma incremental.
+# Ao repetir o comando sobre o mesmo destino, os arquivos marcados como "ok" (e que não mudaram
+# desde então) são pulados.
+#
+# Com uma senha mestra, todos os arquivos do lote usam os mesmos parâmetros de derivação (gravados
+# no cabeçalho de cada .enc e no manifesto): derivar a chave uma vez basta para o lote inteiro,
+# tanto para retomá-lo quanto para descriptografá-lo depois.
+
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import cripto_arquivos
+import metricas
+
+NOME_MANIFESTO = "manifesto.jsonl"
+EXTENSAO = ".enc"
+LIMITE_ARQUIVO_PEQUENO = 256 << 10   # arquivos menores que isso são agrupados numa mesma tarefa
+TAMANHO_MAXIMO_GRUPO = 8 << 20       # soma máxima de bytes por grupo de arquivos pequenos
+ARQUIVOS_POR_GRUPO = 256
+
+
+class _LeitorComHash:
+    """Envolve um arquivo aberto para leitura, calculando o SHA-256 do que é lido."""
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.sha256()
+
+    def read(self, tamanho=-1):
+        dados = self.f.read(tamanho)
+        self.hash.update(dados)
+        return dados
+
+
+class _EscritorComHash:
+    """Envolve um arquivo aberto para escrita, calculando o SHA-256 do que é escrito."""
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.sha256()
+
+    def write(self, dados):
+        self.hash.update(dados)
+        return self.f.write(dados)
+
+
+def impressao_digital_chave(chave):
+    """Identificador curto da chave, gravado no manifesto para evitar retomar um lote com a chave errada."""
+    if isinstance(chave, str):
+        chave = chave.encode()
+    return hashlib.sha256(b"gerador-senhas/lote/" + chave.strip()).hexdigest()[:16]
+
+
+def carregar_manifesto(caminho_manifesto):
+    """Lê o manifesto e retorna (cabeçalho, {caminho relativo: última entrada})."""
+    cabecalho = None
+    entradas = {}
+    if not os.path.exists(caminho_manifesto):
+        return cabecalho, entradas
+    with open(caminho_manifesto, 'r', encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                # Última linha pode ter ficado incompleta se o processo foi interrompido
+                continue
+            if registro.get("tipo") == "cabecalho":
+                cabecalho = registro
+            else:
+                entradas[registro["caminho"]] = registro
+    return cabecalho, entradas
+
+
+def derivacao_do_manifesto(caminho_manifesto):
+    """Parâmetros de derivação (senha mestra) de um lote existente, ou None se ele usa um arquivo .key."""
+    import derivacao_chaves
+    cabecalho, _ = carregar_manifesto(caminho_manifesto)
+    if not cabecalho or not cabecalho.get("derivacao"):
+        return None
+    return derivacao_chaves.desserializar(bytes.fromhex(cabecalho["derivacao"]))
+
+
+def listar_arquivos(origem, ignorar=None):
+    """
+    Percorre `origem` e retorna (caminho relativo, tamanho, mtime_ns) de cada arquivo regular.
+    O diretório `ignorar` (por exemplo, o destino dentro da origem) não é percorrido.
+    """
+    arquivos = []
+    pendentes = [origem]
+    while pendentes:
+        pasta = pendentes.pop()
+        with os.scandir(pasta) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    if ignorar is None or os.path.abspath(entrada.path) != ignorar:
+                        pendentes.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    info = entrada.stat(follow_symlinks=False)
+                    relativo = os.path.relpath(entrada.path, origem).replace(os.sep, "/")
+                    arquivos.append((relativo, info.st_size, info.st_mtime_ns))
+    arquivos.sort()
+    return arquivos
+
+
+def agrupar(arquivos, limite_pequeno=LIMITE_ARQUIVO_PEQUENO, tamanho_grupo=TAMANHO_MAXIMO_GRUPO):
+    """Agrupa arquivos pequenos em tarefas maiores; arquivos grandes viram tarefas individuais."""
+    grupo = []
+    soma = 0
+    for arquivo in arquivos:
+        tamanho = arquivo[1]
+        if tamanho >= limite_pequeno:
+            yield [arquivo]
+            continue
+        grupo.append(arquivo)
+        soma += tamanho
+        if soma >= tamanho_grupo or len(grupo) >= ARQUIVOS_POR_GRUPO:
+            yield grupo
+            grupo, soma = [], 0
+    if grupo:
+        yield grupo
+
+
+def _criptografar_um(origem, destino, chave, derivacao, compressao, relativo, tamanho, mtime_ns):
+    """Criptografa um arquivo do lote e retorna a entrada do manifesto correspondente."""
+    caminho_origem = os.path.join(origem, *relativo.split("/"))
+    caminho_destino = os.path.join(destino, *relativo.split("/")) + EXTENSAO
+    temporario = caminho_destino + ".parcial"
+    entrada = {"caminho": relativo, "tamanho": tamanho, "mtime_ns": mtime_ns}
+    try:
+        os.makedirs(os.path.dirname(caminho_destino), exist_ok=True)
+        with open(caminho_origem, 'rb') as f_origem, open(temporario, 'wb') as f_destino:
+            leitor = _LeitorComHash(f_origem)
+            escritor = _EscritorComHash(f_destino)
+            cripto_arquivos.criptografar_fluxo(leitor, escritor, chave, derivacao=derivacao, compressao=compressao)
+        os.replace(temporario, caminho_destino)
+        entrada.update(status="ok", sha256=leitor.hash.hexdigest(), sha256_cifrado=escritor.hash.hexdigest())
+    except Exception as e:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        entrada.update(status="erro", erro=str(e))
+    return entrada
+
+
+def _criptografar_grupo(origem, destino, chave, derivacao, compressao, grupo):
+    return [_criptografar_um(origem, destino, chave, derivacao, compressao, *arquivo) for arquivo in grupo]
+
+
+@metricas.cronometrar("cripto.pasta", itens=lambda resumo: resumo["ok"])
+def criptografar_diretorio(origem, destino, chave, caminho_manifesto=None, trabalhadores=cripto_arquivos.TRABALHADORES_PADRAO,
+                           progresso=None, cancelar=None, derivacao=None, compressao=None):
+    """
+    Criptografa todos os arquivos de `origem` em `destino` (mesma estrutura, extensão .enc).
+    `progresso(feitos, total)` é chamado a cada grupo concluído; `cancelar()` retornando True
+    interrompe o lote depois dos grupos em andamento (o manifesto permite retomar).
+    `derivacao`: parâmetros de derivacao_chaves, quando `chave` vem de uma senha mestra (ao
+    retomar, use os do manifesto: `derivacao_do_manifesto`). `compressao`: como em
+    cripto_arquivos.criptografar_fluxo (decidida arquivo a arquivo pela amostra de entropia).
+    Retorna um resumo com as contagens de arquivos ok, pulados e com erro.
+    """
+    origem = os.path.abspath(origem)
+    destino = os.path.abspath(destino)
+    caminho_manifesto = caminho_manifesto or os.path.join(destino, NOME_MANIFESTO)
+    digital = impressao_digital_chave(chave)
+
+    cabecalho, anteriores = carregar_manifesto(caminho_manifesto)
+    if cabecalho and cabecalho.get("chave") != digital:
+        raise ValueError("O manifesto existente foi criado com outra chave. Use a mesma chave para retomar o lote.")
+
+    arquivos = listar_arquivos(origem, ignorar=destino)
+    pendentes = []
+    pulados = 0
+    for relativo, tamanho, mtime_ns in arquivos:
+        anterior = anteriores.get(relativo)
+        if (anterior and anterior.get("status") == "ok" and anterior.get("tamanho") == tamanho
+                and anterior.get("mtime_ns") == mtime_ns):
+            pulados += 1
+        else:
+            pendentes.append((relativo, tamanho, mtime_ns))
+
+    os.makedirs(destino, exist_ok=True)
+    resumo = {"total": len(arquivos), "ok": 0, "pulados": pulados, "erros": 0, "cancelado": False}
+    feitos = pulados
+    with open(caminho_manifesto, 'a', encoding='utf-8') as manifesto, ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as pool:
+        if cabecalho is None:
+            registro = {"tipo": "cabecalho", "versao": 1, "origem": origem, "chave": digital}
+            if derivacao is not None:
+                import derivacao_chaves
+                registro["derivacao"] = derivacao_chaves.serializar(derivacao).hex()
+            manifesto.write(json.dumps(registro) + "\n")
+        grupos = agrupar(pendentes)
+        em_andamento = set()
+        while True:
+            # Mantém no máximo 2 × trabalhadores grupos em andamento
+            while len(em_andamento) < 2 * max(1, trabalhadores) and not resumo["cancelado"]:
+                if cancelar and cancelar():
+                    resumo["cancelado"] = True
+                    break
+                grupo = next(grupos, None)
+                if grupo is None:
+                    break
+                em_andamento.add(pool.submit(_criptografar_grupo, origem, destino, chave, derivacao, compressao, grupo))
+            if not em_andamento:
+                break
+            concluidos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                for entrada in futuro.result():
+                    manifesto.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+                    resumo["ok" if entrada["status"] == "ok" else "erros"] += 1
+                    feitos += 1
+            manifesto.flush()
+            if progresso: progresso(feitos, len(arquivos))
+    return resumo
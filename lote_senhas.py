@@ -0,0 +1,87 @@
+# %% Geração de Senhas em Lote Direto para Arquivo
+#
+# Gera milhões de senhas em blocos de tamanho fixo e grava cada bloco assim que fica pronto,
+# em texto simples (uma por linha) ou em um cofre criptografado. A memória não cresce com a
+# quantidade pedida. O arquivo é escrito em um temporário e só substitui o destino no final,
+# então um cancelamento não deixa um arquivo pela metade.
+
+import os
+
+import metricas
+import motor_senhas
+
+TAMANHO_LOTE = 50_000
+
+
+def _abrir_saida(caminho_temporario, chave, derivacao=None):
+    """Retorna (escrever_lote, fechar) para o formato escolhido: cofre se houver chave, texto caso contrário."""
+    if chave is not None:
+        import cofre_senhas
+        escritor = cofre_senhas.EscritorCofre(caminho_temporario, chave, derivacao=derivacao)
+        return escritor.adicionar_varios, escritor.fechar
+    f = open(caminho_temporario, 'w', encoding='utf-8', newline='\n')
+    return (lambda senhas: f.write("\n".join(senhas) + "\n")), f.close
+
+
+def combinar_rejeicoes(filtro=None, registro=None):
+    """
+    Função `rejeitar(senhas)` para motor_senhas.substituir_rejeitadas: recusa as senhas do índice
+    de vazadas (`filtro`) e as repetidas segundo o registro de unicidade (`registro`), que passa
+    a conter as aceitas. Retorna None se não houver nada a conferir.
+    """
+    if filtro is None and registro is None:
+        return None
+
+    def rejeitar(senhas):
+        if filtro is None:
+            return registro.reservar_lote(senhas)
+        vazadas = filtro.verificar_lote(senhas)
+        if registro is None:
+            return vazadas
+        return [vazada or repetida for vazada, repetida in zip(vazadas, registro.reservar_lote(senhas))]
+    return rejeitar
+
+
+@metricas.cronometrar("lote.gerar_arquivo", itens=int)
+def gerar_para_arquivo(caminho, quantidade, tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True,
+                       chave=None, tamanho_lote=TAMANHO_LOTE, progresso=None, cancelar=None, filtro=None, registro=None, derivacao=None,
+                       politica=None):
+    """
+    Gera `quantidade` senhas direto em `caminho`. Com `chave` (Fernet), grava um cofre
+    criptografado; sem ela, texto simples. `progresso(feitos, total)` é chamado a cada lote e
+    `cancelar()` retornando True interrompe a geração (o arquivo parcial é removido).
+    Com `filtro` (vazamentos.FiltroVazamentos), senhas presentes no índice de vazadas são sorteadas
+    de novo; com `registro` (unicidade.RegistroUnicidade), também as que já foram emitidas antes.
+    `derivacao`: parâmetros de derivacao_chaves do cofre, quando `chave` vem de uma senha mestra.
+    `politica` (politicas_senha.PoliticaSenha): sorteia as senhas por ela, em vez das opções de
+    caracteres (o tamanho passa a ser o da política).
+    Retorna o número de senhas gravadas, ou None se cancelado.
+    """
+    rejeitar = combinar_rejeicoes(filtro, registro)
+    temporario = caminho + ".parcial"
+    escrever_lote, fechar = _abrir_saida(temporario, chave, derivacao)
+    if politica is not None:
+        sortear = politica.gerar
+        lotes = (sortear(min(tamanho_lote, quantidade - inicio)) for inicio in range(0, quantidade, tamanho_lote))
+    else:
+        sortear = lambda n: motor_senhas.generate_many(n, tamanho, usar_letras, usar_numeros, usar_especiais)
+        lotes = motor_senhas.gerar_em_lotes(quantidade, tamanho, usar_letras, usar_numeros, usar_especiais, tamanho_lote=tamanho_lote)
+    feitos = 0
+    concluido = False
+    try:
+        for lote in lotes:
+            if cancelar and cancelar():
+                return None
+            if rejeitar is not None:
+                motor_senhas.substituir_rejeitadas_com(lote, rejeitar, sortear)
+            escrever_lote(lote)
+            feitos += len(lote)
+            if progresso: progresso(feitos, quantidade)
+        concluido = True
+    finally:
+        fechar()
+        if concluido:
+            os.replace(temporario, caminho)
+        elif os.path.exists(temporario):
+            os.remove(temporario)
+    return feitos
@@ -0,0 +1,248 @@
+# %% Métricas de Desempenho (latência e vazão por operação)
+#
+# Camada leve de instrumentação para os caminhos críticos: geração, avaliação de força,
+# criptografia de arquivos, abertura de cofres, derivação de chaves e atualização das listas.
+# Cada operação tem um histograma de latências em faixas logarítmicas (4 por potência de 2, de
+# 1 µs a ~1 h), contadores de chamadas, bytes e itens, e as últimas AMOSTRAS_RECENTES latências
+# para os percentis "de agora" (p50/p95/p99).
+#
+# Desligadas por padrão: cada ponto instrumentado custa só a consulta a uma variável global.
+# Para ligar:
+#   GERADOR_METRICAS=1               coleta durante a execução (veja na aba de diagnóstico, Ctrl+Shift+D)
+#   GERADOR_METRICAS=perfil.json     coleta e grava o resumo em JSON ao sair do programa
+# ou `metricas.ativar()` / o botão da aba de diagnóstico.
+#
+# Também guarda os últimos avisos do programa (ícone ou tema que não carregou, configuração que
+# não pôde ser salva), sempre, para que apareçam no diagnóstico.
+
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+VARIAVEL_AMBIENTE = "GERADOR_METRICAS"
+_VARIAVEL_PROCESSO = "GERADOR_METRICAS_PROCESSO"
+FAIXAS_POR_OITAVA = 4
+MENOR_LATENCIA = 1e-6               # início da primeira faixa (1 µs)
+NUMERO_FAIXAS = 32 * FAIXAS_POR_OITAVA  # 2^32 µs ≈ 72 min; latências maiores caem na última faixa
+AMOSTRAS_RECENTES = 1024
+MAXIMO_AVISOS = 100
+
+_ativo = False
+_trava = threading.Lock()
+_operacoes = {}
+_avisos = deque(maxlen=MAXIMO_AVISOS)
+
+
+def _faixa(segundos):
+    if segundos <= MENOR_LATENCIA:
+        return 0
+    return min(NUMERO_FAIXAS - 1, int(math.log2(segundos / MENOR_LATENCIA) * FAIXAS_POR_OITAVA))
+
+
+def limite_faixa(faixa):
+    """Limite superior (em segundos) da faixa do histograma."""
+    return MENOR_LATENCIA * 2 ** ((faixa + 1) / FAIXAS_POR_OITAVA)
+
+
+class Operacao:
+    """Estatísticas de uma operação. Só é alterada com a trava do módulo."""
+    def __init__(self, nome):
+        self.nome = nome
+        self.chamadas = 0
+        self.erros = 0
+        self.tempo_total = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+        self.bytes = 0
+        self.itens = 0
+        self.histograma = array('Q', bytes(8 * NUMERO_FAIXAS))
+        self.recentes = deque(maxlen=AMOSTRAS_RECENTES)
+
+    def registrar(self, segundos, bytes_processados, itens, erro):
+        self.chamadas += 1
+        self.erros += erro
+        self.tempo_total += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        self.bytes += bytes_processados
+        self.itens += itens
+        self.histograma[_faixa(segundos)] += 1
+        self.recentes.append(segundos)
+
+    def percentil_historico(self, p):
+        """Percentil de todas as chamadas, pelo histograma (limite superior da faixa)."""
+        alvo = math.ceil(self.chamadas * p)
+        acumulado = 0
+        for faixa, quantidade in enumerate(self.histograma):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                return min(limite_faixa(faixa), self.maximo)
+        return self.maximo
+
+    def resumo(self):
+        recentes = sorted(self.recentes)
+
+        def percentil(p):
+            return recentes[min(len(recentes) - 1, int(p * len(recentes)))] if recentes else 0.0
+        return {
+            "chamadas": self.chamadas,
+            "erros": self.erros,
+            "tempo_total": self.tempo_total,
+            "media": self.tempo_total / self.chamadas if self.chamadas else 0.0,
+            "minimo": self.minimo if self.chamadas else 0.0,
+            "maximo": self.maximo,
+            "p50": percentil(0.50),
+            "p95": percentil(0.95),
+            "p99": percentil(0.99),
+            "p99_historico": self.percentil_historico(0.99),
+            "bytes": self.bytes,
+            "bytes_por_segundo": self.bytes / self.tempo_total if self.tempo_total else 0.0,
+            "itens": self.itens,
+            "itens_por_segundo": self.itens / self.tempo_total if self.tempo_total else 0.0,
+            "histograma": {f"{limite_faixa(f):.3g}": n for f, n in enumerate(self.histograma) if n},
+        }
+
+
+# --- Liga/desliga ---
+def ativo():
+    return _ativo
+
+
+def ativar():
+    global _ativo
+    _ativo = True
+
+
+def desativar():
+    global _ativo
+    _ativo = False
+
+
+def limpar():
+    with _trava:
+        _operacoes.clear()
+
+
+# --- Registro ---
+def registrar(nome, segundos, bytes_processados=0, itens=0, erro=False):
+    """Registra uma execução de `nome` (ignorado com as métricas desligadas)."""
+    if not _ativo:
+        return
+    with _trava:
+        operacao = _operacoes.get(nome)
+        if operacao is None:
+            operacao = _operacoes[nome] = Operacao(nome)
+        operacao.registrar(segundos, bytes_processados or 0, itens or 0, erro)
+
+
+class _Medicao:
+    """Contexto de `medir`: defina `bytes`/`itens` dentro do bloco quando só forem conhecidos no fim."""
+    __slots__ = ("nome", "bytes", "itens", "inicio")
+
+    def __init__(self, nome, bytes_processados, itens):
+        self.nome, self.bytes, self.itens = nome, bytes_processados, itens
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        registrar(self.nome, time.perf_counter() - self.inicio, self.bytes, self.itens, tipo is not None)
+
+
+class _MedicaoDesligada:
+    __slots__ = ("bytes", "itens")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def medir(nome, bytes_processados=0, itens=0):
+    """Contexto que cronometra o bloco: `with metricas.medir("cofre.abrir") as m: ...`."""
+    if not _ativo:
+        return _MedicaoDesligada()
+    return _Medicao(nome, bytes_processados, itens)
+
+
+def cronometrar(nome, bytes_do_resultado=False, itens=None):
+    """
+    Decorador que cronometra cada chamada da função. `bytes_do_resultado`: o retorno (um inteiro,
+    ou None) é o número de bytes processados. `itens(resultado)`: itens processados (ex.: `len`).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def cronometrada(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except BaseException:
+                registrar(nome, time.perf_counter() - inicio, erro=True)
+                raise
+            registrar(nome, time.perf_counter() - inicio,
+                      resultado if bytes_do_resultado and isinstance(resultado, int) else 0,
+                      itens(resultado) if itens and resultado is not None else 0)
+            return resultado
+        return cronometrada
+    return decorador
+
+
+# --- Avisos ---
+def avisar(origem, mensagem):
+    """Guarda um aviso (mesmo com as métricas desligadas) e o mostra no terminal, como antes."""
+    _avisos.append({"quando": time.strftime("%Y-%m-%d %H:%M:%S"), "origem": origem, "mensagem": mensagem})
+    print(f"Aviso: {mensagem}")
+
+
+def avisos():
+    return list(_avisos)
+
+
+# --- Consulta e exportação ---
+def resumo():
+    """Estatísticas de todas as operações registradas, por nome."""
+    with _trava:
+        return {nome: operacao.resumo() for nome, operacao in sorted(_operacoes.items())}
+
+
+def despejar(caminho):
+    """Grava o resumo das operações e os avisos em JSON."""
+    dados = {"gerado_em": time.strftime("%Y-%m-%d %H:%M:%S"), "ativo": _ativo, "operacoes": resumo(), "avisos": avisos()}
+    temporario = caminho + ".parcial"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def formatar_duracao(segundos):
+    """Duração legível: '850 µs', '12,3 ms', '1,25 s'."""
+    if segundos < 1e-3:
+        texto = f"{segundos * 1e6:.0f} µs"
+    elif segundos < 1:
+        texto = f"{segundos * 1e3:.1f} ms"
+    else:
+        texto = f"{segundos:.2f} s"
+    return texto.replace(".", ",")
+
+
+def _configurar_pelo_ambiente():
+    valor = os.environ.get(VARIAVEL_AMBIENTE, "").strip()
+    if not valor or valor == "0":
+        return
+    ativar()
+    # Processos trabalhadores herdam a variável; só o processo que a leu primeiro grava o arquivo
+    if valor != "1" and os.environ.setdefault(_VARIAVEL_PROCESSO, str(os.getpid())) == str(os.getpid()):
+        atexit.register(despejar, valor)
+
+
+_configurar_pelo_ambiente()
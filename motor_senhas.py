@@ -0,0 +1,139 @@
+# %% Motor de Geração de Senhas (sem interface gráfica)
+
+import os
+import secrets
+from functools import lru_cache
+
+import metricas
+
+# --- Conjuntos de caracteres ---
+LETRAS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+NUMEROS = '0123456789'
+CARACTERES_ESPECIAIS = '!@#$%^&*()_+-=[]{}|;:\'",.<>?/`~\\'
+
+# Níveis de complexidade predefinidos (os mesmos da interface)
+NIVEIS = {
+    "B": {"nome": "Básico", "tamanho": 8, "num": False, "esp": False},
+    "M": {"nome": "Médio", "tamanho": 10, "num": True, "esp": False},
+    "A": {"nome": "Avançado", "tamanho": 14, "num": True, "esp": True},
+    "D": {"nome": "Especialista", "tamanho": 20, "num": True, "esp": True},
+}
+
+# Tamanho máximo de cada leitura de os.urandom (1 MiB)
+TAMANHO_MAX_BUFFER = 1 << 20
+
+_aleatorio_seguro = secrets.SystemRandom()
+
+
+@lru_cache(maxsize=None)
+def obter_alfabeto(usar_letras=True, usar_numeros=True, usar_especiais=True):
+    """Retorna o alfabeto correspondente às opções. O resultado fica em cache por combinação."""
+    alfabeto = ""
+    if usar_letras: alfabeto += LETRAS
+    if usar_numeros: alfabeto += NUMEROS
+    if usar_especiais: alfabeto += CARACTERES_ESPECIAIS
+    return alfabeto
+
+
+@lru_cache(maxsize=None)
+def _tabela_amostragem(alfabeto):
+    """
+    Monta a tabela de tradução usada na amostragem por rejeição.
+    Cada byte aleatório b < limite é mapeado para alfabeto[b % k]; os bytes >= limite
+    são descartados, o que elimina o viés do módulo.
+    """
+    k = len(alfabeto)
+    limite = 256 - (256 % k)
+    tabela = bytes(ord(alfabeto[b % k]) if b < limite else 0 for b in range(256))
+    rejeitados = bytes(range(limite, 256))
+    return tabela, rejeitados
+
+
+def amostrar_caracteres(alfabeto, quantidade):
+    """Sorteia `quantidade` caracteres do alfabeto de forma uniforme a partir de buffers do CSPRNG do sistema."""
+    if quantidade <= 0:
+        return ""
+    if len(alfabeto) > 256 or not alfabeto.isascii():
+        # Alfabetos fora da tabela de bytes caem no sorteio caractere a caractere
+        return ''.join(secrets.choice(alfabeto) for _ in range(quantidade))
+
+    tabela, rejeitados = _tabela_amostragem(alfabeto)
+    taxa_aceitacao = (256 - len(rejeitados)) / 256
+    partes = []
+    obtidos = 0
+    while obtidos < quantidade:
+        # Pede um pouco mais que o necessário para quase sempre resolver em uma única leitura
+        pedido = int((quantidade - obtidos) / taxa_aceitacao * 1.02) + 64
+        bloco = os.urandom(min(pedido, TAMANHO_MAX_BUFFER)).translate(tabela, rejeitados)
+        partes.append(bloco)
+        obtidos += len(bloco)
+    return b''.join(partes)[:quantidade].decode('ascii')
+
+
+@metricas.cronometrar("geracao.senhas", itens=len)
+def generate_many(n, length, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False):
+    """
+    Gera `n` senhas de tamanho `length` de uma só vez.
+    Levanta ValueError se nenhum conjunto de caracteres for selecionado ou se a senha sem
+    repetição for maior que o alfabeto disponível.
+    """
+    alfabeto = obter_alfabeto(usar_letras, usar_numeros, usar_especiais)
+    if not alfabeto:
+        raise ValueError("Nenhum conjunto de caracteres selecionado.")
+    if n <= 0:
+        return []
+    if length <= 0:
+        return [""] * n
+    if sem_repeticao:
+        if length > len(alfabeto):
+            raise ValueError(f"Não é possível gerar uma senha de tamanho {length} sem repetição com os caracteres selecionados (máx: {len(alfabeto)}).")
+        return [''.join(_aleatorio_seguro.sample(alfabeto, length)) for _ in range(n)]
+
+    bruto = amostrar_caracteres(alfabeto, n * length)
+    return [bruto[i:i + length] for i in range(0, n * length, length)]
+
+
+def substituir_rejeitadas_com(senhas, rejeitar, sortear, tentativas=100):
+    """
+    Troca, na própria lista, as senhas recusadas por `rejeitar(senhas)` (lista de booleanos;
+    ex.: índice de vazadas, registro de unicidade) por outras de `sortear(quantidade)`. Só as
+    substitutas são conferidas de novo. Levanta ValueError se ainda houver recusadas depois de
+    `tentativas` rodadas.
+    """
+    pendentes = [i for i, rejeitada in enumerate(rejeitar(senhas)) if rejeitada]
+    for _ in range(tentativas):
+        if not pendentes:
+            return senhas
+        novas = sortear(len(pendentes))
+        for i, senha in zip(pendentes, novas):
+            senhas[i] = senha
+        pendentes = [i for i, rejeitada in zip(pendentes, rejeitar(novas)) if rejeitada]
+    if pendentes:
+        raise ValueError("Não foi possível gerar senhas válidas com essas opções (o conjunto de caracteres ou a lista de palavras é pequeno demais?).")
+    return senhas
+
+
+def substituir_rejeitadas(senhas, rejeitar, tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False,
+                          tentativas=100):
+    """Como `substituir_rejeitadas_com`, sorteando as substitutas com as mesmas opções de generate_many."""
+    return substituir_rejeitadas_com(senhas, rejeitar, lambda quantidade: generate_many(quantidade, tamanho, usar_letras, usar_numeros, usar_especiais, sem_repeticao),
+                                     tentativas)
+
+
+def gerar_senha(tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False):
+    """Gera uma única senha (atalho para generate_many com n=1)."""
+    return generate_many(1, tamanho, usar_letras, usar_numeros, usar_especiais, sem_repeticao)[0]
+
+
+def embaralhar(sequencia):
+    """Embaralha a lista no lugar usando o CSPRNG do sistema."""
+    _aleatorio_seguro.shuffle(sequencia)
+
+
+def gerar_em_lotes(quantidade, tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False, tamanho_lote=50_000):
+    """Gera `quantidade` senhas em listas de até `tamanho_lote`, mantendo a memória constante para lotes enormes."""
+    restantes = quantidade
+    while restantes > 0:
+        n = min(tamanho_lote, restantes)
+        yield generate_many(n, tamanho, usar_letras, usar_numeros, usar_especiais, sem_repeticao)
+        restantes -= n
@@ -0,0 +1,410 @@
+# %% Políticas de Senha (geração construtiva e uniforme, sem laços de rejeição)
+#
+# Uma política fixa o tamanho e, para cada classe de caracteres (minúsculas, maiúsculas, números,
+# especiais), um mínimo e um máximo de ocorrências; também pode excluir caracteres (ou os
+# ambíguos, como 0/O e 1/l/I), proibir caracteres repetidos e limitar quantas vezes seguidas o
+# mesmo caractere aparece.
+#
+# As senhas são sorteadas de forma exatamente uniforme entre TODAS as que satisfazem a política,
+# sem sortear e descartar: a política conta quantas senhas válidas existem (N) e cada senha sai de
+# um único inteiro uniforme em [0, N) do CSPRNG, decodificado ("unranking") de um dos jeitos:
+#   - com repetição e sem limite de seguidos: as classes só disputam posições. Há
+#     Σ C(s, k) × (tamanho da classe)^k × (senhas das outras classes nas s - k posições restantes)
+#     senhas, uma convolução classe a classe sobre o total de posições; o inteiro escolhe a
+#     contagem de cada classe, as suas posições (número combinatório) e os seus caracteres.
+#   - com limite de seguidos: programação dinâmica sobre (posições restantes, contagem de cada
+#     classe limitada ao que importa para o mínimo/máximo, classe e tamanho da sequência do último
+#     caractere). A cada posição, o inteiro é comparado com o número de senhas que começam por
+#     cada escolha, e a escolha feita vira o prefixo da próxima. Sem limite de seguidos, ela é
+#     usada no lugar da convolução quando a sua tabela é menor (mínimos pequenos, sem máximos).
+#   - sem repetição: fórmula fechada. Há tamanho! × Π C(tamanho da classe, k) senhas para as
+#     contagens k de cada classe; o inteiro escolhe as contagens, os caracteres de cada classe
+#     (número combinatório) e a permutação (Fisher-Yates em base mista).
+# O custo por senha depende só do tamanho e do número de classes, não de quão restrita é a
+# política, então a vazão não cai quando a política aperta (a rejeição cairia pela fração de
+# senhas aceitas). Como N é conhecido, a entropia informada é exata: log2(N).
+#
+# As contagens são montadas uma vez por política e os intervalos de cada estado na primeira vez
+# que um sorteio passa por ele. A convolução tem classes × (tamanho + 1) × (tamanho + 2) / 2
+# termos, seja qual for a política. A tabela com limite de seguidos tem Π (contagem guardada + 1) ×
+# (1 + classes × limite) estados por posição: milissegundos para as políticas dos níveis, mesmo com
+# 100 caracteres, mas vários máximos grandes a multiplicam. O tamanho da tabela é calculado antes
+# de montá-la, e acima de `maximo_estados` células (MAXIMO_ESTADOS: cerca de 1 s e 50 MB) a
+# política é recusada com ValueError.
+
+import math
+import secrets
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import product
+
+import metricas
+import motor_senhas
+
+CLASSES = {
+    "minusculas": motor_senhas.LETRAS[26:],
+    "maiusculas": motor_senhas.LETRAS[:26],
+    "numeros": motor_senhas.NUMEROS,
+    "especiais": motor_senhas.CARACTERES_ESPECIAIS,
+}
+AMBIGUOS = "0Oo1lI|`'\""
+MAXIMO_SEGUIDOS_NIVEIS = 2          # "aa" é aceito, "aaa" não (padrão que a avaliação de força penaliza)
+MAXIMO_ESTADOS = 1_000_000          # células (estados × posições) da tabela com limite de seguidos
+
+# Escolhas na decodificação com repetição
+_QUALQUER = 0                       # qualquer caractere da classe
+_OUTRO = 1                          # qualquer caractere da classe menos o anterior (mesma classe)
+_REPETIR = 2                        # o mesmo caractere anterior
+
+
+class PoliticaSenha:
+    """
+    Regras de geração. `classes`: nomes de CLASSES usados (padrão: todos); `minimos` e
+    `maximos`: {classe: quantidade}; `excluir`: caracteres que nunca aparecem; `sem_ambiguos`:
+    exclui AMBIGUOS; `sem_repeticao`: cada caractere no máximo uma vez; `maximo_seguidos`: maior
+    sequência do mesmo caractere. Levanta ValueError se as regras forem contraditórias, se
+    nenhuma senha as satisfizer ou se a tabela de contagens passar de `maximo_estados` células.
+    """
+    def __init__(self, tamanho, classes=None, minimos=None, maximos=None, excluir="", sem_ambiguos=False,
+                 sem_repeticao=False, maximo_seguidos=None, maximo_estados=MAXIMO_ESTADOS):
+        if tamanho < 1:
+            raise ValueError("O tamanho da senha deve ser pelo menos 1.")
+        classes = list(CLASSES) if classes is None else list(dict.fromkeys(classes))
+        minimos, maximos = dict(minimos or {}), dict(maximos or {})
+        for nome in [*classes, *minimos, *maximos]:
+            if nome not in CLASSES:
+                raise ValueError(f"Classe de caracteres desconhecida: {nome}. Use uma de: {', '.join(CLASSES)}.")
+        for nome in [*minimos, *maximos]:
+            if nome not in classes:
+                raise ValueError(f"A classe {nome} tem mínimo ou máximo, mas não foi selecionada.")
+        for nome, limite in [*minimos.items(), *maximos.items()]:
+            if type(limite) is not int or limite < 0:
+                raise ValueError(f"O mínimo e o máximo da classe {nome} devem ser inteiros não negativos, não {limite!r}.")
+        if maximo_seguidos is not None and maximo_seguidos < 1:
+            raise ValueError("O máximo de caracteres iguais seguidos deve ser pelo menos 1.")
+
+        self.tamanho = tamanho
+        self.sem_repeticao = sem_repeticao
+        self.maximo_seguidos = maximo_seguidos
+        proibidos = set(excluir) | (set(AMBIGUOS) if sem_ambiguos else set())
+        self.classes = []  # (nome, caracteres, mínimo, máximo), só as classes que podem aparecer
+        for nome in classes:
+            caracteres = "".join(c for c in CLASSES[nome] if c not in proibidos)
+            minimo = minimos.get(nome, 0)
+            maximo = min(maximos.get(nome, tamanho), tamanho, len(caracteres) if sem_repeticao else tamanho)
+            if minimo > maximo:
+                raise ValueError(f"A classe {nome} não comporta o mínimo de {minimo} caractere(s) com estas regras.")
+            if maximo > 0:
+                self.classes.append((nome, caracteres, minimo, maximo))
+        if not self.classes:
+            raise ValueError("Nenhum conjunto de caracteres selecionado.")
+        if sum(c[2] for c in self.classes) > tamanho:
+            raise ValueError(f"A soma dos mínimos passa do tamanho da senha ({tamanho}).")
+        self.alfabeto = "".join(c[1] for c in self.classes)
+
+        L = tamanho
+        self._seguidos = maximo_seguidos if maximo_seguidos is not None and maximo_seguidos < L else None
+        self._limites = [maximo if maximo < L else minimo for _, _, minimo, maximo in self.classes]
+        if sem_repeticao:
+            self._montar_sem_repeticao()
+            self._decodificar = self._decodificar_sem_repeticao
+        else:
+            # O tamanho de cada tabela é conhecido antes de montá-la; sem limite de seguidos, vale a menor
+            tabela = (math.prod(limite + 1 for limite in self._limites) * (L + 1)
+                      * (1 if self._seguidos is None else 1 + len(self.classes) * self._seguidos))
+            convolucao = len(self.classes) * (L + 1) * (L + 2) // 2
+            por_classe = self._seguidos is None and convolucao < tabela
+            celulas = convolucao if por_classe else tabela
+            if celulas > maximo_estados:
+                raise ValueError(f"Esta política exige uma tabela de {celulas} estados (limite: {maximo_estados}): reduza o "
+                                 "tamanho, os máximos das classes ou o máximo de caracteres iguais seguidos.")
+            if por_classe:
+                self._montar_por_classe()
+                self._decodificar = self._decodificar_por_classe
+            else:
+                self._montar_com_repeticao()
+                self._decodificar = self._decodificar_com_repeticao
+        if not self.total:
+            raise ValueError("Nenhuma senha satisfaz esta política.")
+        # Sem regra alguma além do alfabeto, o sorteio em massa do motor já é a distribuição certa
+        self._irrestrita = (not sem_repeticao and all(c[2] == 0 and c[3] == tamanho for c in self.classes)
+                            and self._seguidos is None)
+
+    # --- Tabelas ---
+    def _montar_com_repeticao(self):
+        """
+        Conta as senhas válidas por estado. A contagem de cada classe só é guardada até onde
+        importa: até o máximo se ele limitar (passar dele é proibido), senão até o mínimo (daí em
+        diante tanto faz). O estado de sequência é 0 (início) ou 1 + classe × r + (seguidos - 1).
+        """
+        L = self.tamanho
+        limites = self._limites
+        limitadas = [maximo < L for _, _, _, maximo in self.classes]
+        contagens = list(product(*(range(limite + 1) for limite in limites)))
+        indice = {contagem: i for i, contagem in enumerate(contagens)}
+        proxima = []  # [estado de contagem][classe] -> próximo estado, ou -1 se passar do máximo
+        for contagem in contagens:
+            seguintes = []
+            for c, limite in enumerate(limites):
+                if contagem[c] < limite:
+                    seguintes.append(indice[contagem[:c] + (contagem[c] + 1,) + contagem[c + 1:]])
+                else:
+                    seguintes.append(-1 if limitadas[c] else indice[contagem])
+            proxima.append(seguintes)
+        finais = [all(n >= c[2] for n, c in zip(contagem, self.classes)) for contagem in contagens]
+
+        r = self._seguidos
+        estados_sequencia = 1 if r is None else 1 + len(self.classes) * r
+
+        # escolhas[e]: (tipo, caracteres, próximo estado, quantos caracteres levam a ele) a partir do
+        # estado e = t × estados_sequencia + u; não dependem da posição
+        self._escolhas = escolhas = []
+        for t in range(len(contagens)):
+            for u in range(estados_sequencia):
+                lista = []
+                for c, (_, caracteres, _, _) in enumerate(self.classes):
+                    proximo = proxima[t][c]
+                    if proximo < 0:
+                        continue
+                    base = proximo * estados_sequencia
+                    if r is None:
+                        lista.append((_QUALQUER, caracteres, base, len(caracteres)))
+                    elif u and (u - 1) // r == c:
+                        seguidos = (u - 1) % r + 1
+                        if seguidos < r:
+                            lista.append((_REPETIR, caracteres, base + 1 + c * r + seguidos, 1))
+                        lista.append((_OUTRO, caracteres, base + 1 + c * r, len(caracteres) - 1))
+                    else:
+                        lista.append((_QUALQUER, caracteres, base + 1 + c * r, len(caracteres)))
+                escolhas.append(lista)
+
+        # contas[p][e]: senhas válidas com p posições restantes a partir do estado e
+        contas = [[1 if finais[t] else 0 for t in range(len(contagens)) for _ in range(estados_sequencia)]]
+        for _ in range(L):
+            anterior = contas[-1]
+            contas.append([sum(quantidade * anterior[proximo] for _, _, proximo, quantidade in lista) for lista in escolhas])
+        self._contas = contas
+        self._estados = len(escolhas)
+        self._intervalos = {}  # p × estados + e -> (fins, ações), montados na primeira visita
+        self.total = contas[L][0]  # estado inicial: nenhuma contagem, nenhum caractere anterior
+
+    def _montar_intervalos(self, p, e):
+        """
+        Divide [0, contas[p][e]) em um intervalo por escolha possível na próxima posição, para
+        decodificá-la com uma busca binária. Só os estados alcançados pelos sorteios são montados.
+        """
+        anterior = self._contas[p - 1]
+        fins, acoes = [], []
+        total = 0
+        for tipo, caracteres, proximo, quantidade in self._escolhas[e]:
+            seguinte = anterior[proximo]
+            if seguinte and quantidade:
+                acoes.append((total, seguinte, caracteres, proximo, tipo))
+                total += quantidade * seguinte
+                fins.append(total)
+        intervalos = self._intervalos[p * self._estados + e] = (fins, acoes)
+        return intervalos
+
+    def _montar_por_classe(self):
+        """
+        Sem limite de seguidos: parciais[j][s] = senhas de s posições só com as classes 0..j-1
+        = Σ C(s, k) × (tamanho da classe j-1)^k × parciais[j-1][s-k], k entre o mínimo e o máximo.
+        """
+        L = self.tamanho
+        parciais = [[1] + [0] * L]
+        for _, caracteres, minimo, maximo in self.classes:
+            anterior = parciais[-1]
+            n = len(caracteres)
+            parciais.append([sum(math.comb(s, k) * n ** k * anterior[s - k] for k in range(minimo, min(maximo, s) + 1))
+                             for s in range(L + 1)])
+        self._parciais = parciais
+        self._blocos = {}  # (classe, posições livres) -> (fins, contagens), montados na primeira visita
+        self.total = parciais[-1][L]
+
+    def _montar_blocos(self, j, s):
+        """Divide [0, parciais[j + 1][s]) em um intervalo por contagem possível da classe j nas s posições livres."""
+        _, caracteres, minimo, maximo = self.classes[j]
+        anterior = self._parciais[j]
+        n = len(caracteres)
+        fins, contagens = [], []
+        total = 0
+        for k in range(minimo, min(maximo, s) + 1):
+            bloco = math.comb(s, k) * n ** k * anterior[s - k]
+            if bloco:
+                total += bloco
+                fins.append(total)
+                contagens.append(k)
+        blocos = self._blocos[j, s] = (fins, contagens)
+        return blocos
+
+    def _montar_sem_repeticao(self):
+        """Combinações por classe: parciais[j][s] = Σ Π C(tamanho da classe, k) das classes 0..j-1 com Σ k = s."""
+        L = self.tamanho
+        parciais = [[1] + [0] * L]
+        for _, caracteres, minimo, maximo in self.classes:
+            anterior = parciais[-1]
+            parciais.append([sum(math.comb(len(caracteres), k) * anterior[s - k] for k in range(minimo, min(maximo, s) + 1))
+                             for s in range(L + 1)])
+        self._parciais = parciais
+        self.total = parciais[-1][L] * math.factorial(L)
+
+    # --- Sorteio ---
+    def _decodificar_com_repeticao(self, x):
+        intervalos, estados = self._intervalos, self._estados
+        senha = []
+        e = 0
+        ultimo = 0  # índice do último caractere na sua classe
+        for p in range(self.tamanho, 0, -1):
+            fins, acoes = intervalos.get(p * estados + e) or self._montar_intervalos(p, e)
+            inicio, seguinte, caracteres, e, tipo = acoes[bisect_right(fins, x)]
+            x -= inicio
+            if tipo == _REPETIR:
+                senha.append(caracteres[ultimo])
+                continue
+            d, x = divmod(x, seguinte)
+            if tipo == _OUTRO:
+                d += d >= ultimo  # qualquer caractere da classe menos o último
+            ultimo = d
+            senha.append(caracteres[d])
+        return "".join(senha)
+
+    def _decodificar_por_classe(self, x):
+        senha = [None] * self.tamanho
+        livres = list(range(self.tamanho))  # posições ainda sem classe, em ordem
+        for j in range(len(self.classes) - 1, 0, -1):
+            s = len(livres)
+            fins, contagens = self._blocos.get((j, s)) or self._montar_blocos(j, s)
+            i = bisect_right(fins, x)
+            if i:
+                x -= fins[i - 1]
+            k = contagens[i]
+            caracteres = self.classes[j][1]
+            n = len(caracteres)
+            escolha, x = divmod(x, self._parciais[j][s - k])
+            subconjunto, digitos = divmod(escolha, n ** k)
+            # Sistema combinatório: as k posições de número `subconjunto` entre as livres; as outras ficam
+            # para as classes seguintes. com_esta = C(posições livres depois desta, k - 1), atualizado sem math.comb.
+            restantes = []
+            com_esta = math.comb(s - 1, k - 1) if k else 0
+            for i, posicao in enumerate(livres):
+                if not k:
+                    restantes += livres[i:]
+                    break
+                m = s - i
+                if subconjunto < com_esta:
+                    digitos, d = divmod(digitos, n)
+                    senha[posicao] = caracteres[d]
+                    if m > 1: com_esta = com_esta * (k - 1) // (m - 1)
+                    k -= 1
+                else:
+                    subconjunto -= com_esta
+                    restantes.append(posicao)
+                    if m > 1: com_esta = com_esta * (m - k) // (m - 1)
+            livres = restantes
+        # A primeira classe fica com as posições que sobraram
+        caracteres = self.classes[0][1]
+        n = len(caracteres)
+        for posicao in livres:
+            x, d = divmod(x, n)
+            senha[posicao] = caracteres[d]
+        return "".join(senha)
+
+    def _decodificar_sem_repeticao(self, x):
+        permutacao, x = divmod(x, self._parciais[-1][self.tamanho])
+        escolhidos = []
+        s = self.tamanho
+        for j in range(len(self.classes) - 1, -1, -1):
+            _, caracteres, minimo, maximo = self.classes[j]
+            anterior = self._parciais[j]
+            for k in range(minimo, min(maximo, s) + 1):
+                bloco = math.comb(len(caracteres), k) * anterior[s - k]
+                if x < bloco:
+                    subconjunto, x = divmod(x, anterior[s - k])
+                    s -= k
+                    # Sistema combinatório: o subconjunto de k caracteres de número `subconjunto`, em ordem lexicográfica
+                    n = len(caracteres)
+                    for i in range(n):
+                        if not k:
+                            break
+                        com_este = math.comb(n - i - 1, k - 1)
+                        if subconjunto < com_este:
+                            escolhidos.append(caracteres[i])
+                            k -= 1
+                        else:
+                            subconjunto -= com_este
+                    break
+                x -= bloco
+        # Fisher-Yates com os dígitos de `permutacao` em base mista (i + 1, ..., 2)
+        for i in range(len(escolhidos) - 1, 0, -1):
+            permutacao, j = divmod(permutacao, i + 1)
+            escolhidos[i], escolhidos[j] = escolhidos[j], escolhidos[i]
+        return "".join(escolhidos)
+
+    def decodificar(self, x):
+        """A senha de número `x` (0 <= x < total): cada inteiro corresponde a uma senha válida diferente."""
+        if not 0 <= x < self.total:
+            raise ValueError("Número fora do intervalo de senhas da política.")
+        return self._decodificar(x)
+
+    @metricas.cronometrar("geracao.politica", itens=len)
+    def gerar(self, n):
+        """`n` senhas sorteadas de forma uniforme entre as que satisfazem a política."""
+        if n <= 0:
+            return []
+        if self._irrestrita:
+            bruto = motor_senhas.amostrar_caracteres(self.alfabeto, n * self.tamanho)
+            return [bruto[i:i + self.tamanho] for i in range(0, n * self.tamanho, self.tamanho)]
+        decodificar = self._decodificar
+        return [decodificar(secrets.randbelow(self.total)) for _ in range(n)]
+
+    def gerar_senha(self):
+        return self.gerar(1)[0]
+
+    def entropia(self):
+        """Entropia exata, em bits, de uma senha sorteada com esta política: log2(total)."""
+        return math.log2(self.total)
+
+    def satisfaz(self, senha):
+        """Indica se a senha cumpre a política (tamanho, alfabeto, contagens, repetições e sequências)."""
+        if len(senha) != self.tamanho or not set(senha) <= set(self.alfabeto):
+            return False
+        for _, caracteres, minimo, maximo in self.classes:
+            if not minimo <= sum(senha.count(c) for c in caracteres) <= maximo:
+                return False
+        if self.sem_repeticao and len(set(senha)) != len(senha):
+            return False
+        if self.maximo_seguidos is not None:
+            seguidos = 1
+            for anterior, atual in zip(senha, senha[1:]):
+                seguidos = seguidos + 1 if atual == anterior else 1
+                if seguidos > self.maximo_seguidos:
+                    return False
+        return True
+
+
+@lru_cache(maxsize=64)
+def politica_das_opcoes(tamanho, usar_letras=True, usar_numeros=True, usar_especiais=True, sem_repeticao=False,
+                        sem_ambiguos=False, maximo_seguidos=None):
+    """
+    Política equivalente às opções de motor_senhas.generate_many, exigindo pelo menos um
+    caractere de cada classe selecionada quando o tamanho comporta. Fica em cache (as políticas
+    não mudam depois de criadas).
+    """
+    classes = []
+    if usar_letras: classes += ["minusculas", "maiusculas"]
+    if usar_numeros: classes.append("numeros")
+    if usar_especiais: classes.append("especiais")
+    minimos = {nome: 1 for nome in classes} if tamanho >= len(classes) else {}
+    return PoliticaSenha(tamanho, classes, minimos, sem_ambiguos=sem_ambiguos, sem_repeticao=sem_repeticao,
+                         maximo_seguidos=maximo_seguidos)
+
+
+@lru_cache(maxsize=64)
+def politica_do_nivel(nivel, tamanho=None):
+    """Política de um nível predefinido: cada classe do nível aparece e nenhum caractere se repete 3 vezes seguidas."""
+    try:
+        c = motor_senhas.NIVEIS[nivel]
+    except KeyError:
+        raise ValueError(f"Nível desconhecido: {nivel}. Use um de: {', '.join(motor_senhas.NIVEIS)}.") from None
+    return politica_das_opcoes(tamanho or c["tamanho"], usar_numeros=c["num"], usar_especiais=c["esp"],
+                               maximo_seguidos=MAXIMO_SEGUIDOS_NIVEIS)
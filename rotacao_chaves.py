@@ -0,0 +1,289 @@
+# %% Rotação de Chaves (troca a chave de cofres e arquivos .enc em lote)
+#
+# Recifra arquivos existentes com uma chave nova (arquivo .key ou senha mestra) sem gravar o
+# conteúdo em claro no disco: cada arquivo passa, em fluxo, da chave antiga para a nova.
+#   .enc em blocos: bloco a bloco, ainda comprimido (cripto_arquivos.recifrar_fluxo)
+#   .cofre:         bloco a bloco, com um índice novo (cofre_senhas.recifrar_cofre); o registro de
+#                   unicidade ao lado dele (.unicos) é refeito com a chave nova a partir das senhas
+#   formato antigo: uma linha Fernet por senha, ou o .enc de um único token, token a token por
+#                   MultiFernet.rotate (a data de cada token é mantida)
+#
+# Durante a transição, vários .key antigos podem ser informados. Nos formatos em blocos, vale o
+# primeiro cuja chave autentica o primeiro bloco (ou o índice) do arquivo. No formato antigo, o
+# MultiFernet tenta as chaves token a token, então um arquivo com linhas de chaves diferentes
+# (anexadas antes e depois de uma troca) também sai inteiro na chave nova. Arquivos em blocos que
+# já abrem com a chave nova são pulados: repetir o comando depois de uma interrupção só processa o
+# que falta. Cada saída vai para um temporário (.parcial) que só substitui o original no fim, e
+# vários arquivos são recifrados ao mesmo tempo (um só arquivo usa o paralelismo nos blocos).
+#
+# O formato antigo não guarda parâmetros de derivação, então só pode mudar para outra chave .key.
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import cofre_senhas
+import cripto_arquivos
+import derivacao_chaves
+import metricas
+
+FORMATO_ENC = "enc"
+FORMATO_COFRE = "cofre"
+FORMATO_FERNET = "fernet"
+TOKENS_POR_CONSULTA = 4096          # tokens do formato antigo entre duas consultas a `cancelar()`
+_CONTAGENS = {"ok": "ok", "pulado": "pulados", "erro": "erros"}
+
+
+class ChavesRotacao:
+    """
+    Chaves de uma rotação. `chave_nova`: chave de destino; com `derivacao` (parâmetros de
+    derivacao_chaves), ela veio de uma senha mestra e os parâmetros vão no cabeçalho de cada arquivo.
+    `chaves_antigas`: chaves .key aceitas na leitura. `senha_antiga` e `senha_nova`: senhas mestras
+    para os arquivos que guardam parâmetros de derivação (a nova só serve para reconhecer os
+    arquivos já rotacionados). Cada senha é derivada uma vez por sal, não uma vez por arquivo.
+    Chaves antigas que não são chaves Fernet são ignoradas; uma chave nova assim levanta ValueError.
+    """
+    def __init__(self, chave_nova, chaves_antigas=(), derivacao=None, senha_antiga=None, senha_nova=None):
+        if not cripto_arquivos.chave_valida(chave_nova):
+            raise ValueError("A chave de destino não é uma chave válida (32 bytes em base64 url-safe).")
+        self.chave_nova = chave_nova
+        self.chaves_antigas = [chave for chave in chaves_antigas if cripto_arquivos.chave_valida(chave)]
+        self.derivacao = derivacao
+        self.senha_antiga = senha_antiga
+        self.senha_nova = senha_nova
+        # O cache é por parâmetros, então cada senha tem o seu
+        self._caches = {False: derivacao_chaves.CacheChaves(), True: derivacao_chaves.CacheChaves()}
+        if derivacao is not None:
+            self._caches[True].guardar(derivacao, chave_nova)
+
+    def _derivada(self, senha, parametros, nova):
+        def obter():
+            try:
+                return self._caches[nova].obter(parametros, senha)
+            except ValueError:
+                return None  # a senha não confere com o verificador do arquivo
+        return obter
+
+    def candidatas(self, caminho):
+        """Lista de (função que devolve a chave ou None, é a chave nova) a tentar na leitura de `caminho`."""
+        parametros = derivacao_chaves.parametros_do_arquivo(caminho)
+        if parametros is None:
+            novas = [(lambda: self.chave_nova, True)] if self.derivacao is None else []
+            return novas + [(lambda chave=chave: chave, False) for chave in self.chaves_antigas]
+        candidatas = []
+        if self.senha_antiga is not None:
+            candidatas.append((self._derivada(self.senha_antiga, parametros, False), False))
+        if self.senha_nova is not None:
+            candidatas.append((self._derivada(self.senha_nova, parametros, True), True))
+        if not candidatas:
+            raise ValueError("Este arquivo usa senha mestra: informe a senha mestra antiga.")
+        return candidatas
+
+
+def formato_arquivo(caminho):
+    """FORMATO_ENC, FORMATO_COFRE ou FORMATO_FERNET (uma linha Fernet por senha, ou o .enc antigo)."""
+    with open(caminho, 'rb') as f:
+        magia = f.read(len(cripto_arquivos.MAGIA))
+    if magia == cripto_arquivos.MAGIA:
+        return FORMATO_ENC
+    if magia == cofre_senhas.MAGIA:
+        return FORMATO_COFRE
+    return FORMATO_FERNET
+
+
+def testador_enc(caminho):
+    """Função que autentica o primeiro bloco do .enc com uma chave (levanta InvalidToken se não for a dele)."""
+    with open(caminho, 'rb') as f:
+        cab = cripto_arquivos.ler_cabecalho(f)
+        indice, ultimo, texto_cifrado = next(cripto_arquivos.ler_quadros(f, cab["tamanho_bloco"]))
+
+    def testar(chave):
+        aead = AESGCM(cripto_arquivos.derivar_chave_arquivo(chave, cab["sal"]))
+        cripto_arquivos.decifrar_bloco(aead, cab["bruto"], indice, ultimo, texto_cifrado)
+    return testar
+
+
+def testador_cofre(caminho):
+    """Função que abre o cofre com uma chave (o índice é autenticado na abertura)."""
+    return lambda chave: cofre_senhas.Cofre(caminho, chave).fechar()
+
+
+def _escolher_chave(candidatas, testar):
+    """(chave, é a nova) da primeira candidata que abre o arquivo."""
+    for obter, nova in candidatas:
+        chave = obter()
+        if chave is None:
+            continue
+        try:
+            testar(chave)
+        except InvalidToken:
+            continue
+        return chave, nova
+    raise ValueError("Nenhuma das chaves informadas abre o arquivo.")
+
+
+def _substituir(caminho, escrever):
+    """
+    Chama `escrever(saida)` com um temporário ao lado de `caminho` e, se ela não retornar None, troca
+    o original por ele. `escrever` abre e fecha o original por conta própria: no Windows, um arquivo
+    aberto não pode ser substituído.
+    """
+    temporario = caminho + ".parcial"
+    resultado = None
+    try:
+        with open(temporario, 'wb') as saida:
+            resultado = escrever(saida)
+        if resultado is not None:
+            os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return resultado
+
+
+def _rotacionar_enc(caminho, chave_antiga, chaves, trabalhadores, cancelar):
+    def escrever(saida):
+        with open(caminho, 'rb') as entrada:
+            return cripto_arquivos.recifrar_fluxo(entrada, saida, chave_antiga, chaves.chave_nova, trabalhadores=trabalhadores,
+                                                  derivacao=chaves.derivacao, cancelar=cancelar)
+    processados = _substituir(caminho, escrever)
+    return None if processados is None else {"bytes": processados}
+
+
+def _rotacionar_cofre(caminho, chave_antiga, chaves, cancelar):
+    import unicidade
+    caminho_unicos = unicidade.caminho_registro(caminho)
+    antigo = novo = None
+    if os.path.exists(caminho_unicos):
+        antigo = unicidade.RegistroUnicidade.carregar(caminho_unicos, chave_antiga)
+        novo = antigo.vazio_com_chave(chaves.chave_nova)
+
+    def escrever(saida):
+        with cofre_senhas.Cofre(caminho, chave_antiga) as cofre:
+            return cofre_senhas.recifrar_cofre(cofre, saida, chaves.chave_nova, chaves.derivacao,
+                                               None if novo is None else novo.reservar_lote, cancelar)
+    total = _substituir(caminho, escrever)
+    if total is None:
+        return None
+    resultado = {"registros": total}
+    if novo is not None:
+        novo.salvar(caminho_unicos)
+        # Senhas registradas que nunca foram para o cofre (ex.: lotes emitidos só na saída padrão)
+        resultado["unicos_fora_do_cofre"] = max(0, len(antigo) - len(novo))
+    return resultado
+
+
+def _rotacionar_fernet(caminho, chaves, cancelar):
+    if chaves.derivacao is not None:
+        raise ValueError("O formato antigo (Fernet) não guarda os parâmetros da senha mestra: use uma chave .key.")
+    multi = MultiFernet([Fernet(chave) for chave in [chaves.chave_nova] + chaves.chaves_antigas])
+
+    def escrever(saida):
+        tokens = 0
+        with open(caminho, 'rb') as entrada:
+            for linha in entrada:
+                token = linha.strip()
+                if not token:
+                    saida.write(linha)
+                    continue
+                saida.write(multi.rotate(token) + linha[len(linha.rstrip()):])  # mantém a quebra de linha original
+                tokens += 1
+                if cancelar and tokens % TOKENS_POR_CONSULTA == 0 and cancelar():
+                    return None
+        return tokens
+    tokens = _substituir(caminho, escrever)
+    return None if tokens is None else {"tokens": tokens}
+
+
+def rotacionar_arquivo(caminho, chaves, trabalhadores=1, cancelar=None):
+    """
+    Recifra `caminho` no lugar com a chave nova de `chaves` (um ChavesRotacao). Retorna um dicionário
+    com "caminho", "formato", "status" ("ok", "pulado" se o arquivo já está na chave nova, ou
+    "cancelado") e as contagens do formato. Levanta ValueError se nenhuma das chaves abre o arquivo.
+    """
+    formato = formato_arquivo(caminho)
+    entrada = {"caminho": caminho, "formato": formato}
+    if formato == FORMATO_FERNET:
+        resultado = _rotacionar_fernet(caminho, chaves, cancelar)
+    else:
+        testador = testador_enc if formato == FORMATO_ENC else testador_cofre
+        chave_antiga, nova = _escolher_chave(chaves.candidatas(caminho), testador(caminho))
+        if nova:
+            entrada["status"] = "pulado"
+            return entrada
+        if formato == FORMATO_ENC:
+            resultado = _rotacionar_enc(caminho, chave_antiga, chaves, trabalhadores, cancelar)
+        else:
+            resultado = _rotacionar_cofre(caminho, chave_antiga, chaves, cancelar)
+    if resultado is None:
+        entrada["status"] = "cancelado"
+        return entrada
+    entrada.update(resultado, status="ok")
+    return entrada
+
+
+def _rotacionar_um(caminho, chaves, trabalhadores, cancelar):
+    try:
+        return rotacionar_arquivo(caminho, chaves, trabalhadores, cancelar)
+    except Exception as e:
+        erro = str(e) or "falha ao descriptografar com as chaves informadas"
+        return {"caminho": caminho, "status": "erro", "erro": erro}
+
+
+def processar_arquivos(funcao, caminhos, resumo, contagens, trabalhadores, progresso=None, cancelar=None, ao_concluir=None):
+    """
+    Executa `funcao(caminho, trabalhadores_bloco)` para cada caminho, até `trabalhadores` ao mesmo
+    tempo. Cada chamada retorna uma entrada com "caminho" e "status": "cancelado" marca o resumo, e
+    os outros somam 1 em `resumo[contagens[status]]` antes de `ao_concluir(entrada)` (em ordem de
+    conclusão). `progresso(feitos, total)` é chamado a cada arquivo; `cancelar()` retornando True
+    para de iniciar arquivos. Preenche `resumo["arquivos"]` na ordem de `caminhos` e o retorna.
+    """
+    trabalhadores = max(1, trabalhadores)
+    # Um único arquivo: o paralelismo vai para os blocos dele
+    trabalhadores_bloco = trabalhadores if len(caminhos) == 1 else 1
+    entradas = {}
+    pendentes = iter(caminhos)
+    with ThreadPoolExecutor(max_workers=trabalhadores) as pool:
+        em_andamento = set()
+        while True:
+            # Mantém no máximo 2 × trabalhadores arquivos em andamento
+            while len(em_andamento) < 2 * trabalhadores and not resumo["cancelado"]:
+                if cancelar and cancelar():
+                    resumo["cancelado"] = True
+                    break
+                caminho = next(pendentes, None)
+                if caminho is None:
+                    break
+                em_andamento.add(pool.submit(funcao, caminho, trabalhadores_bloco))
+            if not em_andamento:
+                break
+            concluidos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                entrada = futuro.result()
+                entradas[entrada["caminho"]] = entrada
+                if entrada["status"] == "cancelado":
+                    resumo["cancelado"] = True
+                    continue
+                resumo[contagens[entrada["status"]]] += 1
+                if ao_concluir: ao_concluir(entrada)
+            if progresso: progresso(len(entradas), len(caminhos))
+    resumo["arquivos"] = [entradas[caminho] for caminho in caminhos if caminho in entradas]
+    return resumo
+
+
+@metricas.cronometrar("rotacao.lote", itens=lambda resumo: resumo["ok"])
+def rotacionar_arquivos(caminhos, chaves, trabalhadores=cripto_arquivos.TRABALHADORES_PADRAO, progresso=None, cancelar=None):
+    """
+    Rotaciona a chave de vários arquivos (.enc, .cofre ou no formato Fernet antigo), até
+    `trabalhadores` ao mesmo tempo. `progresso(feitos, total)` é chamado a cada arquivo concluído;
+    `cancelar()` retornando True interrompe o lote (os arquivos pela metade ficam como estavam).
+    Retorna um resumo com as contagens (total, ok, pulados, erros, cancelado) e, em "arquivos",
+    a entrada de cada arquivo processado, na ordem de `caminhos`. Um erro em um arquivo não
+    interrompe os outros.
+    """
+    caminhos = list(dict.fromkeys(caminhos))
+    resumo = {"total": len(caminhos), "ok": 0, "pulados": 0, "erros": 0, "cancelado": False}
+    return processar_arquivos(lambda caminho, trabalhadores_bloco: _rotacionar_um(caminho, chaves, trabalhadores_bloco, cancelar),
+                              caminhos, resumo, _CONTAGENS, trabalhadores, progresso, cancelar)
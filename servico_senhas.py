@@ -0,0 +1,438 @@
+# %% Serviço Local de Senhas (asyncio, socket Unix ou porta em 127.0.0.1)
+#
+# Para que outros processos da máquina (daemons de provisionamento, testes automatizados) peçam
+# senhas com as mesmas políticas da interface sem abrir um processo por pedido. O protocolo é
+# NDJSON: um pedido JSON por linha, uma resposta por linha, na ordem dos pedidos da conexão.
+#   pedido:   {"id": 7, "nivel": "D", "quantidade": 10}
+#             {"tamanho": 24, "especiais": false, "minimos": {"numeros": 4}, "sem_ambiguos": true}
+#   resposta: {"id": 7, "senhas": [...]}
+#             {"id": 7, "erro": "...", "tentar_em": 0.25}   (tentar_em só quando o limite de taxa recusa)
+# Campos do pedido (todos opcionais):
+#   id          qualquer valor JSON, devolvido na resposta
+#   nivel       B, M, A ou D (padrão A); tamanho (padrão: o do nível); quantidade (padrão 1)
+#   letras, numeros, especiais, sem_repeticao, sem_ambiguos (booleanos), maximo_seguidos,
+#   minimos e maximos ({"classe": n}), excluir (caracteres)
+# Sem nenhuma opção de política, vale a política do nível (politicas_senha.politica_do_nivel, a
+# mesma de "Gerar por nível"). Com alguma, os tipos de caractere partem do nível e vale a política
+# das opções (pelo menos um caractere de cada tipo usado), mais os mínimos, máximos e exclusões.
+# As políticas montadas ficam em cache (as MAXIMO_POLITICAS mais recentes), então só o primeiro
+# pedido de cada uma paga a montagem. A montagem é sempre feita em uma thread, nunca no laço de
+# eventos, e uma política com limite de seguidos cuja tabela passaria de MAXIMO_ESTADOS_PEDIDO
+# estados é recusada com um erro antes de ser montada (ver politicas_senha): um pedido com máximos
+# enormes não segura os outros clientes nem ocupa a memória do serviço.
+#
+# Conexões são persistentes e aceitam pipeline: o cliente pode mandar vários pedidos sem esperar as
+# respostas. O serviço lê tudo o que chegou de uma vez, atende os pedidos em ordem e devolve as
+# respostas em uma única escrita. Pedidos pequenos de políticas já montadas são gerados no próprio
+# laço de eventos (a geração custa microssegundos e uma troca de thread custaria mais). Pedidos
+# grandes vão para uma thread, para não segurar os outros clientes.
+#
+# Limite de taxa por cliente: um balde de fichas de `taxa` senhas por segundo, que acumula até
+# `rajada`. Um pedido acima do limite é recusado (não enfileirado), com o tempo de espera em
+# "tentar_em". No socket Unix (Linux), o cliente é o processo do outro lado (SO_PEERCRED), então
+# várias conexões do mesmo processo dividem o limite. Na porta TCP, cada conexão tem o seu.
+# A porta TCP só escuta em 127.0.0.1. O socket Unix é criado só com as permissões de `modo`
+# (padrão 600: só o dono).
+
+import asyncio
+import itertools
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import metricas
+import motor_senhas
+import politicas_senha
+
+NIVEL_PADRAO = "A"
+MAXIMO_QUANTIDADE = 10_000          # senhas por pedido
+MAXIMO_TAMANHO = 128
+MAXIMO_LINHA = 64 * 1024            # bytes de um pedido
+TAXA_PADRAO = 20_000                # senhas por segundo por cliente
+LOTE_EM_LINHA = 256                 # pedidos até este tamanho são gerados no laço de eventos
+MAXIMO_ESTADOS_PEDIDO = 50_000      # tabela de uma política pedida (cerca de 50 ms e 10 MB)
+MAXIMO_POLITICAS = 16               # políticas montadas guardadas em cache
+TAMANHO_LEITURA = 64 * 1024
+JANELA_CLIENTE = 128                # pedidos enviados por ClienteSenhas antes de ler as respostas
+_OPCOES_POLITICA = ("letras", "numeros", "especiais", "sem_repeticao", "sem_ambiguos", "maximo_seguidos",
+                    "minimos", "maximos", "excluir")
+_CAMPOS = {"id", "nivel", "tamanho", "quantidade", *_OPCOES_POLITICA}
+_PEERCRED = struct.Struct("3i")     # pid, uid, gid
+_POLITICAS = OrderedDict()          # chave da política -> PoliticaSenha, da menos para a mais usada
+_TRAVA_POLITICAS = threading.Lock()
+
+
+# --- Pedidos ---
+def _inteiro(pedido, campo, padrao, minimo, maximo):
+    if campo not in pedido:
+        return padrao
+    valor = pedido[campo]
+    if type(valor) is not int or not minimo <= valor <= maximo:
+        raise ValueError(f"'{campo}' deve ser um inteiro de {minimo} a {maximo}.")
+    return valor
+
+
+def _booleano(pedido, campo, padrao):
+    valor = pedido.get(campo, padrao)
+    if type(valor) is not bool:
+        raise ValueError(f"'{campo}' deve ser true ou false.")
+    return valor
+
+
+def _limites(pedido, campo):
+    valor = pedido.get(campo, {})
+    if not isinstance(valor, dict) or any(type(n) is not int for n in valor.values()):
+        raise ValueError(f"'{campo}' deve ser um objeto {{\"classe\": n}}.")
+    return tuple(sorted(valor.items()))
+
+
+def chave_politica(pedido):
+    """
+    Opções de política de um pedido do protocolo (ver o início do módulo), validadas, como chave do
+    cache de políticas. Não monta a política. Levanta ValueError se o pedido for inválido.
+    """
+    desconhecidos = set(pedido) - _CAMPOS
+    if desconhecidos:
+        raise ValueError(f"Campo desconhecido: {', '.join(sorted(desconhecidos))}.")
+    nivel = pedido.get("nivel", NIVEL_PADRAO)
+    if not isinstance(nivel, str) or nivel not in motor_senhas.NIVEIS:
+        raise ValueError(f"Nível desconhecido: {nivel}. Use um de: {', '.join(motor_senhas.NIVEIS)}.")
+    tamanho = _inteiro(pedido, "tamanho", None, 1, MAXIMO_TAMANHO)
+    if not any(campo in pedido for campo in _OPCOES_POLITICA):
+        return ("nivel", nivel, tamanho)
+    c = motor_senhas.NIVEIS[nivel]
+    tamanho = tamanho or c["tamanho"]
+    classes = ((["minusculas", "maiusculas"] if _booleano(pedido, "letras", True) else [])
+               + (["numeros"] if _booleano(pedido, "numeros", c["num"]) else [])
+               + (["especiais"] if _booleano(pedido, "especiais", c["esp"]) else []))
+    if not classes:
+        raise ValueError("Selecione pelo menos um tipo de caractere.")
+    minimos = {nome: 1 for nome in classes} if tamanho >= len(classes) else {}
+    minimos.update(_limites(pedido, "minimos"))
+    excluir = pedido.get("excluir", "")
+    if not isinstance(excluir, str):
+        raise ValueError("'excluir' deve ser um texto com os caracteres excluídos.")
+    return ("opcoes", tamanho, tuple(classes), tuple(sorted(minimos.items())), _limites(pedido, "maximos"),
+            "".join(sorted(set(excluir))), _booleano(pedido, "sem_ambiguos", False),
+            _booleano(pedido, "sem_repeticao", False), _inteiro(pedido, "maximo_seguidos", None, 1, MAXIMO_TAMANHO))
+
+
+def politica_em_cache(chave):
+    """A política da chave se ela já foi montada, senão None (nunca a monta)."""
+    with _TRAVA_POLITICAS:
+        politica = _POLITICAS.get(chave)
+        if politica is not None:
+            _POLITICAS.move_to_end(chave)
+        return politica
+
+
+def politica_da_chave(chave):
+    """A política da chave, montando-a (e guardando-a no cache) se preciso. Levanta ValueError se ela for recusada."""
+    politica = politica_em_cache(chave)
+    if politica is not None:
+        return politica
+    if chave[0] == "nivel":
+        politica = politicas_senha.politica_do_nivel(*chave[1:])
+    else:
+        tamanho, classes, minimos, maximos, excluir, sem_ambiguos, sem_repeticao, maximo_seguidos = chave[1:]
+        politica = politicas_senha.PoliticaSenha(tamanho, classes, dict(minimos), dict(maximos), excluir, sem_ambiguos,
+                                                 sem_repeticao, maximo_seguidos, maximo_estados=MAXIMO_ESTADOS_PEDIDO)
+    with _TRAVA_POLITICAS:
+        _POLITICAS[chave] = politica
+        while len(_POLITICAS) > MAXIMO_POLITICAS:
+            _POLITICAS.popitem(last=False)
+    return politica
+
+
+def politica_do_pedido(pedido):
+    """PoliticaSenha pedida por um pedido do protocolo (ver o início do módulo). Levanta ValueError se ele for inválido."""
+    return politica_da_chave(chave_politica(pedido))
+
+
+# --- Limite de taxa ---
+class LimiteTaxa:
+    """Balde de fichas: `taxa` senhas por segundo, acumulando até `rajada`."""
+    def __init__(self, taxa, rajada):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.fichas = rajada
+        self.instante = time.monotonic()
+
+    def _repor(self, agora):
+        self.fichas = min(self.rajada, self.fichas + (agora - self.instante) * self.taxa)
+        self.instante = agora
+
+    def consumir(self, n):
+        """Retira `n` fichas e retorna 0; sem fichas suficientes, não retira nada e retorna em quantos segundos haverá."""
+        self._repor(time.monotonic())
+        if n <= self.fichas:
+            self.fichas -= n
+            return 0.0
+        return (n - self.fichas) / self.taxa
+
+    def cheio(self):
+        self._repor(time.monotonic())
+        return self.fichas >= self.rajada
+
+
+def _identificar_processo(escritor):
+    """pid do processo do outro lado de um socket Unix (Linux), ou None."""
+    sock = escritor.get_extra_info("socket")
+    if sock is None or sock.family != getattr(socket, "AF_UNIX", None) or not hasattr(socket, "SO_PEERCRED"):
+        return None
+    try:
+        pid, _, _ = _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size))
+    except OSError:
+        return None
+    return pid
+
+
+# --- Servidor ---
+class ServicoSenhas:
+    """
+    Servidor do protocolo. `taxa`: senhas por segundo por cliente (0 desliga o limite); `rajada`:
+    fichas acumuladas (padrão: o maior entre `taxa` e `maximo_quantidade`); `rejeitar(senhas)`:
+    lista de booleanos das senhas a sortear de novo (ex.: índice de vazadas).
+    """
+    def __init__(self, taxa=TAXA_PADRAO, rajada=None, maximo_quantidade=MAXIMO_QUANTIDADE, rejeitar=None):
+        if taxa < 0:
+            raise ValueError("A taxa não pode ser negativa.")
+        self.taxa = taxa
+        self.rajada = rajada or max(taxa, maximo_quantidade)
+        self.maximo_quantidade = maximo_quantidade
+        self.rejeitar = rejeitar
+        self.endereco = None
+        self.estatisticas = {"conexoes": 0, "pedidos": 0, "senhas": 0, "erros": 0, "limitados": 0}
+        self._limites = {}       # cliente -> LimiteTaxa
+        self._conexoes = {}      # cliente -> conexões abertas
+        self._escritores = {}    # escritor -> tarefa que atende a conexão
+        self._numeros = itertools.count(1)
+        self._servidor = None
+        self._caminho = None
+
+    def atender(self, pedido):
+        """Senhas de um pedido já decodificado, sem limite de taxa. Levanta ValueError se o pedido for inválido."""
+        quantidade = _inteiro(pedido, "quantidade", 1, 1, self.maximo_quantidade)
+        return self._gerar(politica_do_pedido(pedido), quantidade)
+
+    def _gerar(self, politica, quantidade):
+        senhas = politica.gerar(quantidade)
+        if self.rejeitar is not None:
+            motor_senhas.substituir_rejeitadas_com(senhas, self.rejeitar, politica.gerar)
+        return senhas
+
+    def _consumir(self, cliente, quantidade):
+        if not self.taxa:
+            return 0.0
+        if quantidade > self.rajada:
+            raise ValueError(f"O limite deste serviço é de {self.rajada:g} senhas por vez: divida o pedido.")
+        limite = self._limites.get(cliente)
+        if limite is None:
+            limite = self._limites[cliente] = LimiteTaxa(self.taxa, self.rajada)
+        return limite.consumir(quantidade)
+
+    async def _responder(self, linha, cliente):
+        inicio = time.perf_counter()
+        pedido = None
+        try:
+            try:
+                pedido = json.loads(linha)
+            except ValueError:  # JSON ou UTF-8 inválidos
+                raise ValueError("O pedido não é um JSON válido em UTF-8.") from None
+            if not isinstance(pedido, dict):
+                raise ValueError("O pedido deve ser um objeto JSON.")
+            quantidade = _inteiro(pedido, "quantidade", 1, 1, self.maximo_quantidade)
+            chave = chave_politica(pedido)
+            espera = self._consumir(cliente, quantidade)
+            if espera:
+                self.estatisticas["limitados"] += 1
+                return {"id": pedido.get("id"), "erro": f"Limite de {self.taxa:g} senhas/s excedido; tente de novo em {espera:.3f} s.",
+                        "tentar_em": round(espera, 3)}
+            politica = politica_em_cache(chave)
+            if politica is not None and quantidade <= LOTE_EM_LINHA:
+                senhas = self._gerar(politica, quantidade)
+            else:
+                # Uma política ainda não montada também vai para a thread: a montagem pode levar milissegundos
+                senhas = await asyncio.get_running_loop().run_in_executor(
+                    None, lambda: self._gerar(politica if politica is not None else politica_da_chave(chave), quantidade))
+            resposta = {"id": pedido.get("id"), "senhas": senhas}
+            self.estatisticas["senhas"] += len(senhas)
+        except Exception as e:
+            # Qualquer falha responde só a este pedido: a conexão e os pedidos seguintes continuam
+            if not isinstance(e, ValueError):
+                e = f"O pedido não pôde ser atendido ({type(e).__name__})."
+            resposta = {"id": pedido.get("id") if isinstance(pedido, dict) else None, "erro": str(e)}
+            self.estatisticas["erros"] += 1
+        metricas.registrar("servico.pedido", time.perf_counter() - inicio, itens=len(resposta.get("senhas", ())),
+                           erro="erro" in resposta)
+        return resposta
+
+    async def _atender_conexao(self, leitor, escritor):
+        pid = _identificar_processo(escritor)
+        cliente = ("pid", pid) if pid is not None else ("conexao", next(self._numeros))
+        self._conexoes[cliente] = self._conexoes.get(cliente, 0) + 1
+        self._escritores[escritor] = asyncio.current_task()
+        self.estatisticas["conexoes"] += 1
+        resto = b""
+        try:
+            while dados := await leitor.read(TAMANHO_LEITURA):
+                # Todos os pedidos completos que chegaram são atendidos e respondidos de uma vez
+                linhas = (resto + dados).split(b"\n")
+                resto = linhas.pop()
+                respostas = []
+                for linha in linhas:
+                    if linha.strip():
+                        self.estatisticas["pedidos"] += 1
+                        respostas.append(await self._responder(linha, cliente))
+                if len(resto) > MAXIMO_LINHA:
+                    respostas.append({"id": None, "erro": f"Pedido maior que {MAXIMO_LINHA} bytes; conexão encerrada."})
+                if respostas:
+                    escritor.write("".join(json.dumps(resposta) + "\n" for resposta in respostas).encode())
+                    await escritor.drain()
+                if len(resto) > MAXIMO_LINHA:
+                    break
+                await asyncio.sleep(0)  # um cliente com muitos pedidos não monopoliza o laço
+        except ConnectionError:
+            pass
+        finally:
+            del self._escritores[escritor]
+            self._conexoes[cliente] -= 1
+            if not self._conexoes[cliente]:
+                del self._conexoes[cliente]
+                # Baldes cheios de clientes sem conexão não guardam nada: podem ser esquecidos
+                for ocioso in [c for c, limite in self._limites.items() if c not in self._conexoes and limite.cheio()]:
+                    del self._limites[ocioso]
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def iniciar(self, caminho=None, porta=None, modo=0o600):
+        """
+        Começa a escutar no socket Unix `caminho` ou na `porta` de 127.0.0.1 (0: uma livre). Um
+        socket antigo no caminho é substituído; levanta ValueError se outro serviço ainda o atende.
+        """
+        if caminho is not None:
+            if os.path.exists(caminho):
+                if not stat.S_ISSOCK(os.stat(caminho).st_mode):
+                    raise ValueError(f"{caminho} já existe e não é um socket.")
+                with socket.socket(socket.AF_UNIX) as teste:
+                    if teste.connect_ex(caminho) == 0:
+                        raise ValueError(f"Já há um serviço atendendo em {caminho}.")
+                os.remove(caminho)
+            # A máscara garante que o socket já nasce com as permissões de `modo`
+            mascara = os.umask(0o777 & ~modo)
+            try:
+                self._servidor = await asyncio.start_unix_server(self._atender_conexao, caminho)
+            finally:
+                os.umask(mascara)
+            self._caminho = self.endereco = caminho
+        else:
+            self._servidor = await asyncio.start_server(self._atender_conexao, "127.0.0.1", porta)
+            self.endereco = "%s:%d" % self._servidor.sockets[0].getsockname()[:2]
+        return self.endereco
+
+    async def fechar(self):
+        """Para de aceitar conexões, encerra as abertas e apaga o socket Unix."""
+        if self._servidor is None:
+            return
+        self._servidor.close()
+        tarefas = list(self._escritores.values())
+        for escritor in list(self._escritores):
+            escritor.close()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+        await self._servidor.wait_closed()
+        self._servidor = None
+        if self._caminho is not None:
+            try:
+                os.remove(self._caminho)
+            except FileNotFoundError:
+                pass
+
+
+def servir(caminho=None, porta=None, modo=0o600, ao_iniciar=None, **opcoes):
+    """
+    Executa um ServicoSenhas (opções em `opcoes`) até Ctrl+C ou SIGTERM. `ao_iniciar(endereco)` é
+    chamado quando o serviço começa a aceitar conexões. Retorna as estatísticas do serviço.
+    """
+    servico = ServicoSenhas(**opcoes)
+
+    async def principal():
+        await servico.iniciar(caminho, porta, modo)
+        parar = asyncio.Event()
+        laco = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                laco.add_signal_handler(sinal, parar.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C chega como KeyboardInterrupt
+        if ao_iniciar: ao_iniciar(servico.endereco)
+        try:
+            await parar.wait()
+        finally:
+            await servico.fechar()
+    try:
+        asyncio.run(principal())
+    except KeyboardInterrupt:
+        pass
+    return servico.estatisticas
+
+
+# --- Cliente ---
+class ClienteSenhas:
+    """
+    Cliente bloqueante, para scripts e testes:
+        with ClienteSenhas("/run/gerador.sock") as cliente:
+            senhas = cliente.gerar(nivel="D", quantidade=10)
+    """
+    def __init__(self, caminho=None, porta=None, tempo_limite=30):
+        if caminho is not None:
+            self._sock = socket.socket(socket.AF_UNIX)
+            self._sock.settimeout(tempo_limite)
+            try:
+                self._sock.connect(caminho)
+            except OSError:
+                self._sock.close()
+                raise
+        else:
+            self._sock = socket.create_connection(("127.0.0.1", porta), tempo_limite)
+        self._arquivo = self._sock.makefile("rwb")
+
+    def pedir_varios(self, pedidos):
+        """Envia os pedidos em pipeline e retorna as respostas (dicionários do protocolo) na mesma ordem."""
+        respostas = []
+        for inicio in range(0, len(pedidos), JANELA_CLIENTE):
+            # Uma janela por vez: o serviço nunca fica bloqueado escrevendo enquanto o cliente escreve
+            janela = pedidos[inicio:inicio + JANELA_CLIENTE]
+            self._arquivo.write("".join(json.dumps(pedido) + "\n" for pedido in janela).encode())
+            self._arquivo.flush()
+            for _ in janela:
+                linha = self._arquivo.readline()
+                if not linha:
+                    raise ConnectionError("O serviço encerrou a conexão.")
+                respostas.append(json.loads(linha))
+        return respostas
+
+    def gerar(self, **pedido):
+        """Senhas de um pedido (campos do protocolo como argumentos). Levanta ValueError se o serviço recusar."""
+        resposta = self.pedir_varios([pedido])[0]
+        if "erro" in resposta:
+            raise ValueError(resposta["erro"])
+        return resposta["senhas"]
+
+    def fechar(self):
+        self._arquivo.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
@@ -0,0 +1,74 @@
+# %% Tarefas em Segundo Plano
+#
+# Executa operações demoradas fora da thread do Tkinter. A thread de trabalho só atualiza
+# contadores; a interface consulta o estado periodicamente com `root.after`, já que widgets
+# Tk não podem ser acessados de outras threads.
+
+import threading
+import time
+
+
+class Tarefa:
+    """
+    Executa `funcao(tarefa)` em uma thread separada.
+    A função informa o avanço com `tarefa.informar_progresso(feitos, total)` e deve consultar
+    `tarefa.cancelada` entre passos.
+    """
+    def __init__(self, funcao, total=None, unidade="itens"):
+        self.funcao = funcao
+        self.total = total
+        self.unidade = unidade
+        self.feitos = 0
+        self.resultado = None
+        self.erro = None
+        self.inicio = None
+        self.fim = None
+        self._cancelar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _executar(self):
+        try:
+            self.resultado = self.funcao(self)
+        except BaseException as e:
+            self.erro = e
+        finally:
+            self.fim = time.perf_counter()
+
+    # --- Chamado pela thread de trabalho ---
+    def informar_progresso(self, feitos, total=None):
+        self.feitos = feitos
+        if total is not None:
+            self.total = total
+
+    # --- Chamado pela interface ---
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    @property
+    def concluida(self):
+        return self.fim is not None
+
+    def decorrido(self):
+        if self.inicio is None:
+            return 0.0
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    def taxa(self):
+        """Itens (ou bytes) processados por segundo até agora."""
+        decorrido = self.decorrido()
+        return self.feitos / decorrido if decorrido > 0 else 0.0
+
+    def fracao(self):
+        """Fração concluída entre 0 e 1, ou None se o total é desconhecido."""
+        if not self.total:
+            return None
+        return min(1.0, self.feitos / self.total)
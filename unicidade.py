@@ -0,0 +1,279 @@
+# %% Unicidade Global de Senhas
+#
+# Registro compacto das senhas já emitidas, para que nenhuma se repita entre lotes, sessões e
+# cofres salvos antes. Guarda só impressões digitais com chave (BLAKE2b com uma chave derivada da
+# chave do cofre), nunca as senhas: sem a chave, o arquivo não permite testar palpites.
+#
+# Dois modos:
+#   exato:          tabela hash de endereçamento aberto em um array('Q') com impressões de 64
+#                   bits (11 a 21 bytes por senha). Uma colisão de 64 bits só faz uma senha nova
+#                   ser sorteada de novo (~1 em 10^11 com 50 milhões de senhas).
+#   probabilístico: filtro de Bloom em blocos (como o de vazamentos.py) com taxa de falsos
+#                   positivos ajustável, ~2,5 bytes por senha a 0,1%. Um falso positivo também só
+#                   causa um novo sorteio; senhas repetidas nunca passam. A capacidade é fixada na
+#                   criação: acima dela, a taxa de falsos positivos sobe.
+#
+# Formato do arquivo (.unicos, normalmente ao lado do cofre):
+#   MAGIA(5) | versão(1) | modo(1) | hashes(1) | sal(16) | verificador(16) | quantidade(8) | tamanho(8) | dados
+# Os dados são a tabela (tamanho = número de posições, inteiros de 64 bits little-endian) ou os
+# blocos do filtro (tamanho = número de blocos de 64 bytes).
+
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+import vazamentos
+
+MAGIA = b"GSUNQ"
+VERSAO = 1
+EXTENSAO = ".unicos"
+MODO_EXATO = 0
+MODO_PROBABILISTICO = 1
+TAMANHO_SAL = 16
+TAMANHO_TABELA_INICIAL = 1 << 10
+CAPACIDADE_PADRAO = 10_000_000
+LIMITE_EXATO = 10_000_000  # acima disso, prefira o modo probabilístico (a tabela exata passa de ~200 MB)
+TAXA_FALSOS_POSITIVOS = 0.001
+HASHES_PROBABILISTICO = 4  # menos posições por senha: ~20 bits por senha a 0,1%, com metade do custo por operação
+
+_FORMATO_CABECALHO = ">5sBBB16s16sQQ"
+_TAMANHO_CABECALHO = struct.calcsize(_FORMATO_CABECALHO)
+_CONTEXTO_CHAVE = b"gerador-senhas/unicidade/v1"
+
+
+def _derivar(chave_fernet, sal):
+    import cripto_arquivos
+    return cripto_arquivos.derivar_chave(chave_fernet, sal, _CONTEXTO_CHAVE)
+
+
+def _verificador(chave):
+    return hashlib.blake2b(b"verificador", key=chave, digest_size=16).digest()
+
+
+def caminho_registro(caminho_cofre):
+    """Caminho do registro de unicidade que acompanha um cofre."""
+    return caminho_cofre + EXTENSAO
+
+
+class RegistroUnicidade:
+    """
+    Conjunto de impressões digitais de senhas. Sem `chave`, usa uma chave aleatória (registro só
+    da sessão, que não pode ser salvo); use `criar`/`carregar` para registros ligados a uma chave Fernet.
+    """
+    def __init__(self, chave=None, sal=None, probabilistico=False, capacidade=None,
+                 taxa_falsos_positivos=TAXA_FALSOS_POSITIVOS):
+        """
+        `capacidade`: senhas previstas. No modo probabilístico fixa o tamanho do filtro (padrão:
+        CAPACIDADE_PADRAO); no exato só reserva a tabela de uma vez, evitando redimensionamentos.
+        """
+        self.chave = chave if chave is not None else os.urandom(32)
+        self.sal = sal
+        self.probabilistico = probabilistico
+        self.quantidade = 0
+        if probabilistico:
+            self.num_blocos, self.hashes = vazamentos.dimensionar(capacidade or CAPACIDADE_PADRAO, taxa_falsos_positivos, HASHES_PROBABILISTICO)
+            self.bits = bytearray(self.num_blocos * vazamentos.TAMANHO_BLOCO)
+        else:
+            self.hashes = 0
+            posicoes = TAMANHO_TABELA_INICIAL
+            while capacidade and posicoes * 3 // 4 < capacidade:
+                posicoes *= 2
+            self.tabela = array('Q', bytes(8 * posicoes))
+
+    @classmethod
+    def criar(cls, chave_fernet, **opcoes):
+        """Registro novo cuja chave é derivada da chave Fernet (o sal vai no arquivo)."""
+        sal = os.urandom(TAMANHO_SAL)
+        return cls(_derivar(chave_fernet, sal), sal, **opcoes)
+
+    @classmethod
+    def carregar(cls, caminho, chave_fernet):
+        """Abre um registro salvo. Levanta ValueError se o arquivo for inválido ou a chave não for a dele."""
+        with open(caminho, 'rb') as f:
+            cabecalho = f.read(_TAMANHO_CABECALHO)
+            if len(cabecalho) < _TAMANHO_CABECALHO:
+                raise ValueError("Registro de unicidade incompleto.")
+            magia, versao, modo, hashes, sal, verificador, quantidade, tamanho = struct.unpack(_FORMATO_CABECALHO, cabecalho)
+            if magia != MAGIA:
+                raise ValueError("O arquivo não é um registro de unicidade.")
+            if versao != VERSAO:
+                raise ValueError(f"Versão de registro não suportada: {versao}.")
+            chave = _derivar(chave_fernet, sal)
+            if _verificador(chave) != verificador:
+                raise ValueError("A chave não corresponde a este registro de unicidade.")
+            registro = cls(chave, sal)
+            registro.probabilistico = modo == MODO_PROBABILISTICO
+            if registro.probabilistico:
+                registro.num_blocos, registro.hashes = tamanho, hashes
+                registro.bits = bytearray(tamanho * vazamentos.TAMANHO_BLOCO)
+                lidos = f.readinto(registro.bits)
+                esperado = len(registro.bits)
+            else:
+                registro.tabela = array('Q')
+                dados = f.read(tamanho * 8)
+                lidos, esperado = len(dados), tamanho * 8
+                registro.tabela.frombytes(dados)
+                if sys.byteorder == 'big':
+                    registro.tabela.byteswap()
+            if lidos != esperado:
+                raise ValueError("Registro de unicidade truncado.")
+            registro.quantidade = quantidade
+            return registro
+
+    def vazio_com_chave(self, chave_fernet):
+        """
+        Registro vazio no mesmo modo e com o mesmo tamanho deste, ligado a outra chave Fernet. As
+        impressões têm chave, então não dá para convertê-las: depois de trocar a chave do cofre, o
+        registro é preenchido de novo com as senhas dele.
+        """
+        sal = os.urandom(TAMANHO_SAL)
+        chave = _derivar(chave_fernet, sal)
+        if not self.probabilistico:
+            return RegistroUnicidade(chave, sal, capacidade=self.quantidade)
+        registro = RegistroUnicidade(chave, sal, probabilistico=True, capacidade=1)
+        registro.num_blocos, registro.hashes = self.num_blocos, self.hashes
+        registro.bits = bytearray(len(self.bits))
+        return registro
+
+    def salvar(self, caminho):
+        """Grava o registro (escreve em um temporário e substitui o arquivo no final)."""
+        if self.sal is None:
+            raise ValueError("Registro de sessão (sem chave Fernet) não pode ser salvo.")
+        if self.probabilistico:
+            modo, tamanho, dados = MODO_PROBABILISTICO, self.num_blocos, self.bits
+        else:
+            modo, tamanho, dados = MODO_EXATO, len(self.tabela), self.tabela
+            if sys.byteorder == 'big':
+                dados = array('Q', dados)
+                dados.byteswap()
+        temporario = caminho + ".parcial"
+        with open(temporario, 'wb') as f:
+            f.write(struct.pack(_FORMATO_CABECALHO, MAGIA, VERSAO, modo, self.hashes, self.sal, _verificador(self.chave), self.quantidade, tamanho))
+            f.write(dados)
+        os.replace(temporario, caminho)
+
+    def __len__(self):
+        return self.quantidade
+
+    # --- Impressões digitais ---
+    def _impressoes(self, senhas, tamanho):
+        """BLAKE2b com chave de cada senha; o estado com a chave é preparado uma vez e copiado."""
+        base = hashlib.blake2b(key=self.chave, digest_size=tamanho)
+        for dados in map(str.encode, senhas):
+            h = base.copy()
+            h.update(dados)
+            yield h.digest()
+
+    def _impressoes_exatas(self, senhas):
+        # Converte todas de uma vez para inteiros de 64 bits (0 marca posição vazia e vira 1 no uso)
+        impressoes = array('Q', b"".join(self._impressoes(senhas, 8)))
+        if sys.byteorder == 'big':
+            impressoes.byteswap()
+        return impressoes
+
+    # --- Tabela exata (endereçamento aberto, sondagem linear) ---
+    def _crescer(self):
+        antiga = self.tabela
+        tabela = self.tabela = array('Q', bytes(16 * len(antiga)))
+        mascara = len(tabela) - 1
+        for x in antiga:
+            if x:
+                i = x & mascara
+                while tabela[i]:
+                    i = (i + 1) & mascara
+                tabela[i] = x
+
+    def _lote_exato(self, senhas, registrar):
+        resultado = []
+        tabela = self.tabela
+        mascara = len(tabela) - 1
+        limite = len(tabela) * 3 // 4
+        for x in self._impressoes_exatas(senhas):
+            x = x or 1
+            i = x & mascara
+            while True:
+                v = tabela[i]
+                if v == x:
+                    resultado.append(True)
+                    break
+                if not v:
+                    resultado.append(False)
+                    if registrar:
+                        tabela[i] = x
+                        self.quantidade += 1
+                        if self.quantidade > limite:
+                            self._crescer()
+                            tabela = self.tabela
+                            mascara = len(tabela) - 1
+                            limite = len(tabela) * 3 // 4
+                    break
+                i = (i + 1) & mascara
+        return resultado
+
+    # --- Filtro de Bloom em blocos ---
+    def _lote_probabilistico(self, senhas, registrar):
+        resultado = []
+        bits = self.bits
+        num_blocos, hashes = self.num_blocos, self.hashes
+        for digest in self._impressoes(senhas, 20):
+            offset = int.from_bytes(digest[:8], 'big') % num_blocos * vazamentos.TAMANHO_BLOCO
+            resto = int.from_bytes(digest[8:20], 'big')
+            presente = True
+            for _ in range(hashes):
+                posicao = resto & 511
+                resto >>= vazamentos.BITS_POSICAO
+                j, bit = offset + (posicao >> 3), 1 << (posicao & 7)
+                if not bits[j] & bit:
+                    presente = False
+                    if not registrar:
+                        break
+                    bits[j] |= bit
+            if registrar and not presente:
+                self.quantidade += 1
+            resultado.append(presente)
+        return resultado
+
+    # --- API ---
+    def _lote(self, senhas, registrar):
+        if self.probabilistico:
+            return self._lote_probabilistico(senhas, registrar)
+        return self._lote_exato(senhas, registrar)
+
+    def __contains__(self, senha):
+        return self._lote((senha,), False)[0]
+
+    def reservar(self, senha):
+        """Registra a senha. Retorna True se ela já estava registrada (repetida)."""
+        return self._lote((senha,), True)[0]
+
+    def reservar_lote(self, senhas):
+        """Registra um lote. Retorna, para cada senha, se ela era repetida (no registro ou no próprio lote)."""
+        return self._lote(senhas, True)
+
+    def verificar_lote(self, senhas):
+        """Para cada senha, se ela já está registrada (sem registrar nada)."""
+        return self._lote(senhas, False)
+
+
+def registro_do_cofre(caminho_cofre, chave_fernet, **opcoes):
+    """
+    Registro de unicidade de um cofre: o arquivo `.unicos` ao lado dele, se existir; senão, um
+    registro novo preenchido com as senhas do cofre (se o cofre já existir).
+    """
+    caminho = caminho_registro(caminho_cofre)
+    if os.path.exists(caminho):
+        return RegistroUnicidade.carregar(caminho, chave_fernet)
+    registro = RegistroUnicidade.criar(chave_fernet, **opcoes)
+    if os.path.exists(caminho_cofre):
+        import fontes_senhas
+        fonte = fontes_senhas.abrir_fonte(caminho_cofre, chave_fernet)
+        try:
+            while not fonte.indexar():
+                pass
+            for inicio in range(0, len(fonte), 4096):
+                registro.reservar_lote(fonte.obter_intervalo(inicio, inicio + 4096))
+        finally:
+            fonte.fechar()
+    return registro
@@ -0,0 +1,226 @@
+# %% Verificação Offline de Senhas Vazadas (filtro de Bloom mapeado em memória)
+#
+# Formato do índice (.vaz):
+#   cabeçalho (64 bytes): MAGIA(5) | versão(1) | hashes por item(1) | reservado(1) |
+#                         número de blocos(8) | itens inseridos(8) | taxa de falsos positivos(8)
+#   blocos:               N × 64 bytes (512 bits)
+#
+# É um filtro de Bloom "em blocos": todos os bits de um item ficam no mesmo bloco de 64 bytes
+# (uma linha de cache), escolhido pelos primeiros 8 bytes do SHA-1; as posições dentro do bloco
+# saem dos 12 bytes seguintes. Cada consulta lê um único bloco do arquivo mapeado com mmap, então
+# um índice de gigabytes não precisa caber na memória e cada verificação toca uma única página.
+#
+# A origem pode ser um dump no estilo HIBP ("SHA1:contagem" por linha, em hexadecimal) ou uma
+# lista de palavras (uma senha por linha); as duas podem ser misturadas. Como o índice guarda
+# apenas bits, uma senha ausente nunca é acusada, e uma presente pode ser acusada por engano com
+# a taxa escolhida na criação.
+
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+
+import metricas
+import motor_senhas
+
+MAGIA = b"GSBLM"
+VERSAO = 1
+EXTENSAO = ".vaz"
+TAMANHO_BLOCO = 64                  # bytes por bloco (512 bits)
+BITS_POSICAO = 9                    # log2(512): bits do SHA-1 usados por posição no bloco
+HASHES_MAXIMO = 96 // BITS_POSICAO  # posições que cabem nos 12 bytes restantes do SHA-1
+TAXA_FALSOS_POSITIVOS = 0.001
+TAMANHO_MINIMO_PALAVRA = 4          # núcleo mínimo para conferir a senha sem números/símbolos nas pontas
+TAMANHO_LEITURA = 1 << 20
+
+_FORMATO_CABECALHO = ">5sBBxQQd"
+TAMANHO_CABECALHO = 64
+_LINHA_HASH = re.compile(rb"[0-9A-Fa-f]{40}(?::\d+)?")
+_BORDAS = motor_senhas.NUMEROS + motor_senhas.CARACTERES_ESPECIAIS + " "
+
+
+def dimensionar(quantidade, taxa_falsos_positivos=TAXA_FALSOS_POSITIVOS, hashes_maximo=HASHES_MAXIMO):
+    """
+    Retorna (número de blocos, hashes por item) para `quantidade` itens com a taxa pedida.
+    Limitar `hashes_maximo` deixa cada operação mais barata em troca de um índice maior.
+    """
+    quantidade = max(1, quantidade)
+    hashes = max(1, min(hashes_maximo, HASHES_MAXIMO, round(-math.log2(taxa_falsos_positivos))))
+    # Bits para p = (1 - e^(-k·n/m))^k, com 20% a mais para compensar a concentração em blocos
+    bits = -hashes * quantidade / math.log(1 - taxa_falsos_positivos ** (1 / hashes)) * 1.2
+    return max(1, math.ceil(bits / (TAMANHO_BLOCO * 8))), hashes
+
+
+def mascara_bloco(resto, hashes):
+    """Máscara de 512 bits com `hashes` posições tiradas de `resto` (9 bits por posição)."""
+    mascara = 0
+    for _ in range(hashes):
+        mascara |= 1 << (resto & 511)
+        resto >>= BITS_POSICAO
+    return mascara
+
+
+def _localizar(digest, num_blocos, hashes):
+    """Offset do bloco e máscara de bits de um SHA-1."""
+    bloco = int.from_bytes(digest[:8], 'big') % num_blocos
+    return TAMANHO_CABECALHO + bloco * TAMANHO_BLOCO, mascara_bloco(int.from_bytes(digest[8:20], 'big'), hashes)
+
+
+def _sha1(senha):
+    return hashlib.sha1(senha.encode('utf-8')).digest()
+
+
+def _palavra_base(senha):
+    """
+    A palavra em que a senha se baseia, em minúsculas e sem números/símbolos nas pontas
+    ("Dragao2024!" -> "dragao"), ou None se não sobrar uma palavra diferente da própria senha.
+    Senhas sorteadas quase nunca têm uma, então o lote raramente paga um segundo SHA-1.
+    """
+    nucleo = senha.lower().strip(_BORDAS)
+    if nucleo != senha and len(nucleo) >= TAMANHO_MINIMO_PALAVRA and nucleo.isalpha():
+        return nucleo
+    return None
+
+
+class FiltroVazamentos:
+    """Índice de senhas vazadas aberto com mmap (somente leitura)."""
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.f = open(caminho, 'rb')
+        try:
+            cabecalho = self.f.read(TAMANHO_CABECALHO)
+            if len(cabecalho) < TAMANHO_CABECALHO:
+                raise ValueError("Índice de senhas vazadas incompleto.")
+            magia, versao, self.hashes, self.num_blocos, self.quantidade, self.taxa_falsos_positivos = struct.unpack_from(_FORMATO_CABECALHO, cabecalho)
+            if magia != MAGIA:
+                raise ValueError("O arquivo não é um índice de senhas vazadas.")
+            if versao != VERSAO:
+                raise ValueError(f"Versão de índice não suportada: {versao}.")
+            if os.fstat(self.f.fileno()).st_size < TAMANHO_CABECALHO + self.num_blocos * TAMANHO_BLOCO:
+                raise ValueError("Índice de senhas vazadas truncado.")
+            self.mapa = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.f.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.mapa.close()
+        self.f.close()
+
+    def contem_hash(self, digest):
+        """Indica se o SHA-1 (20 bytes) está no índice."""
+        offset = TAMANHO_CABECALHO + int.from_bytes(digest[:8], 'big') % self.num_blocos * TAMANHO_BLOCO
+        bloco = int.from_bytes(self.mapa[offset:offset + TAMANHO_BLOCO], 'little')
+        resto = int.from_bytes(digest[8:20], 'big')
+        # Testa bit a bit: para itens ausentes, quase sempre um dos primeiros bits já está zerado
+        for _ in range(self.hashes):
+            if not bloco >> (resto & 511) & 1:
+                return False
+            resto >>= BITS_POSICAO
+        return True
+
+    def __contains__(self, senha):
+        """A senha exata está no índice."""
+        return self.contem_hash(_sha1(senha))
+
+    def comprometida(self, senha):
+        """A senha, ou a palavra em que ela se baseia, está no índice."""
+        if senha in self:
+            return True
+        palavra = _palavra_base(senha)
+        return palavra is not None and palavra in self
+
+    @metricas.cronometrar("vazamentos.verificar_lote", itens=len)
+    def verificar_lote(self, senhas):
+        """Lista de booleanos: quais senhas do lote estão comprometidas."""
+        resultado = list(map(self.contem_hash, map(_sha1, senhas)))
+        for i, palavra in enumerate(map(_palavra_base, senhas)):
+            if palavra is not None and not resultado[i]:
+                resultado[i] = palavra in self
+        return resultado
+
+
+def _digests(caminho, progresso_bytes):
+    """Gera o SHA-1 de cada linha: hashes hexadecimais (HIBP) são usados direto; palavras são calculadas."""
+    with open(caminho, 'rb') as f:
+        lidos = 0
+        for linha in f:
+            lidos += len(linha)
+            linha = linha.strip()
+            if not linha:
+                continue
+            if _LINHA_HASH.fullmatch(linha):
+                yield bytes.fromhex(linha[:40].decode('ascii'))
+            else:
+                yield hashlib.sha1(linha).digest()
+            if lidos >= TAMANHO_LEITURA:
+                progresso_bytes(lidos)
+                lidos = 0
+        progresso_bytes(lidos)
+
+
+def contar_linhas(caminhos):
+    """Conta as linhas dos arquivos de origem (usado para dimensionar o filtro)."""
+    total = 0
+    for caminho in caminhos:
+        ultimo = b"\n"
+        with open(caminho, 'rb') as f:
+            while bloco := f.read(TAMANHO_LEITURA):
+                total += bloco.count(b"\n")
+                ultimo = bloco[-1:]
+        if ultimo != b"\n":
+            total += 1
+    return total
+
+
+def construir_filtro(origens, destino, taxa_falsos_positivos=TAXA_FALSOS_POSITIVOS, progresso=None, cancelar=None):
+    """
+    Cria o índice `destino` a partir dos arquivos `origens` (dumps SHA-1 e/ou listas de palavras).
+    `progresso(bytes_lidos, bytes_totais)` acompanha a leitura e `cancelar()` retornando True
+    interrompe a criação (o arquivo parcial é removido). Retorna um resumo, ou None se cancelado.
+    """
+    if not 0 < taxa_falsos_positivos < 1:
+        raise ValueError("A taxa de falsos positivos deve estar entre 0 e 1.")
+    quantidade_estimada = contar_linhas(origens)
+    num_blocos, hashes = dimensionar(quantidade_estimada, taxa_falsos_positivos)
+    total_bytes = sum(os.path.getsize(caminho) for caminho in origens)
+    lidos = [0]
+
+    def avancar(n):
+        lidos[0] += n
+        if progresso: progresso(lidos[0], total_bytes)
+
+    temporario = destino + ".parcial"
+    inseridos = 0
+    concluido = False
+    with open(temporario, 'wb+') as f:
+        try:
+            f.truncate(TAMANHO_CABECALHO + num_blocos * TAMANHO_BLOCO)
+            with mmap.mmap(f.fileno(), 0) as mapa:
+                for caminho in origens:
+                    for digest in _digests(caminho, avancar):
+                        offset, mascara = _localizar(digest, num_blocos, hashes)
+                        bloco = int.from_bytes(mapa[offset:offset + TAMANHO_BLOCO], 'little') | mascara
+                        mapa[offset:offset + TAMANHO_BLOCO] = bloco.to_bytes(TAMANHO_BLOCO, 'little')
+                        inseridos += 1
+                        if cancelar and not inseridos & 0xFFFF and cancelar():
+                            return None
+                mapa[:TAMANHO_CABECALHO] = struct.pack(_FORMATO_CABECALHO, MAGIA, VERSAO, hashes, num_blocos, inseridos,
+                                                       taxa_falsos_positivos).ljust(TAMANHO_CABECALHO, b"\0")
+                mapa.flush()
+            concluido = True
+        finally:
+            f.close()
+            if concluido:
+                os.replace(temporario, destino)
+            elif os.path.exists(temporario):
+                os.remove(temporario)
+    return {"itens": inseridos, "blocos": num_blocos, "hashes": hashes, "tamanho": TAMANHO_CABECALHO + num_blocos * TAMANHO_BLOCO}
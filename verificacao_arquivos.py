@@ -0,0 +1,214 @@
+# %% Verificação de Integridade (confere chave e autenticação sem descriptografar para o disco)
+#
+# Para auditar backups: confere se cada arquivo abre com a sua chave e se nenhum byte foi alterado,
+# sem pedir um destino e sem gravar conteúdo em claro.
+#   .enc em blocos: a tag AES-GCM de cada bloco (cripto_arquivos.verificar_fluxo); o conteúdo de um
+#                   bloco só existe na memória durante a conferência e não é descomprimido
+#   .enc antigo:    o HMAC do token Fernet, em fluxo (nada é decifrado)
+#   .cofre:         o índice e a tag de cada bloco, sem desempacotar as senhas
+#   .txt antigo:    o HMAC de cada linha Fernet (sem decifrar)
+# A memória fica limitada a um bloco por arquivo em andamento, e vários arquivos são conferidos ao
+# mesmo tempo (a leitura do disco é o gargalo, não a AES-GCM).
+#
+# Resultado de cada arquivo:
+#   ok:              todas as tags conferem
+#   chave_incorreta: nenhuma das chaves autentica o início do arquivo, ou o token inteiro no .enc
+#                    antigo (chave errada ou conteúdo alterado: a tag não distingue os dois casos)
+#   corrompido:      o início confere, mas um bloco, o índice ou a estrutura do arquivo não
+#   erro:            o arquivo não pôde ser lido, ou não há chave para ele
+#   cancelado
+
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+
+import cofre_senhas
+import cripto_arquivos
+import derivacao_chaves
+import metricas
+import rotacao_chaves
+
+EXTENSOES = (".enc", cofre_senhas.EXTENSAO)  # procuradas ao verificar uma pasta
+EXTENSAO_CHAVE = ".key"
+OK = "ok"
+CHAVE_INCORRETA = "chave_incorreta"
+CORROMPIDO = "corrompido"
+ERRO = "erro"
+CANCELADO = "cancelado"
+_CONTAGENS = {OK: "ok", CHAVE_INCORRETA: "chave_incorreta", CORROMPIDO: "corrompidos", ERRO: "erros"}
+
+
+def caminho_chave_ao_lado(caminho):
+    """O .key com o nome do arquivo, como a interface sugere ao criptografar (dump.sql.enc → dump.sql.key)."""
+    return os.path.splitext(caminho)[0] + EXTENSAO_CHAVE
+
+
+class ChavesVerificacao:
+    """
+    Chaves aceitas na verificação: `chaves` (conteúdo de arquivos .key), a senha mestra `senha`
+    para os arquivos que guardam parâmetros de derivação (derivada uma vez por sal) e, com
+    `chave_ao_lado`, o .key com o nome de cada arquivo (ver `caminho_chave_ao_lado`). Conteúdos
+    que não são chaves Fernet são ignorados.
+    """
+    def __init__(self, chaves=(), senha=None, chave_ao_lado=False):
+        self.chaves = list(chaves)
+        self.senha = senha
+        self.chave_ao_lado = chave_ao_lado
+        self.cache = derivacao_chaves.CacheChaves()
+
+    def candidatas(self, caminho):
+        """Chaves a tentar em `caminho`. Levanta ValueError se nenhuma fonte de chave serve para ele."""
+        candidatas = []
+        parametros = derivacao_chaves.parametros_do_arquivo(caminho)
+        if parametros is not None:
+            if self.senha is None:
+                raise ValueError("Este arquivo usa senha mestra: informe a senha.")
+            try:
+                candidatas.append(self.cache.obter(parametros, self.senha))
+            except ValueError:
+                pass  # senha que não confere com o verificador: o arquivo sai como chave incorreta
+            return candidatas
+        candidatas.extend(self.chaves)
+        if self.chave_ao_lado and os.path.isfile(caminho_chave_ao_lado(caminho)):
+            with open(caminho_chave_ao_lado(caminho), 'rb') as f:
+                candidatas.append(f.read())
+        if not candidatas:
+            raise ValueError("Nenhuma chave para este arquivo: informe o .key (ou deixe-o ao lado, com o mesmo nome).")
+        validas = [chave for chave in candidatas if cripto_arquivos.chave_valida(chave)]
+        if not validas:
+            raise ValueError("Nenhum dos .key informados contém uma chave válida (32 bytes em base64 url-safe).")
+        return validas
+
+
+def expandir_caminhos(caminhos):
+    """Os arquivos de `caminhos`, com cada pasta trocada pelos .enc e .cofre dentro dela (em ordem)."""
+    for caminho in caminhos:
+        if not os.path.isdir(caminho):
+            yield caminho
+            continue
+        for pasta, subpastas, arquivos in os.walk(caminho):
+            subpastas.sort()
+            for nome in sorted(arquivos):
+                if nome.lower().endswith(EXTENSOES):
+                    yield os.path.join(pasta, nome)
+
+
+def _escolher_chave(candidatas, testar):
+    """A primeira candidata que `testar` aceita, ou None."""
+    for chave in candidatas:
+        try:
+            testar(chave)
+        except InvalidToken:
+            continue
+        return chave
+    return None
+
+
+def _tokens(f):
+    """(número da linha, token) de cada linha não vazia de um arquivo no formato antigo."""
+    for numero, linha in enumerate(f, 1):
+        token = linha.strip()
+        if token:
+            yield numero, token
+
+
+def _verificar_linhas(caminho, candidatas, cancelar):
+    with open(caminho, 'rb') as f:
+        tokens = _tokens(f)
+        primeiro = next(tokens, None)
+        if primeiro is None:
+            return OK, {"tokens": 0}
+        chave = _escolher_chave(candidatas, lambda chave: Fernet(chave).extract_timestamp(primeiro[1]))
+        if chave is None:
+            return CHAVE_INCORRETA, {}
+        fernet = Fernet(chave)
+        total = 1
+        for numero, token in tokens:
+            try:
+                fernet.extract_timestamp(token)  # confere o HMAC sem decifrar
+            except InvalidToken:
+                return CORROMPIDO, {"erro": f"O token da linha {numero} não confere."}
+            total += 1
+            if cancelar and total % rotacao_chaves.TOKENS_POR_CONSULTA == 0 and cancelar():
+                return CANCELADO, {}
+    return OK, {"tokens": total}
+
+
+def _verificar_legado(caminho, candidatas):
+    with open(caminho, 'rb') as f:
+        chave = _escolher_chave(candidatas, lambda chave: cripto_arquivos.verificar_legado_fluxo(f, chave))
+    return (OK, {}) if chave is not None else (CHAVE_INCORRETA, {})
+
+
+def _verificar_enc(caminho, candidatas, progresso, trabalhadores, cancelar):
+    chave = _escolher_chave(candidatas, rotacao_chaves.testador_enc(caminho))
+    if chave is None:
+        return CHAVE_INCORRETA, {}
+    with open(caminho, 'rb') as f:
+        conferidos = cripto_arquivos.verificar_fluxo(f, chave, progresso, trabalhadores, cancelar=cancelar)
+    return (CANCELADO, {}) if conferidos is None else (OK, {})
+
+
+def _verificar_cofre(caminho, candidatas, cancelar):
+    chave = _escolher_chave(candidatas, rotacao_chaves.testador_cofre(caminho))
+    if chave is None:
+        return CHAVE_INCORRETA, {}
+    with cofre_senhas.Cofre(caminho, chave) as cofre:
+        total = cofre_senhas.verificar_cofre(cofre, cancelar)
+    return (CANCELADO, {}) if total is None else (OK, {"registros": total})
+
+
+def verificar_arquivo(caminho, chaves, progresso=None, trabalhadores=1, cancelar=None):
+    """
+    Confere um arquivo com as chaves de `chaves` (um ChavesVerificacao). Retorna um dicionário com
+    "caminho", "formato", "bytes", "status" (ver o início do módulo) e, conforme o caso, "erro" e
+    as contagens do formato. `progresso(bytes conferidos)` só é chamado nos .enc em blocos.
+    """
+    entrada = {"caminho": caminho}
+    try:
+        entrada["bytes"] = os.path.getsize(caminho)
+        entrada["formato"] = formato = rotacao_chaves.formato_arquivo(caminho)
+        candidatas = chaves.candidatas(caminho)
+    except (OSError, ValueError) as e:
+        entrada.update(status=ERRO, erro=str(e))
+        return entrada
+    try:
+        if formato == rotacao_chaves.FORMATO_ENC:
+            status, detalhes = _verificar_enc(caminho, candidatas, progresso, trabalhadores, cancelar)
+        elif formato == rotacao_chaves.FORMATO_COFRE:
+            status, detalhes = _verificar_cofre(caminho, candidatas, cancelar)
+        elif caminho.lower().endswith(".enc"):
+            status, detalhes = _verificar_legado(caminho, candidatas)
+        else:
+            status, detalhes = _verificar_linhas(caminho, candidatas, cancelar)
+    except InvalidToken:
+        status, detalhes = CORROMPIDO, {"erro": "Um bloco ou o índice não confere (conteúdo alterado)."}
+    except ValueError as e:
+        status, detalhes = CORROMPIDO, {"erro": str(e)}  # cabeçalho, tamanhos ou fim do arquivo inválidos
+    except OSError as e:
+        status, detalhes = ERRO, {"erro": str(e)}
+    if status == CHAVE_INCORRETA:
+        detalhes["erro"] = "Nenhuma das chaves autentica o arquivo (chave errada ou conteúdo alterado)."
+    entrada.update(detalhes, status=status)
+    return entrada
+
+
+@metricas.cronometrar("verificacao.lote", itens=lambda resumo: resumo["total"])
+def verificar_arquivos(caminhos, chaves, trabalhadores=cripto_arquivos.TRABALHADORES_PADRAO, progresso=None, cancelar=None,
+                       ao_verificar=None):
+    """
+    Confere vários arquivos (pastas são expandidas para os .enc e .cofre dentro delas), até
+    `trabalhadores` ao mesmo tempo. `ao_verificar(entrada)` recebe o resultado de cada arquivo assim
+    que ele termina (em ordem de conclusão); `progresso(feitos, total)` é chamado a cada arquivo;
+    `cancelar()` retornando True interrompe a auditoria. Retorna um resumo com as contagens por
+    resultado, os bytes conferidos e, em "arquivos", as entradas na ordem de `caminhos`.
+    """
+    caminhos = list(dict.fromkeys(expandir_caminhos(caminhos)))
+    resumo = {"total": len(caminhos), "ok": 0, "chave_incorreta": 0, "corrompidos": 0, "erros": 0, "bytes": 0, "cancelado": False}
+
+    def concluido(entrada):
+        if entrada["status"] == OK:
+            resumo["bytes"] += entrada["bytes"]
+        if ao_verificar: ao_verificar(entrada)
+    return rotacao_chaves.processar_arquivos(lambda caminho, trabalhadores_bloco: verificar_arquivo(caminho, chaves, None, trabalhadores_bloco, cancelar),
+                                             caminhos, resumo, _CONTAGENS, trabalhadores, progresso, cancelar, concluido)